@@ -6,6 +6,7 @@ from .signature_remover import remove_signatures, remove_signatures_batch
 from .pdfa_converter import convert_to_pdfa, convert_to_pdfa_batch
 from .batch_processor import process_pdf_batch, ProcessingOptions
 from .signer import sign_pdf, sign_pdf_batch, SigningOptions, find_pkcs11_library, list_certificates_from_token
+from .batch_signer import BatchSigner
 
 __all__ = [
     'remove_signatures',
@@ -16,6 +17,7 @@ __all__ = [
     'ProcessingOptions',
     'sign_pdf',
     'sign_pdf_batch',
+    'BatchSigner',
     'SigningOptions',
     'find_pkcs11_library',
     'list_certificates_from_token'
@@ -2,20 +2,45 @@
 # Dávkové zpracování PDF souborů - kompletní flow
 # Build 1.1 | © 2025 Ing. Martin Cieślar
 
+import io
 import os
+import sys
+import time
+import tempfile
 import shutil
 import logging
+import threading
 from pathlib import Path
-from dataclasses import dataclass
-from typing import List, Optional, Callable
+from dataclasses import dataclass, field
+from typing import List, Optional, Callable, Dict, Tuple
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from .signature_remover import remove_signatures
-from .pdfa_converter import convert_to_pdfa
+from .signature_remover import (remove_signatures, remove_signatures_to_stream,
+                                PIKEPDF_AVAILABLE, PYPDF_AVAILABLE)
+from .pdfa_converter import convert_to_pdfa, find_ghostscript, _create_pdfa_def
 from .signer import sign_pdf, SigningOptions
 
 logger = logging.getLogger(__name__)
 
+# Rychlá předkontrola (PDF/A značky, podpisy) z enginu DokuCheck – pdf_checker.py leží vedle agenta
+# (pdfcheck_agent / desktop_agent); bez něj se zpracuje každý soubor jako dřív
+try:
+    from pdf_checker import scan_pdfa_markers, check_signature_data
+    PRECHECK_AVAILABLE = True
+except ImportError:
+    _AGENT_DIR = Path(__file__).resolve().parents[2] / "desktop_agent"
+    if (_AGENT_DIR / "pdf_checker.py").is_file() and str(_AGENT_DIR) not in sys.path:
+        sys.path.append(str(_AGENT_DIR))
+    try:
+        from pdf_checker import scan_pdfa_markers, check_signature_data
+        PRECHECK_AVAILABLE = True
+    except ImportError:
+        PRECHECK_AVAILABLE = False
+        logger.warning("pdf_checker není k dispozici, předkontrola PDF/A a podpisů se přeskočí")
+
+# Odhad paměti jednoho běhu Ghostscriptu (pdfwrite) pro určení počtu souběžných konverzí
+GS_MEMORY_MB = 512
+
 
 @dataclass
 class ProcessingOptions:
@@ -33,6 +58,8 @@ class ProcessingOptions:
     use_auto_suffix: bool = True        # Použít automatický suffix podle operací
     use_signed_subfolder: bool = False  # Ukládat do podsložky "Signed"
     max_workers: int = 4                # Počet paralelních vláken
+    skip_compliant: bool = True         # Soubor už v cílovém PDF/A a bez podpisů jen zkopírovat (bez Ghostscriptu)
+    pipe_max_mb: int = 64               # Do této velikosti jde očištěné PDF Ghostscriptu rourou z paměti, větší přes tmpfs spool
 
 
 @dataclass
@@ -43,28 +70,225 @@ class ProcessingResult:
     success: bool
     steps: List[str]  # Provedené kroky
     error: Optional[str] = None
+    skipped: bool = False               # Konverze nebyla potřeba (předkontrola), výstup je kopie vstupu
+    timings: Dict[str, float] = field(default_factory=dict)  # Doba kroků v sekundách (precheck, remove_signatures, convert_to_pdfa, sign, total)
 
 
-def process_single_pdf(input_path: str, options: ProcessingOptions) -> ProcessingResult:
+@dataclass
+class PrecheckResult:
+    """Výsledek rychlé předkontroly (pdf_checker) jednoho souboru"""
+    pdfa_part: Optional[int] = None     # pdfaid:part (1, 2, 3) nebo None
+    conformance: Optional[str] = None   # pdfaid:conformance malým písmenem ('b', 'a', 'u') nebo None
+    signed: bool = True                 # Obsahuje podpisové objekty (/Type /Sig) – při nejistotě True
+
+
+class BatchTools:
+    """
+    Sdílené prostředky jedné dávky: Ghostscript se hledá jednou, PDFA definition soubor se vytvoří jednou
+    a souběh Ghostscriptu hlídá semafor (gs_slots). Po dávce close() smaže definition soubor.
+    """
+
+    def __init__(self, options: ProcessingOptions):
+        self.gs_path = find_ghostscript() if (options.convert_to_pdfa or options.remove_signatures) else None
+        self.pdfa_def = None
+        if options.convert_to_pdfa and self.gs_path:
+            self.pdfa_def = _create_pdfa_def(options.pdfa_version, options.pdfa_conformance)
+        self.spool_dir = _spool_dir()
+        self.gs_workers = ghostscript_concurrency(options.max_workers)
+        self.gs_slots = threading.BoundedSemaphore(self.gs_workers)
+
+    def close(self):
+        if self.pdfa_def and os.path.exists(self.pdfa_def):
+            try:
+                os.remove(self.pdfa_def)
+            except OSError:
+                pass
+        self.pdfa_def = None
+
+
+def _available_memory_mb() -> Optional[int]:
+    """Volná fyzická paměť v MB (Windows GlobalMemoryStatusEx, POSIX sysconf), nebo None."""
+    try:
+        if os.name == "nt":
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                            ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                            ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                            ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                            ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return int(status.ullAvailPhys // (1024 * 1024))
+            return None
+        return int(os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024))
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def ghostscript_concurrency(max_workers: int) -> int:
+    """Počet souběžných běhů Ghostscriptu: nejvýš max_workers, počet CPU a volná paměť / GS_MEMORY_MB."""
+    limit = max(1, min(max_workers or 1, os.cpu_count() or 1))
+    memory_mb = _available_memory_mb()
+    if memory_mb is not None:
+        limit = max(1, min(limit, memory_mb // GS_MEMORY_MB))
+    return limit
+
+
+def precheck_pdf(input_path: str) -> Optional[PrecheckResult]:
+    """Rychlá předkontrola bez Ghostscriptu (pdf_checker). None = nelze posoudit, soubor se zpracuje celý."""
+    if not PRECHECK_AVAILABLE:
+        return None
+    try:
+        with open(input_path, "rb") as f:
+            content = f.read()
+    except OSError:
+        return None
+    markers = scan_pdfa_markers(content)
+    signatures = check_signature_data(content)
+    signed = bool(signatures.get("has_signature") or signatures.get("sig_count")
+                  or b"/Type /Sig" in content or b"/Type/Sig" in content)
+    return PrecheckResult(pdfa_part=markers.get("part"), conformance=markers.get("conformance"), signed=signed)
+
+
+def _is_compliant(precheck: Optional[PrecheckResult], options: ProcessingOptions) -> bool:
+    """Soubor už odpovídá cíli (PDF/A stejné verze a conformance, bez podpisů) – Ghostscript není potřeba."""
+    if precheck is None or precheck.signed:
+        return False
+    if not options.convert_to_pdfa:
+        return True  # jen odstranění podpisů a žádné nejsou
+    if str(precheck.pdfa_part or "") != str(options.pdfa_version):
+        return False
+    return precheck.conformance in (None, options.pdfa_conformance.lower())
+
+
+def process_single_pdf(input_path: str, options: ProcessingOptions,
+                       precheck: Optional[PrecheckResult] = None,
+                       tools: Optional[BatchTools] = None) -> ProcessingResult:
     """
     Zpracuje jeden PDF soubor podle nastavených možností.
 
     Flow:
-    1. (volitelně) Odstranění podpisů
-    2. (volitelně) Převod na PDF/A
-    3. (budoucnost) Podepsání
+    1. (volitelně) Odstranění podpisů – přeskočí se, pokud předkontrola nenašla žádný podpis
+    2. (volitelně) Převod na PDF/A – soubor už v cílovém PDF/A bez podpisů se jen zkopíruje
+    3. (volitelně) Podepsání
 
     Args:
         input_path: Cesta k vstupnímu PDF
         options: Nastavení zpracování
+        precheck: Výsledek precheck_pdf (None = bez předkontroly)
+        tools: Sdílené prostředky dávky (None = Ghostscript se hledá pro tento soubor)
 
     Returns:
         ProcessingResult
     """
-    input_path = Path(input_path)
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    skip = (options.convert_to_pdfa or options.remove_signatures) and options.skip_compliant \
+        and _is_compliant(precheck, options)
+    result = _process_single_pdf(Path(input_path), options, precheck, tools, skip, timings)
+    result.skipped = skip and result.success
+    result.timings = timings
+    timings["total"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def _timed(timings: Dict[str, float], step: str, slots: Optional[threading.BoundedSemaphore], func, *args, **kwargs):
+    """Spustí krok (Ghostscript pod semaforem dávky) a přičte jeho dobu do timings[step]."""
+    started = time.perf_counter()
+    if slots is None:
+        out = func(*args, **kwargs)
+    else:
+        with slots:
+            out = func(*args, **kwargs)
+    timings[step] = round(timings.get(step, 0.0) + time.perf_counter() - started, 3)
+    return out
+
+
+def _spool_dir() -> Optional[str]:
+    """Složka pro spool souborů nad limitem roury: tmpfs (/dev/shm), jinak None = systémový temp."""
+    shm = "/dev/shm"
+    if os.path.isdir(shm) and os.access(shm, os.W_OK):
+        return shm
+    return None
+
+
+def _remove_signatures_into_pdfa(input_path: Path, final_path: Path, options: ProcessingOptions,
+                                 tools: Optional[BatchTools], timings: Dict[str, float],
+                                 automatic: bool = False) -> Tuple[bool, List[str], Optional[str]]:
+    """
+    Odstranění podpisů a PDF/A bez mezisouborů na disku: pikepdf/pypdf uloží očištěné PDF do paměti,
+    Ghostscript ho čte rourou (stdin) a zapisuje rovnou do final_path. Vstup nad options.pipe_max_mb
+    se místo do paměti uloží do spool souboru v tmpfs. Bez PDF knihovny čte Ghostscript originál –
+    pdfwrite podpisy nepřenáší (stejně jako _remove_signatures_ghostscript).
+
+    Returns:
+        Tuple (success, kroky, chyba)
+    """
+    steps = []
+    suffix = " (automaticky před PDF/A konverzí)" if automatic else ""
+    spool_dir = tools.spool_dir if tools else _spool_dir()
+    gs_kwargs = {
+        "gs_path": tools.gs_path if tools else None,
+        "pdfa_def": tools.pdfa_def if tools else None,
+        "spool_dir": spool_dir,
+    }
+    gs_slots = tools.gs_slots if tools else None
+
+    def convert(source: str, **kwargs):
+        return _timed(timings, "convert_to_pdfa", gs_slots, convert_to_pdfa, source, str(final_path),
+                      options.pdfa_version, options.pdfa_conformance, **gs_kwargs, **kwargs)
+
+    if not (PIKEPDF_AVAILABLE or PYPDF_AVAILABLE):
+        steps.append(f"Podpisy: odstraněny Ghostscriptem při konverzi{suffix}")
+        success, message = convert(str(input_path))
+        return success, steps, None if success else f"Konverze na PDF/A selhala: {message}"
+
+    spool_path = None
+    try:
+        started = time.perf_counter()
+        if input_path.stat().st_size > options.pipe_max_mb * 1024 * 1024:
+            with tempfile.NamedTemporaryFile(prefix="_spool_", suffix=".pdf", dir=spool_dir, delete=False) as spool:
+                spool_path = spool.name
+                success, message = remove_signatures_to_stream(str(input_path), spool)
+            buffer = None
+        else:
+            buffer = io.BytesIO()
+            success, message = remove_signatures_to_stream(str(input_path), buffer)
+        timings["remove_signatures"] = round(time.perf_counter() - started, 3)
+
+        if not success:
+            error = f"Odstranění podpisů selhalo: {message}"
+            if automatic:
+                error = f"PDF/A vyžaduje odstranění podpisů, ale odstranění selhalo: {message}"
+            return False, steps, error
+        steps.append(f"Podpisy: {message}{suffix}")
+
+        if buffer is None:
+            success, message = convert(spool_path)
+        else:
+            with buffer.getbuffer() as data:
+                success, message = convert(str(input_path), input_data=data)
+            buffer.close()
+        return success, steps, None if success else f"Konverze na PDF/A selhala: {message}"
+    finally:
+        if spool_path:
+            try:
+                os.remove(spool_path)
+            except OSError as e:
+                logger.warning(f"Nelze smazat spool soubor {spool_path}: {e}")
+
+
+def _process_single_pdf(input_path: Path, options: ProcessingOptions, precheck: Optional[PrecheckResult],
+                        tools: Optional[BatchTools], skip: bool, timings: Dict[str, float]) -> ProcessingResult:
     steps = []
     current_file = str(input_path)
-    temp_files = []
+    gs_path = tools.gs_path if tools else None
+    pdfa_def = tools.pdfa_def if tools else None
+    gs_slots = tools.gs_slots if tools else None
 
     try:
         # Určíme výstupní složku
@@ -133,21 +357,34 @@ def process_single_pdf(input_path: str, options: ProcessingOptions) -> Processin
                 final_path = output_dir / f"{base_name}{final_suffix}({counter:02d}).pdf"
                 counter += 1
 
-        # Krok 1: Odstranění podpisů
-        if options.remove_signatures:
-            # Pokud budeme dělat i konverzi, použijeme dočasný soubor
+        unsigned = precheck is not None and not precheck.signed
+
+        if skip:
+            # Předkontrola: už v cílovém stavu – kopie místo Ghostscriptu (podpis případně níže)
+            started = time.perf_counter()
+            shutil.copy2(current_file, final_path)
+            timings["copy"] = round(time.perf_counter() - started, 3)
             if options.convert_to_pdfa:
-                unsigned_path = output_dir / f"_temp_{input_path.stem}_unsigned.pdf"
-                temp_files.append(unsigned_path)
+                steps.append(f"PDF/A: již PDF/A-{options.pdfa_version}{options.pdfa_conformance} bez podpisů – zkopírováno bez konverze")
             else:
-                # Jinak přímo finální soubor
-                unsigned_path = final_path
+                steps.append("Podpisy: soubor žádné neobsahuje – zkopírováno")
+            current_file = str(final_path)
+
+        # Krok 1: Odstranění podpisů
+        elif options.remove_signatures and unsigned:
+            # Žádné podpisy – krok odpadá; bez konverze stačí kopie
+            steps.append("Podpisy: soubor žádné neobsahuje – krok přeskočen")
+            if not options.convert_to_pdfa:
+                shutil.copy2(current_file, final_path)
+                current_file = str(final_path)
 
-            success, message = remove_signatures(current_file, str(unsigned_path))
+        elif options.remove_signatures and not options.convert_to_pdfa:
+            success, message = _timed(timings, "remove_signatures", gs_slots,
+                                      remove_signatures, current_file, str(final_path), gs_path=gs_path)
 
             if success:
                 steps.append(f"Podpisy: {message}")
-                current_file = str(unsigned_path)
+                current_file = str(final_path)
             else:
                 return ProcessingResult(
                     input_file=str(input_path),
@@ -158,32 +395,28 @@ def process_single_pdf(input_path: str, options: ProcessingOptions) -> Processin
                 )
 
         # Krok 2: Převod na PDF/A
-        if options.convert_to_pdfa:
-            # PDF/A nemůže obsahovat podpisy - pokud nebyly odstraněny, odstraníme je teď
-            if not options.remove_signatures:
-                # Musíme odstranit podpisy před konverzí na PDF/A
-                temp_unsigned = output_dir / f"_temp_{input_path.stem}_unsigned_for_pdfa.pdf"
-                temp_files.append(temp_unsigned)
-                
-                success, message = remove_signatures(current_file, str(temp_unsigned))
-                if success:
-                    steps.append(f"Podpisy: {message} (automaticky před PDF/A konverzí)")
-                    current_file = str(temp_unsigned)
-                else:
-                    return ProcessingResult(
-                        input_file=str(input_path),
-                        output_file=None,
-                        success=False,
-                        steps=steps,
-                        error=f"PDF/A vyžaduje odstranění podpisů, ale odstranění selhalo: {message}"
-                    )
-            
-            success, message = convert_to_pdfa(
-                current_file,
-                str(final_path),
-                options.pdfa_version,
-                options.pdfa_conformance
-            )
+        if options.convert_to_pdfa and not skip:
+            if unsigned:
+                # Předkontrola nenašla podpisy – Ghostscript čte rovnou vstupní soubor
+                success, message = _timed(
+                    timings, "convert_to_pdfa", gs_slots,
+                    convert_to_pdfa,
+                    current_file,
+                    str(final_path),
+                    options.pdfa_version,
+                    options.pdfa_conformance,
+                    gs_path=gs_path,
+                    pdfa_def=pdfa_def
+                )
+                error = None if success else f"Konverze na PDF/A selhala: {message}"
+            else:
+                # PDF/A nemůže obsahovat podpisy – odstraní se vždy (i bez volby remove_signatures),
+                # výsledek jde Ghostscriptu rourou bez mezisouboru
+                success, pipeline_steps, error = _remove_signatures_into_pdfa(
+                    input_path, final_path, options, tools, timings,
+                    automatic=not options.remove_signatures
+                )
+                steps.extend(pipeline_steps)
 
             if success:
                 steps.append(f"PDF/A: Převedeno na PDF/A-{options.pdfa_version}{options.pdfa_conformance}")
@@ -194,7 +427,7 @@ def process_single_pdf(input_path: str, options: ProcessingOptions) -> Processin
                     output_file=None,
                     success=False,
                     steps=steps,
-                    error=f"Konverze na PDF/A selhala: {message}"
+                    error=error
                 )
 
         # Krok 3: Podepsání (Fáze 2) - PO konverzi na PDF/A
@@ -210,7 +443,8 @@ def process_single_pdf(input_path: str, options: ProcessingOptions) -> Processin
             pdfa_backup_path = current_file if options.convert_to_pdfa else None
             
             try:
-                success, message = sign_pdf(input_for_signing, str(signed_path), options.signing_options)
+                success, message = _timed(timings, "sign", None,
+                                          sign_pdf, input_for_signing, str(signed_path), options.signing_options)
                 
                 if success:
                     steps.append(f"Podpis: {message}")
@@ -258,14 +492,6 @@ def process_single_pdf(input_path: str, options: ProcessingOptions) -> Processin
                         error=f"Chyba při podepisování: {str(e)}"
                     )
 
-        # Vyčistíme dočasné soubory
-        for temp_file in temp_files:
-            try:
-                if temp_file.exists() and str(temp_file) != current_file:
-                    temp_file.unlink()
-            except Exception as e:
-                logger.warning(f"Nelze smazat dočasný soubor {temp_file}: {e}")
-
         # Pokud jsme dělali pouze odstranění podpisů (bez PDF/A), ujistíme se že výstupní soubor existuje
         if options.remove_signatures and not options.convert_to_pdfa:
             # current_file by měl být finální soubor
@@ -297,6 +523,17 @@ def process_single_pdf(input_path: str, options: ProcessingOptions) -> Processin
         )
 
 
+def _precheck_and_process(input_file: str, options: ProcessingOptions, tools: BatchTools) -> ProcessingResult:
+    """Úloha dávky: předkontrola (pdf_checker) a zpracování jednoho souboru."""
+    started = time.perf_counter()
+    precheck = precheck_pdf(input_file) if options.convert_to_pdfa or options.remove_signatures else None
+    elapsed = time.perf_counter() - started
+    result = process_single_pdf(input_file, options, precheck, tools)
+    result.timings["precheck"] = round(elapsed, 3)
+    result.timings["total"] = round(result.timings.get("total", 0.0) + elapsed, 3)
+    return result
+
+
 def process_pdf_batch(
     input_files: List[str],
     options: ProcessingOptions,
@@ -305,57 +542,76 @@ def process_pdf_batch(
     """
     Dávkové zpracování více PDF souborů.
 
+    Každý soubor nejdřív projde rychlou předkontrolou (PDF/A značky a podpisy bez Ghostscriptu):
+    soubory už v cílovém PDF/A bez podpisů se jen zkopírují, u nepodepsaných odpadá odstranění podpisů.
+    Ghostscript se hledá jednou na dávku, PDFA definition soubor se vytváří jednou a počet souběžných
+    běhů Ghostscriptu je omezen počtem CPU a volnou pamětí (ghostscript_concurrency). Větší soubory
+    se spouštějí dřív, aby dávka nečekala na jeden velký soubor na konci.
+
     Args:
         input_files: Seznam cest k PDF souborům
         options: Nastavení zpracování
-        progress_callback: Callback pro průběh (current, total, filename)
+        progress_callback: Callback pro průběh (current, total, filename) – v pořadí dokončení
 
     Returns:
-        Seznam ProcessingResult
+        Seznam ProcessingResult ve stejném pořadí jako input_files (včetně timings)
     """
-    results = []
     total = len(input_files)
+    results: List[Optional[ProcessingResult]] = [None] * total
+    tools = BatchTools(options)
 
-    # Pro malý počet souborů zpracujeme sekvenčně
-    if total <= 2 or options.max_workers <= 1:
-        for i, input_file in enumerate(input_files):
-            if progress_callback:
-                progress_callback(i + 1, total, Path(input_file).name)
-
-            result = process_single_pdf(input_file, options)
-            results.append(result)
-
-        if progress_callback:
-            progress_callback(total, total, "Hotovo")
+    try:
+        # Pro malý počet souborů zpracujeme sekvenčně
+        if total <= 2 or options.max_workers <= 1:
+            for i, input_file in enumerate(input_files):
+                if progress_callback:
+                    progress_callback(i + 1, total, Path(input_file).name)
 
-    else:
-        # Pro více souborů použijeme paralelní zpracování
-        with ThreadPoolExecutor(max_workers=options.max_workers) as executor:
-            future_to_file = {
-                executor.submit(process_single_pdf, f, options): f
-                for f in input_files
-            }
-
-            completed = 0
-            for future in as_completed(future_to_file):
-                input_file = future_to_file[future]
-                completed += 1
+                results[i] = _precheck_and_process(input_file, options, tools)
 
-                if progress_callback:
-                    progress_callback(completed, total, Path(input_file).name)
+            if progress_callback:
+                progress_callback(total, total, "Hotovo")
 
+        else:
+            # Vlákna navíc nad gs_workers obslouží předkontrolu a kopie, Ghostscript hlídá tools.gs_slots
+            def _size(index):
                 try:
-                    result = future.result()
-                    results.append(result)
-                except Exception as e:
-                    results.append(ProcessingResult(
-                        input_file=input_file,
-                        output_file=None,
-                        success=False,
-                        steps=[],
-                        error=str(e)
-                    ))
+                    return os.path.getsize(input_files[index])
+                except OSError:
+                    return 0
+
+            order = sorted(range(total), key=_size, reverse=True)
+            with ThreadPoolExecutor(max_workers=options.max_workers) as executor:
+                future_to_index = {
+                    executor.submit(_precheck_and_process, input_files[i], options, tools): i
+                    for i in order
+                }
+
+                completed = 0
+                for future in as_completed(future_to_index):
+                    index = future_to_index[future]
+                    input_file = input_files[index]
+                    completed += 1
+
+                    if progress_callback:
+                        progress_callback(completed, total, Path(input_file).name)
+
+                    try:
+                        results[index] = future.result()
+                    except Exception as e:
+                        results[index] = ProcessingResult(
+                            input_file=input_file,
+                            output_file=None,
+                            success=False,
+                            steps=[],
+                            error=str(e)
+                        )
+    finally:
+        tools.close()
 
+    skipped = sum(1 for r in results if r is not None and r.skipped)
+    if skipped:
+        logger.info(f"Dávka: {skipped}/{total} souborů už v cílovém stavu, zkopírováno bez Ghostscriptu")
     return results
 
 
@@ -428,5 +684,6 @@ if __name__ == "__main__":
         print(f"{status} {Path(r.input_file).name}")
         for step in r.steps:
             print(f"    {step}")
+        print("    Časy: " + ", ".join(f"{k} {v:.2f} s" for k, v in r.timings.items()))
         if r.error:
             print(f"    CHYBA: {r.error}")
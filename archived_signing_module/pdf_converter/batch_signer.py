@@ -0,0 +1,420 @@
+# batch_signer.py
+# Dávkové podepisování PDF – klíč načtený jednou, paralelní příprava dokumentů, sdílené spojení na TSA
+# Build 1.0 | © 2025 Ing. Martin Cieślar
+#
+# Průběh (pyHanko „interrupted signing“):
+# 1. credentials (PFX / PKCS#11 token) se načtou jednou na dávku, velikost místa pro CMS se odhadne jednou
+# 2. pracovní procesy připraví každý dokument (podpisové pole, vzhled, placeholder) rovnou do výstupního
+#    souboru a spočítají hash přes /ByteRange – privátní klíč do nich nejde, jen certifikát
+# 3. hlavní proces z hotových hashů skládá CMS: podpis klíčem včetně razítka omezuje key_concurrency (token = 1),
+#    požadavky na TSA jdou přes jednu requests.Session s nejvýš tsa_concurrency souběžnými dotazy
+# 4. CMS se zapíše do připraveného místa ve výstupním souboru (PdfTBSDocument.async_finish_signing)
+
+import os
+import io
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from typing import Tuple, List, Optional, Callable, Dict, Any
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from pyhanko.sign import signers
+from pyhanko.sign.fields import SigFieldSpec
+from pyhanko.sign.timestamps import TimeStamper, TimestampRequestError
+
+from .signer import SigningOptions, PKCS11SigningContext, _create_signature_appearance_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TSA_CONCURRENCY = 4
+DEFAULT_POSITION = (425, 20, 575, 80)  # pravý dolní roh A4, stejně jako sign_pdf při chybě zjištění stránky
+
+
+class PooledTimeStamper(TimeStamper):
+    """
+    RFC 3161 klient nad jednou requests.Session (keep-alive, pool spojení) s omezeným počtem
+    souběžných dotazů. Náhrada HTTPTimeStamper, který otevírá nové spojení pro každý dotaz.
+    """
+
+    def __init__(self, url: str, timeout: int = 5, auth=None, concurrency: int = DEFAULT_TSA_CONCURRENCY):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        super().__init__()
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = auth
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, concurrency))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+        self.requests_sent = 0
+
+    async def async_request_tsa_response(self, req):
+        from asn1crypto import tsp
+
+        def task():
+            with self._slots:
+                try:
+                    response = self.session.post(
+                        self.url,
+                        data=req.dump(),
+                        headers={"Content-Type": "application/timestamp-query"},
+                        timeout=self.timeout,
+                    )
+                except OSError as e:
+                    raise TimestampRequestError("Chyba komunikace s TSA serverem") from e
+                self.requests_sent += 1
+            if response.headers.get("Content-Type") != "application/timestamp-reply":
+                raise TimestampRequestError(f"TSA vrátilo neplatnou odpověď (HTTP {response.status_code})")
+            return tsp.TimeStampResp.load(response.content)
+
+        return await asyncio.to_thread(task)
+
+    def close(self):
+        self.session.close()
+
+
+# --- pracovní proces: příprava dokumentu a hash /ByteRange ---
+
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_prepare_worker(params: Dict[str, Any]):
+    """Initializer pracovního procesu – certifikát a nastavení dávky se předají jednou."""
+    from asn1crypto import x509 as asn1_x509
+    from pyhanko_certvalidator.registry import SimpleCertificateStore
+
+    _WORKER.clear()
+    _WORKER.update(params)
+    cert = asn1_x509.Certificate.load(params["cert_der"])
+    registry = SimpleCertificateStore.from_certs([asn1_x509.Certificate.load(der) for der in params["chain_der"]])
+    # Podpis se v procesu nepočítá – ExternalSigner slouží jen pro certifikát ve vzhledu a metadatech
+    _WORKER["signer"] = signers.ExternalSigner(cert, registry)
+
+
+def _auto_placement(input_path: str, page_number: int, position: tuple) -> Tuple[int, tuple]:
+    """Stránka a obdélník podpisu – automaticky poslední stránka, pravý dolní roh (jako sign_pdf)."""
+    if page_number >= 0 and position != (-1, -1, -1, -1):
+        return page_number, position
+    try:
+        import pikepdf
+        with pikepdf.open(input_path) as pdf:
+            page_index = len(pdf.pages) - 1
+            media_box = pdf.pages[page_index].MediaBox
+            page_width = float(media_box[2] - media_box[0])
+        x0 = page_width - 170
+        return page_index, (x0, 20, x0 + 150, 80)
+    except Exception as e:
+        logger.warning(f"Nepodařilo se zjistit poslední stránku {input_path}, použije se výchozí umístění: {e}")
+        return max(page_number, 0), position if position != (-1, -1, -1, -1) else DEFAULT_POSITION
+
+
+def _prepare_for_signing(input_path: str, output_path: str) -> Dict[str, Any]:
+    """
+    Připraví dokument k podpisu přímo do output_path (pole, vzhled, placeholder CMS)
+    a vrátí PreparedByteRangeDigest pro doplnění podpisu v hlavním procesu.
+    """
+    from pyhanko.pdf_utils.reader import PdfFileReader
+    from pyhanko.pdf_utils.writer import copy_into_new_writer
+    from pyhanko.sign.signers.pdf_signer import PdfSignatureMetadata
+
+    params = _WORKER
+    try:
+        page_number, position = _auto_placement(input_path, params["page_number"], params["position"])
+        new_field_spec = None
+        if params["visual_signature"]:
+            new_field_spec = SigFieldSpec(params["field_name"], box=position, on_page=page_number)
+        pdf_signer = signers.PdfSigner(
+            PdfSignatureMetadata(**params["metadata"]),
+            params["signer"],
+            new_field_spec=new_field_spec,
+        )
+
+        with open(input_path, "rb") as inf:
+            writer = copy_into_new_writer(PdfFileReader(io.BytesIO(inf.read())))
+
+        with open(output_path, "w+b") as outf:
+            prepared, tbs_document, _ = asyncio.run(pdf_signer.async_digest_doc_for_signing(
+                writer,
+                bytes_reserved=params["bytes_reserved"],
+                appearance_text_params=params["appearance_text_params"],
+                output=outf,
+            ))
+        return {
+            "prepared": prepared,
+            "md_algorithm": tbs_document.md_algorithm,
+            "use_pades": tbs_document.use_pades,
+        }
+    except Exception as e:
+        logger.exception(f"Příprava k podpisu selhala {input_path}: {e}")
+        try:
+            os.remove(output_path)
+        except OSError:
+            pass
+        return {"error": str(e)}
+
+
+class BatchSigner:
+    """
+    Podepisovací engine pro dávku souborů se stejným nastavením (SigningOptions).
+
+    Použití:
+        with BatchSigner(options) as batch:
+            results = batch.sign_files(files, output_dir)
+
+    Args:
+        options: Nastavení podepisování (PFX nebo PKCS#11, TSA, vzhled)
+        workers: Počet procesů pro přípravu a hash dokumentů (None = počet CPU)
+        tsa_concurrency: Nejvýš souběžných dotazů na TSA (zároveň počet vláken skládajících CMS)
+        key_concurrency: Nejvýš souběžně skládaných CMS – podpis klíčem včetně razítka TSA
+            (None = 1 pro token, jinak tsa_concurrency)
+    """
+
+    def __init__(self, options: SigningOptions, workers: Optional[int] = None,
+                 tsa_concurrency: int = DEFAULT_TSA_CONCURRENCY, key_concurrency: Optional[int] = None):
+        self.options = options
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.tsa_concurrency = max(1, tsa_concurrency)
+        if key_concurrency is None:
+            key_concurrency = 1 if options.pkcs11_lib else self.tsa_concurrency
+        self._key_slots = threading.BoundedSemaphore(max(1, key_concurrency))
+        self.signer = None
+        self.timestamper: Optional[PooledTimeStamper] = None
+        self.bytes_reserved: Optional[int] = None
+        self._pkcs11_context = None
+        self._worker_params: Optional[Dict[str, Any]] = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- příprava dávky ---
+
+    def open(self):
+        """Načte klíč a certifikát, připraví TSA a odhadne velikost CMS. Chyba = výjimka (celá dávka selže)."""
+        self.signer = self._load_signer()
+
+        if self.options.use_tsa and self.options.tsa_url:
+            try:
+                auth = None
+                if self.options.tsa_username and self.options.tsa_password:
+                    from requests.auth import HTTPBasicAuth
+                    auth = HTTPBasicAuth(self.options.tsa_username, self.options.tsa_password)
+                self.timestamper = PooledTimeStamper(self.options.tsa_url, timeout=5, auth=auth,
+                                                     concurrency=self.tsa_concurrency)
+                logger.info(f"TSA pro dávku: {self.options.tsa_url} (nejvýš {self.tsa_concurrency} souběžných dotazů)")
+            except ImportError as e:
+                logger.warning(f"requests není dostupný: {e}, TSA nebude použito")
+        elif self.options.use_tsa:
+            logger.warning("TSA je povoleno, ale není zadána URL. TSA nebude použito.")
+
+        self.bytes_reserved = asyncio.run(self._estimate_bytes_reserved())
+        self._worker_params = self._build_worker_params()
+
+    def close(self):
+        if self.timestamper is not None:
+            logger.info(f"TSA: {self.timestamper.requests_sent} dotazů v dávce")
+            self.timestamper.close()
+            self.timestamper = None
+        if self._pkcs11_context is not None:
+            try:
+                self._pkcs11_context.__exit__(None, None, None)
+            except Exception as e:
+                logger.warning(f"Chyba při zavírání PKCS#11 relace: {e}")
+            self._pkcs11_context = None
+        self.signer = None
+
+    def _load_signer(self):
+        options = self.options
+        if options.verified_signer is not None:
+            return options.verified_signer
+        if options.pkcs11_lib:
+            if PKCS11SigningContext is None:
+                raise RuntimeError("pyhanko.keys.pkcs11 není dostupné. Instalujte: pip install 'pyhanko[pkcs11]'")
+            self._pkcs11_context = PKCS11SigningContext(
+                options.pkcs11_lib,
+                slot_no=0,
+                user_pin=options.token_pin,
+                cert_label=options.certificate_label
+            )
+            return self._pkcs11_context.__enter__()
+        if options.certificate_path:
+            from pyhanko.sign.signers.pdf_cms import signer_from_p12_config, PKCS12SignatureConfig
+
+            cert_path = Path(options.certificate_path)
+            if not cert_path.exists():
+                raise FileNotFoundError(f"Certifikát neexistuje: {cert_path}")
+            password = options.token_pin.encode() if isinstance(options.token_pin, str) else options.token_pin
+            last_error = None
+            # Stejné pořadí pokusů jako _sign_with_pfx: zadané heslo, bez hesla, prázdné heslo
+            for passphrase in [password, None, b""]:
+                try:
+                    return signer_from_p12_config(PKCS12SignatureConfig(pfx_file=str(cert_path),
+                                                                        pfx_passphrase=passphrase))
+                except Exception as e:
+                    last_error = e
+            raise RuntimeError(f"Nepodařilo se načíst certifikát z .pfx souboru. Zkontrolujte heslo. Chyba: {last_error}")
+        raise RuntimeError("Není zadán certifikát (token nebo .pfx soubor)")
+
+    async def _estimate_bytes_reserved(self) -> int:
+        """Velikost placeholderu pro CMS – jeden zkušební podpis na dávku (s TSA jedno zkušební razítko)."""
+        from cryptography.hazmat.primitives import hashes
+        from pyhanko.sign.signers.pdf_cms import PdfCMSSignedAttributes
+        from datetime import datetime, timezone
+
+        with self._key_slots:
+            test_cms = await self.signer.async_sign(
+                hashes.Hash(hashes.SHA256()).finalize(),
+                "sha256",
+                dry_run=True,
+                timestamper=self.timestamper,
+                signed_attr_settings=PdfCMSSignedAttributes(signing_time=datetime.now(timezone.utc)),
+            )
+        test_len = len(test_cms.dump()) * 2
+        # Stejná rezerva jako pyHanko: +50 % (odpověď TSA nemusí mít vždy stejnou délku)
+        return test_len + 2 * (test_len // 4)
+
+    def _build_worker_params(self) -> Dict[str, Any]:
+        from cryptography import x509
+
+        options = self.options
+        cert = x509.load_der_x509_certificate(self.signer.signing_cert.dump())
+        signer_name = cert.subject.rfc4514_string()
+        if options.certificate_info and options.certificate_info.get("common_name"):
+            signer_name = options.certificate_info["common_name"]
+
+        if options.signature_type == "razitko":
+            reason_text = options.reason if options.reason else "Elektronické autorizační razítko"
+        else:
+            reason_text = options.reason if options.reason else "Elektronický podpis"
+
+        appearance_text_params = None
+        if options.visual_signature:
+            appearance_text_params = {"text": _create_signature_appearance_text(cert, options)}
+
+        chain = list(self.signer.cert_registry) if self.signer.cert_registry is not None else []
+        return {
+            "cert_der": self.signer.signing_cert.dump(),
+            "chain_der": [c.dump() for c in chain],
+            "metadata": {
+                "field_name": options.signature_field_name,
+                "reason": reason_text,
+                "location": options.location,
+                "contact_info": options.contact_info,
+                "name": signer_name,
+            },
+            "visual_signature": options.visual_signature,
+            "field_name": options.signature_field_name,
+            "page_number": options.page_number,
+            "position": tuple(options.signature_position),
+            "appearance_text_params": appearance_text_params,
+            "bytes_reserved": self.bytes_reserved,
+        }
+
+    # --- podpis ---
+
+    async def _complete(self, output_path: str, prepared: Dict[str, Any]):
+        """CMS nad hashem dokumentu (klíč + TSA) a jeho zápis do připraveného výstupu."""
+        from datetime import datetime, timezone
+        from pyhanko.sign.signers.pdf_cms import PdfCMSSignedAttributes
+        from pyhanko.sign.signers.pdf_signer import PdfTBSDocument
+
+        digest = prepared["prepared"]
+        # Semafor kolem celého podpisu, signer (i verified_signer volajícího) se neupravuje;
+        # token zvládne jen jednu operaci naráz (každý soubor má vlastní vlákno a asyncio.run)
+        with self._key_slots:
+            signature_cms = await self.signer.async_sign(
+                digest.document_digest,
+                prepared["md_algorithm"],
+                use_pades=prepared["use_pades"],
+                timestamper=self.timestamper,
+                signed_attr_settings=PdfCMSSignedAttributes(signing_time=datetime.now(timezone.utc)),
+            )
+        with open(output_path, "r+b") as outf:
+            await PdfTBSDocument.async_finish_signing(outf, digest, signature_cms)
+
+    def _finish_one(self, output_path: str, prepared: Dict[str, Any]) -> Tuple[bool, str]:
+        try:
+            asyncio.run(self._complete(output_path, prepared))
+            return True, f"PDF podepsáno (dávka) → {Path(output_path).name}"
+        except Exception as e:
+            logger.exception(f"Chyba při podepisování {output_path}: {e}")
+            try:
+                os.remove(output_path)  # placeholder bez podpisu nesmí zůstat jako „podepsaný“ soubor
+            except OSError:
+                pass
+            error_str = str(e).lower()
+            if "tsa" in error_str or "timestamp" in error_str:
+                return False, "Chyba při komunikaci s TSA serverem. Zkontrolujte připojení k internetu."
+            return False, f"Chyba při podepisování: {str(e)}"
+
+    def sign_files(
+        self,
+        input_files: List[str],
+        output_dir: Optional[str] = None,
+        progress_callback: Optional[Callable[[int, int, str], None]] = None
+    ) -> List[Tuple[str, bool, str]]:
+        """
+        Podepíše soubory – výstup {stem}_signed.pdf v output_dir (None = vedle vstupu).
+
+        Returns:
+            Seznam výsledků ve stejném pořadí jako input_files: [(filename, success, message), ...]
+        """
+        if self.signer is None:
+            raise RuntimeError("BatchSigner není otevřen (použijte with BatchSigner(...) nebo open())")
+
+        total = len(input_files)
+        results: List[Optional[Tuple[str, bool, str]]] = [None] * total
+        outputs: List[Optional[str]] = [None] * total
+        if output_dir:
+            Path(output_dir).mkdir(parents=True, exist_ok=True)
+
+        jobs = []
+        for i, input_file in enumerate(input_files):
+            input_path = Path(input_file)
+            if not input_path.exists():
+                results[i] = (input_path.name, False, f"Soubor neexistuje: {input_path}")
+                continue
+            folder = Path(output_dir) if output_dir else input_path.parent
+            outputs[i] = str(folder / f"{input_path.stem}_signed{input_path.suffix}")
+            jobs.append(i)
+
+        done = 0
+        workers = min(self.workers, max(1, len(jobs)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_prepare_worker,
+                                 initargs=(self._worker_params,)) as prepare_pool, \
+                ThreadPoolExecutor(max_workers=self.tsa_concurrency) as sign_pool:
+            prepare_futures = {
+                prepare_pool.submit(_prepare_for_signing, str(input_files[i]), outputs[i]): i for i in jobs
+            }
+            sign_futures = {}
+            # Hotové hashe jdou hned do podepisování – příprava dalších souborů běží souběžně
+            for future in as_completed(prepare_futures):
+                i = prepare_futures[future]
+                try:
+                    prepared = future.result()
+                except Exception as e:
+                    prepared = {"error": str(e)}
+                if "error" in prepared:
+                    results[i] = (Path(input_files[i]).name, False, f"Chyba při přípravě k podpisu: {prepared['error']}")
+                    done += 1
+                    if progress_callback:
+                        progress_callback(done, total, Path(input_files[i]).name)
+                    continue
+                sign_futures[sign_pool.submit(self._finish_one, outputs[i], prepared)] = i
+
+            for future in as_completed(sign_futures):
+                i = sign_futures[future]
+                success, message = future.result()
+                results[i] = (Path(input_files[i]).name, success, message)
+                done += 1
+                if progress_callback:
+                    progress_callback(done, total, Path(input_files[i]).name)
+
+        return results
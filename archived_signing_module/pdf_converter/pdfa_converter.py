@@ -61,7 +61,9 @@ def find_ghostscript() -> Optional[str]:
 
 
 def convert_to_pdfa(input_path: str, output_path: Optional[str] = None,
-                    pdfa_version: str = "3", conformance: str = "B") -> Tuple[bool, str]:
+                    pdfa_version: str = "3", conformance: str = "B",
+                    gs_path: Optional[str] = None, pdfa_def: Optional[str] = None,
+                    input_data: Optional[bytes] = None, spool_dir: Optional[str] = None) -> Tuple[bool, str]:
     """
     Převede PDF na PDF/A formát pomocí Ghostscript.
 
@@ -70,13 +72,17 @@ def convert_to_pdfa(input_path: str, output_path: Optional[str] = None,
         output_path: Cesta k výstupnímu PDF (pokud None, přidá _pdfa suffix)
         pdfa_version: Verze PDF/A (1, 2, nebo 3)
         conformance: Úroveň conformance (A nebo B)
+        gs_path: Již nalezený Ghostscript (dávka ho hledá jednou); None = find_ghostscript()
+        pdfa_def: Sdílený PDFA definition soubor dávky (nemaže se); None = vytvoří a smaže vlastní
+        input_data: Obsah PDF v paměti – pošle se Ghostscriptu rourou (stdin), input_path slouží jen pro název
+        spool_dir: Složka pro vlastní dočasné soubory Ghostscriptu (TMPDIR, typicky tmpfs /dev/shm)
 
     Returns:
         Tuple (success, message)
     """
     input_path = Path(input_path)
 
-    if not input_path.exists():
+    if input_data is None and not input_path.exists():
         return False, f"Soubor neexistuje: {input_path}"
 
     if output_path is None:
@@ -86,12 +92,14 @@ def convert_to_pdfa(input_path: str, output_path: Optional[str] = None,
         output_path = Path(output_path)
 
     # Najdeme Ghostscript
-    gs_path = find_ghostscript()
+    gs_path = gs_path or find_ghostscript()
     if not gs_path:
         return False, "Ghostscript není nainstalován. Stáhněte z: https://ghostscript.com/releases/gsdnld.html"
 
     # Vytvoříme PDFA definition file
-    pdfa_def = _create_pdfa_def(pdfa_version, conformance)
+    own_def = pdfa_def is None
+    if own_def:
+        pdfa_def = _create_pdfa_def(pdfa_version, conformance)
 
     try:
         # Ghostscript příkaz pro PDF/A konverzi
@@ -109,20 +117,28 @@ def convert_to_pdfa(input_path: str, output_path: Optional[str] = None,
             "-dAutoRotatePages=/None",
             "-dCompatibilityLevel=1.7",
             pdfa_def,
-            str(input_path)
+            "-" if input_data is not None else str(input_path)
         ]
 
         logger.info(f"Spouštím Ghostscript: {' '.join(cmd)}")
 
+        env = None
+        if spool_dir:
+            # PDF ze stdin si Ghostscript ukládá do vlastního dočasného souboru – ten patří do spool složky
+            env = dict(os.environ, TMPDIR=spool_dir, TEMP=spool_dir, TMP=spool_dir)
+
         result = subprocess.run(
             cmd,
+            input=input_data,
             capture_output=True,
-            text=True,
-            timeout=300  # 5 minut timeout
+            timeout=300,  # 5 minut timeout
+            env=env
         )
+        result.stdout = result.stdout.decode("utf-8", "replace")
+        result.stderr = result.stderr.decode("utf-8", "replace")
 
         # Odstraníme dočasný soubor
-        if os.path.exists(pdfa_def):
+        if own_def and os.path.exists(pdfa_def):
             os.remove(pdfa_def)
 
         if result.returncode == 0:
@@ -8,7 +8,7 @@ import subprocess
 import shutil
 import logging
 from pathlib import Path
-from typing import Tuple, List, Optional
+from typing import Tuple, List, Optional, Union, BinaryIO
 
 logger = logging.getLogger(__name__)
 
@@ -27,13 +27,15 @@ except ImportError:
     PYPDF_AVAILABLE = False
 
 
-def remove_signatures(input_path: str, output_path: Optional[str] = None) -> Tuple[bool, str]:
+def remove_signatures(input_path: str, output_path: Optional[str] = None,
+                      gs_path: Optional[str] = None) -> Tuple[bool, str]:
     """
     Odstraní všechny elektronické podpisy z PDF souboru.
 
     Args:
         input_path: Cesta ke vstupnímu PDF
         output_path: Cesta k výstupnímu PDF (pokud None, přidá _unsigned suffix)
+        gs_path: Již nalezený Ghostscript (dávka ho hledá jednou); None = hledat
 
     Returns:
         Tuple (success, message)
@@ -49,7 +51,7 @@ def remove_signatures(input_path: str, output_path: Optional[str] = None) -> Tup
         output_path = Path(output_path)
 
     # Zkusíme použít Ghostscript pro odstranění podpisů (nejspolehlivější)
-    gs_path = _find_ghostscript()
+    gs_path = gs_path or _find_ghostscript()
     if gs_path:
         result = _remove_signatures_ghostscript(input_path, output_path, gs_path)
         if result[0]:  # Pokud Ghostscript uspěl, použijeme to
@@ -64,6 +66,37 @@ def remove_signatures(input_path: str, output_path: Optional[str] = None) -> Tup
         return False, "Není nainstalována žádná PDF knihovna (pikepdf nebo pypdf) a Ghostscript není dostupný"
 
 
+def remove_signatures_to_stream(input_path: str, stream: BinaryIO) -> Tuple[bool, str]:
+    """
+    Odstraní podpisy knihovnou (pikepdf, fallback pypdf) a výsledek zapíše do binárního streamu
+    (BytesIO, spool soubor) – bez Ghostscriptu a bez mezisouboru, pro rouru do konverze PDF/A.
+
+    Returns:
+        Tuple (success, message)
+    """
+    input_path = Path(input_path)
+
+    if not input_path.exists():
+        return False, f"Soubor neexistuje: {input_path}"
+
+    if PIKEPDF_AVAILABLE:
+        return _remove_signatures_pikepdf(input_path, stream)
+    elif PYPDF_AVAILABLE:
+        return _remove_signatures_pypdf(input_path, stream)
+    else:
+        return False, "Není nainstalována žádná PDF knihovna (pikepdf nebo pypdf)"
+
+
+def _output_label(output: Union[Path, BinaryIO]) -> str:
+    """Název výstupu do zprávy – soubor, nebo stream pro rouru do Ghostscriptu."""
+    if isinstance(output, Path):
+        return output.name
+    name = getattr(output, "name", None)
+    if isinstance(name, str):
+        return f"spool {os.path.basename(name)}"
+    return "do paměti"
+
+
 def _find_ghostscript() -> Optional[str]:
     """Najde cestu k Ghostscript"""
     # Hledáme v distribuci aplikace (pro PyInstaller)
@@ -137,7 +170,7 @@ def _remove_signatures_ghostscript(input_path: Path, output_path: Path, gs_path:
         return False, f"Chyba: {str(e)}"
 
 
-def _remove_signatures_pikepdf(input_path: Path, output_path: Path) -> Tuple[bool, str]:
+def _remove_signatures_pikepdf(input_path: Path, output_path: Union[Path, BinaryIO]) -> Tuple[bool, str]:
     """Odstranění podpisů pomocí pikepdf - kompletní odstranění jako PDF24"""
     try:
         with pikepdf.open(input_path) as pdf:
@@ -277,20 +310,20 @@ def _remove_signatures_pikepdf(input_path: Path, output_path: Path) -> Tuple[boo
                 signatures_removed += sig_objects_removed
                 logger.debug(f"Odstraněno {sig_objects_removed} /Sig objektů")
 
-            # Uložíme výsledek
+            # Uložíme výsledek (soubor nebo stream)
             pdf.save(output_path)
 
             if signatures_removed > 0:
-                return True, f"Odstraněno {signatures_removed} podpisů/podpisových objektů → {output_path.name}"
+                return True, f"Odstraněno {signatures_removed} podpisů/podpisových objektů → {_output_label(output_path)}"
             else:
-                return True, f"Žádné podpisy nenalezeny, soubor zkopírován → {output_path.name}"
+                return True, f"Žádné podpisy nenalezeny, soubor zkopírován → {_output_label(output_path)}"
 
     except Exception as e:
         logger.exception(f"Chyba při odstraňování podpisů (pikepdf): {e}")
         return False, f"Chyba: {str(e)}"
 
 
-def _remove_signatures_pypdf(input_path: Path, output_path: Path) -> Tuple[bool, str]:
+def _remove_signatures_pypdf(input_path: Path, output_path: Union[Path, BinaryIO]) -> Tuple[bool, str]:
     """Odstranění podpisů pomocí pypdf (fallback) - kompletní odstranění"""
     try:
         reader = PdfReader(str(input_path))
@@ -426,14 +459,17 @@ def _remove_signatures_pypdf(input_path: Path, output_path: Path) -> Tuple[bool,
         # pypdf nemá přímý přístup k všem objektům jako pikepdf, ale můžeme zkusit
         # projít přes metadata a další struktury
         
-        # Uložíme výsledek
-        with open(output_path, 'wb') as f:
-            writer.write(f)
+        # Uložíme výsledek (soubor nebo stream)
+        if isinstance(output_path, Path):
+            with open(output_path, 'wb') as f:
+                writer.write(f)
+        else:
+            writer.write(output_path)
 
         if signatures_removed > 0:
-            return True, f"Odstraněno {signatures_removed} podpisů/podpisových objektů → {output_path.name}"
+            return True, f"Odstraněno {signatures_removed} podpisů/podpisových objektů → {_output_label(output_path)}"
         else:
-            return True, f"Žádné podpisy nenalezeny, soubor zkopírován → {output_path.name}"
+            return True, f"Žádné podpisy nenalezeny, soubor zkopírován → {_output_label(output_path)}"
 
     except Exception as e:
         logger.exception(f"Chyba při odstraňování podpisů (pypdf): {e}")
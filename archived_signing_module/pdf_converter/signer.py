@@ -886,37 +886,37 @@ def _create_signature_appearance_text(certificate, options: SigningOptions) -> s
 def sign_pdf_batch(
     input_files: List[str],
     options: SigningOptions,
-    output_dir: Optional[str] = None
+    output_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    progress_callback=None
 ) -> List[Tuple[str, bool, str]]:
     """
-    Dávkové podepisování více PDF souborů.
+    Dávkové podepisování více PDF souborů (BatchSigner: klíč se načte jednou, dokumenty se připravují
+    paralelně v procesech, TSA přes jedno sdílené spojení).
     
     Args:
         input_files: Seznam cest k PDF souborům
         options: Nastavení podepisování
         output_dir: Výstupní složka (pokud None, použije se stejná složka)
+        workers: Počet procesů pro přípravu dokumentů (None = počet CPU)
+        progress_callback: Callback pro průběh (current, total, filename)
     
     Returns:
-        Seznam výsledků: [(filename, success, message), ...]
+        Seznam výsledků ve stejném pořadí jako input_files: [(filename, success, message), ...]
     """
-    results = []
-    
-    if output_dir:
-        output_dir = Path(output_dir)
-        output_dir.mkdir(parents=True, exist_ok=True)
-    
-    for input_path in input_files:
-        input_path = Path(input_path)
-        
-        if output_dir:
-            output_path = output_dir / f"{input_path.stem}_signed{input_path.suffix}"
-        else:
-            output_path = None
-        
-        success, message = sign_pdf(str(input_path), str(output_path) if output_path else None, options)
-        results.append((input_path.name, success, message))
-    
-    return results
+    from .batch_signer import BatchSigner
+
+    batch = BatchSigner(options, workers=workers)
+    try:
+        batch.open()
+    except Exception as e:
+        logger.exception(f"Dávkové podepisování nelze zahájit: {e}")
+        batch.close()
+        return [(Path(f).name, False, f"Chyba při podepisování: {str(e)}") for f in input_files]
+    try:
+        return batch.sign_files(input_files, output_dir, progress_callback)
+    finally:
+        batch.close()
 
 
 # Test
@@ -0,0 +1,441 @@
+# analysis_daemon.py
+# Lokální démon analýzy: warm pool procesů + cache výsledků sdílené agentem, CLI a lokálními skripty.
+# © 2025 Ing. Martin Cieślar
+#
+# Spuštění:  python -m desktop_agent.analysis_daemon [--workers N]   (nebo python analysis_daemon.py)
+#
+# - POSIX: Unix socket (práva 0600) v uživatelské cache složce; Windows: 127.0.0.1:DOKUCHECK_DAEMON_PORT
+# - přístup chrání náhodný token v souboru vedle cache (čte ho jen tentýž uživatel)
+# - protokol: JSON na řádek. {"op": "analyze", "paths": [...]} -> {"i": n, "result": {...}} po souborech
+#   v pořadí vstupu a nakonec {"done": true, ...}; dále "health", "metrics", "shutdown"
+# - klienti (analyze_paths, analyze_multiple_pdfs, analyze_folder) při nedostupném démonu
+#   nebo jiné verzi engine analyzují v procesu – chování je stejné, jen bez warm poolu
+
+import argparse
+import json
+import logging
+import os
+import secrets
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+_AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if _AGENT_DIR not in sys.path:
+    sys.path.insert(0, _AGENT_DIR)
+
+from check_cache import default_cache_path, engine_version  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 47631
+CONNECT_TIMEOUT = 0.2
+PROTOCOL_VERSION = 1
+
+
+def _state_dir():
+    return os.path.dirname(default_cache_path())
+
+
+def daemon_address():
+    """Unix socket (POSIX) nebo (127.0.0.1, port) – přepsatelné DOKUCHECK_DAEMON_SOCKET / DOKUCHECK_DAEMON_PORT."""
+    if hasattr(socket, 'AF_UNIX') and os.name != 'nt':
+        return os.environ.get('DOKUCHECK_DAEMON_SOCKET') or os.path.join(_state_dir(), 'analysis-daemon.sock')
+    try:
+        port = int(os.environ.get('DOKUCHECK_DAEMON_PORT') or DEFAULT_PORT)
+    except ValueError:
+        port = DEFAULT_PORT
+    return ('127.0.0.1', port)
+
+
+def _token_path():
+    return os.path.join(_state_dir(), 'analysis-daemon.token')
+
+
+def _read_token():
+    try:
+        with open(_token_path(), 'r', encoding='ascii') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+# =============================================================================
+# KLIENT
+# =============================================================================
+
+class DaemonUnavailable(Exception):
+    """Démon neběží, neodpovídá nebo má jinou verzi engine – volající analyzuje v procesu."""
+
+
+class DaemonClient:
+    """Jedno spojení s démonem; požadavky jdou sekvenčně."""
+
+    def __init__(self, address=None, token=None, timeout=CONNECT_TIMEOUT):
+        self.address = address or daemon_address()
+        self.token = token if token is not None else _read_token()
+        if not self.token:
+            raise DaemonUnavailable('token démona nenalezen')
+        family = socket.AF_INET if isinstance(self.address, tuple) else socket.AF_UNIX
+        self._sock = socket.socket(family, socket.SOCK_STREAM)
+        self._sock.settimeout(timeout)
+        try:
+            self._sock.connect(self.address)
+        except OSError as e:
+            self._sock.close()
+            raise DaemonUnavailable(str(e))
+        self._sock.settimeout(None)
+        self._rfile = self._sock.makefile('rb')
+
+    def close(self):
+        try:
+            self._rfile.close()
+            self._sock.close()
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _send(self, request):
+        request = dict(request, token=self.token, protocol=PROTOCOL_VERSION)
+        self._sock.sendall(json.dumps(request, ensure_ascii=False).encode('utf-8') + b'\n')
+
+    def _recv(self):
+        line = self._rfile.readline()
+        if not line:
+            raise DaemonUnavailable('démon ukončil spojení')
+        message = json.loads(line)
+        if message.get('error'):
+            raise DaemonUnavailable(message['error'])
+        return message
+
+    def call(self, op):
+        """health / metrics / shutdown – jedna odpověď."""
+        self._send({'op': op})
+        return self._recv()
+
+    def analyze(self, paths, use_cache=True):
+        """Generátor výsledků v pořadí paths. Verze engine se ověří na začátku (DaemonUnavailable při neshodě)."""
+        self._send({'op': 'analyze', 'paths': [os.path.abspath(p) for p in paths], 'cache': bool(use_cache),
+                    'engine_version': engine_version()})
+        while True:
+            message = self._recv()
+            if message.get('done'):
+                return
+            yield message['result']
+
+
+def connect():
+    """DaemonClient, nebo None když démon neběží (test stojí jeden neúspěšný connect)."""
+    try:
+        return DaemonClient()
+    except DaemonUnavailable:
+        return None
+
+
+def analyze_paths(paths, workers=1, use_daemon=True):
+    """
+    Výsledky analyze_pdf_file v pořadí paths: přes démona, jinak v procesu (iter_analyze_pdfs).
+    Když démon vypadne uprostřed, zbytek se dopočítá lokálně.
+    """
+    paths = list(paths)
+    done = 0
+    client = connect() if use_daemon and paths else None
+    if client is not None:
+        with client:
+            try:
+                for result in client.analyze(paths):
+                    done += 1
+                    yield result
+                return
+            except (DaemonUnavailable, OSError, ValueError) as e:
+                logger.info(f"Démon analýzy nedostupný ({e}), pokračuji v procesu")
+    from pdf_checker import iter_analyze_pdfs
+    yield from iter_analyze_pdfs(paths[done:], workers)
+
+
+def analyze_multiple_pdfs(file_paths, progress_callback=None, workers=1):
+    """Jako pdf_checker.analyze_multiple_pdfs, přednostně přes démona."""
+    results = []
+    total = len(file_paths)
+    for i, result in enumerate(analyze_paths(file_paths, workers), 1):
+        if progress_callback:
+            progress_callback(i, total, os.path.basename(file_paths[i - 1]))
+        results.append(result)
+    return results
+
+
+def analyze_folder(folder_path, progress_callback=None, workers=1):
+    """Jako pdf_checker.analyze_folder, přednostně přes démona."""
+    from pdf_checker import find_all_pdfs
+    pdf_files = find_all_pdfs(folder_path)
+    if not pdf_files:
+        return {
+            'folder_path': folder_path,
+            'total_files': 0,
+            'results': [],
+            'error': 'Ve složce nebyly nalezeny žádné PDF soubory'
+        }
+    results = analyze_multiple_pdfs([pdf['full_path'] for pdf in pdf_files], progress_callback, workers)
+    for pdf, result in zip(pdf_files, results):
+        result['folder'] = pdf['folder']
+        result['relative_path'] = pdf['relative_path']
+    return {
+        'folder_path': folder_path,
+        'total_files': len(pdf_files),
+        'results': results
+    }
+
+
+# =============================================================================
+# DÉMON
+# =============================================================================
+
+def _warm_worker():
+    """Initializer procesu poolu: engine a pypdf naimportované předem."""
+    import pdf_checker  # noqa: F401
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        pass
+
+
+class AnalysisService:
+    """Stav démona: warm pool, cache a metriky. Obsluha spojení běží ve vláknech serveru."""
+
+    def __init__(self, workers=None, cache_path=None):
+        from concurrent.futures import ProcessPoolExecutor
+        self._executor_cls = ProcessPoolExecutor
+        self.workers = max(1, int(workers or os.cpu_count() or 1))
+        self.version = engine_version()
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        self._executor = self._new_executor()
+        from check_cache import CheckCache
+        self.cache = CheckCache(cache_path, version=self.version)
+        self._stats = {'requests': 0, 'analyze_requests': 0, 'files': 0, 'cache_hits': 0,
+                       'analyzed': 0, 'failed': 0, 'in_flight': 0, 'respawns': 0,
+                       'analyze_seconds': 0.0, 'rejected': 0}
+
+    def _new_executor(self):
+        executor = self._executor_cls(max_workers=self.workers, initializer=_warm_worker)
+        # Spustit procesy hned (jinak se startují až s první úlohou)
+        for future in [executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+        return executor
+
+    def _count(self, **delta):
+        with self._lock:
+            for key, value in delta.items():
+                self._stats[key] += value
+
+    def health(self):
+        return {'status': 'ok', 'pid': os.getpid(), 'uptime_s': round(time.time() - self.started, 1),
+                'workers': self.workers, 'engine_version': self.version, 'protocol': PROTOCOL_VERSION}
+
+    def metrics(self):
+        with self._lock:
+            out = dict(self._stats)
+        out['analyze_seconds'] = round(out['analyze_seconds'], 3)
+        out['uptime_s'] = round(time.time() - self.started, 1)
+        out['workers'] = self.workers
+        lookups = out['cache_hits'] + out['analyzed']
+        out['cache_hit_rate'] = round(out['cache_hits'] / lookups, 3) if lookups else 0
+        return out
+
+    def analyze(self, paths, use_cache=True):
+        """Generátor (index, výsledek) v pořadí paths."""
+        from pdf_checker import iter_analyze_pdfs
+        started = time.monotonic()
+        self._count(analyze_requests=1, files=len(paths), in_flight=len(paths))
+        stats = [None] * len(paths)
+        cached = [None] * len(paths)
+        if use_cache:
+            with self._cache_lock:
+                for i, path in enumerate(paths):
+                    try:
+                        stats[i] = os.stat(path)
+                    except OSError:
+                        continue
+                    cached[i] = self.cache.get(path, stats[i])
+        misses = [paths[i] for i in range(len(paths)) if cached[i] is None]
+        with self._lock:
+            executor = self._executor
+        fresh = iter_analyze_pdfs(misses, self.workers, executor=executor)
+        emitted = 0
+        try:
+            for i, path in enumerate(paths):
+                result = cached[i]
+                if result is None:
+                    result = next(fresh)
+                    self._count(analyzed=1, failed=0 if result.get('success') else 1)
+                    if use_cache and stats[i] is not None:
+                        with self._cache_lock:
+                            self.cache.put(path, result, stats[i])
+                else:
+                    self._count(cache_hits=1)
+                self._count(in_flight=-1)
+                emitted += 1
+                yield i, result
+        finally:
+            fresh.close()
+            self._count(in_flight=emitted - len(paths))
+            with self._cache_lock:
+                self.cache.flush()
+            self._count(analyze_seconds=time.monotonic() - started)
+            self._respawn_if_broken(executor)
+
+    def _respawn_if_broken(self, executor):
+        # Pád workeru (segfault v knihovně, OOM) rozbije celý ProcessPoolExecutor – nahradit novým
+        if not getattr(executor, '_broken', False):
+            return
+        with self._lock:
+            if self._executor is not executor:
+                return
+            logger.warning("Démon analýzy: pool procesů spadl, startuji nový")
+            self._executor = self._new_executor()
+            self._stats['respawns'] += 1
+        executor.shutdown(wait=False)
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._cache_lock:
+            self.cache.close()
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def _reply(self, message):
+        self.wfile.write(json.dumps(message, ensure_ascii=False, default=str).encode('utf-8') + b'\n')
+
+    def handle(self):
+        service = self.server.service
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                self._reply({'error': 'bad_request'})
+                return
+            service._count(requests=1)
+            if not secrets.compare_digest(str(request.get('token') or ''), self.server.token):
+                service._count(rejected=1)
+                self._reply({'error': 'unauthorized'})
+                return
+            op = request.get('op')
+            if op == 'health':
+                self._reply(service.health())
+            elif op == 'metrics':
+                self._reply(service.metrics())
+            elif op == 'shutdown':
+                self._reply({'status': 'stopping'})
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+            elif op == 'analyze':
+                if request.get('engine_version') not in (None, service.version):
+                    self._reply({'error': 'engine_mismatch'})
+                    continue
+                paths = [str(p) for p in request.get('paths') or []]
+                count = 0
+                for i, result in service.analyze(paths, use_cache=request.get('cache', True)):
+                    self._reply({'i': i, 'result': result})
+                    count += 1
+                self._reply({'done': True, 'count': count})
+            else:
+                self._reply({'error': f'unknown_op:{op}'})
+            self.wfile.flush()
+
+
+if hasattr(socketserver, 'ThreadingUnixStreamServer'):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+
+class _TcpServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _write_token():
+    os.makedirs(_state_dir(), exist_ok=True)
+    token = secrets.token_hex(16)
+    path = _token_path()
+    fd = os.open(path + '.tmp', os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='ascii') as f:
+        f.write(token)
+    os.replace(path + '.tmp', path)
+    return token
+
+
+def serve(workers=None, cache_path=None):
+    """Spustí démona v popředí (Ctrl+C / op shutdown ukončí)."""
+    existing = connect()
+    if existing is not None:
+        existing.close()
+        logger.error("Démon analýzy už běží")
+        return 1
+    address = daemon_address()
+    service = AnalysisService(workers, cache_path)
+    token = _write_token()
+    if isinstance(address, tuple):
+        server = _TcpServer(address, _Handler)
+    else:
+        try:
+            os.unlink(address)  # socket po předchozím (spadlém) běhu
+        except OSError:
+            pass
+        old_umask = os.umask(0o177)
+        try:
+            server = _UnixServer(address, _Handler)
+        finally:
+            os.umask(old_umask)
+    server.service = service
+    server.token = token
+    logger.info(f"Démon analýzy naslouchá na {address} ({service.workers} procesů, engine {service.version})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+        if not isinstance(address, tuple):
+            try:
+                os.unlink(address)
+            except OSError:
+                pass
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m desktop_agent.analysis_daemon',
+                                     description='Lokální démon analýzy PDF DokuCheck')
+    parser.add_argument('--workers', '-j', type=int, default=None, help='počet procesů (výchozí = počet CPU)')
+    parser.add_argument('--cache', metavar='SOUBOR', help='cesta k cache výsledků')
+    parser.add_argument('--status', action='store_true', help='vypsat health a metriky běžícího démona')
+    parser.add_argument('--stop', action='store_true', help='ukončit běžícího démona')
+    args = parser.parse_args(argv)
+    if args.status or args.stop:
+        client = connect()
+        if client is None:
+            print('Démon analýzy neběží', file=sys.stderr)
+            return 1
+        with client:
+            if args.stop:
+                print(json.dumps(client.call('shutdown')))
+            else:
+                print(json.dumps({'health': client.call('health'), 'metrics': client.call('metrics')},
+                                 ensure_ascii=False, indent=2))
+        return 0
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    return serve(args.workers, args.cache)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
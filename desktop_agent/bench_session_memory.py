@@ -0,0 +1,110 @@
+# bench_session_memory.py – paměť relace agenta: výsledky ve frontě jako slovníky vs. ResultRecord
+# Spouštění ze složky desktop_agent:  python bench_session_memory.py [--files 50000] [--signatures 2] [--pdf vzor.pdf]
+#
+# Každý soubor relace = nový výsledek ve tvaru pdf_checker (vlastní řetězce jako při skutečné analýze),
+# uložený do QueueModel přes set_result a zároveň v seznamu výsledků dávky (jako _check_thread v UI).
+#   peak_mb     špička tracemalloc během plnění fronty
+#   retained_mb co zůstane alokované po naplnění (drží se po celou relaci)
+# --pdf = vzor výsledku z analyze_pdf_file(vzor.pdf), jinak syntetický výsledek s --signatures podpisy.
+
+import argparse
+import gc
+import hashlib
+import json
+import time
+import tracemalloc
+
+from queue_model import QueueModel
+from result_record import ResultRecord, compact_result
+
+SIGNERS = [('Ing. Jan Novák', '0012345'), ('Ing. Petra Svobodová', '0045678'), ('Ing. Karel Dvořák', '0078901')]
+TSA_ISSUERS = ['PostSignum TSA', 'I.CA TSA', 'eIdentity TSA']
+
+
+def _synthetic_result(signatures):
+    sigs = []
+    for i in range(signatures):
+        signer, ckait = SIGNERS[i % len(SIGNERS)]
+        sigs.append({
+            'index': i + 1, 'type': 'SIGNATURE', 'valid': True, 'name': signer, 'signer': signer,
+            'ckait_number': ckait, 'signature_type': 'kvalifikovaný', 'timestamp_valid': True,
+            'certificate_valid': True, 'date': '2025-03-14 10:2%d' % i, 'tsa_issuer': TSA_ISSUERS[i % len(TSA_ISSUERS)],
+            'tsa_qualified': True,
+        })
+    pdf_format = {'is_pdf_a3': True, 'exact_version': 'PDF/A-3', 'standard': 'ISO 19005-3:2012',
+                  'pdf_version': '1.7', 'conformance': 'B'}
+    return {
+        'success': True, 'file_name': 'vzor.pdf', 'file_hash': '0' * 64, 'file_size': 0, 'processed_at': '',
+        'results': {'pdf_format': pdf_format, 'signatures': sigs,
+                    'file_info': {'filename': 'vzor.pdf', 'size': 0, 'hash': '0' * 64},
+                    'docmdp_level': None, 'issr_compatible': True},
+        'display': {'pdf_version': 'PDF/A-3', 'is_pdf_a3': True, 'signature_count': len(sigs), 'signatures': sigs,
+                    'docmdp_level': None, 'issr_compatible': True},
+    }
+
+
+def _fresh_result(template_json, i):
+    # json.loads = nové objekty i řetězce pro každý soubor (jako samostatné volání enginu)
+    result = json.loads(template_json)
+    name = f'vykres_{i:06d}.pdf'
+    file_hash = hashlib.sha256(name.encode()).hexdigest()
+    result.update(file_name=name, file_hash=file_hash, file_size=100000 + i, processed_at=f'2025-03-14T10:{i % 60:02d}:00.{i:06d}')
+    result['results']['file_info'] = {'filename': name, 'size': 100000 + i, 'hash': file_hash}
+    result['display']['signatures'] = result['results']['signatures']
+    result['folder'] = f'SO {i % 40:02d}'
+    result['relative_path'] = f"{result['folder']}/{name}"
+    return result
+
+
+def _stats(result):
+    # Stejné čítače jako _result_stats v UI (bez importu Tk); u slovníku dočasný záznam, hned se uvolní
+    record = compact_result(result)
+    if isinstance(record, ResultRecord):
+        return record.error_count(), record.is_pdf_a3 is True
+    return 0, False
+
+
+def _run(template_json, files, compact):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    queue = QueueModel(result_stats=_stats)
+    queue.add_task('folder', 'C:/projekt', 'projekt', [(f'C:/projekt/vykres_{i:06d}.pdf', None) for i in range(files)])
+    base, _ = tracemalloc.get_traced_memory()
+    all_results = []
+    for i in range(files):
+        result = _fresh_result(template_json, i)
+        if compact:
+            result = compact_result(result)
+        all_results.append((i, result))
+        queue.set_result(i, result)
+    elapsed = time.perf_counter() - t0
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'peak_mb': (peak - base) / 2**20, 'retained_mb': (current - base) / 2**20, 'seconds': elapsed,
+            'errors': queue.n_errors, 'pdfa_ok': queue.n_pdfa_ok}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Paměť relace agenta (výsledky ve frontě)')
+    parser.add_argument('--files', type=int, default=50000)
+    parser.add_argument('--signatures', type=int, default=2)
+    parser.add_argument('--pdf', help='vzorový PDF – výsledek z analyze_pdf_file místo syntetického')
+    args = parser.parse_args()
+
+    if args.pdf:
+        from pdf_checker import analyze_pdf_file
+        template = analyze_pdf_file(args.pdf)
+    else:
+        template = _synthetic_result(args.signatures)
+    template_json = json.dumps(template, ensure_ascii=False)
+
+    rows = [('slovníky', _run(template_json, args.files, False)), ('ResultRecord', _run(template_json, args.files, True))]
+    for label, r in rows:
+        print(f"{label:13} peak {r['peak_mb']:8.1f} MB   drženo {r['retained_mb']:8.1f} MB   {r['seconds']:6.1f} s"
+              f"   chyb {r['errors']}   PDF/A-3 OK {r['pdfa_ok']}")
+    print(f"souborů: {args.files}   úspora (drženo): {100 * (1 - rows[1][1]['retained_mb'] / rows[0][1]['retained_mb']):.0f} %")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# check_cache.py
+# Lokální cache výsledků kontroly pro CLI / sledování složky (SQLite, bez serveru).
+# © 2025 Ing. Martin Cieślar
+#
+# - klíč = (cesta, velikost, mtime_ns) + verze engine: zásah nevyžaduje ani čtení souboru (hash je ve výsledku)
+# - verze engine = hash zdrojů pdf_checker.py a tsa_registry.py (stejně jako cache analýz na webu);
+#   po jejich změně se staré řádky při otevření smažou
+# - ukládají se jen úspěšné analýzy
+
+import hashlib
+import json
+import os
+import sqlite3
+
+_AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_SOURCES = (
+    os.path.join(_AGENT_DIR, 'pdf_checker.py'),
+    os.path.join(_AGENT_DIR, 'tsa_registry.py'),
+)
+
+
+def default_cache_path():
+    """Uživatelská cache složka (Windows LOCALAPPDATA, jinde XDG_CACHE_HOME / ~/.cache)."""
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'dokucheck', 'check_cache.sqlite')
+
+
+def engine_version(sources=ENGINE_SOURCES):
+    """Hash zdrojů engine; v zabaleném exe (zdroje nejsou na disku) verze agenta."""
+    h = hashlib.sha256()
+    found = False
+    for path in sources:
+        try:
+            with open(path, 'rb') as f:
+                h.update(f.read())
+            found = True
+        except OSError:
+            pass
+    if not found:
+        try:
+            from version import AGENT_VERSION
+            return 'agent-' + AGENT_VERSION
+        except ImportError:
+            return 'unknown'
+    return h.hexdigest()[:16]
+
+
+class CheckCache:
+    """Cache výsledků analyze_pdf_file podle stavu souboru. Není thread-safe – přístup z více vláken serializuje volající."""
+
+    def __init__(self, path=None, version=None):
+        self.path = path or default_cache_path()
+        self.version = version or engine_version()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS check_cache ('
+            ' path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, engine_version TEXT, payload TEXT)'
+        )
+        self._conn.execute('DELETE FROM check_cache WHERE engine_version != ?', (self.version,))
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self._pending = 0
+
+    @staticmethod
+    def _key(filepath):
+        return os.path.normcase(os.path.abspath(filepath))
+
+    def get(self, filepath, st=None):
+        """Výsledek z cache (nový dict s from_cache=True), nebo None. st = již zjištěný os.stat."""
+        try:
+            st = st or os.stat(filepath)
+        except OSError:
+            return None
+        row = self._conn.execute(
+            'SELECT payload FROM check_cache WHERE path = ? AND size = ? AND mtime_ns = ? AND engine_version = ?',
+            (self._key(filepath), st.st_size, st.st_mtime_ns, self.version),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        result = json.loads(row[0])
+        result['from_cache'] = True
+        return result
+
+    def put(self, filepath, result, st=None):
+        if not isinstance(result, dict) or not result.get('success'):
+            return
+        try:
+            st = st or os.stat(filepath)
+        except OSError:
+            return
+        self._conn.execute(
+            'INSERT OR REPLACE INTO check_cache (path, size, mtime_ns, engine_version, payload) VALUES (?, ?, ?, ?, ?)',
+            (self._key(filepath), st.st_size, st.st_mtime_ns, self.version,
+             json.dumps(result, ensure_ascii=False, default=str)),
+        )
+        self._pending += 1
+        if self._pending >= 200:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        self.flush()
+        self._conn.close()
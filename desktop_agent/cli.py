@@ -0,0 +1,282 @@
+# cli.py
+# Příkazová řádka desktop engine pro CI / build server – bez okna, bez importu Tk.
+# © 2025 Ing. Martin Cieślar
+#
+# Použití (z kořene projektu):
+#   python -m desktop_agent.cli check SLOŽKA|SOUBOR.pdf [...] [--workers N] [--format ndjson|json|csv]
+#          [-o VÝSTUP] [--fail-on error,not-pdfa3,docmdp-locked,unsigned] [--no-cache] [--upload]
+#
+# Výsledky se píšou průběžně (ve stejném pořadí jako vstup), souhrn na stderr.
+# Běží-li lokální démon analýzy (analysis_daemon), použije se jeho warm pool a cache.
+# Návratové kódy: 0 = vše v pořádku, 1 = porušení politiky (--fail-on), 2 = chybné použití,
+# 3 = odeslání na server (--upload) selhalo.
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+_AGENT_DIR = os.path.dirname(os.path.abspath(__file__))
+if _AGENT_DIR not in sys.path:
+    # Moduly agenta se importují navzájem „naplocho“ (from pdf_checker import ...)
+    sys.path.insert(0, _AGENT_DIR)
+
+from pdf_checker import find_all_pdfs, iter_analyze_pdfs  # noqa: E402
+
+EXIT_OK = 0
+EXIT_POLICY = 1
+EXIT_USAGE = 2
+EXIT_UPLOAD = 3
+
+POLICIES = ('error', 'not-pdfa3', 'docmdp-locked', 'unsigned')
+
+CSV_COLUMNS = (
+    'path', 'relative_path', 'success', 'pdf_version', 'is_pdf_a3', 'signature_count',
+    'docmdp_level', 'issr_compatible', 'file_size', 'file_hash', 'from_cache', 'violations', 'error',
+)
+
+
+def policy_violations(result, policies):
+    """Seznam porušených pravidel pro jeden výsledek (prázdný = OK)."""
+    if not result.get('success'):
+        return ['error'] if 'error' in policies else []
+    display = result.get('display') or {}
+    out = []
+    if 'not-pdfa3' in policies and not display.get('is_pdf_a3'):
+        out.append('not-pdfa3')
+    if 'docmdp-locked' in policies and display.get('issr_compatible') is False:
+        out.append('docmdp-locked')
+    if 'unsigned' in policies and not display.get('signature_count'):
+        out.append('unsigned')
+    return out
+
+
+def _collect_targets(paths):
+    """
+    Vstupní cesty -> [(zdrojová složka, [položky jako find_all_pdfs])]. Složky rekurzivně,
+    samostatné soubory se seskupí podle své složky (jedna dávka na složku při --upload).
+    """
+    groups = {}
+    order = []
+    missing = []
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            key, items = path, find_all_pdfs(path)
+            items.sort(key=lambda p: p['relative_path'].lower())
+        elif os.path.isfile(path):
+            key = os.path.dirname(path)
+            name = os.path.basename(path)
+            items = [{'full_path': path, 'relative_path': name, 'folder': '.', 'filename': name}]
+        else:
+            missing.append(path)
+            continue
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        seen = {i['full_path'] for i in groups[key]}
+        groups[key].extend(i for i in items if i['full_path'] not in seen)
+    return [(key, groups[key]) for key in order], missing
+
+
+def _analyze_stream(items, workers, cache, daemon=None):
+    """Výsledky v pořadí items; zásahy cache se neposílají do workerů. S démonem řeší cache i pool démon."""
+    if daemon is not None:
+        from analysis_daemon import DaemonUnavailable
+        done = 0
+        try:
+            for result in daemon.analyze([item['full_path'] for item in items], use_cache=cache is not None):
+                yield items[done], result
+                done += 1
+            return
+        except (DaemonUnavailable, OSError, ValueError) as e:
+            print(f"Démon analýzy nedostupný ({e}), pokračuji v procesu", file=sys.stderr)
+        items = items[done:]
+    stats = [None] * len(items)
+    cached = [None] * len(items)
+    to_run = []
+    for i, item in enumerate(items):
+        if cache is not None:
+            try:
+                stats[i] = os.stat(item['full_path'])
+            except OSError:
+                stats[i] = None
+            cached[i] = cache.get(item['full_path'], stats[i]) if stats[i] else None
+        if cached[i] is None:
+            to_run.append(i)
+    fresh = iter_analyze_pdfs([items[i]['full_path'] for i in to_run], workers)
+    for i, item in enumerate(items):
+        result = cached[i]
+        if result is None:
+            result = next(fresh)
+            if cache is not None and stats[i] is not None:
+                cache.put(item['full_path'], result, stats[i])
+        yield item, result
+
+
+class _Writer:
+    """Streamovaný zápis NDJSON / JSON pole / CSV."""
+
+    def __init__(self, fmt, stream):
+        self.fmt = fmt
+        self.stream = stream
+        self.count = 0
+        self._csv = None
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(stream, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+            self._csv.writeheader()
+        elif fmt == 'json':
+            stream.write('[')
+
+    def write(self, record):
+        if self.fmt == 'csv':
+            display = record.get('display') or {}
+            self._csv.writerow({
+                'path': record.get('path'),
+                'relative_path': record.get('relative_path'),
+                'success': record.get('success'),
+                'pdf_version': display.get('pdf_version'),
+                'is_pdf_a3': display.get('is_pdf_a3'),
+                'signature_count': display.get('signature_count'),
+                'docmdp_level': display.get('docmdp_level'),
+                'issr_compatible': display.get('issr_compatible'),
+                'file_size': record.get('file_size'),
+                'file_hash': record.get('file_hash'),
+                'from_cache': bool(record.get('from_cache')),
+                'violations': ' '.join(record.get('violations') or []),
+                'error': record.get('error', ''),
+            })
+        else:
+            line = json.dumps(record, ensure_ascii=False, default=str)
+            if self.fmt == 'json':
+                self.stream.write(('\n' if not self.count else ',\n') + line)
+            else:
+                self.stream.write(line + '\n')
+                self.stream.flush()
+        self.count += 1
+
+    def close(self):
+        if self.fmt == 'json':
+            self.stream.write('\n]\n' if self.count else ']\n')
+        self.stream.flush()
+
+
+def _upload(config_path, source_folder, results):
+    """Odešle výsledky jedné složky jako dávku (stejně jako agent s oknem). Vrací (ok, zpráva)."""
+    from license import LicenseManager
+    manager = LicenseManager(config_path)
+    if not manager.has_valid_key():
+        return False, 'API klíč není nastaven (config.yaml, api.key)'
+    batch_name = f"{os.path.basename(source_folder)} ({datetime.now().strftime('%Y-%m-%d %H:%M')})"
+    out = manager.upload_batch(batch_name, source_folder, results)
+    return out[0], (f"dávka {out[2]}: {out[1]}" if out[0] else out[1])
+
+
+def cmd_check(args):
+    policies = [p.strip() for p in args.fail_on.split(',') if p.strip()]
+    unknown = [p for p in policies if p not in POLICIES]
+    if unknown:
+        print(f"Neznámé pravidlo --fail-on: {', '.join(unknown)} (dostupná: {', '.join(POLICIES)})", file=sys.stderr)
+        return EXIT_USAGE
+    groups, missing = _collect_targets(args.paths)
+    for path in missing:
+        print(f"Cesta neexistuje: {path}", file=sys.stderr)
+    if missing:
+        return EXIT_USAGE
+    if not any(items for _, items in groups):
+        print('Nenalezena žádná PDF', file=sys.stderr)
+        return EXIT_USAGE
+
+    cache = None
+    if not args.no_cache:
+        from check_cache import CheckCache
+        cache = CheckCache(args.cache)
+    daemon = None
+    if not args.no_daemon:
+        from analysis_daemon import connect
+        daemon = connect()
+
+    out = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    writer = _Writer(args.format, out)
+    started = time.time()
+    totals = {'files': 0, 'failed': 0, 'violations': 0, 'cached': 0}
+    upload_failed = False
+    try:
+        for source_folder, items in groups:
+            uploaded = [] if args.upload else None
+            for item, result in _analyze_stream(items, args.workers, cache, daemon):
+                result['folder'] = item['folder']
+                result['relative_path'] = item['relative_path']
+                violations = policy_violations(result, policies)
+                totals['files'] += 1
+                totals['failed'] += 0 if result.get('success') else 1
+                totals['violations'] += 1 if violations else 0
+                totals['cached'] += 1 if result.get('from_cache') else 0
+                record = dict(result, path=item['full_path'], violations=violations)
+                writer.write(record)
+                if uploaded is not None:
+                    uploaded.append(result)
+            if uploaded:
+                ok, message = _upload(args.config, source_folder, uploaded)
+                print(f"Odeslání {source_folder}: {message}", file=sys.stderr)
+                upload_failed = upload_failed or not ok
+    finally:
+        writer.close()
+        if out is not sys.stdout:
+            out.close()
+        if cache is not None:
+            cache.close()
+        if daemon is not None:
+            daemon.close()
+
+    elapsed = time.time() - started
+    summary = (f"Zkontrolováno {totals['files']} PDF za {elapsed:.1f} s, chyb analýzy {totals['failed']}, "
+               f"porušení pravidel {totals['violations']}")
+    if cache is not None:
+        summary += f", z cache {totals['cached']}"
+    if daemon is not None:
+        summary += ", přes démona analýzy"
+    print(summary, file=sys.stderr)
+    if upload_failed:
+        return EXIT_UPLOAD
+    return EXIT_POLICY if totals['violations'] else EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m desktop_agent.cli', description='PDF DokuCheck – kontrola bez okna')
+    sub = parser.add_subparsers(dest='command', required=True)
+    check = sub.add_parser('check', help='zkontrolovat PDF soubory / složky (rekurzivně)')
+    check.add_argument('paths', nargs='+', metavar='CESTA')
+    check.add_argument('--workers', '-j', type=int, default=os.cpu_count() or 1,
+                       help='počet paralelních procesů (výchozí = počet CPU)')
+    check.add_argument('--format', '-f', choices=('ndjson', 'json', 'csv'), default='ndjson')
+    check.add_argument('--output', '-o', metavar='SOUBOR', help='výstup do souboru místo stdout')
+    check.add_argument('--fail-on', default='error', metavar='PRAVIDLA',
+                       help='čárkou oddělená pravidla pro návratový kód 1: ' + ', '.join(POLICIES))
+    check.add_argument('--no-cache', action='store_true', help='nepoužívat lokální cache výsledků')
+    check.add_argument('--cache', metavar='SOUBOR', help='cesta k cache (výchozí v uživatelské cache složce)')
+    check.add_argument('--no-daemon', action='store_true',
+                       help='analyzovat v procesu i když běží lokální démon (analysis_daemon)')
+    check.add_argument('--upload', action='store_true', help='odeslat výsledky na server (jedna dávka na složku)')
+    check.add_argument('--config', default=os.path.join(_AGENT_DIR, 'config.yaml'),
+                       help='config.yaml s API klíčem (pro --upload)')
+    check.set_defaults(func=cmd_check)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # např. | head – zbytek výstupu nikdo nečte
+        return EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -34,6 +34,12 @@ a = Analysis(
         'license',
         'machine_id',
         'pdf_checker',
+        'folder_scanner',
+        'progress_channel',
+        'folder_watch',
+        'analysis_daemon',
+        'check_cache',
+        'queue_model',
         'ui_2026_v3_enterprise',
     ],
     hookspath=[],
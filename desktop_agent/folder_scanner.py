@@ -0,0 +1,104 @@
+# folder_scanner.py
+# Vyhledání PDF ve složce na pozadí: os.scandir, podsložky paralelně, výsledky po dávkách.
+# © 2025 Ing. Martin Cieślar
+#
+# Tk vlákno nečeká na procházení (síťové disky, velké projekty) – jen si v taktu vyzvedává take():
+# nově nalezené soubory, počet prohledaných složek a příznak dokončení. cancel() procházení zastaví.
+# Typ položky (soubor/složka) bere z DirEntry (d_type), bez os.stat na každou položku jako os.walk + isdir.
+
+import os
+import queue
+import threading
+
+DEFAULT_WORKERS = 4
+
+
+class FolderScanner:
+    """Paralelní rekurzivní hledání *.pdf pod root_path; výsledky (cesta, název) streamuje přes take()."""
+
+    def __init__(self, root_path, workers=DEFAULT_WORKERS):
+        self.root_path = root_path
+        self.workers = max(1, int(workers))
+        self._dirs = queue.Queue()
+        self._lock = threading.Lock()
+        self._found = []
+        self._pending = 0  # složky ve frontě nebo právě procházené
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+        self.dirs_scanned = 0
+        self.files_found = 0
+        self.errors = 0
+
+    def start(self):
+        self._push(self.root_path)
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"folder-scan-{i}", daemon=True).start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def take(self):
+        """Vrátí (nové soubory [(cesta, název)], prohledané složky, nalezené soubory, hotovo)."""
+        done = self._done.is_set()
+        with self._lock:
+            found, self._found = self._found, []
+            return found, self.dirs_scanned, self.files_found, done
+
+    def _push(self, path):
+        with self._lock:
+            self._pending += 1
+        self._dirs.put(path)
+
+    def _worker(self):
+        while True:
+            path = self._dirs.get()
+            if path is None:
+                return
+            if not self._cancel.is_set():
+                self._scan_dir(path)
+            with self._lock:
+                self._pending -= 1
+                finished = self._pending == 0
+            if finished:
+                # Poslední složka dozpracovaná – probudit a ukončit všechna vlákna
+                self._done.set()
+                for _ in range(self.workers):
+                    self._dirs.put(None)
+                return
+
+    def _scan_dir(self, path):
+        files = []
+        subdirs = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.name.lower().endswith(".pdf") and entry.is_file():
+                            files.append((entry.path, entry.name))
+                    except OSError:
+                        continue
+        except OSError:
+            with self._lock:
+                self.errors += 1
+                self.dirs_scanned += 1
+            return
+        files.sort(key=lambda f: f[1].lower())
+        with self._lock:
+            self._found.extend(files)
+            self.files_found += len(files)
+            self.dirs_scanned += 1
+        if self._cancel.is_set():
+            return
+        for sub in sorted(subdirs):
+            self._push(sub)
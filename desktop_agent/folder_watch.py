@@ -0,0 +1,280 @@
+# folder_watch.py
+# Sledování projektové složky: po každé změně se analyzují jen přidaná/změněná PDF a na server jde jen rozdíl.
+# © 2025 Ing. Martin Cieślar
+#
+# - stav souborů (relativní cesta -> mtime, velikost, hash, výsledek OK/chyba) se ukládá do JSON indexu,
+#   takže i po restartu agenta stojí kontrola beze změn jen průchod adresáři (os.scandir + stat jen u PDF)
+# - změny: Linux inotify (ctypes, bez závislostí), jinde / při chybě polling po interval sekundách
+# - první běh založí na serveru dávku, další běhy ji aktualizují (batch_id + removed), viz upload_batch
+#
+# Spuštění: python pdf_check_agent_main.py --watch "C:/Projekty/Stavba" [--once] [--interval 30]
+
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import logging
+import os
+import select
+import sys
+import threading
+import time
+
+from analysis_daemon import analyze_multiple_pdfs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL = 30  # s – polling; s inotify jen pojistka (síťové disky události neposílají)
+INOTIFY_SAFETY_FACTOR = 10
+SETTLE_SECONDS = 2.0  # po události počkat, až se kopírování dodávky uklidní
+INDEX_VERSION = 1
+
+
+def snapshot_folder(root):
+    """Všechna PDF pod root: ({relativní cesta '/': (mtime_ns, size)}, [složky]). Typ položky z DirEntry, stat jen u PDF."""
+    files = {}
+    dirs = []
+    stack = [root]
+    while stack:
+        path = stack.pop()
+        dirs.append(path)
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.lower().endswith('.pdf') and entry.is_file():
+                            st = entry.stat()
+                            rel = os.path.relpath(entry.path, root).replace('\\', '/')
+                            files[rel] = (st.st_mtime_ns, st.st_size)
+                    except OSError:
+                        continue
+        except OSError as e:
+            logger.warning(f"Sledování: složku nelze číst {path}: {e}")
+    return files, dirs
+
+
+class FileStateIndex:
+    """Perzistentní index stavu souborů jedné sledované složky (JSON v uživatelské složce agenta)."""
+
+    def __init__(self, state_dir, root):
+        key = hashlib.sha1(os.path.normcase(os.path.abspath(root)).encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(state_dir, 'watch_index', key + '.json')
+        self.root = root
+        self.batch_id = None
+        self.files = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == INDEX_VERSION:
+                self.batch_id = data.get('batch_id')
+                self.files = data.get('files') or {}
+        except (OSError, ValueError):
+            pass
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'root': self.root, 'batch_id': self.batch_id, 'files': self.files}, f)
+        os.replace(tmp, self.path)
+
+    def reset(self):
+        self.batch_id = None
+        self.files = {}
+
+    def diff(self, current):
+        """(přidané, změněné, odebrané) relativní cesty; soubory s chybou analýzy se zkouší znovu."""
+        added, changed = [], []
+        for rel, (mtime_ns, size) in current.items():
+            entry = self.files.get(rel)
+            if entry is None:
+                added.append(rel)
+            elif entry.get('mtime_ns') != mtime_ns or entry.get('size') != size or not entry.get('ok'):
+                changed.append(rel)
+        removed = [rel for rel in self.files if rel not in current]
+        return sorted(added), sorted(changed), sorted(removed)
+
+
+class _Inotify:
+    """Minimální obal inotify přes ctypes – jen „něco se změnilo“, detaily dopočítá snapshot."""
+
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_FROM = 0x040
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_MOVE_SELF = 0x800
+    IN_ONLYDIR = 0x01000000
+    MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 selhalo')
+        self._watched = set()
+
+    def watch_dirs(self, dirs):
+        """Přidá watch na nové složky (opakované přidání téže složky je v jádře no-op)."""
+        for path in dirs:
+            if path in self._watched:
+                continue
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f'inotify_add_watch selhalo: {path}')
+            self._watched.add(path)
+
+    def forget(self, dirs):
+        # Smazané složky jádro odhlásí samo (IN_IGNORED); jen je vyřadit z evidence, aby šly znovu přidat
+        self._watched.intersection_update(dirs)
+
+    def wait(self, timeout):
+        """True = přišla aspoň jedna událost (buffer se vyprázdní)."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return False
+        try:
+            while os.read(self._fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+        return True
+
+    def close(self):
+        try:
+            os.close(self._fd)
+        except OSError:
+            pass
+
+
+class FolderWatch:
+    """
+    Inkrementální kontrola jedné složky. uploader(results, removed, batch_id) -> (success, message, batch_id, data)
+    odesílá rozdíl na server; None = jen lokální analýza (index se aktualizuje hned).
+    """
+
+    def __init__(self, root, state_dir, uploader=None, progress_callback=None):
+        self.root = os.path.abspath(root)
+        self.index = FileStateIndex(state_dir, self.root)
+        self.uploader = uploader
+        self.progress_callback = progress_callback
+        self._dirs = []
+
+    def run_once(self):
+        """Jeden průchod: snapshot, analýza rozdílu, odeslání rozdílu, uložení indexu. Vrací souhrn (dict)."""
+        started = time.time()
+        current, self._dirs = snapshot_folder(self.root)
+        added, changed, removed = self.index.diff(current)
+        summary = {'files': len(current), 'added': len(added), 'changed': len(changed), 'removed': len(removed),
+                   'analyzed': 0, 'uploaded': False, 'batch_id': self.index.batch_id}
+        if not (added or changed or removed):
+            summary['seconds'] = round(time.time() - started, 3)
+            return summary
+
+        delta = added + changed
+        results = analyze_multiple_pdfs([os.path.join(self.root, rel) for rel in delta], self.progress_callback)
+        for rel, result in zip(delta, results):
+            result['relative_path'] = rel
+            result['folder'] = os.path.dirname(rel) or '.'
+        summary['analyzed'] = len(results)
+
+        not_saved = set()
+        if self.uploader is not None:
+            # Soubor, který dřív prošel a teď analýza selhala, se ze serverové dávky odebere (neúspěšné se neposílají)
+            stale = [rel for rel, r in zip(changed, results[len(added):]) if not r.get('success')]
+            ok, message, batch_id, data = self._upload(results, removed + stale)
+            if not ok and (data or {}).get('error') == 'batch_not_found' and self.index.batch_id:
+                # Dávku někdo na webu smazal – začít znovu celou složkou do nové dávky
+                logger.warning("Sledování: dávka %s na serveru neexistuje, odesílám celou složku znovu", self.index.batch_id)
+                self.index.reset()
+                self.index.save()
+                return self.run_once()
+            if not ok:
+                # Index se neposouvá – rozdíl se zkusí odeslat znovu při příštím průchodu
+                logger.error(f"Sledování: odeslání změn selhalo: {message}")
+                summary['error'] = message
+                summary['seconds'] = round(time.time() - started, 3)
+                return summary
+            self.index.batch_id = batch_id or self.index.batch_id
+            summary['uploaded'] = True
+            summary['batch_id'] = self.index.batch_id
+            not_saved = self._not_saved(delta, results, data)
+            if not_saved:
+                # Server dávku ořízl (max_batch_size licence, zbytek zkušebního limitu) – neuložené soubory
+                # zůstanou v indexu jako dosud a odešlou se při příštím průchodu
+                logger.warning("Sledování: server uložil jen část změn (%s), neuloženo %d – odešle se příště",
+                               message, len(not_saved))
+                summary['not_uploaded'] = len(not_saved)
+
+        for rel, result in zip(delta, results):
+            if rel in not_saved:
+                continue
+            mtime_ns, size = current[rel]
+            self.index.files[rel] = {'mtime_ns': mtime_ns, 'size': size,
+                                     'file_hash': result.get('file_hash'), 'ok': bool(result.get('success'))}
+        for rel in removed:
+            self.index.files.pop(rel, None)
+        self.index.save()
+        summary['seconds'] = round(time.time() - started, 3)
+        return summary
+
+    @staticmethod
+    def _not_saved(delta, results, data):
+        """
+        Cesty úspěšně analyzovaných souborů, které server neuložil. Server ukládá prvních saved_count
+        odeslaných výsledků (upload_batch posílá jen úspěšné, v pořadí delta); chybí-li saved_count, uložil vše.
+        """
+        sent = [rel for rel, result in zip(delta, results) if result.get('success')]
+        saved = (data or {}).get('saved_count')
+        if not isinstance(saved, int) or saved >= len(sent):
+            return set()
+        return set(sent[max(0, saved):])
+
+    def _upload(self, results, removed):
+        if self.index.batch_id is None and not results:
+            return True, '', None, None
+        return self.uploader(results, removed, self.index.batch_id)
+
+    def watch(self, interval=DEFAULT_INTERVAL, stop_event=None, on_summary=None):
+        """Běží do stop_event: inotify (Linux), jinak polling po interval sekundách."""
+        stop_event = stop_event or threading.Event()
+        notifier = None
+        if sys.platform.startswith('linux'):
+            try:
+                notifier = _Inotify()
+            except (OSError, AttributeError) as e:
+                logger.info(f"Sledování: inotify nedostupné ({e}), použije se polling")
+        try:
+            while not stop_event.is_set():
+                summary = self.run_once()
+                if on_summary:
+                    on_summary(summary)
+                if notifier is not None:
+                    try:
+                        notifier.forget(self._dirs)
+                        notifier.watch_dirs(self._dirs)
+                    except OSError as e:
+                        # Typicky vyčerpaný fs.inotify.max_user_watches
+                        logger.warning(f"Sledování: inotify selhalo ({e}), přepínám na polling")
+                        notifier.close()
+                        notifier = None
+                if notifier is None:
+                    stop_event.wait(interval)
+                    continue
+                deadline = time.monotonic() + interval * INOTIFY_SAFETY_FACTOR
+                while not stop_event.is_set() and time.monotonic() < deadline:
+                    if notifier.wait(min(1.0, deadline - time.monotonic())):
+                        # Počkat, až dodávka dokopíruje (žádná událost po SETTLE_SECONDS)
+                        while notifier.wait(SETTLE_SECONDS) and not stop_event.is_set():
+                            pass
+                        break
+        finally:
+            if notifier is not None:
+                notifier.close()
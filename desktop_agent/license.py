@@ -275,8 +275,11 @@ class LicenseManager:
         except Exception as e:
             return False, str(e)
 
-    def upload_batch(self, batch_name, source_folder, results):
-        """Odešle CELÝ batch najednou v jednom requestu. Vrátí (success, message, batch_id, response_data)."""
+    def upload_batch(self, batch_name, source_folder, results, batch_id=None, removed=None):
+        """
+        Odešle CELÝ batch najednou v jednom requestu. Vrátí (success, message, batch_id, response_data).
+        S batch_id aktualizuje existující dávku: výsledky nahradí soubory se stejnou cestou, removed = smazané cesty.
+        """
         if not self.has_valid_key():
             return False, "API klíč není nastaven", None, None
         try:
@@ -298,6 +301,9 @@ class LicenseManager:
                 'total_files': len(files_data),
                 'results': files_data
             }
+            if batch_id:
+                payload['batch_id'] = batch_id
+                payload['removed'] = list(removed or [])
             headers = self._api_headers(self.api_key)
             response = requests.post(
                 f"{self.api_url}/api/batch/upload",
@@ -322,6 +328,8 @@ class LicenseManager:
                     return False, err, None, None
                 except Exception:
                     return False, "Zkušební limit vyčerpán. Zakupte si prosím licenci.", None, None
+            elif response.status_code == 404 and batch_id:
+                return False, "Dávka na serveru neexistuje", None, {'error': 'batch_not_found'}
             elif response.status_code == 413:
                 return False, "Data jsou příliš velká", None, None
             else:
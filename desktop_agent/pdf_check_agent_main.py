@@ -10,7 +10,9 @@ from pathlib import Path
 import requests
 
 # Importy lokálních modulů
-from pdf_checker import analyze_pdf_file, analyze_multiple_pdfs, analyze_folder
+from pdf_checker import analyze_pdf_file
+# Dávky přes lokálního démona analýzy (warm pool + cache), když běží; jinak v procesu
+from analysis_daemon import analyze_multiple_pdfs, analyze_folder
 from license import LicenseManager
 # Grafika V3 (Enterprise) – strom složek, světlé rozlišení, bez detailu kontroly v okně
 from ui_2026_v3_enterprise import create_app_2026_v3 as create_app
@@ -187,12 +189,7 @@ class PDFCheckAgent:
                 filepaths = filepath_or_folder
                 logger.info(f"Kontrola {len(filepaths)} souborů")
 
-                # Progress callback
-                def progress_callback(current, total, filename):
-                    if self.app:
-                        self.app.root.after(0, lambda: self.app.update_progress(current, total, filename))
-
-                results = analyze_multiple_pdfs(filepaths, progress_callback)
+                results = analyze_multiple_pdfs(filepaths, self._progress_callback)
 
                 # Odeslání na API (batch)
                 if do_send:
@@ -209,12 +206,7 @@ class PDFCheckAgent:
                 folder = filepath_or_folder
                 logger.info(f"Kontrola složky: {folder}")
 
-                # Progress callback
-                def progress_callback(current, total, filename):
-                    if self.app:
-                        self.app.root.after(0, lambda: self.app.update_progress(current, total, filename))
-
-                folder_results = analyze_folder(folder, progress_callback)
+                folder_results = analyze_folder(folder, self._progress_callback)
 
                 # Odeslání na API (batch) - předej source_folder pro stromovou strukturu
                 if do_send:
@@ -226,6 +218,15 @@ class PDFCheckAgent:
             logger.exception(f"Chyba při kontrole PDF: {e}")
             return {'success': False, 'error': str(e)}
 
+    def _progress_callback(self, current, total, filename):
+        """Průběh z analyzačního vlákna. UI s progress_channel ho čte samo v taktu – bez root.after za každý soubor."""
+        if not self.app:
+            return
+        if getattr(self.app, 'progress_channel', None) is not None:
+            self.app.update_progress(current, total, filename)
+        else:
+            self.app.root.after(0, lambda: self.app.update_progress(current, total, filename))
+
     def _check_single_file(self, filepath):
         """Zkontroluje jeden PDF soubor"""
         if not os.path.exists(filepath):
@@ -418,6 +419,7 @@ class PDFCheckAgent:
             on_has_login=lambda: self.license_manager.has_valid_key(),
             on_get_remote_config=_get_remote_config,
             on_get_legal_config=lambda: self.legal_config,
+            session_dir=_get_user_data_dir(),
         )
 
         # Zkontroluj první spuštění a zobraz stav licence
@@ -428,6 +430,9 @@ class PDFCheckAgent:
         logger.info("Agent běží")
         self.root.mainloop()
 
+        # Relace (fronta + výsledky) zůstává na disku – po dalším spuštění se obnoví
+        if hasattr(self.app, 'close_session'):
+            self.app.close_session()
         logger.info("Agent ukončen")
 
     def _get_web_login_url(self):
@@ -457,8 +462,66 @@ class PDFCheckAgent:
         return None
 
 
+def run_watch(argv):
+    """
+    Režim sledování složky bez okna: --watch SLOŽKA [--once] [--interval N] [--no-upload].
+    Změny se analyzují a odesílají jako aktualizace jedné dávky na serveru (viz folder_watch).
+    """
+    import argparse
+    from folder_watch import FolderWatch, DEFAULT_INTERVAL
+
+    parser = argparse.ArgumentParser(prog='pdf_check_agent', description='Sledování složky s PDF')
+    parser.add_argument('--watch', required=True, metavar='SLOŽKA')
+    parser.add_argument('--once', action='store_true', help='jen jeden průchod (např. z plánovače úloh)')
+    parser.add_argument('--interval', type=int, default=DEFAULT_INTERVAL, help='interval pollingu v sekundách')
+    parser.add_argument('--no-upload', action='store_true', help='jen lokální kontrola, nic neodesílat')
+    args = parser.parse_args(argv)
+
+    folder = os.path.abspath(args.watch)
+    if not os.path.isdir(folder):
+        logger.error(f"Složka neexistuje: {folder}")
+        return 2
+
+    _ensure_config_in_exe_dir()
+    license_manager = LicenseManager(_get_config_path())
+    uploader = None
+    if not args.no_upload:
+        if not license_manager.has_valid_key():
+            logger.error("API klíč není nastaven – spusťte agenta s oknem a aktivujte licenci, nebo použijte --no-upload")
+            return 2
+        batch_name = os.path.basename(folder.rstrip('/\\')) or folder
+
+        def uploader(results, removed, batch_id):
+            return license_manager.upload_batch(batch_name, folder, results, batch_id=batch_id, removed=removed)
+
+    def on_summary(summary):
+        if summary['added'] or summary['changed'] or summary['removed'] or summary.get('error'):
+            logger.info(
+                "Sledování %s: %d souborů, +%d ~%d -%d, analyzováno %d, dávka %s (%.1f s)%s%s",
+                folder, summary['files'], summary['added'], summary['changed'], summary['removed'],
+                summary['analyzed'], summary['batch_id'], summary['seconds'],
+                f" – neodesláno {summary['not_uploaded']} (limit serveru)" if summary.get('not_uploaded') else '',
+                f" – chyba: {summary['error']}" if summary.get('error') else '',
+            )
+
+    watcher = FolderWatch(folder, _get_user_data_dir(), uploader=uploader)
+    if args.once:
+        summary = watcher.run_once()
+        on_summary(summary)
+        return 1 if summary.get('error') else 0
+    logger.info(f"Sledování složky {folder} (Ctrl+C ukončí)")
+    watcher.watch(interval=args.interval, on_summary=on_summary)
+    return 0
+
+
 def main():
     """Hlavní entry point"""
+    if any(a == '--watch' or a.startswith('--watch=') for a in sys.argv[1:]):
+        try:
+            sys.exit(run_watch(sys.argv[1:]))
+        except KeyboardInterrupt:
+            logger.info("Sledování ukončeno uživatelem")
+            sys.exit(0)
     try:
         agent = PDFCheckAgent()
         agent.run()
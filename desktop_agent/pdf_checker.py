@@ -3,6 +3,7 @@
 # Převzato z PDF DokuCheck PRO v38
 
 import re
+import io
 import os
 import hashlib
 from datetime import datetime
@@ -597,9 +598,38 @@ def detect_docmdp_lock(content):
         return {'locked': False, 'level': None}
 
 
-def analyze_pdf(content):
-    """Kompletní analýza PDF. Status podpisu vychází pouze z objektů typu SIGNATURE (ne z DOCUMENT_TIMESTAMP)."""
-    pdfa_version, pdfa_status = check_pdfa_version(content)
+def scan_pdfa_markers(content):
+    """
+    Jeden průchod značkami PDF/A v obsahu: verze z hlavičky (%PDF-x.y), pdfaid:part a conformance.
+    Vrací {'pdf_version', 'part', 'status', 'conformance'} – sdílí ho výsledek analýzy i web adaptér.
+    """
+    pdf_version = None
+    conformance = None
+    try:
+        pdf_header = re.search(rb'%PDF-(\d+\.\d+)', content[:100])
+        if pdf_header:
+            pdf_version = pdf_header.group(1).decode('ascii')
+    except Exception:
+        pass
+    try:
+        conf_match = re.search(rb"pdfaid:conformance=['\"]?([ABUYabuy])['\"]?", content, re.IGNORECASE)
+        if conf_match:
+            conformance = conf_match.group(1).decode('ascii').lower()
+        if not conformance:
+            for level in (b'PDF/A-3y', b'PDF/A-3u', b'PDF/A-3b', b'PDF/A-3a'):
+                if level in content:
+                    conformance = level.decode('ascii')[-1].lower()
+                    break
+    except Exception:
+        pass
+    part, status = check_pdfa_version(content)
+    return {'pdf_version': pdf_version, 'part': part, 'status': status, 'conformance': conformance}
+
+
+def analyze_pdf(content, pdfa=None):
+    """Kompletní analýza PDF. Status podpisu vychází pouze z objektů typu SIGNATURE (ne z DOCUMENT_TIMESTAMP).
+    pdfa = již zjištěná dvojice (verze, status) z check_pdfa_version – ušetří opakovaný průchod obsahem."""
+    pdfa_version, pdfa_status = pdfa if pdfa is not None else check_pdfa_version(content)
     sig_data = check_signature_data(content)
     tsa = check_timestamp(content)
     docmdp = detect_docmdp_lock(content)
@@ -626,124 +656,161 @@ def analyze_pdf(content):
     }
 
 
+# Soubory nad tímto limitem se pro byte-scan čtou jen po částech (začátek + konec)
+_FULL_SCAN_LIMIT = 2 * 1024 * 1024
+_HEAD_CHUNK = 512 * 1024
+_TAIL_CHUNK = 1024 * 1024
+
+
+def is_chunk_scanned(file_size):
+    """True = byte-scan viděl jen začátek + konec souboru (XMP se značkami PDF/A uprostřed v něm chybí)."""
+    return (file_size or 0) > _FULL_SCAN_LIMIT
+
+
+def _build_file_result(reader_source, content, filename, file_size, file_hash):
+    """
+    Společné jádro analyze_pdf_file / analyze_pdf_bytes.
+    reader_source = cesta nebo stream pro pypdf; content = obsah (nebo začátek + konec) pro byte-scan.
+    """
+    # Primárně podpisy a DocMDP ze struktury PDF (pypdf) – nezávisí na velikosti souboru
+    sig_list_from_reader = []
+    reader = None
+    try:
+        from pypdf import PdfReader
+        reader = PdfReader(reader_source)
+        sig_list_from_reader = extract_signatures_via_reader(reader)
+    except Exception:
+        pass
+    markers = scan_pdfa_markers(content)
+    analysis = analyze_pdf(content, pdfa=(markers['part'], markers['status']))
+    # Přepsat podpisy z readeru, pokud jsme nějaké získali (nezávisí na chunku)
+    if sig_list_from_reader:
+        signature_objs = [s for s in sig_list_from_reader if s.get('type') == 'SIGNATURE']
+        analysis['signatures'] = sig_list_from_reader
+        analysis['sig_count'] = len(sig_list_from_reader)
+        if signature_objs:
+            all_have_ckait = all(s.get('ckait', '—') != '—' for s in signature_objs)
+            all_have_name = all(s.get('signer', '—') != '—' for s in signature_objs)
+            analysis['sig'] = 'OK' if (all_have_ckait and all_have_name) else 'PARTIAL'
+            analysis['signer'] = signature_objs[0].get('signer', '—')
+            analysis['ckait'] = signature_objs[0].get('ckait', '—')
+        else:
+            analysis['sig'] = 'PARTIAL' if analysis.get('sig_count') else 'FAIL'
+            analysis['signer'] = '—'
+            analysis['ckait'] = '—'
+        if any(s.get('tsa') == 'TSA' and s.get('timestamp_valid') for s in sig_list_from_reader):
+            analysis['tsa'] = 'TSA'
+        elif any(s.get('tsa') == 'LOCAL' for s in sig_list_from_reader):
+            analysis['tsa'] = 'LOCAL'
+        else:
+            analysis['tsa'] = 'NONE'
+    # Preferenční detekce DocMDP přes strukturu PDF (AcroForm / Sig / Lock, TransformParams)
+    if reader is not None:
+        try:
+            docmdp_reader = detect_docmdp_lock_via_reader(reader)
+            analysis['docmdp_level'] = docmdp_reader['level']
+            analysis['issr_compatible'] = not docmdp_reader['locked']
+        except Exception:
+            pass
+    pdf_format = {
+        'is_pdf_a3': analysis['pdfaVersion'] == 3,
+        'exact_version': f"PDF/A-{analysis['pdfaVersion']}" if analysis['pdfaVersion'] else "PDF (ne PDF/A)",
+        'standard': "ISO 19005-3:2012" if analysis['pdfaVersion'] == 3 else None,
+        'pdf_version': markers['pdf_version'],
+        'conformance': markers['conformance'],
+    }
+    signatures = []
+    for sig in analysis.get('signatures', []):
+        tsa_issuer = sig.get('tsa_issuer', '—')
+        tsa_qualified = is_tsa_issuer_qualified(tsa_issuer) if tsa_issuer and tsa_issuer != '—' else False
+        sig_type = sig.get('type', 'SIGNATURE')
+        if sig_type == 'DOCUMENT_TIMESTAMP':
+            display_name = 'Časové razítko dokumentu (' + (tsa_issuer if tsa_issuer != '—' else '—') + ')'
+        else:
+            display_name = sig.get('signer', '—')
+        signatures.append({
+            'index': sig.get('index', len(signatures) + 1),
+            'type': sig_type,
+            'valid': sig.get('valid', False),
+            'name': display_name,
+            'signer': sig.get('signer', '—'),
+            'ckait_number': sig.get('ckait', '—'),
+            'signature_type': sig.get('signature_type', None),
+            'timestamp_valid': sig.get('timestamp_valid', False),
+            'certificate_valid': sig.get('certificate_valid', False),
+            'date': sig.get('date', '—'),
+            'tsa_issuer': tsa_issuer,
+            'tsa_qualified': tsa_qualified,
+        })
+    docmdp_level = analysis.get('docmdp_level')
+    issr_compatible = analysis.get('issr_compatible', True)
+    return {
+        'success': True,
+        'file_name': filename,
+        'file_hash': file_hash,
+        'file_size': file_size,
+        'processed_at': datetime.now().isoformat(),
+        'results': {
+            'pdf_format': pdf_format,
+            'signatures': signatures,
+            'file_info': {'filename': filename, 'size': file_size, 'hash': file_hash},
+            'docmdp_level': docmdp_level,
+            'issr_compatible': issr_compatible,
+        },
+        'display': {
+            'pdf_version': pdf_format['exact_version'],
+            'is_pdf_a3': pdf_format['is_pdf_a3'],
+            'signature_count': len(signatures),
+            'signatures': signatures,
+            'docmdp_level': docmdp_level,
+            'issr_compatible': issr_compatible,
+        }
+    }
+
+
 def analyze_pdf_file(filepath):
     """Analýza PDF souboru z disku - vrací kompletní výsledky pro API. Kvalifikace TSA z lokálního whitelistu."""
     try:
         file_size = os.path.getsize(filepath)
         filename = os.path.basename(filepath)
         file_hash = get_file_hash(filepath)
-        # Primárně podpisy a DocMDP ze struktury PDF (pypdf) – nezávisí na velikosti souboru
-        sig_list_from_reader = []
-        reader = None
-        try:
-            from pypdf import PdfReader
-            reader = PdfReader(filepath)
-            sig_list_from_reader = extract_signatures_via_reader(reader)
-        except Exception:
-            pass
         with open(filepath, 'rb') as f:
-            if file_size <= 2 * 1024 * 1024:
+            if file_size <= _FULL_SCAN_LIMIT:
                 content = f.read()
             else:
-                content = f.read(512 * 1024)
-                f.seek(-1024 * 1024, 2)
+                content = f.read(_HEAD_CHUNK)
+                f.seek(-_TAIL_CHUNK, 2)
                 content += f.read()
-        analysis = analyze_pdf(content)
-        # Přepsat podpisy z readeru, pokud jsme nějaké získali (nezávisí na chunku)
-        if sig_list_from_reader:
-            signature_objs = [s for s in sig_list_from_reader if s.get('type') == 'SIGNATURE']
-            analysis['signatures'] = sig_list_from_reader
-            analysis['sig_count'] = len(sig_list_from_reader)
-            if signature_objs:
-                all_have_ckait = all(s.get('ckait', '—') != '—' for s in signature_objs)
-                all_have_name = all(s.get('signer', '—') != '—' for s in signature_objs)
-                analysis['sig'] = 'OK' if (all_have_ckait and all_have_name) else 'PARTIAL'
-                analysis['signer'] = signature_objs[0].get('signer', '—')
-                analysis['ckait'] = signature_objs[0].get('ckait', '—')
-            else:
-                analysis['sig'] = 'PARTIAL' if analysis.get('sig_count') else 'FAIL'
-                analysis['signer'] = '—'
-                analysis['ckait'] = '—'
-            if any(s.get('tsa') == 'TSA' and s.get('timestamp_valid') for s in sig_list_from_reader):
-                analysis['tsa'] = 'TSA'
-            elif any(s.get('tsa') == 'LOCAL' for s in sig_list_from_reader):
-                analysis['tsa'] = 'LOCAL'
-            else:
-                analysis['tsa'] = 'NONE'
-        # Preferenční detekce DocMDP přes strukturu PDF (AcroForm / Sig / Lock, TransformParams)
-        if reader is not None:
-            try:
-                docmdp_reader = detect_docmdp_lock_via_reader(reader)
-                analysis['docmdp_level'] = docmdp_reader['level']
-                analysis['issr_compatible'] = not docmdp_reader['locked']
-            except Exception:
-                pass
-        else:
-            try:
-                from pypdf import PdfReader
-                reader = PdfReader(filepath)
-                docmdp_reader = detect_docmdp_lock_via_reader(reader)
-                analysis['docmdp_level'] = docmdp_reader['level']
-                analysis['issr_compatible'] = not docmdp_reader['locked']
-            except Exception:
-                pass
-        pdf_format = {
-            'is_pdf_a3': analysis['pdfaVersion'] == 3,
-            'exact_version': f"PDF/A-{analysis['pdfaVersion']}" if analysis['pdfaVersion'] else "PDF (ne PDF/A)",
-            'standard': "ISO 19005-3:2012" if analysis['pdfaVersion'] == 3 else None
-        }
-        signatures = []
-        for sig in analysis.get('signatures', []):
-            tsa_issuer = sig.get('tsa_issuer', '—')
-            tsa_qualified = is_tsa_issuer_qualified(tsa_issuer) if tsa_issuer and tsa_issuer != '—' else False
-            sig_type = sig.get('type', 'SIGNATURE')
-            if sig_type == 'DOCUMENT_TIMESTAMP':
-                display_name = 'Časové razítko dokumentu (' + (tsa_issuer if tsa_issuer != '—' else '—') + ')'
-            else:
-                display_name = sig.get('signer', '—')
-            signatures.append({
-                'index': sig.get('index', len(signatures) + 1),
-                'type': sig_type,
-                'valid': sig.get('valid', False),
-                'name': display_name,
-                'signer': sig.get('signer', '—'),
-                'ckait_number': sig.get('ckait', '—'),
-                'signature_type': sig.get('signature_type', None),
-                'timestamp_valid': sig.get('timestamp_valid', False),
-                'certificate_valid': sig.get('certificate_valid', False),
-                'date': sig.get('date', '—'),
-                'tsa_issuer': tsa_issuer,
-                'tsa_qualified': tsa_qualified,
-            })
-        docmdp_level = analysis.get('docmdp_level')
-        issr_compatible = analysis.get('issr_compatible', True)
+        return _build_file_result(filepath, content, filename, file_size, file_hash)
+    except Exception as e:
         return {
-            'success': True,
-            'file_name': filename,
-            'file_hash': file_hash,
-            'file_size': file_size,
-            'processed_at': datetime.now().isoformat(),
-            'results': {
-                'pdf_format': pdf_format,
-                'signatures': signatures,
-                'file_info': {'filename': filename, 'size': file_size, 'hash': file_hash},
-                'docmdp_level': docmdp_level,
-                'issr_compatible': issr_compatible,
-            },
-            'display': {
-                'pdf_version': pdf_format['exact_version'],
-                'is_pdf_a3': pdf_format['is_pdf_a3'],
-                'signature_count': len(signatures),
-                'signatures': signatures,
-                'docmdp_level': docmdp_level,
-                'issr_compatible': issr_compatible,
-            }
+            'success': False,
+            'error': str(e),
+            'file_name': os.path.basename(filepath) if filepath else 'unknown'
         }
+
+
+def analyze_pdf_bytes(buffer, filename='upload.pdf'):
+    """
+    Analýza PDF z paměti (bytes / bytearray / memoryview) bez dočasného souboru.
+    pypdf čte z BytesIO, byte-scan a hash pracují přímo nad bufferem. Vrací stejnou strukturu jako analyze_pdf_file.
+    """
+    try:
+        view = memoryview(buffer).cast('B')
+        file_size = view.nbytes
+        file_hash = hashlib.sha256(view).hexdigest()
+        if file_size <= _FULL_SCAN_LIMIT:
+            content = buffer if isinstance(buffer, bytes) else view.tobytes()
+        else:
+            content = view[:_HEAD_CHUNK].tobytes() + view[-_TAIL_CHUNK:].tobytes()
+        # BytesIO nad bytes sdílí buffer (copy-on-write), jiné buffery se zkopírují jednou
+        stream = io.BytesIO(buffer if isinstance(buffer, bytes) else view)
+        return _build_file_result(stream, content, filename, file_size, file_hash)
     except Exception as e:
         return {
             'success': False,
             'error': str(e),
-            'file_name': os.path.basename(filepath) if filepath else 'unknown'
+            'file_name': filename or 'unknown'
         }
 
 
@@ -768,8 +835,64 @@ def find_all_pdfs(folder_path):
     return pdf_files
 
 
-def analyze_multiple_pdfs(file_paths, progress_callback=None):
+def _analysis_error(filepath, e):
+    return {
+        'success': False,
+        'error': str(e),
+        'file_name': os.path.basename(filepath)
+    }
+
+
+def iter_analyze_pdfs(file_paths, workers=1, executor=None):
+    """
+    Generátor výsledků ve stejném pořadí jako file_paths, hned jak jsou k dispozici (streamovaný výstup).
+    workers > 1 = paralelně v procesech (pypdf drží GIL); v letu je nejvýš 4 × workers souborů.
+    executor = již běžící (warm) pool procesů, který se nezavírá – např. lokální démon analýzy.
+    """
+    if executor is not None:
+        yield from _iter_ordered(executor, file_paths, 4 * max(1, workers))
+        return
+    if workers <= 1 or len(file_paths) <= 1:
+        for filepath in file_paths:
+            try:
+                yield analyze_pdf_file(filepath)
+            except Exception as e:
+                yield _analysis_error(filepath, e)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from _iter_ordered(pool, file_paths, 4 * workers)
+
+
+def _iter_ordered(executor, file_paths, window):
+    from collections import deque
+    pending = deque()
+    paths = iter(file_paths)
+    for filepath in paths:
+        pending.append((filepath, executor.submit(analyze_pdf_file, filepath)))
+        if len(pending) >= window:
+            break
+    while pending:
+        filepath, future = pending.popleft()
+        try:
+            yield future.result()
+        except Exception as e:
+            yield _analysis_error(filepath, e)
+        nxt = next(paths, None)
+        if nxt is not None:
+            pending.append((nxt, executor.submit(analyze_pdf_file, nxt)))
+
+
+def analyze_multiple_pdfs(file_paths, progress_callback=None, workers=1):
     """Analyzuje více PDF souborů najednou. Kvalifikace TSA z lokálního whitelistu."""
+    if workers > 1:
+        results = []
+        total = len(file_paths)
+        for i, result in enumerate(iter_analyze_pdfs(file_paths, workers), 1):
+            if progress_callback:
+                progress_callback(i, total, os.path.basename(file_paths[i - 1]))
+            results.append(result)
+        return results
     results = []
     total = len(file_paths)
     for i, filepath in enumerate(file_paths, 1):
@@ -779,15 +902,11 @@ def analyze_multiple_pdfs(file_paths, progress_callback=None):
             result = analyze_pdf_file(filepath)
             results.append(result)
         except Exception as e:
-            results.append({
-                'success': False,
-                'error': str(e),
-                'file_name': os.path.basename(filepath)
-            })
+            results.append(_analysis_error(filepath, e))
     return results
 
 
-def analyze_folder(folder_path, progress_callback=None):
+def analyze_folder(folder_path, progress_callback=None, workers=1):
     """Analyzuje všechny PDF ve složce (rekurzivně). Kvalifikace TSA z lokálního whitelistu."""
     pdf_files = find_all_pdfs(folder_path)
     if not pdf_files:
@@ -798,7 +917,7 @@ def analyze_folder(folder_path, progress_callback=None):
             'error': 'Ve složce nebyly nalezeny žádné PDF soubory'
         }
     file_paths = [pdf['full_path'] for pdf in pdf_files]
-    results = analyze_multiple_pdfs(file_paths, progress_callback)
+    results = analyze_multiple_pdfs(file_paths, progress_callback, workers)
     for i, result in enumerate(results):
         if i < len(pdf_files):
             result['folder'] = pdf_files[i]['folder']
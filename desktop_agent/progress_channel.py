@@ -0,0 +1,108 @@
+# progress_channel.py
+# Průběh kontroly mezi analyzačním vláknem a Tk: vlákno jen zapisuje čítače, Tk je čte v pevném taktu.
+# © 2025 Ing. Martin Cieślar
+#
+# Místo root.after(0, ...) za každý soubor (zahlcení smyčky Tk při rychlé/paralelní analýze)
+# zapisuje vlákno do akumulátoru pod zámkem a Tk si každých ~100 ms vyzvedne jeden snímek:
+# poslední čítače, rychlost (soub/s, MB/s), ETA a dávku hotových výsledků.
+
+import threading
+import time
+
+DEFAULT_INTERVAL_MS = 100
+
+
+class ProgressChannel:
+    """Thread-safe akumulátor průběhu; zapisuje libovolné vlákno, čte (poll) jen Tk vlákno."""
+
+    def __init__(self, interval_ms=DEFAULT_INTERVAL_MS):
+        self.interval_ms = interval_ms
+        self._lock = threading.Lock()
+        self._after_id = None
+        self._token = None
+        self.reset()
+
+    def reset(self, total=0):
+        """Nový běh kontroly (volat z Tk vlákna před spuštěním analyzačního vlákna)."""
+        with self._lock:
+            self._current = 0
+            self._total = total
+            self._filename = ""
+            self._bytes = 0
+            self._results = []
+            self._started = time.time()
+            self._dirty = True
+
+    # --- strana analyzačního vlákna ---
+
+    def update(self, current, total, filename="", nbytes=0):
+        """Absolutní pozice (current z total) + volitelně velikost právě hotového souboru v bajtech."""
+        with self._lock:
+            self._current = current
+            self._total = total
+            if filename:
+                self._filename = filename
+            self._bytes += nbytes or 0
+            self._dirty = True
+
+    def add_result(self, qidx, result):
+        """Hotový výsledek k zobrazení ve frontě – doručí se v dávce s nejbližším snímkem."""
+        with self._lock:
+            self._results.append((qidx, result))
+            self._dirty = True
+
+    # --- strana Tk ---
+
+    def take(self):
+        """Snímek od posledního take(), nebo None pokud se nic nezměnilo. Výsledky se předají jen jednou."""
+        with self._lock:
+            if not self._dirty:
+                return None
+            self._dirty = False
+            results, self._results = self._results, []
+            current, total, nbytes = self._current, self._total, self._bytes
+            filename = self._filename
+            elapsed = time.time() - self._started
+        files_per_s = current / elapsed if elapsed > 0 and current else 0.0
+        mb_per_s = nbytes / elapsed / (1024 * 1024) if elapsed > 0 and nbytes else 0.0
+        eta = (total - current) / files_per_s if files_per_s and total > current else None
+        return {
+            "current": current,
+            "total": total,
+            "filename": filename,
+            "elapsed": elapsed,
+            "files_per_s": files_per_s,
+            "mb_per_s": mb_per_s,
+            "eta_seconds": eta,
+            "results": results,
+        }
+
+    def attach(self, root, on_snapshot):
+        """
+        Spustí pravidelný poll na Tk smyčce; on_snapshot(snapshot) se volá jen při změně.
+        Výjimka z on_snapshot poll nezastaví (hlásí ji Tk) – další takt se naplánuje vždy, dokud nepřijde detach.
+        """
+        self.detach(root)
+        token = object()
+        self._token = token
+
+        def _tick():
+            try:
+                snapshot = self.take()
+                if snapshot is not None:
+                    on_snapshot(snapshot)
+            finally:
+                # detach (nebo nový attach) uvnitř on_snapshot tento řetěz ukončil
+                if self._token is token:
+                    self._after_id = root.after(self.interval_ms, _tick)
+
+        self._after_id = root.after(self.interval_ms, _tick)
+
+    def detach(self, root):
+        self._token = None
+        if self._after_id is not None:
+            try:
+                root.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
@@ -0,0 +1,346 @@
+# queue_model.py
+# Datový model fronty agenta: úlohy (složka / soubor) a jejich PDF soubory.
+# © 2025 Ing. Martin Cieślar
+#
+# - qidx je stabilní identita řádku: přiděluje se při přidání a do clear() se nemění ani po odebrání jiných řádků
+#   (strom v UI i výsledky kontroly se na řádek odkazují přímo přes qidx, bez přepočtu offsetů)
+# - cesta -> qidx ve slovníku, úloha k qidx přes bisect nad začátky úloh
+# - zaškrtnutí, výsledek i odebrání jsou O(1); souhrnné čítače pro UI se drží průběžně
+# - se SessionStore se každá změna zapisuje i na disk a výsledky se v paměti nedrží (result() je čte ze store);
+#   restore() po startu relaci obnoví
+
+import bisect
+import os
+
+
+def _path_key(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+class QueueItem:
+    """Jeden PDF ve frontě. get()/[] kvůli kompatibilitě s kódem, který pracoval se slovníky."""
+    __slots__ = ('qidx', 'path', 'filename', 'status', 'result', 'checked', 'sent', 'task_ix', 'errors', 'pdfa_ok')
+
+    def __init__(self, qidx, path, filename, task_ix):
+        self.qidx = qidx
+        self.path = path
+        self.filename = filename
+        self.status = 'pending'
+        self.result = None
+        self.checked = True
+        self.sent = False
+        self.task_ix = task_ix
+        self.errors = 0
+        self.pdfa_ok = False
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+
+class QueueTask:
+    """Úloha = jedna přidaná složka nebo soubor; její soubory mají qidx v rozsahu [start, end)."""
+    __slots__ = ('type', 'path', 'name', 'start', 'end', 'live')
+
+    def __init__(self, type_, path, name, start, end):
+        self.type = type_
+        self.path = path
+        self.name = name
+        self.start = start
+        self.end = end
+        self.live = end - start
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+
+class QueueModel:
+    """
+    Fronta souborů s indexem podle cesty. Odebrané řádky zůstávají jako None (qidx se nerecyklují),
+    iterace a len() vrací jen živé položky.
+    """
+
+    def __init__(self, result_stats=None, store=None):
+        # result_stats(result) -> (počet chyb, PDF/A-3 OK) – počítá se jednou při set_result
+        self._result_stats = result_stats or (lambda result: (0, False))
+        self._store = store
+        self._reset()
+
+    def clear(self):
+        self._reset()
+        if self._store is not None:
+            self._store.clear()
+
+    def _reset(self):
+        self._items = []
+        self._by_path = {}
+        self._tasks = []
+        self._task_starts = []
+        self._live = 0
+        self._live_tasks = 0
+        self._live_folder_tasks = 0
+        self.n_checked = 0
+        self.n_processed = 0
+        self.n_done = 0
+        self.n_success = 0
+        self.n_sent = 0
+        self.n_errors = 0
+        self.n_pdfa_ok = 0
+
+    # --- čtení ---
+
+    def __len__(self):
+        return self._live
+
+    def __iter__(self):
+        return (item for item in self._items if item is not None)
+
+    def __contains__(self, path):
+        return _path_key(path) in self._by_path
+
+    @property
+    def next_qidx(self):
+        """qidx, který dostane příští přidaný soubor (hranice dávky)."""
+        return len(self._items)
+
+    def get(self, qidx):
+        if 0 <= qidx < len(self._items):
+            return self._items[qidx]
+        return None
+
+    def index_of(self, path):
+        return self._by_path.get(_path_key(path))
+
+    def task_index_of(self, qidx):
+        pos = bisect.bisect_right(self._task_starts, qidx) - 1
+        if pos >= 0 and qidx < self._tasks[pos].end:
+            return pos
+        return None
+
+    def task(self, task_ix):
+        if 0 <= task_ix < len(self._tasks):
+            task = self._tasks[task_ix]
+            return task if task.live else None
+        return None
+
+    def tasks(self):
+        """Živé úlohy jako (task_ix, QueueTask)."""
+        return [(ix, t) for ix, t in enumerate(self._tasks) if t.live]
+
+    def task_count(self):
+        return self._live_tasks
+
+    def folder_task_count(self):
+        return self._live_folder_tasks
+
+    def task_items(self, task_ix):
+        task = self._tasks[task_ix]
+        return [item for item in self._items[task.start:task.end] if item is not None]
+
+    def task_root(self, task_ix):
+        """Kořenová složka úlohy – od ní se ve stromu zobrazují podsložky."""
+        task = self._tasks[task_ix]
+        if task.type == 'folder':
+            return (task.path or '').strip()
+        return (os.path.dirname(task.path) or '').strip()
+
+    def checked_items(self):
+        return [item for item in self._items if item is not None and item.checked]
+
+    def result(self, qidx):
+        """Výsledek kontroly řádku – z paměti, nebo (se SessionStore) načtený z disku."""
+        item = self.get(qidx)
+        if item is None:
+            return None
+        if item.result is None and self._store is not None and item.status != 'pending':
+            return self._store.load_result(qidx)
+        return item.result
+
+    def unsent_success_qidx(self):
+        """qidx úspěšně zkontrolovaných a dosud neodeslaných souborů (včetně obnovené relace)."""
+        return [item.qidx for item in self._items if item is not None and item.status == 'success' and not item.sent]
+
+    # --- změny ---
+
+    def add_task(self, type_, path, name, files):
+        """files: [(cesta, název)]; již zařazené cesty se přeskočí. Vrací počet přidaných souborů."""
+        start = len(self._items)
+        added = self._append_items(files, len(self._tasks))
+        if added:
+            self._tasks.append(QueueTask(type_, path, name, start, len(self._items)))
+            self._task_starts.append(start)
+            self._live_tasks += 1
+            if type_ == 'folder':
+                self._live_folder_tasks += 1
+            if self._store is not None:
+                self._store.put_task(len(self._tasks) - 1, self._tasks[-1])
+        return added
+
+    @property
+    def last_task_ix(self):
+        return len(self._tasks) - 1 if self._tasks else None
+
+    def extend_task(self, task_ix, files):
+        """Připojí další soubory k poslední úloze (streamované načítání složky). Vrací počet přidaných."""
+        if task_ix != self.last_task_ix:
+            raise ValueError('Rozšířit lze jen poslední úlohu fronty')
+        task = self._tasks[task_ix]
+        added = self._append_items(files, task_ix)
+        if added:
+            if not task.live:
+                self._live_tasks += 1
+                if task.type == 'folder':
+                    self._live_folder_tasks += 1
+            task.end = len(self._items)
+            task.live += added
+            if self._store is not None:
+                self._store.put_task(task_ix, task)
+        return added
+
+    def _append_items(self, files, task_ix):
+        added = 0
+        rows = []
+        for file_path, filename in files:
+            key = _path_key(file_path)
+            if key in self._by_path:
+                continue
+            qidx = len(self._items)
+            item = QueueItem(qidx, file_path, filename or os.path.basename(file_path), task_ix)
+            self._items.append(item)
+            self._by_path[key] = qidx
+            rows.append((qidx, task_ix, item.path, item.filename))
+            added += 1
+        if self._store is not None:
+            self._store.add_items(rows)
+        self._live += added
+        self.n_checked += added
+        return added
+
+    def set_checked(self, qidx, value):
+        item = self.get(qidx)
+        if item is None or item.checked == bool(value):
+            return
+        item.checked = bool(value)
+        self.n_checked += 1 if item.checked else -1
+        if self._store is not None:
+            self._store.set_flag(qidx, 'checked', item.checked)
+
+    def toggle_checked(self, qidx):
+        item = self.get(qidx)
+        if item is not None:
+            self.set_checked(qidx, not item.checked)
+
+    def set_result(self, qidx, result):
+        """Připojí výsledek kontroly; úspěšné se odškrtnou, chybné zůstanou zaškrtnuté k opakování."""
+        item = self.get(qidx)
+        if item is None:
+            return
+        self._count_result(item, -1)
+        item.result = result
+        item.status = 'skipped' if result.get('skipped') else ('success' if result.get('success') else 'error')
+        item.errors, item.pdfa_ok = self._result_stats(result)
+        self._count_result(item, 1)
+        if self._store is None:
+            self.set_checked(qidx, not result.get('success'))
+            return
+        # Se store jeden zápis (stav, zaškrtnutí, výsledek) a výsledek zůstává jen na disku
+        if item.checked != (not result.get('success')):
+            item.checked = not item.checked
+            self.n_checked += 1 if item.checked else -1
+        self._store.put_result(item, result)
+        item.result = None
+
+    def mark_sent(self, qidx):
+        item = self.get(qidx)
+        if item is not None and not item.sent:
+            item.sent = True
+            self.n_sent += 1
+            if self._store is not None:
+                self._store.set_flag(qidx, 'sent', True)
+
+    def remove(self, qidx):
+        """Odebere řádek; ostatní qidx zůstávají platné. Vrací True, pokud řádek existoval."""
+        item = self.get(qidx)
+        if item is None:
+            return False
+        self._count_result(item, -1)
+        if item.checked:
+            self.n_checked -= 1
+        if item.sent:
+            self.n_sent -= 1
+        self._items[qidx] = None
+        self._by_path.pop(_path_key(item.path), None)
+        if self._store is not None:
+            self._store.remove(qidx)
+        self._live -= 1
+        task = self._tasks[item.task_ix]
+        task.live -= 1
+        if not task.live:
+            self._live_tasks -= 1
+            if task.type == 'folder':
+                self._live_folder_tasks -= 1
+        return True
+
+    def remove_paths(self, paths):
+        """Odebere soubory podle cest. Vrací seznam odebraných qidx."""
+        removed = []
+        for path in paths:
+            qidx = self.index_of(path)
+            if qidx is not None and self.remove(qidx):
+                removed.append(qidx)
+        return removed
+
+    def restore(self):
+        """Načte relaci ze SessionStore (bez výsledků – ty se čtou až přes result()). Vrací počet souborů."""
+        self._reset()
+        if self._store is None:
+            return 0
+        for task_ix, type_, path, name, start, end in self._store.load_tasks():
+            if task_ix != len(self._tasks):
+                break  # úlohy se ukládají souvisle od 0; jinak je relace poškozená – zbytek se nenačte
+            task = QueueTask(type_, path, name, start, end)
+            task.live = 0
+            self._tasks.append(task)
+            self._task_starts.append(start)
+        for qidx, task_ix, path, filename, status, checked, sent, errors, pdfa_ok in self._store.iter_items():
+            if task_ix is None or not 0 <= task_ix < len(self._tasks):
+                continue
+            if qidx >= len(self._items):
+                self._items.extend([None] * (qidx + 1 - len(self._items)))
+            item = QueueItem(qidx, path, filename, task_ix)
+            item.status = status or 'pending'
+            item.checked = bool(checked)
+            item.sent = bool(sent)
+            item.errors = errors or 0
+            item.pdfa_ok = bool(pdfa_ok)
+            self._items[qidx] = item
+            self._by_path[_path_key(path)] = qidx
+            self._live += 1
+            self.n_checked += 1 if item.checked else 0
+            self.n_sent += 1 if item.sent else 0
+            self._count_result(item, 1)
+            self._tasks[task_ix].live += 1
+        # qidx se nerecyklují: další přidaný soubor dostane číslo za koncem poslední úlohy
+        if self._tasks and len(self._items) < self._tasks[-1].end:
+            self._items.extend([None] * (self._tasks[-1].end - len(self._items)))
+        for task in self._tasks:
+            if task.live:
+                self._live_tasks += 1
+                if task.type == 'folder':
+                    self._live_folder_tasks += 1
+        return self._live
+
+    def _count_result(self, item, sign):
+        if item.result is not None or item.status not in ('pending', None):
+            self.n_processed += sign
+        if item.status not in ('pending', None):
+            self.n_done += sign
+        if item.status == 'success':
+            self.n_success += sign
+        self.n_errors += sign * item.errors
+        if item.pdfa_ok:
+            self.n_pdfa_ok += sign
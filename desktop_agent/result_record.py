@@ -0,0 +1,186 @@
+# result_record.py
+# Kompaktní záznam výsledku kontroly pro frontu agenta (dlouhé relace s desetitisíci souborů).
+# © 2025 Ing. Martin Cieślar
+#
+# - výsledek z pdf_checker (_build_file_result) je vnořený slovník: seznam podpisů dvakrát (results + display),
+#   file_info opakuje název / velikost / hash – ve frontě se drží po celou relaci
+# - ResultRecord / SignatureRecord drží totéž ve __slots__, opakované řetězce (podepisující, ČKAIT, TSA, verze PDF/A)
+#   přes sys.intern, hash jako 32 bajtů místo 64znakového hexu
+# - get()/[] jako u slovníku; původní tvar (dict pro API / export) se skládá líně až při čtení 'results' / 'display'
+#   nebo přes to_dict()
+# - výsledek v jiném tvaru (chyba analýzy, ručně doplněné klíče uvnitř results) zůstává slovníkem beze změny
+
+import sys
+
+_SIG_FIELDS = (
+    'index', 'type', 'valid', 'name', 'signer', 'ckait_number', 'signature_type',
+    'timestamp_valid', 'certificate_valid', 'date', 'tsa_issuer', 'tsa_qualified',
+)
+_SIG_KEYS = frozenset(_SIG_FIELDS)
+_TOP_KEYS = ('success', 'file_name', 'file_hash', 'file_size', 'processed_at', 'results', 'display')
+_RESULTS_KEYS = frozenset(('pdf_format', 'signatures', 'file_info', 'docmdp_level', 'issr_compatible'))
+_FORMAT_KEYS = frozenset(('is_pdf_a3', 'exact_version', 'standard', 'pdf_version', 'conformance'))
+_DISPLAY_KEYS = frozenset(('pdf_version', 'is_pdf_a3', 'signature_count', 'signatures', 'docmdp_level', 'issr_compatible'))
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class SignatureRecord:
+    """Jeden podpis / časové razítko – stejné klíče jako položka results.signatures."""
+    __slots__ = _SIG_FIELDS
+
+    def __init__(self, sig):
+        for key in _SIG_FIELDS:
+            setattr(self, key, _intern(sig[key]))
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in _SIG_FIELDS}
+
+
+class ResultRecord:
+    """Úspěšný výsledek analýzy jednoho PDF. get()/[] kvůli kompatibilitě s kódem, který pracoval se slovníky."""
+    __slots__ = ('file_name', 'file_hash', 'file_size', 'processed_at', 'is_pdf_a3', 'exact_version', 'standard',
+                 'pdf_version', 'conformance', 'signatures', 'docmdp_level', 'issr_compatible', 'extra')
+
+    def __init__(self, result):
+        self.file_name = result['file_name']
+        file_hash = result['file_hash']
+        # 64 hex znaků -> 32 bajtů; cokoli jiného (velká písmena, jiná délka) se drží jako řetězec
+        packed = bytes.fromhex(file_hash) if isinstance(file_hash, str) and len(file_hash) == 64 else None
+        self.file_hash = packed if packed is not None and packed.hex() == file_hash else file_hash
+        self.file_size = result['file_size']
+        self.processed_at = result['processed_at']
+        results = result['results']
+        pdf_format = results['pdf_format']
+        self.is_pdf_a3 = pdf_format['is_pdf_a3']
+        self.exact_version = _intern(pdf_format['exact_version'])
+        self.standard = _intern(pdf_format['standard'])
+        self.pdf_version = _intern(pdf_format['pdf_version'])
+        self.conformance = _intern(pdf_format['conformance'])
+        self.signatures = tuple(SignatureRecord(sig) for sig in results['signatures'])
+        self.docmdp_level = results['docmdp_level']
+        self.issr_compatible = results['issr_compatible']
+        # Klíče doplněné mimo engine (folder, relative_path, …) v původním pořadí
+        extra = {key: value for key, value in result.items() if key not in _TOP_KEYS}
+        self.extra = {key: _intern(value) for key, value in extra.items()} or None
+
+    # --- čtení ve tvaru slovníku ---
+
+    def _hash_hex(self):
+        return self.file_hash.hex() if isinstance(self.file_hash, bytes) else self.file_hash
+
+    def _signature_dicts(self):
+        return [sig.to_dict() for sig in self.signatures]
+
+    def _pdf_format(self):
+        return {
+            'is_pdf_a3': self.is_pdf_a3,
+            'exact_version': self.exact_version,
+            'standard': self.standard,
+            'pdf_version': self.pdf_version,
+            'conformance': self.conformance,
+        }
+
+    def _results(self, signatures=None):
+        return {
+            'pdf_format': self._pdf_format(),
+            'signatures': self._signature_dicts() if signatures is None else signatures,
+            'file_info': {'filename': self.file_name, 'size': self.file_size, 'hash': self._hash_hex()},
+            'docmdp_level': self.docmdp_level,
+            'issr_compatible': self.issr_compatible,
+        }
+
+    def _display(self, signatures=None):
+        return {
+            'pdf_version': self.exact_version,
+            'is_pdf_a3': self.is_pdf_a3,
+            'signature_count': len(self.signatures),
+            'signatures': self._signature_dicts() if signatures is None else signatures,
+            'docmdp_level': self.docmdp_level,
+            'issr_compatible': self.issr_compatible,
+        }
+
+    def get(self, key, default=None):
+        if key == 'success':
+            return True
+        if key == 'file_name':
+            return self.file_name
+        if key == 'file_hash':
+            return self._hash_hex()
+        if key in ('file_size', 'processed_at'):
+            return getattr(self, key)
+        if key == 'results':
+            return self._results()
+        if key == 'display':
+            return self._display()
+        if self.extra is not None:
+            return self.extra.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        return self.get(key)
+
+    def __contains__(self, key):
+        return key in _TOP_KEYS or (self.extra is not None and key in self.extra)
+
+    def error_count(self):
+        """Počet chyb stejně jako ui._count_errors_from_result, bez skládání slovníku."""
+        errors = 1 if self.exact_version and 'ne PDF/A' in str(self.exact_version) else 0
+        return errors + sum(1 for sig in self.signatures if not sig.valid)
+
+    def to_dict(self):
+        """Původní tvar z pdf_checker (pro odeslání na server / export)."""
+        signatures = self._signature_dicts()
+        out = {
+            'success': True,
+            'file_name': self.file_name,
+            'file_hash': self._hash_hex(),
+            'file_size': self.file_size,
+            'processed_at': self.processed_at,
+            'results': self._results(signatures),
+            'display': self._display(signatures),
+        }
+        if self.extra is not None:
+            out.update(self.extra)
+        return out
+
+
+def _is_engine_shape(result):
+    """Jen výsledek přesně ve tvaru _build_file_result jde převést a zpět bez ztráty."""
+    try:
+        if result.get('success') is not True or any(key not in result for key in _TOP_KEYS):
+            return False
+        results, display = result['results'], result['display']
+        if results.keys() != _RESULTS_KEYS or display.keys() != _DISPLAY_KEYS:
+            return False
+        pdf_format, signatures = results['pdf_format'], results['signatures']
+        if pdf_format.keys() != _FORMAT_KEYS or any(sig.keys() != _SIG_KEYS for sig in signatures):
+            return False
+        if results['file_info'] != {'filename': result['file_name'], 'size': result['file_size'], 'hash': result['file_hash']}:
+            return False
+        return (display['signatures'] is signatures or display['signatures'] == signatures) and display == {
+            'pdf_version': pdf_format['exact_version'],
+            'is_pdf_a3': pdf_format['is_pdf_a3'],
+            'signature_count': len(signatures),
+            'signatures': display['signatures'],
+            'docmdp_level': results['docmdp_level'],
+            'issr_compatible': results['issr_compatible'],
+        }
+    except (AttributeError, KeyError, TypeError):
+        return False
+
+
+def compact_result(result):
+    """Slovník z analýzy -> ResultRecord; jiný tvar (nebo už záznam) vrátí beze změny."""
+    if isinstance(result, dict) and _is_engine_shape(result):
+        return ResultRecord(result)
+    return result
+
+
+def expand_result(result):
+    """ResultRecord -> slovník v původním tvaru; cokoli jiného beze změny."""
+    return result.to_dict() if isinstance(result, ResultRecord) else result
@@ -0,0 +1,189 @@
+# session_store.py
+# Relace agenta na disku (SQLite v uživatelské složce): úlohy a soubory fronty, dávky a výsledky kontroly.
+# © 2025 Ing. Martin Cieślar
+#
+# - QueueModel zapisuje každou změnu (přidání, zaškrtnutí, výsledek, odeslání, odebrání) rovnou sem;
+#   commit po dávkách (flush v taktu UI), pád aplikace tak přijde nejvýš o poslední takt
+# - výsledky se v paměti nedrží: payload (JSON) se čte po jednom až při potřebě (odeslání na server)
+# - po startu se relace obnoví; hotové soubory jsou odškrtnuté, přerušená kontrola pokračuje zbylými zaškrtnutými
+# - databáze leží v uživatelské složce agenta (_get_user_data_dir, stejně jako FolderWatch a config.yaml);
+#   relaci drží jen jedna instance agenta (zámek souboru .lock), další běží s frontou jen v paměti
+
+import json
+import os
+import sqlite3
+import threading
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import fcntl
+
+SESSION_FILENAME = 'agent_session.sqlite'
+
+from result_record import compact_result, expand_result
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS session_tasks ('
+    ' task_ix INTEGER PRIMARY KEY, type TEXT, path TEXT, name TEXT, start INTEGER, "end" INTEGER)',
+    'CREATE TABLE IF NOT EXISTS session_items ('
+    ' qidx INTEGER PRIMARY KEY, task_ix INTEGER, path TEXT, filename TEXT, status TEXT DEFAULT \'pending\','
+    ' checked INTEGER DEFAULT 1, sent INTEGER DEFAULT 0, errors INTEGER DEFAULT 0, pdfa_ok INTEGER DEFAULT 0,'
+    ' payload TEXT)',
+    'CREATE TABLE IF NOT EXISTS session_meta (key TEXT PRIMARY KEY, value TEXT)',
+)
+
+
+class SessionLocked(RuntimeError):
+    """Relaci už má otevřenou jiná instance agenta."""
+
+
+def _lock_file(path):
+    """Výhradní zámek relace na dobu běhu procesu (OS ho uvolní i po pádu). Vrací otevřený soubor."""
+    f = open(path, 'a+b')
+    try:
+        if msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        raise SessionLocked(path)
+    return f
+
+
+def _unlock_file(f):
+    try:
+        if msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    except OSError:
+        pass
+    f.close()
+
+
+class SessionStore:
+    """
+    Perzistentní relace fronty v data_dir. Zápisy se drží v otevřené transakci do flush(); přístup z více vláken
+    chrání zámek. Drží-li relaci jiná instance agenta, konstruktor vyhodí SessionLocked.
+    """
+
+    def __init__(self, data_dir):
+        self.path = os.path.join(data_dir, SESSION_FILENAME)
+        os.makedirs(data_dir, exist_ok=True)
+        self._lock_handle = _lock_file(self.path + '.lock')
+        try:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            self._conn.commit()
+        except Exception:
+            _unlock_file(self._lock_handle)
+            raise
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def _write(self, sql, params=()):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._pending += 1
+
+    # --- fronta ---
+
+    def put_task(self, task_ix, task):
+        self._write(
+            'INSERT OR REPLACE INTO session_tasks (task_ix, type, path, name, start, "end") VALUES (?, ?, ?, ?, ?, ?)',
+            (task_ix, task.type, task.path, task.name, task.start, task.end),
+        )
+
+    def add_items(self, rows):
+        """rows: [(qidx, task_ix, cesta, název)] – nové řádky, stav pending a zaškrtnuté."""
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO session_items (qidx, task_ix, path, filename) VALUES (?, ?, ?, ?)', rows)
+            self._pending += len(rows)
+
+    def set_flag(self, qidx, column, value):
+        if column not in ('checked', 'sent'):
+            raise ValueError(column)
+        self._write(f'UPDATE session_items SET {column} = ? WHERE qidx = ?', (int(bool(value)), qidx))
+
+    def put_result(self, item, result):
+        """Stav položky + výsledek (ResultRecord se uloží v původním tvaru slovníku)."""
+        self._write(
+            'UPDATE session_items SET status = ?, checked = ?, errors = ?, pdfa_ok = ?, payload = ? WHERE qidx = ?',
+            (item.status, int(item.checked), item.errors, int(bool(item.pdfa_ok)),
+             json.dumps(expand_result(result), ensure_ascii=False, default=str), item.qidx),
+        )
+
+    def remove(self, qidx):
+        self._write('DELETE FROM session_items WHERE qidx = ?', (qidx,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM session_items')
+            self._conn.execute('DELETE FROM session_tasks')
+            self._conn.execute('DELETE FROM session_meta')
+            self._conn.commit()
+            self._pending = 0
+
+    # --- čtení ---
+
+    def load_tasks(self):
+        """[(task_ix, type, path, name, start, end)] podle task_ix."""
+        with self._lock:
+            return self._conn.execute(
+                'SELECT task_ix, type, path, name, start, "end" FROM session_tasks ORDER BY task_ix').fetchall()
+
+    def iter_items(self, batch=2000):
+        """(qidx, task_ix, path, filename, status, checked, sent, errors, pdfa_ok) po stránkách, bez payloadu."""
+        last = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT qidx, task_ix, path, filename, status, checked, sent, errors, pdfa_ok FROM session_items'
+                    ' WHERE qidx > ? ORDER BY qidx LIMIT ?', (last, batch)).fetchall()
+            if not rows:
+                return
+            yield from rows
+            last = rows[-1][0]
+
+    def load_result(self, qidx):
+        """Výsledek položky (kompaktní záznam), nebo None."""
+        with self._lock:
+            row = self._conn.execute('SELECT payload FROM session_items WHERE qidx = ?', (qidx,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return compact_result(json.loads(row[0]))
+
+    # --- metadata relace (dávky, zdrojová složka) ---
+
+    def set_meta(self, key, value):
+        self._write('INSERT OR REPLACE INTO session_meta (key, value) VALUES (?, ?)',
+                    (key, json.dumps(value, ensure_ascii=False)))
+
+    def get_meta(self, key, default=None):
+        with self._lock:
+            row = self._conn.execute('SELECT value FROM session_meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._conn.commit()
+                self._pending = 0
+
+    def close(self):
+        try:
+            self.flush()
+            self._conn.close()
+        finally:
+            _unlock_file(self._lock_handle)
@@ -2,6 +2,7 @@
 # Více panelů, metriky nahoře, vyšší info density, „Jak to funguje“ timeline.
 # Optimalizováno pro moderní velké rozlišení (2K/4K): DPI awareness + škálování CTk.
 
+import logging
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk
@@ -14,9 +15,16 @@ import time
 import customtkinter as ctk
 
 from ui import _count_errors_from_result, _session_summary_text
+from progress_channel import ProgressChannel
+from queue_model import QueueModel
+from result_record import ResultRecord, compact_result
+from session_store import SessionLocked, SessionStore
+from folder_scanner import FolderScanner
 from version import BUILD_VERSION, AGENT_VERSION
 from license import UP_TO_DATE, UPDATE_AVAILABLE, UPDATE_REQUIRED
 
+logger = logging.getLogger(__name__)
+
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
 
@@ -85,6 +93,48 @@ LOGO_ICO_PATH = os.path.join(_AGENT_DIR, "logo", "logo.ico")
 NO_DETAIL_MSG = "Výsledky kontroly jednotlivých PDF se v této aplikaci nezobrazují.\nStav uvidíte po odeslání na server."
 
 SPLASH_DURATION_MS = 3000
+SCAN_POLL_MS = 150  # takt přebírání souborů z FolderScanner do fronty
+SESSION_FLUSH_MS = 1000  # takt commitu relace na disk (session_store)
+CHECK_CHUNK_FILES = 200  # soubory složky se kontrolují po částech – výsledky se průběžně ukládají do relace
+
+
+def _result_stats(result):
+    """(počet chyb, PDF/A-3 OK) pro souhrnné čítače fronty – počítá se jednou při připojení výsledku."""
+    if isinstance(result, ResultRecord):
+        return result.error_count(), result.is_pdf_a3 is True
+    if not result or not isinstance(result, dict):
+        return 0, False
+    pdfa_ok = (result.get("results") or {}).get("pdf_format", {}).get("is_pdf_a3") is True
+    return _count_errors_from_result(result), pdfa_ok
+
+
+def _open_session_store(session_dir):
+    """
+    Relace na disku v uživatelské složce agenta -> (store, locked).
+    Bez složky, při chybě (práva) nebo když relaci drží jiná instance agenta běží fronta jen v paměti (store None).
+    """
+    if not session_dir:
+        return None, False
+    try:
+        return SessionStore(session_dir), False
+    except SessionLocked:
+        return None, True
+    except Exception:
+        return None, False
+
+
+def _set_relative_path(result, path, base):
+    """folder / relative_path výsledku vůči zdrojové složce dávky (stromová struktura na serveru)."""
+    try:
+        rel = os.path.relpath(path, base).replace('\\', '/')
+        if not rel.startswith('..'):
+            result['folder'] = os.path.dirname(rel).replace('\\', '/') or '.'
+            result['relative_path'] = rel
+            return
+    except Exception:
+        pass
+    result.setdefault('folder', '.')
+    result.setdefault('relative_path', result.get('file_name', os.path.basename(path)))
 
 
 def _create_splash(master):
@@ -147,7 +197,7 @@ class PDFCheckUI_2026_V3:
                  on_after_login_callback=None, on_after_logout_callback=None, on_get_web_login_url=None,
                  on_get_remote_config=None,
                  on_get_legal_config=None,
-                 on_send_batch_callback=None, on_has_login=None):
+                 on_send_batch_callback=None, on_has_login=None, session_dir=None):
         self.root = root
         self.on_check_callback = on_check_callback
         self.on_api_key_callback = on_api_key_callback
@@ -163,15 +213,21 @@ class PDFCheckUI_2026_V3:
         self.on_get_legal_config = on_get_legal_config  # callable() -> dict s disclaimer, vop_url, gdpr_url
         self.api_url = api_url or "https://www.dokucheck.cz"
 
-        self.tasks = []
-        self.queue_display = []
+        # fronta a výsledky na disku – obnova po zavření / pádu; session_dir = uživatelská složka agenta
+        self.session_store, self._session_locked = _open_session_store(session_dir)
+        self.queue = QueueModel(result_stats=_result_stats, store=self.session_store)  # úlohy + soubory fronty, qidx = stabilní identita řádku
         self.batches = []  # [{"label": "Dávka - HH:MM", "qidx_start": int, "qidx_end": int, "root_iid": str|None}, ...]
+        self._scan = None  # probíhající načítání složek na pozadí (viz _start_scan)
+        self._pending_adds = []  # přidání během načítání – zpracují se po jeho dokončení
         self.session_files_checked = 0
         self.start_time = None
         self.total_files = 0
         self.processed_files = 0
         self.cancel_requested = False
         self.is_running = False
+        self.progress_channel = ProgressChannel()  # průběh z analyzačního vlákna, Tk ho čte v taktu 100 ms
+        self._progress_base = None  # (hotovo, celkem) při kontrole složky po částech – průběh části se přičte
+        self._source_folder = None
         self.selected_qidx = None
 
         self.root.title("DokuCheck")
@@ -187,6 +243,8 @@ class PDFCheckUI_2026_V3:
         self._apply_dark_title_bar()
         self._setup_logo()
         self._show_session_summary()
+        self._restore_session()
+        self.root.after(SESSION_FLUSH_MS, self._flush_session)
         # Maximalizace se provádí v create_app před deiconify() – zde už ne, aby neprobliklo
         self.root.after(250, self._update_analyze_send_state)
 
@@ -197,6 +255,60 @@ class PDFCheckUI_2026_V3:
         y = (self.root.winfo_screenheight() // 2) - (h // 2)
         self.root.geometry(f"{w}x{h}+{x}+{y}")
 
+    def _restore_session(self):
+        """Obnoví frontu z minulé relace (zavření nebo pád aplikace); výsledky zůstávají na disku."""
+        if self._session_locked:
+            self.show_message("Relace je otevřená v jiném okně agenta – fronta v tomto okně se po zavření neuloží.", "warning")
+        if self.session_store is None:
+            return
+        try:
+            n_files = self.queue.restore()
+            batches = self.session_store.get_meta("batches") or []
+            self._source_folder = self.session_store.get_meta("source_folder")
+        except Exception:
+            self.queue = QueueModel(result_stats=_result_stats)
+            self.session_store = None
+            return
+        if not n_files:
+            return
+        self.batches = [dict(b, root_iid=None) for b in batches] or [
+            {"label": "Obnovená relace", "qidx_start": 0, "qidx_end": self.queue.next_qidx, "root_iid": None}
+        ]
+        self.update_queue_display()
+        self._show_session_summary()
+        remaining = self.queue.n_checked
+        text = f"Obnovena předchozí relace: {n_files} souborů, zkontrolováno {self.queue.n_done}."
+        if remaining:
+            text += f" Zbývající zaškrtnuté ({remaining}) dokončíte tlačítkem „Analyzovat PDF“."
+        self.show_message(text)
+        if self.queue.unsent_success_qidx():
+            self._last_display_result = {"source_folder_for_batch": self._source_folder}
+            self.send_btn.pack(side=tk.RIGHT, padx=4, pady=6)
+
+    def _save_batches(self):
+        if self.session_store is not None:
+            self.session_store.set_meta("batches", [
+                {"label": b["label"], "qidx_start": b["qidx_start"], "qidx_end": b["qidx_end"]} for b in self.batches
+            ])
+
+    def _flush_session(self):
+        """Takt Tk: commit změn relace na disk (zápisy z QueueModel se hromadí v transakci)."""
+        if self.session_store is not None:
+            try:
+                self.session_store.flush()
+            except Exception:
+                pass
+        self.root.after(SESSION_FLUSH_MS, self._flush_session)
+
+    def close_session(self):
+        """Při ukončení aplikace – zapíše zbytek relace; další spuštění v ní pokračuje."""
+        if self.session_store is not None:
+            try:
+                self.session_store.close()
+            except Exception:
+                pass
+            self.session_store = None
+
     def _apply_dark_title_bar(self):
         """Tmavý title bar na Windows 10/11 (DWM)."""
         if sys.platform != "win32":
@@ -345,6 +457,9 @@ class PDFCheckUI_2026_V3:
         ctk.CTkButton(bar, text="Přidat soubory", command=self.add_files, font=(FONT_STACK[0], FS_12), width=100, fg_color=ACCENT).pack(side=tk.LEFT, padx=6, pady=4)
         ctk.CTkButton(bar, text="+ Složka", command=self.add_folder, font=(FONT_STACK[0], FS_12), width=72, fg_color=ACCENT).pack(side=tk.LEFT, padx=2, pady=4)
         ctk.CTkButton(bar, text="VYMAZAT VŠE", command=self.clear_queue, font=(FONT_STACK[0], FS_12), width=100, fg_color=BORDER).pack(side=tk.LEFT, padx=2, pady=4)
+        # Stav načítání složek – zobrazí se jen během procházení
+        self._scan_label = ctk.CTkLabel(bar, text="", font=(FONT_STACK[0], FS_12), text_color=TEXT_MUTED)
+        self._scan_cancel_btn = ctk.CTkButton(bar, text="Zrušit načítání", command=self.cancel_scan, font=(FONT_STACK[0], FS_12), width=100, fg_color=WARNING)
         self.check_btn = ctk.CTkButton(bar, text="Analyzovat PDF", command=self.on_check_clicked, font=(FONT_STACK[0], FS_14, "bold"), fg_color=ACCENT, height=32)
         self.check_btn.pack(side=tk.RIGHT, padx=4, pady=6)
         self.send_btn = ctk.CTkButton(bar, text="Odeslat metadata na server", command=self._on_send_metadata_clicked, font=(FONT_STACK[0], FS_12, "bold"), fg_color=SUCCESS, height=28)
@@ -414,6 +529,7 @@ class PDFCheckUI_2026_V3:
         scroll.grid(row=0, column=1, sticky="ns")
         self.queue_tree.bind("<<TreeviewSelect>>", self._on_tree_select)
         self.queue_tree.bind("<Button-1>", self._on_tree_click)
+        self.queue_tree.bind("<<TreeviewOpen>>", self._on_tree_open)
         self._dnd_hint_label = ctk.CTkLabel(
             self._tree_container, text="Zde přetáhněte soubory nebo složky k analýze",
             text_color=TEXT_MUTED, font=(FONT_STACK[0], FS_14),
@@ -422,6 +538,9 @@ class PDFCheckUI_2026_V3:
         self._tree_iid_to_qidx = {}
         self._tree_iid_to_task_ix = {}
         self._qidx_to_tree_iid = {}
+        self._tree_nodes = {}  # iid dávky/složky -> (model dávky, prefix) – viz _build_batch_model
+        self._tree_populated = set()  # uzly, jejichž potomci už jsou vložení ve Treeview
+        self._dirty_qidx = set()  # qidx se změněným stavem, překreslí je update_queue_display
         self._last_display_result = None
         self.queue_scroll = None
 
@@ -594,18 +713,40 @@ class PDFCheckUI_2026_V3:
     def _on_drop(self, event):
         if getattr(self, "_dnd_overlay", None):
             self._dnd_overlay.place_forget()
-        start = len(self.queue_display)
+        paths = []
         for raw in self.root.tk.splitlist(event.data):
             path = (raw.strip() if isinstance(raw, str) else None) or (raw.get("path") or raw.get("full_path") if isinstance(raw, dict) else None)
             if path and isinstance(path, str):
+                paths.append(path)
+        self._enqueue_paths(paths)
+
+    def _enqueue_paths(self, paths):
+        """Přidá cesty jako jednu dávku: soubory hned, složky načítá FolderScanner na pozadí do téže dávky."""
+        if self._scan is not None:
+            self._pending_adds.append(list(paths))
+            self._update_scan_status()
+            return
+        start = self.queue.next_qidx
+        folders = []
+        for path in paths:
+            path = self._normalize_path(path)
+            if not path:
+                continue
+            if os.path.isdir(path):
+                folders.append(path)
+            else:
                 self.add_path_to_queue(path)
-        if len(self.queue_display) > start:
-            self.batches.append({
+        if self.queue.next_qidx > start or folders:
+            batch = {
                 "label": "Dávka - " + time.strftime("%d.%m. %H:%M"),
                 "qidx_start": start,
-                "qidx_end": len(self.queue_display),
+                "qidx_end": self.queue.next_qidx,
                 "root_iid": None,
-            })
+            }
+            self.batches.append(batch)
+            self._save_batches()
+            if folders:
+                self._start_scan(batch, folders)
         self.update_queue_display()
         self._update_progress_idle()
 
@@ -633,8 +774,8 @@ class PDFCheckUI_2026_V3:
 
     def _get_queue_totals(self):
         """Vrátí (počet PDF souborů, počet složek) – okamžitý předpočet z fronty."""
-        n_files = len(self.queue_display)
-        n_folders = sum(1 for t in self.tasks if t.get("type") == "folder")
+        n_files = len(self.queue)
+        n_folders = self.queue.folder_task_count()
         return n_files, n_folders
 
     def _update_progress_idle(self):
@@ -642,9 +783,9 @@ class PDFCheckUI_2026_V3:
         if self.is_running:
             return
         n_files, n_folders = self._get_queue_totals()
-        checked = len([q for q in self.queue_display if q.get("checked", True)])
-        processed = len([q for q in self.queue_display if q.get("result")])
-        sent = len([q for q in self.queue_display if q.get("sent")])
+        checked = self.queue.n_checked
+        processed = self.queue.n_processed
+        sent = self.queue.n_sent
         new_count = n_files - processed
         if n_files > 0:
             self._progress_row.grid()
@@ -670,87 +811,135 @@ class PDFCheckUI_2026_V3:
             from pdf_checker import find_all_pdfs
             pdfs = find_all_pdfs(path)
             if pdfs:
-                name = os.path.basename(path)
-                file_paths = []
+                files = []
                 for fp in pdfs:
                     p = (fp.get("full_path") or fp.get("path")) if isinstance(fp, dict) else (fp if isinstance(fp, str) else None)
                     if not p:
                         continue
-                    file_paths.append(p)
-                    self.queue_display.append({"path": p, "filename": (fp.get("filename") or os.path.basename(p)) if isinstance(fp, dict) else os.path.basename(p), "status": "pending", "result": None, "checked": True})
-                if file_paths:
-                    self.tasks.append({"type": "folder", "path": path, "name": name, "file_paths": file_paths})
+                    files.append((p, (fp.get("filename") or os.path.basename(p)) if isinstance(fp, dict) else os.path.basename(p)))
+                self.queue.add_task("folder", path, os.path.basename(path), files)
         elif path.lower().endswith(".pdf"):
             name = os.path.basename(path)
-            self.tasks.append({"type": "file", "path": path, "name": name, "file_paths": [path]})
-            self.queue_display.append({"path": path, "filename": name, "status": "pending", "result": None, "checked": True})
+            self.queue.add_task("file", path, name, [(path, name)])
 
     def add_files(self):
         files = filedialog.askopenfilenames(title="Vyberte PDF", filetypes=[("PDF", "*.pdf")])
-        start = len(self.queue_display)
-        for f in files:
-            self.add_path_to_queue(f)
-        if len(self.queue_display) > start:
-            self.batches.append({
-                "label": "Dávka - " + time.strftime("%d.%m. %H:%M"),
-                "qidx_start": start,
-                "qidx_end": len(self.queue_display),
-                "root_iid": None,
-            })
-        self.update_queue_display()
-        self._update_progress_idle()
+        if files:
+            self._enqueue_paths(files)
 
     def add_folder(self):
         folder = filedialog.askdirectory(title="Vyberte složku s PDF")
         if folder:
-            start = len(self.queue_display)
-            self.add_path_to_queue(folder)
-            if len(self.queue_display) > start:
-                self.batches.append({
-                    "label": "Dávka - " + time.strftime("%d.%m. %H:%M"),
-                    "qidx_start": start,
-                    "qidx_end": len(self.queue_display),
-                    "root_iid": None,
-                })
+            self._enqueue_paths([folder])
+
+    # --- načítání složek na pozadí ---
+
+    def _start_scan(self, batch, folders):
+        self._scan = {"batch": batch, "folders": list(folders), "scanner": None, "task_ix": None, "dirs": 0, "files": 0}
+        self._next_scan_folder(self._scan)
+        self._scan_label.pack(side=tk.LEFT, padx=(10, 4), pady=4)
+        self._scan_cancel_btn.pack(side=tk.LEFT, padx=2, pady=4)
+        self._update_scan_status()
+        self.root.after(SCAN_POLL_MS, self._poll_scan, self._scan)
+
+    def _next_scan_folder(self, scan):
+        folder = scan["folders"].pop(0)
+        scan["scanner"] = FolderScanner(folder).start()
+        scan["task_ix"] = None
+
+    def _poll_scan(self, scan):
+        """Takt Tk: převezme nově nalezené soubory do fronty a stromu, aktualizuje počty složek/PDF."""
+        if self._scan is not scan:
+            return
+        scanner = scan["scanner"]
+        files, dirs, found, done = scanner.take()
+        if files:
+            folder = scanner.root_path
+            if scan["task_ix"] is None:
+                if self.queue.add_task("folder", folder, os.path.basename(folder), files):
+                    scan["task_ix"] = self.queue.last_task_ix
+            else:
+                self.queue.extend_task(scan["task_ix"], files)
+            self._extend_batch(scan["batch"], self.queue.next_qidx)
             self.update_queue_display()
-            self._update_progress_idle()
+        self._update_scan_status(dirs, found)
+        if done:
+            scan["dirs"] += dirs
+            scan["files"] += found
+            if scan["folders"] and not scanner.cancelled:
+                self._next_scan_folder(scan)
+            else:
+                self._finish_scan()
+                return
+        self.root.after(SCAN_POLL_MS, self._poll_scan, scan)
+
+    def _update_scan_status(self, dirs=0, found=0):
+        scan = self._scan
+        if scan is None:
+            return
+        text = f"Načítám: {scan['dirs'] + dirs} složek, {scan['files'] + found} PDF"
+        if self._pending_adds:
+            text += f" (další ve frontě: {len(self._pending_adds)})"
+        self._scan_label.configure(text=text)
+
+    def _finish_scan(self):
+        batch = self._scan["batch"]
+        if batch["qidx_end"] <= batch["qidx_start"] and batch in self.batches:
+            self.batches.remove(batch)  # ve složkách nebylo žádné nové PDF
+        self._save_batches()
+        self._scan = None
+        self._scan_label.pack_forget()
+        self._scan_cancel_btn.pack_forget()
+        self.update_queue_display()
+        self._show_session_summary()
+        if self._pending_adds:
+            self._enqueue_paths(self._pending_adds.pop(0))
+
+    def cancel_scan(self):
+        """Zastaví načítání složek; už nalezené soubory ve frontě zůstanou."""
+        self._pending_adds = []
+        if self._scan is not None:
+            self._scan["folders"] = []
+            self._scan["scanner"].cancel()
 
     def clear_queue(self):
-        """Jediné místo, kde smí být voláno tree.delete – VYMAZAT VŠE."""
-        self.tasks = []
-        self.queue_display = []
+        """Jediné místo, kde smí být voláno tree.delete (kromě zástupných potomků líných složek) – VYMAZAT VŠE."""
+        if self._scan is not None:
+            self.cancel_scan()
+            self._finish_scan()
+        self.queue.clear()
         self.batches = []
+        self._source_folder = None
         for iid in self.queue_tree.get_children(""):
             self.queue_tree.delete(iid)
         self._tree_iid_to_qidx.clear()
         self._tree_iid_to_task_ix.clear()
         self._qidx_to_tree_iid.clear()
+        self._tree_nodes.clear()
+        self._tree_populated.clear()
+        self._dirty_qidx.clear()
         self._update_stats()
         self._show_session_summary()
         self._update_progress_idle()
 
     def _badge_text(self, item):
         """Vrátí (text pro pilulku, barva). Pilulky: ✓ zelená / ✗ červená."""
-        r = item.get("result")
-        if not r or not isinstance(r, dict):
-            return "…", TEXT_MUTED
-        if r.get("skipped"):
-            return "…", TEXT_MUTED
-        if r.get("success"):
+        # Podle stavu řádku – výsledek samotný může být jen na disku (session_store)
+        status = item.get("status")
+        if status == "success":
             return "✓", SUCCESS
-        return "✗", ERROR
+        if status == "error":
+            return "✗", ERROR
+        return "…", TEXT_MUTED
 
     def _item_passes_filter(self, item):
         if self._queue_filter == "all":
             return True
         if self._queue_filter == "errors":
-            r = item.get("result")
-            return r and isinstance(r, dict) and not r.get("success") and not r.get("skipped")
+            return item.get("status") == "error"
         if self._queue_filter == "pdfa_ok":
-            r = item.get("result")
-            if not r or not isinstance(r, dict):
-                return False
-            return (r.get("results") or {}).get("pdf_format", {}).get("is_pdf_a3") is True
+            # Spočteno při set_result (_result_stats) – bez skládání výsledku zpět do slovníku
+            return item.get("pdfa_ok") is True
         return True
 
     def _on_queue_filter(self, value):
@@ -764,19 +953,19 @@ class PDFCheckUI_2026_V3:
 
     def _tree_expand_all(self):
         def _expand(iid):
+            self._populate_tree_node(iid)
             self.queue_tree.item(iid, open=True)
             for c in self.queue_tree.get_children(iid):
-                _expand(c)
+                if c in self._tree_nodes:
+                    _expand(c)
         for iid in self.queue_tree.get_children(""):
             _expand(iid)
 
     def _tree_collapse_all(self):
-        def _collapse(iid):
-            for c in self.queue_tree.get_children(iid):
-                _collapse(c)
-            self.queue_tree.item(iid, open=False)
-        for iid in self.queue_tree.get_children(""):
-            _collapse(iid)
+        # Sbalit stačí uzly, které už byly vložené (ostatní jsou sbalené od začátku)
+        for iid in self._tree_populated:
+            if self.queue_tree.exists(iid):
+                self.queue_tree.item(iid, open=False)
 
     def _on_tree_select(self, event):
         sel = self.queue_tree.selection()
@@ -788,14 +977,16 @@ class PDFCheckUI_2026_V3:
             self._select_item(qidx)
 
     def _collect_file_qindices_under(self, parent_iid):
-        """Rekurzivně vrátí set qidx všech souborů pod daným uzlem (složka/dávka)."""
+        """Vrátí set qidx všech souborů pod daným uzlem (složka/dávka) – z modelu, i když uzel není rozbalený."""
         out = set()
-        for c in self.queue_tree.get_children(parent_iid):
-            qidx = self._tree_iid_to_qidx.get(c)
-            if qidx is not None:
-                out.add(qidx)
-            else:
-                out.update(self._collect_file_qindices_under(c))
+        if parent_iid not in self._tree_nodes:
+            return out
+        model, prefix = self._tree_nodes[parent_iid]
+        stack = [prefix]
+        while stack:
+            node = model[stack.pop()]
+            out.update(node["files"])
+            stack.extend(node["folders"])
         return out
 
     def _on_tree_click(self, event):
@@ -814,18 +1005,15 @@ class PDFCheckUI_2026_V3:
             qindices = self._collect_file_qindices_under(iid)
             if not qindices:
                 return
-            items = [self.queue_display[i] for i in qindices if 0 <= i < len(self.queue_display)]
-            all_checked = all(item.get("checked", True) for item in items)
+            items = [item for item in map(self.queue.get, qindices) if item is not None]
+            all_checked = all(item.checked for item in items)
             new_val = not all_checked
-            for i in qindices:
-                if 0 <= i < len(self.queue_display):
-                    self.queue_display[i]["checked"] = new_val
-            for i in qindices:
-                fiid = self._qidx_to_tree_iid.get(i)
+            for item in items:
+                self.queue.set_checked(item.qidx, new_val)
+                fiid = self._qidx_to_tree_iid.get(item.qidx)
                 if fiid and self.queue_tree.exists(fiid):
                     chk = "☑" if new_val else "☐"
-                    name = self.queue_display[i].get("filename", "")
-                    self.queue_tree.item(fiid, text=f"{chk}  📄 {name}")
+                    self.queue_tree.item(fiid, text=f"{chk}  📄 {item.filename}")
             self._update_stats()
             if not self.is_running:
                 self._update_progress_idle()
@@ -1060,17 +1248,8 @@ class PDFCheckUI_2026_V3:
 
     def _root_for_qidx(self, qidx):
         """Vrátí kořenovou cestu (složku výběru) pro daný qidx – od ní se zobrazuje strom níže."""
-        qidx_start = 0
-        for task in self.tasks:
-            file_paths = task.get("file_paths", [])
-            if not file_paths:
-                continue
-            if qidx_start <= qidx < qidx_start + len(file_paths):
-                if task.get("type") == "folder":
-                    return (task.get("path") or "").strip()
-                return (os.path.dirname(file_paths[0]) or "").strip()
-            qidx_start += len(file_paths)
-        return ""
+        task_ix = self.queue.task_index_of(qidx)
+        return self.queue.task_root(task_ix) if task_ix is not None else ""
 
     def _path_to_folder_prefixes(self, path, root):
         """Z cesty souboru vrátí relativní prefixy složek vůči root (od vybrané složky níže)."""
@@ -1091,97 +1270,140 @@ class PDFCheckUI_2026_V3:
             return []
         return ["/".join(parts[:i]) for i in range(1, len(parts) + 1)]
 
+    def _build_batch_model(self, root_iid, qidx_start, qidx_end):
+        """
+        Model stromu dávky bez zásahu do Treeview: prefix složky -> {iid, name, folders, files}.
+        Kořen dávky má prefix "". Do Treeview se uzly vkládají až při rozbalení (_populate_tree_node).
+        """
+        nodes = {"": {"iid": root_iid, "name": "", "folders": [], "files": []}}
+        self._extend_batch_model(nodes, qidx_start, qidx_end)
+        return nodes
+
+    def _extend_batch_model(self, nodes, qidx_start, qidx_end):
+        """Doplní soubory qidx_start..qidx_end do modelu. Vrací nové složky [(rodič, prefix)] a soubory [(rodič, qidx)]."""
+        root_iid = nodes[""]["iid"]
+        new_folders, new_files = [], []
+        for qidx in range(qidx_start, qidx_end):
+            item = self.queue.get(qidx)
+            if item is None or not item.path:
+                continue
+            root = self._root_for_qidx(qidx)
+            parent = ""
+            for prefix in self._path_to_folder_prefixes(item.path, root):
+                if prefix not in nodes:
+                    safe = (root_iid + "-" + prefix).replace("/", "_").replace(":", "_").replace("\\", "_")
+                    nodes[prefix] = {"iid": "path-" + safe, "name": prefix.rsplit("/", 1)[-1], "folders": [], "files": []}
+                    nodes[parent]["folders"].append(prefix)
+                    new_folders.append((parent, prefix))
+                parent = prefix
+            nodes[parent]["files"].append(qidx)
+            new_files.append((parent, qidx))
+        return new_folders, new_files
+
+    def _extend_batch(self, batch, qidx_end):
+        """Rozšíří dávku o nově načtené soubory; do stromu vloží jen ty, jejichž rodič je už rozbalený."""
+        qidx_start, batch["qidx_end"] = batch["qidx_end"], qidx_end
+        self._save_batches()
+        root_iid = batch.get("root_iid")
+        if not root_iid or root_iid not in self._tree_nodes:
+            return  # kořen dávky ještě nevznikl – založí ho update_queue_display s celým rozsahem
+        model = self._tree_nodes[root_iid][0]
+        new_folders, new_files = self._extend_batch_model(model, qidx_start, qidx_end)
+        for parent, prefix in new_folders:
+            if model[parent]["iid"] in self._tree_populated:
+                self._insert_tree_folder(model[parent]["iid"], model, prefix)
+        for parent, qidx in new_files:
+            if model[parent]["iid"] in self._tree_populated:
+                self._insert_tree_file(model[parent]["iid"], qidx)
+
+    def _file_row(self, qidx):
+        """Text, hodnoty a tagy řádku souboru podle aktuálního stavu položky."""
+        item = self.queue.get(qidx)
+        chk = "☑" if item.checked else "☐"
+        badge_text, _ = self._badge_text(item)
+        tag = "ok" if badge_text == "✓" else ("error" if badge_text == "✗" else "pending")
+        return "%s  📄 %s" % (chk, item.filename), (badge_text,), (tag,)
+
+    def _insert_tree_folder(self, parent_iid, model, prefix):
+        node = model[prefix]
+        iid = node["iid"]
+        self.queue_tree.insert(parent_iid, "end", iid=iid, text="📁 " + node["name"], values=("",))
+        self._tree_nodes[iid] = (model, prefix)
+        if node["folders"] or node["files"]:
+            # Zástupný potomek – Treeview pak u složky zobrazí rozbalovací šipku
+            self.queue_tree.insert(iid, "end", iid=iid + "-lazy", text="")
+
+    def _populate_tree_node(self, iid):
+        """Vloží přímé potomky uzlu (složky + soubory), pokud ještě nejsou ve stromu."""
+        if iid in self._tree_populated or iid not in self._tree_nodes:
+            return
+        self._tree_populated.add(iid)
+        model, prefix = self._tree_nodes[iid]
+        node = model[prefix]
+        if self.queue_tree.exists(iid + "-lazy"):
+            self.queue_tree.delete(iid + "-lazy")
+        for sub in node["folders"]:
+            self._insert_tree_folder(iid, model, sub)
+        for qidx in node["files"]:
+            self._insert_tree_file(iid, qidx)
+
+    def _insert_tree_file(self, parent_iid, qidx):
+        if self.queue.get(qidx) is None:
+            return
+        file_iid = "file-%d" % qidx
+        text, values, tags = self._file_row(qidx)
+        self.queue_tree.insert(parent_iid, "end", iid=file_iid, text=text, values=values, tags=tags)
+        self._tree_iid_to_qidx[file_iid] = qidx
+        self._qidx_to_tree_iid[qidx] = file_iid
+
+    def _on_tree_open(self, event):
+        iid = self.queue_tree.focus()
+        if iid:
+            self._populate_tree_node(iid)
+
     def _append_to_tree(self, batch):
-        """Přidá jednu dávku do stromu bez mazání: kořen 📦 Dávka - [čas], pod ním hloubková struktura složek a souborů."""
+        """
+        Přidá jednu dávku do stromu bez mazání: kořen 📦 Dávka - [čas] a jeho první úroveň.
+        Hlubší složky a soubory se vkládají líně při rozbalení – i při desítkách tisíc souborů je vložení okamžité.
+        """
         root_iid = batch.get("root_iid")
         if root_iid and self.queue_tree.exists(root_iid):
             return
         qidx_start = batch["qidx_start"]
         qidx_end = batch["qidx_end"]
-        root_iid = "batch-%d-%d" % (qidx_start, qidx_end)
+        if qidx_end <= qidx_start:
+            return  # dávka zatím bez souborů (složky se teprve načítají)
+        root_iid = "batch-%d" % qidx_start
         batch["root_iid"] = root_iid
-        self.queue_tree.insert("", "end", iid=root_iid, text="📦 " + batch["label"], values=("",))
+        self.queue_tree.insert("", "end", iid=root_iid, text="📦 " + batch["label"], values=("",), open=True)
         self._tree_iid_to_task_ix[root_iid] = None
+        self._tree_nodes[root_iid] = (self._build_batch_model(root_iid, qidx_start, qidx_end), "")
+        self._populate_tree_node(root_iid)
 
-        path_to_iid = {}  # relativní prefix (v rámci dávky) -> iid, aby se složky neduplikovaly
-        for qidx in range(qidx_start, qidx_end):
-            item = self.queue_display[qidx]
-            path = item.get("path") or ""
-            if not path:
-                continue
-            root = self._root_for_qidx(qidx)
-            full = os.path.normpath(path).replace("\\", "/")
-            root_n = (os.path.normpath(root).replace("\\", "/").rstrip("/") + "/") if root else ""
-            if root_n and full.startswith(root_n):
-                rel = full[len(root_n):].lstrip("/")
-            else:
-                rel = full
-            dirname = os.path.dirname(rel)
-            for prefix in self._path_to_folder_prefixes(path, root):
-                if prefix in path_to_iid:
-                    continue
-                parts = [p for p in prefix.split("/") if p]
-                parent_prefix = "/".join(parts[:-1]) if len(parts) > 1 else None
-                parent_iid = path_to_iid.get(parent_prefix, root_iid) if parent_prefix else root_iid
-                safe = (root_iid + "-" + prefix).replace("/", "_").replace(":", "_").replace("\\", "_")
-                folder_iid = "path-" + safe
-                path_to_iid[prefix] = folder_iid
-                display_name = parts[-1] if parts else prefix
-                self.queue_tree.insert(parent_iid, "end", iid=folder_iid, text="📁 " + display_name, values=("",))
-            parent_iid = path_to_iid.get(dirname, root_iid) if dirname else root_iid
-            chk = "☑" if item.get("checked", True) else "☐"
-            badge_text, _ = self._badge_text(item)
-            display_name = "%s  📄 %s" % (chk, item.get("filename", ""))
-            file_iid = "file-%d" % qidx
-            self.queue_tree.insert(parent_iid, "end", iid=file_iid, text=display_name, values=(badge_text,))
-            self._tree_iid_to_qidx[file_iid] = qidx
-            self._qidx_to_tree_iid[qidx] = file_iid
-            if badge_text == "✓":
-                self.queue_tree.item(file_iid, tags=("ok",))
-            elif badge_text == "✗":
-                self.queue_tree.item(file_iid, tags=("error",))
-            else:
-                self.queue_tree.item(file_iid, tags=("pending",))
-
-        def _expand(iid):
-            self.queue_tree.item(iid, open=True)
-            for c in self.queue_tree.get_children(iid):
-                _expand(c)
-        _expand(root_iid)
+    def mark_queue_dirty(self, *qindices):
+        """Označí položky fronty ke překreslení při příštím update_queue_display."""
+        self._dirty_qidx.update(qindices)
 
     def update_queue_display(self):
-        """Žádné mazání stromu – pouze přidání nových dávkových uzlů a aktualizace textu/tagů u existujících."""
+        """
+        Žádné mazání stromu – přidání nových dávkových uzlů a překreslení jen změněných (dirty) řádků.
+        Řádky, které ve stromu ještě nejsou (nerozbalená složka), dostanou aktuální stav při vložení.
+        """
         for batch in self.batches:
             self._append_to_tree(batch)
-        for qidx, item in enumerate(self.queue_display):
+        dirty, self._dirty_qidx = self._dirty_qidx, set()
+        for qidx in dirty:
             file_iid = self._qidx_to_tree_iid.get(qidx)
-            if not file_iid or not self.queue_tree.exists(file_iid):
+            if not file_iid or self.queue.get(qidx) is None or not self.queue_tree.exists(file_iid):
                 continue
-            chk = "☑" if item.get("checked", True) else "☐"
-            badge_text, _ = self._badge_text(item)
-            name = item.get("filename", "")
-            self.queue_tree.item(file_iid, text="%s  📄 %s" % (chk, name), values=(badge_text,))
-            if badge_text == "✓":
-                self.queue_tree.item(file_iid, tags=("ok",))
-            elif badge_text == "✗":
-                self.queue_tree.item(file_iid, tags=("error",))
-            else:
-                self.queue_tree.item(file_iid, tags=("pending",))
-        self._queue_tree_style.configure(
-            "Queue.Treeview",
-            rowheight=TREE_ROWHEIGHT,
-            background=TREEVIEW_BG,
-            foreground=TREEVIEW_FG,
-            fieldbackground=TREEVIEW_BG,
-        )
-        self._queue_tree_style.map(
-            "Queue.Treeview",
-            foreground=[("selected", TREEVIEW_FG), ("!selected", TREEVIEW_FG)],
-            background=[("selected", BORDER), ("!selected", TREEVIEW_BG)],
-            fieldbackground=[("selected", BORDER), ("!selected", TREEVIEW_BG)],
-        )
+            try:
+                text, values, tags = self._file_row(qidx)
+                self.queue_tree.item(file_iid, text=text, values=values, tags=tags)
+            except tk.TclError as e:
+                # Jeden řádek (např. právě smazaný uzel) nesmí zastavit překreslení ostatních
+                logger.warning("Fronta: řádek %s nelze překreslit: %s", qidx, e)
         if getattr(self, "_dnd_hint_label", None):
-            if not self.queue_display:
+            if not len(self.queue):
                 self._dnd_hint_label.place(relx=0.5, rely=0.5, anchor=tk.CENTER)
             else:
                 self._dnd_hint_label.place_forget()
@@ -1190,18 +1412,18 @@ class PDFCheckUI_2026_V3:
             self._update_progress_idle()
 
     def _toggle_checked(self, qidx):
-        if 0 <= qidx < len(self.queue_display):
-            self.queue_display[qidx]["checked"] = not self.queue_display[qidx].get("checked", True)
+        item = self.queue.get(qidx)
+        if item is not None:
+            self.queue.toggle_checked(qidx)
             iid = self._qidx_to_tree_iid.get(qidx)
             if iid and self.queue_tree.exists(iid):
-                chk = "☑" if self.queue_display[qidx].get("checked", True) else "☐"
-                name = self.queue_display[qidx].get("filename", "")
-                self.queue_tree.item(iid, text=f"{chk}  📄 {name}")
+                chk = "☑" if item.checked else "☐"
+                self.queue_tree.item(iid, text=f"{chk}  📄 {item.filename}")
             else:
                 self.update_queue_display()
 
     def _select_item(self, qidx):
-        if 0 <= qidx < len(self.queue_display):
+        if self.queue.get(qidx) is not None:
             self.selected_qidx = qidx
             self.detail_text.configure(state="normal")
             self.detail_text.delete("0.0", "end")
@@ -1210,33 +1432,25 @@ class PDFCheckUI_2026_V3:
 
     def remove_checked_from_queue(self):
         """Odebere z fronty všechny zaškrtnuté položky."""
-        to_remove = set()
-        for qidx, item in enumerate(self.queue_display):
-            if item.get("checked", True):
-                to_remove.add(item.get("path"))
+        to_remove = [item.qidx for item in self.queue.checked_items()]
         if not to_remove:
             self.show_message("Žádné zaškrtnuté položky k odebrání.")
             return
-        self._remove_paths_from_queue(to_remove)
+        self._remove_qindices_from_queue(to_remove)
 
     def remove_selected_from_queue(self):
         """Odebere z fronty aktuálně vybranou položku."""
         if self.selected_qidx is None:
             self.show_message("Nejdříve vyberte položku (klikněte na řádek).")
             return
-        if 0 <= self.selected_qidx < len(self.queue_display):
-            path = self.queue_display[self.selected_qidx].get("path")
-            if path:
-                self._remove_paths_from_queue({path})
+        if self.queue.get(self.selected_qidx) is not None:
+            self._remove_qindices_from_queue([self.selected_qidx])
         self.selected_qidx = None
 
     def _remove_folder_by_index(self, task_ix):
         """Odebere celou složku (úlohu) z fronty."""
-        if 0 <= task_ix < len(self.tasks):
-            task = self.tasks[task_ix]
-            paths = set(task.get("file_paths", []))
-            if paths:
-                self._remove_paths_from_queue(paths)
+        if self.queue.task(task_ix) is not None:
+            self._remove_qindices_from_queue([item.qidx for item in self.queue.task_items(task_ix)])
         self.selected_qidx = None
 
     def remove_folder_of_selected(self):
@@ -1244,31 +1458,27 @@ class PDFCheckUI_2026_V3:
         if self.selected_qidx is None:
             self.show_message("Nejdříve vyberte položku ve složce, kterou chcete odebrat.")
             return
-        for task_ix, task in enumerate(self.tasks):
-            file_paths = task.get("file_paths", [])
-            qidx_start = sum(len(self.tasks[i].get("file_paths", [])) for i in range(task_ix))
-            if qidx_start <= self.selected_qidx < qidx_start + len(file_paths):
-                self._remove_folder_by_index(task_ix)
-                return
+        task_ix = self.queue.task_index_of(self.selected_qidx)
+        if task_ix is not None:
+            self._remove_folder_by_index(task_ix)
+            return
         self.selected_qidx = None
 
     def _remove_paths_from_queue(self, paths_to_remove):
-        """Odstraní z tasks a queue_display všechny položky s path v paths_to_remove."""
-        paths_to_remove = set(paths_to_remove)
-        new_tasks = []
-        new_queue_display = []
-        for task in self.tasks:
-            kept_paths = [p for p in task.get("file_paths", []) if p not in paths_to_remove]
-            if not kept_paths:
+        """Odstraní z fronty všechny položky s path v paths_to_remove."""
+        self._remove_qindices_from_queue([q for q in map(self.queue.index_of, set(paths_to_remove)) if q is not None])
+
+    def _remove_qindices_from_queue(self, qindices):
+        """Odebere řádky fronty; qidx ostatních zůstávají platné, takže dávky i strom se jen zmenší."""
+        for qidx in qindices:
+            if not self.queue.remove(qidx):
                 continue
-            for p in kept_paths:
-                item = next((q for q in self.queue_display if q.get("path") == p), None)
-                if item is not None:
-                    new_queue_display.append(item)
-            new_tasks.append({**task, "file_paths": kept_paths})
-        self.tasks = new_tasks
-        self.queue_display = new_queue_display
-        self.batches = []  # po změně obsahu fronty jsou qidx neplatné
+            file_iid = self._qidx_to_tree_iid.pop(qidx, None)
+            if file_iid:
+                self._tree_iid_to_qidx.pop(file_iid, None)
+                if self.queue_tree.exists(file_iid):
+                    self.queue_tree.delete(file_iid)
+            self._dirty_qidx.discard(qidx)
         self.selected_qidx = None
         self.update_queue_display()
         self._show_session_summary()
@@ -1276,15 +1486,15 @@ class PDFCheckUI_2026_V3:
     def _show_session_summary(self):
         self.detail_text.configure(state="normal")
         self.detail_text.delete("0.0", "end")
-        self.detail_text.insert("0.0", _session_summary_text(self.tasks, self.queue_display, self.session_files_checked))
+        self.detail_text.insert("0.0", _session_summary_text(self.queue.tasks(), self.queue, self.session_files_checked))
         self.detail_text.configure(state="disabled")
 
     def _update_stats(self):
-        total = len([q for q in self.queue_display if q.get("status") not in ("pending", None)])
-        ok = len([q for q in self.queue_display if q.get("status") == "success"])
+        total = self.queue.n_done
+        ok = self.queue.n_success
         pct = int(round(100 * ok / total)) if total else 0
-        errs = sum(_count_errors_from_result(q.get("result")) for q in self.queue_display)
-        pdfa_ok = sum(1 for q in self.queue_display if q.get("result") and isinstance(q.get("result"), dict) and (q.get("result").get("results") or {}).get("pdf_format", {}).get("is_pdf_a3"))
+        errs = self.queue.n_errors
+        pdfa_ok = self.queue.n_pdfa_ok
         self.metric_dnes.configure(text=f"Dnes: {self.session_files_checked}")
         self.metric_ok.configure(text=f"Úspěšnost: {pct}%" if total else "Úspěšnost: —")
         self.metric_chyby.configure(text=f"Chyby: {errs}")
@@ -1294,7 +1504,10 @@ class PDFCheckUI_2026_V3:
         if self.on_has_login and callable(self.on_has_login) and not self.on_has_login():
             self.show_message("Pro analýzu a odeslání na server se nejprve přihlaste („Vyzkoušet zdarma“ nebo e-mail v sidebaru).", msg_type="warning")
             return
-        checked = [(q["path"], i) for i, q in enumerate(self.queue_display) if q.get("checked")]
+        if self._scan is not None:
+            self.show_message("Počkejte na dokončení načítání složek (nebo ho zrušte).", msg_type="warning")
+            return
+        checked = [(item.path, item.qidx) for item in self.queue.checked_items()]
         if not checked:
             self.show_message("Přidejte a zaškrtněte položky ke kontrole.", msg_type="warning")
             return
@@ -1316,9 +1529,18 @@ class PDFCheckUI_2026_V3:
                     max_files = 5
             if max_files < 0:
                 max_files = 99999
-            all_results = []
+            # Výsledky jdou jen přes progress_channel do fronty (a session_store) – vlákno si drží jen qidx
+            done_qidx = []
+            success_count = 0
             source_folder_for_batch = None
 
+            def _deliver(qidx, result):
+                nonlocal success_count
+                result = compact_result(result)
+                done_qidx.append(qidx)
+                success_count += 1 if result.get('success') else 0
+                self.progress_channel.add_result(qidx, result)
+
             if max_files < 99999:
                 # Limitovaný účet (trial/zdarma): analyzovat jen prvních max_files souborů po jednom
                 to_process = checked_paths_qidx[:max_files]
@@ -1328,45 +1550,22 @@ class PDFCheckUI_2026_V3:
                 for path, qidx in to_process:
                     if self.cancel_requested:
                         break
-                    processed = len(all_results)
-                    self.root.after(0, lambda c=processed + 1, t=total_files_to_process, f=os.path.basename(path): self.update_progress(c, t, f))
+                    processed = len(done_qidx)
+                    self.progress_channel.update(processed, total_files_to_process, os.path.basename(path))
                     result = self.on_check_callback(path, mode="single", auto_send=False)
                     if result.get('success') and source_folder_for_batch:
-                        try:
-                            rel = os.path.relpath(path, source_folder_for_batch).replace('\\', '/')
-                            if not rel.startswith('..'):
-                                result['folder'] = os.path.dirname(rel).replace('\\', '/') or '.'
-                                result['relative_path'] = rel
-                            else:
-                                result.setdefault('folder', '.')
-                                result.setdefault('relative_path', result.get('file_name', os.path.basename(path)))
-                        except Exception:
-                            result.setdefault('folder', '.')
-                            result.setdefault('relative_path', result.get('file_name', os.path.basename(path)))
-                    all_results.append((qidx, result))
+                        _set_relative_path(result, path, source_folder_for_batch)
+                    _deliver(qidx, result)
+                    self.progress_channel.update(len(done_qidx), total_files_to_process, nbytes=result.get('file_size') or 0)
             else:
-                # Neomezený účet: složky po složce, soubory po jednom
-                task_checked = []
-                qidx_used = set()
+                # Neomezený účet: složky po částech (CHECK_CHUNK_FILES), jednotlivé soubory po jednom
+                by_task = {}
                 for path, qidx in checked_paths_qidx:
-                    if qidx in qidx_used:
-                        continue
-                    for task_ix, task in enumerate(self.tasks):
-                        file_paths = task.get("file_paths", [])
-                        if not file_paths:
-                            continue
-                        qidx_start = sum(len(self.tasks[i].get("file_paths", [])) for i in range(task_ix))
-                        if qidx_start <= qidx < qidx_start + len(file_paths):
-                            found = False
-                            for tc in task_checked:
-                                if tc[0] == task_ix:
-                                    tc[2].append((path, qidx))
-                                    found = True
-                                    break
-                            if not found:
-                                task_checked.append((task_ix, task, [(path, qidx)]))
-                            qidx_used.add(qidx)
-                            break
+                    task_ix = self.queue.task_index_of(qidx)
+                    if task_ix is not None:
+                        by_task.setdefault(task_ix, []).append((path, qidx))
+                task_checked = [(task_ix, self.queue.task(task_ix), items) for task_ix, items in sorted(by_task.items())]
+                task_checked = [tc for tc in task_checked if tc[1] is not None]
                 total_files_to_process = min(sum(len(items) for _, _, items in task_checked), max_files)
                 processed = 0
                 for task_ix, task, items in task_checked:
@@ -1375,48 +1574,50 @@ class PDFCheckUI_2026_V3:
                     is_folder = task.get("type") == "folder"
                     task_path = task.get("path", "")
                     if is_folder and task_path:
-                        self.root.after(0, lambda p=processed, t=total_files_to_process: self.update_progress(p, t, os.path.basename(task_path)))
-                        folder_result = self.on_check_callback(task_path, mode="folder", auto_send=False)
-                        results_list = folder_result.get("results", []) if isinstance(folder_result, dict) else []
-                        qidx_start = sum(len(self.tasks[i].get("file_paths", [])) for i in range(task_ix))
-                        checked_qidx_in_task = {q for _, q in items}
-                        for j, res in enumerate(results_list):
-                            if processed >= max_files:
+                        if source_folder_for_batch is None:
+                            source_folder_for_batch = task_path
+                        # Jen zaškrtnuté soubory složky a po částech: hotové se hned uloží do relace,
+                        # obnovená (přerušená) kontrola pokračuje jen zbylými soubory
+                        for chunk_start in range(0, len(items), CHECK_CHUNK_FILES):
+                            if self.cancel_requested or processed >= max_files:
                                 break
-                            qidx = qidx_start + j
-                            if qidx in checked_qidx_in_task:
-                                all_results.append((qidx, res))
+                            chunk = items[chunk_start:chunk_start + CHECK_CHUNK_FILES][:max_files - processed]
+                            self.progress_channel.update(processed, total_files_to_process, os.path.basename(task_path))
+                            self._progress_base = (processed, total_files_to_process)
+                            try:
+                                multi = self.on_check_callback([p for p, _ in chunk], mode="multiple", auto_send=False)
+                            finally:
+                                self._progress_base = None
+                            results_list = multi.get("results", []) if isinstance(multi, dict) else []
+                            nbytes = 0
+                            for (path, qidx), res in zip(chunk, results_list):
+                                if not isinstance(res, dict):
+                                    continue
+                                _set_relative_path(res, path, task_path)
+                                nbytes += res.get('file_size') or 0
+                                _deliver(qidx, res)
                                 processed += 1
-                        if all_results and source_folder_for_batch is None:
-                            source_folder_for_batch = task_path
+                            self.progress_channel.update(processed, total_files_to_process, nbytes=nbytes)
                     else:
                         if source_folder_for_batch is None and items:
                             source_folder_for_batch = os.path.dirname(items[0][0])
                         for path, qidx in items:
                             if self.cancel_requested or processed >= max_files:
                                 break
-                            processed += 1
-                            self.root.after(0, lambda c=processed, t=total_files_to_process, f=os.path.basename(path): self.update_progress(c, t, f))
+                            self.progress_channel.update(processed, total_files_to_process, os.path.basename(path))
                             result = self.on_check_callback(path, mode="single", auto_send=False)
+                            processed += 1
                             if result.get('success') and source_folder_for_batch:
-                                try:
-                                    rel = os.path.relpath(path, source_folder_for_batch).replace('\\', '/')
-                                    if not rel.startswith('..'):
-                                        result['folder'] = os.path.dirname(rel).replace('\\', '/') or '.'
-                                        result['relative_path'] = rel
-                                    else:
-                                        result.setdefault('folder', '.')
-                                        result.setdefault('relative_path', result.get('file_name', os.path.basename(path)))
-                                except Exception:
-                                    result.setdefault('folder', '.')
-                                    result.setdefault('relative_path', result.get('file_name', os.path.basename(path)))
-                            all_results.append((qidx, result))
-
-            if not all_results:
+                                _set_relative_path(result, path, source_folder_for_batch)
+                            _deliver(qidx, result)
+                            self.progress_channel.update(processed, total_files_to_process, nbytes=result.get('file_size') or 0)
+
+            if not done_qidx:
                 self.root.after(0, lambda: self.display_error("Žádné PDF ke kontrole."))
             else:
                 self.root.after(0, lambda: self.display_results({
-                    "results_with_qidx": all_results,
+                    "done_qidx": done_qidx,
+                    "success_count": success_count,
                     "response_data": None,
                     "upload_error": None,
                     "source_folder_for_batch": source_folder_for_batch,
@@ -1441,17 +1642,21 @@ class PDFCheckUI_2026_V3:
         import time
         self.start_time = time.time()
         self.progress.set(0)
-        total = len([q for q in self.queue_display if q.get("checked")])
+        total = self.queue.n_checked
         self.progress_label.configure(text=f"Zpracováno: 0/{total} | Zbývá: --:-- (ETA) | Rychlost: — soub/s", text_color=ACCENT)
         self.eta_label.configure(text="")
         self._progress_speed_label.configure(text="")
         self._progress_row.grid()
+        self.progress_channel.reset(total)
+        self.progress_channel.attach(self.root, self._on_progress_snapshot)
         self.cancel_btn.pack(side=tk.RIGHT, padx=6)
         self.check_btn.configure(state="disabled")
         if getattr(self, "send_btn", None):
             self.send_btn.pack_forget()
 
     def finish_progress(self):
+        self._flush_progress()
+        self.progress_channel.detach(self.root)
         self.is_running = False
         self.progress.set(1)
         self.progress_label.configure(text="Hotovo." if not self.cancel_requested else "Zrušeno", text_color=SUCCESS if not self.cancel_requested else WARNING)
@@ -1460,48 +1665,66 @@ class PDFCheckUI_2026_V3:
         self.cancel_btn.pack_forget()
         self.check_btn.configure(state="normal")
         def _hide_or_idle():
-            if self.tasks and not self.is_running:
+            if self.queue.task_count() and not self.is_running:
                 self._update_progress_idle()
             else:
                 self._progress_row.grid_remove()
         self.root.after(2500, _hide_or_idle)
 
     def update_progress(self, current, total, filename):
-        import time
+        """Thread-safe: jen zapíše pozici do progress_channel, okno se překreslí v nejbližším taktu."""
+        base = self._progress_base
+        if base is not None:
+            # Průběh jedné části složky -> pozice v celé kontrole
+            current, total = base[0] + current, base[1]
+        self.progress_channel.update(current, total, filename)
+
+    def _flush_progress(self):
+        snapshot = self.progress_channel.take()
+        if snapshot is not None:
+            self._on_progress_snapshot(snapshot)
+
+    def _on_progress_snapshot(self, snapshot):
+        """Jeden snímek z progress_channel: dávka hotových výsledků do fronty + čítače, rychlost a ETA."""
+        for qidx, res in snapshot["results"]:
+            try:
+                self.queue.set_result(qidx, res)
+            except Exception as e:
+                # Chyba u jednoho výsledku (SQLite relace, TclError) nezahodí zbytek dávky
+                logger.error("Fronta: výsledek %s nelze uložit: %s", qidx, e)
+            self.mark_queue_dirty(qidx)
+        if snapshot["results"]:
+            self.update_queue_display()
         if self.cancel_requested:
             return
+        current, total = snapshot["current"], snapshot["total"]
         if total > 0:
-            self.progress.set(current / total)
-            remaining = total - current
-            if current > 0 and self.start_time:
-                elapsed = time.time() - self.start_time
-                eta_seconds = elapsed / current * remaining
-                speed = current / elapsed if elapsed > 0 else 0
-                speed_str = f"{speed:.1f}"
-            else:
-                eta_seconds = remaining * SECONDS_PER_FILE_ETA
-                speed_str = "—"
+            self.progress.set(min(1.0, current / total))
+            eta_seconds = snapshot["eta_seconds"]
+            if eta_seconds is None:
+                eta_seconds = (total - current) * SECONDS_PER_FILE_ETA
+            speed_str = (f"{snapshot['files_per_s']:.1f}" if snapshot["files_per_s"] else "—") + " soub/s"
+            if snapshot["mb_per_s"]:
+                speed_str += f", {snapshot['mb_per_s']:.1f} MB/s"
             mm, ss = int(eta_seconds // 60), int(eta_seconds % 60)
             self.progress_label.configure(
-                text=f"Zpracováno: {current}/{total} | Zbývá: {mm:02d}:{ss:02d} (ETA) | Rychlost: {speed_str} soub/s",
+                text=f"Zpracováno: {current}/{total} | Zbývá: {mm:02d}:{ss:02d} (ETA) | Rychlost: {speed_str}",
                 text_color=ACCENT,
             )
             self.eta_label.configure(text="")
             self._progress_speed_label.configure(text="")
-        self.root.update_idletasks()
 
     def display_results(self, result):
         import time
-        results_with_qidx = result.get("results_with_qidx", [])
-        for qidx, res in results_with_qidx:
-            if 0 <= qidx < len(self.queue_display):
-                self.queue_display[qidx]["result"] = res
-                self.queue_display[qidx]["status"] = "success" if res.get("success") else "error"
-                self.queue_display[qidx]["checked"] = not res.get("success")
+        # Výsledky už do fronty doručil progress_channel (poslední snímek převezme _flush_progress)
+        self._flush_progress()
         self.update_queue_display()
         self._update_stats()
-        success_count = sum(1 for _, r in results_with_qidx if r.get("success"))
+        success_count = result.get("success_count", 0)
         self.session_files_checked += success_count
+        self._source_folder = result.get("source_folder_for_batch") or self._source_folder
+        if self.session_store is not None:
+            self.session_store.set_meta("source_folder", self._source_folder)
         total_time = time.time() - self.start_time if self.start_time else 0
         time_str = f"{int(total_time)}s" if total_time < 60 else f"{int(total_time / 60)}m {int(total_time % 60)}s"
         self.detail_text.configure(state="normal")
@@ -1509,7 +1732,7 @@ class PDFCheckUI_2026_V3:
         self.detail_text.configure(state="disabled")
         upload_error = result.get("upload_error")
         can_send = self.on_has_login and callable(self.on_has_login) and self.on_has_login()
-        if can_send and self.on_send_batch_callback and results_with_qidx:
+        if can_send and self.on_send_batch_callback and result.get("done_qidx"):
             self.detail_text.configure(state="normal")
             self.detail_text.insert("0.0", f"Hotovo: {success_count} souborů | Čas: {time_str}\n\nKlikněte na „Odeslat metadata na server“ pro odeslání výsledků do portálu.")
             self.detail_text.configure(state="disabled")
@@ -1528,18 +1751,19 @@ class PDFCheckUI_2026_V3:
     def _on_send_confirm(self, send_yes, result):
         """Callback po kliknutí Ano/Ne u odeslání na server."""
         self.clear_message()
-        results_with_qidx = result.get("results_with_qidx", [])
+        # Odesílá se vše zkontrolované a neodeslané v relaci (i výsledky před obnovením po pádu);
+        # výsledky se čtou ze session_store až teď
+        send_qidx = self.queue.unsent_success_qidx()
         upload_error = result.get("upload_error")
-        if send_yes and results_with_qidx and self.on_send_batch_callback:
+        if send_yes and send_qidx and self.on_send_batch_callback:
             try:
-                results_only = [r for _, r in results_with_qidx]
-                out = self.on_send_batch_callback(results_only, result.get("source_folder_for_batch"))
+                results_only = [r for r in map(self.queue.result, send_qidx) if r is not None]
+                out = self.on_send_batch_callback(results_only, result.get("source_folder_for_batch") or self._source_folder)
                 if out and len(out) >= 2 and not out[0]:
                     upload_error = out[1]
                 elif out and len(out) >= 1 and out[0]:
-                    for qidx, _ in results_with_qidx:
-                        if 0 <= qidx < len(self.queue_display):
-                            self.queue_display[qidx]["sent"] = True
+                    for qidx in send_qidx:
+                        self.queue.mark_sent(qidx)
                     if not self.is_running:
                         self._update_progress_idle()
                     # Po úspěšném odeslání vymazat frontu a připravit na další vložení
@@ -1589,11 +1813,9 @@ class PDFCheckUI_2026_V3:
         self._update_analyze_send_state()
 
     def clear_results_and_queue(self):
-        self.tasks = []
-        self.queue_display = []
         self.session_files_checked = 0
+        self.clear_queue()
         self.update_queue_display()
-        self._show_session_summary()
 
     def open_web_after_check(self):
         self._open_web()
@@ -1666,11 +1888,13 @@ class PDFCheckUI_2026_V3:
 def create_app_2026_v3(on_check_callback, on_api_key_callback, api_url="",
                        on_login_password_callback=None, on_logout_callback=None, on_get_max_files=None,
                        on_after_login_callback=None, on_after_logout_callback=None, on_get_web_login_url=None,
-                       on_send_batch_callback=None, on_has_login=None, on_get_remote_config=None, on_get_legal_config=None):
+                       on_send_batch_callback=None, on_has_login=None, on_get_remote_config=None, on_get_legal_config=None,
+                       session_dir=None):
     """Vytvoří a vrátí (root, app) pro preview V3 Enterprise.
     Okno je během inicializace skryté (withdraw), po dokončení nastavení se zobrazí již maximalizované (bez probliknutí).
     on_has_login: callable() -> bool; bez přihlášení nelze analyzovat ani odesílat.
-    on_get_remote_config: callable() -> dict; on_get_legal_config: callable() -> dict."""
+    on_get_remote_config: callable() -> dict; on_get_legal_config: callable() -> dict.
+    session_dir: složka pro relaci fronty na disku (None = fronta jen v paměti)."""
     _setup_high_dpi_v3()
     if TKINTERDND_AVAILABLE:
         try:
@@ -1699,6 +1923,7 @@ def create_app_2026_v3(on_check_callback, on_api_key_callback, api_url="",
         on_has_login=on_has_login,
         on_get_remote_config=on_get_remote_config,
         on_get_legal_config=on_get_legal_config,
+        session_dir=session_dir,
     )
     # Maximalizace před zobrazením – hlavní okno se zobrazí až po splashi
     try:
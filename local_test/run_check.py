@@ -16,7 +16,8 @@ os.chdir(_root)
 
 # Import z agenta (stejná logika jako web po úpravách)
 sys.path.insert(0, os.path.join(_root, 'desktop_agent'))
-from pdf_checker import analyze_pdf_file
+# Přes lokálního démona analýzy, když běží (python -m desktop_agent.analysis_daemon); jinak v procesu
+from analysis_daemon import analyze_paths
 
 def main():
     pdfs_dir = os.path.join(_root, 'local_test', 'pdfs')
@@ -37,9 +38,8 @@ def main():
             sys.exit(0)
 
     print("--- Lokální kontrola PDF (bez webu) ---")
-    for path in paths:
+    for path, result in zip(paths, analyze_paths(paths)):
         print("\nSoubor:", path)
-        result = analyze_pdf_file(path)
         if result.get('success'):
             sigs = result.get('results', {}).get('signatures', [])
             print("  Úspěch | Podpisů:", len(sigs), "| PDF/A:", result.get('results', {}).get('pdf_format', {}).get('exact_version', '—'))
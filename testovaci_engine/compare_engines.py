@@ -1,15 +1,22 @@
 from __future__ import annotations
 
 import argparse
+import copy
 import datetime as dt
+import hashlib
 import html
 import importlib.util
 import json
 import os
 import re
+import shutil
+import statistics
 import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
@@ -22,6 +29,18 @@ FIXTURE_ROOT = ROOT / "testovaci_engine" / "zdrojove PDF_testovaci"
 REPORT_ROOT = ROOT / "testovaci_engine" / "reports"
 SNAPSHOT_ROOT = REPORT_ROOT / "snapshots"
 
+# Zdrojaky, na kterych zavisi vysledek porovnani - zmena = vsechny snapshoty jsou zastarale
+ENGINE_SOURCES = [
+    ROOT / "desktop_agent" / "pdf_checker.py",
+    ROOT / "desktop_agent" / "tsa_registry.py",
+    ROOT / "testovaci_engine" / "pdf_engine.py",
+    ROOT / "testovaci_engine" / "pdf_engine_web.py",
+    ROOT / "web_app" / "pdf_check_web_main.py",
+    Path(__file__).resolve(),
+]
+ENGINES = ("web_legacy", "agent_legacy", "unified_new")
+SHARD_SIZE = 8
+
 
 def load_legacy_web_module():
     web_file = ROOT / "web_app" / "pdf_check_web_main.py"
@@ -157,13 +176,214 @@ def convert_agent_wrapped_to_flat(wrapped: Dict[str, Any], content: bytes) -> Di
     }
 
 
-def render_html(rows: List[Dict[str, Any]], generated: str, output_file: Path) -> None:
+def engine_fingerprint() -> str:
+    digest = hashlib.sha256()
+    for path in ENGINE_SOURCES:
+        digest.update(path.name.encode("utf-8"))
+        digest.update(path.read_bytes() if path.is_file() else b"<missing>")
+    return digest.hexdigest()[:16]
+
+
+def fixture_stat(path: Path) -> Dict[str, int]:
+    st = path.stat()
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def snapshot_path(snapshot_root: Path, rel: Path) -> Path:
+    return snapshot_root / (sanitize_filename(rel) + ".json")
+
+
+def load_fresh_snapshot(
+    snapshot_root: Path, rel: Path, pdf_path: Path, fingerprint: str, since: Optional[dt.datetime]
+) -> Optional[Dict[str, Any]]:
+    """Radek reportu z platneho snapshotu, nebo None = fixture se musi prepocitat."""
+    snap = snapshot_path(snapshot_root, rel)
+    try:
+        data = json.loads(snap.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if data.get("engine_fingerprint") != fingerprint or data.get("fixture") != fixture_stat(pdf_path):
+        return None
+    if since is not None and dt.datetime.fromtimestamp(snap.stat().st_mtime) < since:
+        return None
+    return {"file": str(rel), "diff": data.get("diff", []), "timings_ms": data.get("timings_ms", {}), "cached": True}
+
+
+class EngineMemo:
+    """
+    Pamet identickych volani enginu v ramci jednoho fixture (funkce + argumenty -> vysledek).
+    Kazdy odberatel dostane vlastni deepcopy - flatten/analyze_from_bytes vysledek upravuji.
+    Cas puvodniho volani se pri zasahu pricte do credit_ms, aby latence cesty odpovidala samostatnemu behu.
+    """
+
+    def __init__(self) -> None:
+        self._results: Dict[Tuple[Any, ...], Tuple[Any, float]] = {}
+        self.credit_ms = 0.0
+        self.calls = 0
+
+    def wrap(self, name: str, func: Callable[..., Any]) -> Callable[..., Any]:
+        def memoized(*args: Any, **kwargs: Any) -> Any:
+            key = (name, args, tuple(sorted(kwargs.items())))
+            hit = self._results.get(key)
+            if hit is None:
+                start = time.perf_counter()
+                value = func(*args, **kwargs)
+                hit = (value, (time.perf_counter() - start) * 1000)
+                self._results[key] = hit
+                self.calls += 1
+            else:
+                self.credit_ms += hit[1]
+            return copy.deepcopy(hit[0])
+
+        return memoized
+
+    def reset(self) -> None:
+        self._results.clear()
+        self.credit_ms = 0.0
+        self.calls = 0
+
+
+# Stav workeru (naplni _init_worker)
+_LEGACY_WEB: Any = None
+_MEMO = EngineMemo()
+
+
+def _init_worker(db_dir: str) -> None:
+    """Jednou na proces: legacy web bez analyzacniho poolu a bez cache vysledku, s vlastni DB; enginy pres EngineMemo."""
+    global _LEGACY_WEB
+    os.environ["ANALYSIS_POOL_WORKERS"] = "0"
+    # result_cache by schovala zmenu enginu (vysledek podle hashe obsahu)
+    os.environ["ANALYSIS_CACHE_MAX_ENTRIES"] = "0"
+    os.environ["DOKUCHECK_DB_PATH"] = os.path.join(db_dir, f"web_{os.getpid()}.db")
+    _LEGACY_WEB = load_legacy_web_module()
+    try:
+        from desktop_agent.tsa_registry import is_tsa_issuer_qualified
+
+        pdf_engine.legacy_engine.is_tsa_issuer_qualified = is_tsa_issuer_qualified
+    except Exception:
+        pass
+    # pdf_engine_web vola pdf_engine.analyze_pdf_bytes, legacy web desktop_agent.pdf_checker.analyze_pdf_bytes
+    # (atribut modulu v dobe volani) - obalit oba moduly stejnou memo funkci
+    memo_bytes = _MEMO.wrap("bytes", pdf_engine.legacy_engine.analyze_pdf_bytes)
+    memo_file = _MEMO.wrap("file", pdf_engine.legacy_engine.analyze_pdf_file)
+    pdf_engine.analyze_pdf_bytes = pdf_engine.legacy_engine.analyze_pdf_bytes = memo_bytes
+    pdf_engine.analyze_pdf_file = pdf_engine.legacy_engine.analyze_pdf_file = memo_file
+
+
+def _timed(timings: Dict[str, float], key: str, func: Callable[[], Any]) -> Any:
+    credit = _MEMO.credit_ms
+    start = time.perf_counter()
+    try:
+        return func()
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000 + (_MEMO.credit_ms - credit)
+        timings[key] = round(timings.get(key, 0.0) + elapsed, 1)
+
+
+def _web_legacy(content: bytes, name: str) -> Dict[str, Any]:
+    # Primo legacy analyze_pdf_from_content (vcetne jeho chyboveho tvaru); result_cache vypnuta v _init_worker
+    result = _LEGACY_WEB.analyze_pdf_from_content(content, filename=name)
+    _LEGACY_WEB._enrich_signatures_tsa_qualified(result)
+    result["name"] = name
+    return result
+
+
+def compare_fixture(pdf_path: Path, rel: Path) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Vsechny 3 enginy nad jednim PDF -> (radek reportu, obsah snapshotu)."""
+    _MEMO.reset()
+    timings: Dict[str, float] = {}
+    wall_start = time.perf_counter()
+    content = pdf_path.read_bytes()
+
+    web_legacy = _timed(timings, "web_legacy", lambda: _web_legacy(content, pdf_path.name))
+    agent_flat = _timed(
+        timings,
+        "agent_legacy",
+        lambda: convert_agent_wrapped_to_flat(pdf_engine.analyze_pdf_file(str(pdf_path)), content),
+    )
+    unified_web = _timed(
+        timings, "unified_new", lambda: pdf_engine_web.analyze_upload(content, filename=pdf_path.name)
+    )
+    unified_agent_flat = _timed(
+        timings,
+        "unified_new",
+        lambda: convert_agent_wrapped_to_flat(pdf_engine.analyze_pdf_file(str(pdf_path)), content),
+    )
+    # Interni kontrola unified cesty: upload vs file
+    unified_internal_diff = diff_three(
+        unified_web, unified_agent_flat, unified_web, ignore_fields={"name"}
+    )
+
+    diffs = diff_three(web_legacy, agent_flat, unified_web)
+    if unified_internal_diff:
+        diffs.append(
+            {
+                "field": "__unified_internal_path_diff__",
+                "web_legacy": f"{len(unified_internal_diff)} rozdilu",
+                "agent_legacy": "n/a",
+                "unified_new": "upload!=file",
+            }
+        )
+    timings["wall"] = round((time.perf_counter() - wall_start) * 1000, 1)
+    timings["engine_calls"] = _MEMO.calls
+
+    row = {"file": str(rel), "diff": diffs, "timings_ms": timings, "cached": False}
+    snapshot = {
+        "file": str(rel),
+        "web_legacy": web_legacy,
+        "agent_legacy": agent_flat,
+        "unified_new": unified_web,
+        "diff_count": len(diffs),
+        "diff": diffs,
+        "timings_ms": timings,
+    }
+    return row, snapshot
+
+
+def run_shard(
+    jobs: List[Tuple[str, str]], snapshot_root: str, fingerprint: str
+) -> List[Dict[str, Any]]:
+    """Worker: shard fixtures, snapshoty zapisuje primo (hlavni proces drzi jen radky reportu)."""
+    rows = []
+    for path_str, rel_str in jobs:
+        pdf_path, rel = Path(path_str), Path(rel_str)
+        try:
+            row, snapshot = compare_fixture(pdf_path, rel)
+        except Exception as e:
+            error = {"field": "__error__", "web_legacy": str(e), "agent_legacy": "n/a", "unified_new": "n/a"}
+            rows.append({"file": rel_str, "diff": [error], "timings_ms": {}, "cached": False})
+            continue
+        snapshot["fixture"] = fixture_stat(pdf_path)
+        snapshot["engine_fingerprint"] = fingerprint
+        snapshot_path(Path(snapshot_root), rel).write_text(
+            json.dumps(snapshot, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        rows.append(row)
+    return rows
+
+
+def _fmt_ms(value: Any) -> str:
+    return f"{value:.0f}" if isinstance(value, (int, float)) else "—"
+
+
+def latency_summary(rows: List[Dict[str, Any]]) -> Dict[str, Optional[float]]:
+    out: Dict[str, Optional[float]] = {}
+    for engine in ENGINES:
+        values = [r["timings_ms"][engine] for r in rows if engine in r.get("timings_ms", {})]
+        out[engine] = round(statistics.median(values), 1) if values else None
+    return out
+
+
+def render_html(rows: List[Dict[str, Any]], generated: str, output_file: Path, wall_s: float = 0.0) -> None:
     total = len(rows)
     same = sum(1 for r in rows if not r["diff"])
     diff = total - same
+    cached = sum(1 for r in rows if r.get("cached"))
+    medians = latency_summary(rows)
     html_rows = []
     for row in rows:
         css = "ok" if not row["diff"] else "diff"
+        timings = row.get("timings_ms", {})
         diff_list = "".join(
             f"<tr><td>{html.escape(d['field'])}</td>"
             f"<td>{html.escape(str(d['web_legacy']))}</td>"
@@ -175,10 +395,14 @@ def render_html(rows: List[Dict[str, Any]], generated: str, output_file: Path) -
             diff_list = "<tr><td colspan='4'>Bez rozdilu</td></tr>"
         html_rows.append(
             f"<tr class='{css}'><td>{html.escape(row['file'])}</td><td>{len(row['diff'])}</td>"
-            f"<td>{'OK' if not row['diff'] else 'DIFF'}</td></tr>"
-            f"<tr><td colspan='3'><details><summary>Detaily</summary>"
-            f"<table><thead><tr><th>Pole</th><th>Web legacy</th><th>Agent legacy</th><th>Unified</th></tr></thead>"
-            f"<tbody>{diff_list}</tbody></table></details></td></tr>"
+            f"<td>{'OK' if not row['diff'] else 'DIFF'}</td>"
+            + "".join(f"<td class='ms'>{_fmt_ms(timings.get(e))}</td>" for e in ENGINES)
+            + f"<td>{'snapshot' if row.get('cached') else 'beh'}</td></tr>"
+            f"<tr><td colspan='8'><details><summary>Detaily</summary>"
+            f"<table><thead><tr><th>Pole</th><th>Web legacy</th><th>Agent legacy</th><th>Unified</th></tr>"
+            f"<tr><th>latence [ms]</th>"
+            + "".join(f"<th class='ms'>{_fmt_ms(timings.get(e))}</th>" for e in ENGINES)
+            + f"</tr></thead><tbody>{diff_list}</tbody></table></details></td></tr>"
         )
 
     page = f"""<!doctype html>
@@ -188,92 +412,117 @@ body{{font-family:Segoe UI,Arial,sans-serif;margin:24px}}
 table{{border-collapse:collapse;width:100%;margin:12px 0}}
 th,td{{border:1px solid #ddd;padding:6px;font-size:13px;vertical-align:top}}
 th{{background:#f1f5f9}}
+.ms{{text-align:right;white-space:nowrap}}
 .ok{{background:#ecfdf5}}
 .diff{{background:#fef2f2}}
 </style></head><body>
 <h2>Srovnani 3 enginu</h2>
-<p>Generovano: {html.escape(generated)} | Souboru: {total} | Shoda: {same} | Rozdily: {diff}</p>
-<table><thead><tr><th>Soubor</th><th>Pocet rozdilu</th><th>Stav</th></tr></thead>
+<p>Generovano: {html.escape(generated)} | Souboru: {total} | Shoda: {same} | Rozdily: {diff} | Ze snapshotu: {cached} | Beh: {wall_s:.1f} s</p>
+<p>Median latence [ms]: web legacy {_fmt_ms(medians['web_legacy'])} | agent legacy {_fmt_ms(medians['agent_legacy'])} | unified {_fmt_ms(medians['unified_new'])}</p>
+<table><thead><tr><th>Soubor</th><th>Pocet rozdilu</th><th>Stav</th><th>Web legacy ms</th><th>Agent legacy ms</th><th>Unified ms</th><th>Zdroj</th></tr></thead>
 <tbody>{''.join(html_rows)}</tbody></table>
 </body></html>"""
     output_file.write_text(page, encoding="utf-8")
 
 
+def parse_since(value: str) -> Optional[dt.datetime]:
+    if value == "snapshot":
+        return None
+    try:
+        return dt.datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Neplatne datum: {value} (ocekavano YYYY-MM-DD[THH:MM])")
+
+
 def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument("--limit", type=int, default=0, help="Volitelny limit poctu souboru")
+    parser.add_argument("--fixtures", type=Path, default=FIXTURE_ROOT, help="Slozka s testovacimi PDF")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Pocet procesu (vychozi = pocet CPU)"
+    )
+    parser.add_argument(
+        "--changed-since",
+        nargs="?",
+        const="snapshot",
+        default=None,
+        metavar="KDY",
+        help="Prepocitat jen fixtures se zastaralym snapshotem (zmena PDF nebo enginu); "
+        "s datem YYYY-MM-DD[THH:MM] i snapshoty starsi nez toto datum",
+    )
     args = parser.parse_args()
+    since = parse_since(args.changed_since) if args.changed_since is not None else None
 
     REPORT_ROOT.mkdir(parents=True, exist_ok=True)
     SNAPSHOT_ROOT.mkdir(parents=True, exist_ok=True)
 
-    files = list_pdf_files(FIXTURE_ROOT)
+    fixture_root = args.fixtures.resolve()
+    files = list_pdf_files(fixture_root)
     if args.limit and args.limit > 0:
         files = files[: args.limit]
     if not files:
-        print(f"Nenalezeny PDF soubory v {FIXTURE_ROOT}")
+        print(f"Nenalezeny PDF soubory v {fixture_root}")
         return 2
 
-    legacy_web = load_legacy_web_module()
-    rows: List[Dict[str, Any]] = []
-
-    for idx, pdf_path in enumerate(files, 1):
-        rel = pdf_path.relative_to(FIXTURE_ROOT)
-        content = pdf_path.read_bytes()
-
-        web_legacy = legacy_web.analyze_pdf_from_content(content)
-        legacy_web._enrich_signatures_tsa_qualified(web_legacy)
-        web_legacy["name"] = pdf_path.name
-
-        agent_wrapped = pdf_engine.analyze_pdf_file(str(pdf_path))
-        agent_flat = convert_agent_wrapped_to_flat(agent_wrapped, content)
-
-        unified_web = pdf_engine_web.analyze_upload(content, filename=pdf_path.name)
-        unified_agent_wrapped = pdf_engine.analyze_pdf_file(str(pdf_path))
-        unified_agent_flat = convert_agent_wrapped_to_flat(unified_agent_wrapped, content)
-        # Interni kontrola unified cesty: upload vs file
-        unified_internal_diff = diff_three(
-            unified_web, unified_agent_flat, unified_web, ignore_fields={"name"}
-        )
-
-        diffs = diff_three(web_legacy, agent_flat, unified_web)
-        if unified_internal_diff:
-            diffs.append(
-                {
-                    "field": "__unified_internal_path_diff__",
-                    "web_legacy": f"{len(unified_internal_diff)} rozdilu",
-                    "agent_legacy": "n/a",
-                    "unified_new": "upload!=file",
-                }
-            )
-
-        rows.append({"file": str(rel), "diff": diffs})
-
-        snap_name = sanitize_filename(rel) + ".json"
-        (SNAPSHOT_ROOT / snap_name).write_text(
-            json.dumps(
-                {
-                    "file": str(rel),
-                    "web_legacy": web_legacy,
-                    "agent_legacy": agent_flat,
-                    "unified_new": unified_web,
-                    "diff_count": len(diffs),
-                    "diff": diffs,
-                },
-                ensure_ascii=False,
-                indent=2,
-            ),
-            encoding="utf-8",
-        )
-        print(f"[{idx}/{len(files)}] {rel} -> {'OK' if not diffs else f'DIFF({len(diffs)})'}")
-
+    fingerprint = engine_fingerprint()
+    rows_by_file: Dict[str, Dict[str, Any]] = {}
+    jobs: List[Tuple[str, str]] = []
+    for pdf_path in files:
+        rel = pdf_path.relative_to(fixture_root)
+        cached = None
+        if args.changed_since is not None:
+            cached = load_fresh_snapshot(SNAPSHOT_ROOT, rel, pdf_path, fingerprint, since)
+        if cached is not None:
+            rows_by_file[str(rel)] = cached
+        else:
+            jobs.append((str(pdf_path), str(rel)))
+    if args.changed_since is not None:
+        print(f"Zastaralych snapshotu: {len(jobs)} z {len(files)} (engine {fingerprint})")
+
+    wall_start = time.perf_counter()
+    if jobs:
+        workers = max(1, min(args.workers, len(jobs)))
+        # Shardy: mensi nez jobs/workers, aby se dlouhe fixtures rozlozily; SHARD_SIZE drzi rezii IPC nizko
+        shard_size = max(1, min(SHARD_SIZE, len(jobs) // (workers * 2) or 1))
+        shards = [jobs[i : i + shard_size] for i in range(0, len(jobs), shard_size)]
+        db_dir = tempfile.mkdtemp(prefix="compare-engines-")
+        done = 0
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(db_dir,)) as pool:
+                futures = [
+                    pool.submit(run_shard, shard, str(SNAPSHOT_ROOT), fingerprint)
+                    for shard in shards
+                ]
+                for future in as_completed(futures):
+                    for row in future.result():
+                        done += 1
+                        rows_by_file[row["file"]] = row
+                        t = row["timings_ms"]
+                        print(
+                            f"[{done}/{len(jobs)}] {row['file']} -> "
+                            f"{'OK' if not row['diff'] else 'DIFF(' + str(len(row['diff'])) + ')'}"
+                            f" | web {_fmt_ms(t.get('web_legacy'))} ms, agent {_fmt_ms(t.get('agent_legacy'))} ms,"
+                            f" unified {_fmt_ms(t.get('unified_new'))} ms"
+                        )
+        finally:
+            shutil.rmtree(db_dir, ignore_errors=True)
+    wall_s = time.perf_counter() - wall_start
+
+    rows = [rows_by_file[str(p.relative_to(fixture_root))] for p in files]
     generated = dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     out_html = REPORT_ROOT / f"compare_{dt.datetime.now().strftime('%Y-%m-%d_%H%M')}.html"
-    render_html(rows, generated, out_html)
+    render_html(rows, generated, out_html, wall_s)
 
     diffs_total = sum(1 for r in rows if r["diff"])
+    medians = latency_summary(rows)
     print("")
-    print(f"Hotovo. Souboru: {len(rows)} | Se rozdilem: {diffs_total}")
+    print(
+        f"Hotovo. Souboru: {len(rows)} | Prepocitano: {len(jobs)} | Se rozdilem: {diffs_total} | Beh: {wall_s:.1f} s"
+    )
+    print(
+        "Median latence [ms]: "
+        + ", ".join(f"{e} {_fmt_ms(medians[e])}" for e in ENGINES)
+    )
     print(f"HTML report: {out_html}")
     return 1 if diffs_total else 0
 
@@ -5,9 +5,7 @@ Faze 1: Pouziva aktualni desktop engine jako zdroj pravdy.
 
 from __future__ import annotations
 
-import os
 import re
-import tempfile
 from typing import Any, Dict
 
 from desktop_agent import pdf_checker as legacy_engine
@@ -28,37 +26,23 @@ detect_docmdp_lock_via_reader = legacy_engine.detect_docmdp_lock_via_reader
 detect_docmdp_lock = legacy_engine.detect_docmdp_lock
 analyze_pdf = legacy_engine.analyze_pdf
 analyze_pdf_file = legacy_engine.analyze_pdf_file
+analyze_pdf_bytes = legacy_engine.analyze_pdf_bytes
+scan_pdfa_markers = legacy_engine.scan_pdfa_markers
 find_all_pdfs = legacy_engine.find_all_pdfs
 analyze_multiple_pdfs = legacy_engine.analyze_multiple_pdfs
 analyze_folder = legacy_engine.analyze_folder
 
 
-def get_pdfa_details(content: bytes) -> Dict[str, Any]:
-    """Vrati webova doplnkova pole: pdf_version, conformance, level."""
-    pdf_version = ""
-    conformance = ""
-    try:
-        pdf_header = re.search(rb"%PDF-(\d+\.\d+)", content[:100])
-        if pdf_header:
-            pdf_version = pdf_header.group(1).decode("ascii")
-    except Exception:
-        pass
+def get_pdfa_details(content: bytes = b"", markers: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    """Vrati webova doplnkova pole: pdf_version, conformance, level.
 
-    try:
-        conf_match = re.search(
-            rb"pdfaid:conformance=['\"]?([ABUYabuy])['\"]?", content, re.IGNORECASE
-        )
-        if conf_match:
-            conformance = conf_match.group(1).decode("ascii").lower()
-        if not conformance:
-            for level in (b"PDF/A-3y", b"PDF/A-3u", b"PDF/A-3b", b"PDF/A-3a"):
-                if level in content:
-                    conformance = level.decode("ascii")[-1].lower()
-                    break
-    except Exception:
-        pass
-
-    part, _status = check_pdfa_version(content)
+    markers = vysledek scan_pdfa_markers (nebo pdfa_markers_from_result); content jen jako zaloha.
+    """
+    if markers is None:
+        markers = scan_pdfa_markers(content)
+    pdf_version = markers.get("pdf_version") or ""
+    conformance = markers.get("conformance") or ""
+    part = markers.get("part")
     pdfa_level = ""
     if part == 3 and conformance:
         pdfa_level = f"A-3{conformance}"
@@ -72,24 +56,23 @@ def get_pdfa_details(content: bytes) -> Dict[str, Any]:
     }
 
 
-def analyze_from_bytes(content: bytes, filename: str = "upload.pdf") -> Dict[str, Any]:
-    """Simulace web upload cesty: bytes -> temporary file -> analyze_pdf_file."""
-    suffix = ".pdf"
-    if filename and "." in filename:
-        _, ext = os.path.splitext(filename)
-        if ext:
-            suffix = ext
+def pdfa_markers_from_result(wrapped: Dict[str, Any]) -> Dict[str, Any] | None:
+    """Znacky PDF/A zjistene enginem (results.pdf_format) - bez noveho cteni obsahu."""
+    results = wrapped.get("results") if isinstance(wrapped, dict) else None
+    pdf_format = (results or {}).get("pdf_format") or {}
+    if "pdf_version" not in pdf_format and "conformance" not in pdf_format:
+        return None
+    m = re.search(r"PDF/A-(\d)", str(pdf_format.get("exact_version") or ""))
+    return {
+        "pdf_version": pdf_format.get("pdf_version"),
+        "conformance": pdf_format.get("conformance"),
+        "part": int(m.group(1)) if m else None,
+    }
+
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        tmp.write(content)
-        tmp_path = tmp.name
-    try:
-        result = analyze_pdf_file(tmp_path)
-    finally:
-        try:
-            os.remove(tmp_path)
-        except OSError:
-            pass
+def analyze_from_bytes(content: bytes, filename: str = "upload.pdf") -> Dict[str, Any]:
+    """Web upload cesta: bytes -> analyze_pdf_bytes (v pameti, bez docasneho souboru)."""
+    result = analyze_pdf_bytes(content, filename=filename or "upload.pdf")
     if isinstance(result, dict) and result.get("success"):
         result["file_name"] = filename or result.get("file_name", "upload.pdf")
         if "results" in result and isinstance(result["results"], dict):
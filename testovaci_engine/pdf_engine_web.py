@@ -91,17 +91,24 @@ def _flatten_wrapped_result(wrapped: Dict[str, Any], details: Dict[str, Any]) ->
     }
 
 
+def _details_for(wrapped: Dict[str, Any], content: bytes = b"") -> Dict[str, Any]:
+    markers = pdf_engine.pdfa_markers_from_result(wrapped)
+    return pdf_engine.get_pdfa_details(content, markers=markers)
+
+
 def analyze_upload(content: bytes, filename: str = "upload.pdf") -> Dict[str, Any]:
     wrapped = pdf_engine.analyze_from_bytes(content, filename=filename)
-    details = pdf_engine.get_pdfa_details(content)
-    return _flatten_wrapped_result(wrapped, details)
+    return _flatten_wrapped_result(wrapped, _details_for(wrapped, content))
 
 
 def analyze_file(filepath: str) -> Dict[str, Any]:
     wrapped = pdf_engine.analyze_pdf_file(filepath)
-    with open(filepath, "rb") as f:
-        content = f.read()
-    details = pdf_engine.get_pdfa_details(content)
+    markers = pdf_engine.pdfa_markers_from_result(wrapped)
+    if markers is None:
+        with open(filepath, "rb") as f:
+            details = pdf_engine.get_pdfa_details(f.read())
+    else:
+        details = pdf_engine.get_pdfa_details(markers=markers)
     out = _flatten_wrapped_result(wrapped, details)
     out["name"] = os.path.basename(filepath)
     return out
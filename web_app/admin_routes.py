@@ -58,6 +58,9 @@ except ImportError:
 # Blueprint pro admin routes
 admin_bp = Blueprint('admin', __name__)
 
+# Počet licencí na stránku v přehledu licencí (stránkování v SQL)
+LICENSES_PER_PAGE = 100
+
 # Secret key pro sessions (v produkci použít silný klíč)
 ADMIN_SECRET_KEY = os.environ.get('ADMIN_SECRET_KEY', 'pdfcheck_admin_secret_2025')
 
@@ -359,32 +362,22 @@ def dashboard():
     tier_filter = (request.args.get('tier') or '').strip()
     status_filter = (request.args.get('status') or '').strip()  # active, blocked
 
-    licenses = db.admin_get_all_licenses()
-
-    if search:
-        search_lower = search.lower()
-        licenses = [l for l in licenses if (
-            (l.get('email') or '').lower().find(search_lower) >= 0 or
-            (l.get('user_name') or '').lower().find(search_lower) >= 0 or
-            (l.get('api_key') or '').lower().find(search_lower) >= 0
-        )]
-    if tier_filter:
-        licenses = [l for l in licenses if (l.get('tier_name') or '').lower() == tier_filter.lower()]
-    if status_filter == 'blocked':
-        licenses = [l for l in licenses if not l.get('is_active')]
-    elif status_filter == 'active':
-        licenses = [l for l in licenses if l.get('is_active')]
+    # Vyhledávání, filtry i součty běží v SQL nad license_stats (bez načtení všech licencí)
+    licenses, _ = db.admin_query_licenses(search=search, tier_name=tier_filter, status=status_filter,
+                                          limit=LICENSES_PER_PAGE)
+    summary = db.admin_license_summary(search=search, tier_name=tier_filter, status=status_filter)
+    groups = summary.get('groups') or []
 
     stats = {
-        'total_licenses': len(licenses),
-        'active_licenses': sum(1 for l in licenses if l.get('is_active') and not l.get('is_expired')),
-        'expired_licenses': sum(1 for l in licenses if l.get('is_expired')),
-        'total_devices': sum(l.get('active_devices', 0) for l in licenses),
-        'total_checks': sum(l.get('total_checks', 0) for l in licenses),
+        'total_licenses': summary['total_licenses'],
+        'active_licenses': summary['active_licenses'],
+        'expired_licenses': summary['expired_licenses'],
+        'total_devices': summary['total_devices'],
+        'total_checks': summary['total_checks'],
         'by_tier': {}
     }
     for tier in LicenseTier:
-        stats['by_tier'][tier.name] = sum(1 for l in licenses if l.get('license_tier') == tier.value)
+        stats['by_tier'][tier.name] = sum(g['licenses'] for g in groups if g.get('license_tier') == tier.value)
 
     activity_30_raw = db.get_combined_activity_last_30_days()
     activity_30 = activity_30_raw
@@ -396,10 +389,7 @@ def dashboard():
         product_tiers = tiers_list
     by_tier_counts = {}
     for t in tiers_list:
-        by_tier_counts[t['name']] = sum(1 for l in licenses if (l.get('tier_id') == t['id']) or (l.get('tier_name') == t['name']))
-    for t in tiers_list:
-        if t['name'] not in by_tier_counts:
-            by_tier_counts[t['name']] = 0
+        by_tier_counts[t['name']] = sum(g['licenses'] for g in groups if (g.get('tier_id') == t['id']) or (g.get('tier_name') == t['name']))
 
     kpis = db.get_dashboard_kpis()
     user_ranking = db.get_user_activity_ranking(limit=10)
@@ -907,8 +897,7 @@ def users_licenses():
         pricing_tarifs = get_pricing_tarifs(db)
     except Exception:
         pricing_tarifs = db.get_setting_json('pricing_tarifs', {'basic': {'label': 'BASIC', 'amount_czk': 1090}, 'standard': {'label': 'PRO', 'amount_czk': 1590}})
-    licenses_all = db.admin_get_all_licenses() if hasattr(db, 'admin_get_all_licenses') else []
-    active_emails = {(l.get('email') or '').lower(): l for l in licenses_all if l.get('is_active') and (l.get('tier_name') or '').lower() not in ('trial', 'free')}
+    active_emails = db.admin_get_active_licenses_by_emails([o.get('email') for o in (orders_raw or [])])
     orders = []
     for o in (orders_raw or []):
         o_dict = dict(o)
@@ -916,24 +905,18 @@ def users_licenses():
         o_dict['tarif_label'] = (pricing_tarifs.get(t) or {}).get('label') or (t or '').upper() or '—'
         email = (o_dict.get('email') or '').lower()
         o_dict['has_active_license'] = email in active_emails
-        o_dict['api_key'] = active_emails.get(email, {}).get('api_key') if email in active_emails else None
+        o_dict['api_key'] = active_emails.get(email)
         orders.append(o_dict)
 
-    # Licence (filtry jako na dashboardu)
-    licenses = list(licenses_all) if licenses_all else []
-    if search:
-        search_lower = search.lower()
-        licenses = [l for l in licenses if (
-            (l.get('email') or '').lower().find(search_lower) >= 0 or
-            (l.get('user_name') or '').lower().find(search_lower) >= 0 or
-            (l.get('api_key') or '').lower().find(search_lower) >= 0
-        )]
-    if tier_filter:
-        licenses = [l for l in licenses if (l.get('tier_name') or '').lower() == tier_filter.lower()]
-    if status_filter == 'blocked':
-        licenses = [l for l in licenses if not l.get('is_active')]
-    elif status_filter == 'active':
-        licenses = [l for l in licenses if l.get('is_active')]
+    # Licence (filtry jako na dashboardu) – vyhledávání, filtry a stránkování v SQL
+    try:
+        page = max(1, int(request.args.get('page') or 1))
+    except (TypeError, ValueError):
+        page = 1
+    licenses, licenses_total = db.admin_query_licenses(search=search, tier_name=tier_filter, status=status_filter,
+                                                       limit=LICENSES_PER_PAGE,
+                                                       offset=(page - 1) * LICENSES_PER_PAGE)
+    total_pages = max(1, (licenses_total + LICENSES_PER_PAGE - 1) // LICENSES_PER_PAGE)
 
     tiers_list = db.get_all_license_tiers()
     product_tiers = [t for t in (tiers_list or []) if (t.get('name') or '').strip() in ('Trial', 'Basic', 'Pro', 'Unlimited')] or (tiers_list or [])
@@ -952,6 +935,9 @@ def users_licenses():
         licenses=licenses,
         tiers_list=tiers_list or [],
         product_tiers=product_tiers,
+        licenses_total=licenses_total,
+        page=page,
+        total_pages=total_pages,
         search=search,
         tier_filter=tier_filter,
         status_filter=status_filter,
@@ -1020,21 +1006,51 @@ def bulk_delete_orders():
 @admin_bp.route('/admin/bulk-send-payment', methods=['POST'])
 @admin_required
 def bulk_send_payment():
-    """Hromadné odeslání e-mailu s platebními údaji vybraným objednávkám."""
+    """
+    Hromadné odeslání e-mailu s platebními údaji vybraným objednávkám. E-maily se jen zařadí do odchozí
+    fronty (mail_outbox); email_logs a stav 'payment_sent' zapíše odesílací vlákno po odeslání.
+    Objednávka, která už platební e-mail ve frontě má (opakované odeslání formuláře), se přeskočí.
+    """
     raw = request.form.get('order_ids', '') or ''
     order_ids = [x.strip() for x in raw.split(',') if x.strip()]
     if not order_ids:
         flash('Nejsou vybrány žádné objednávky.', 'error')
         return redirect(url_for('admin.users_licenses'))
     db = get_db()
-    from email_sender import get_order_confirmation_email_preview, send_email_with_attachment
-    sent = 0
+    from email_sender import get_order_confirmation_email_preview, apply_footer
+    outbox = current_app.extensions['mail_outbox']
+    queued = 0
     failed = 0
+    already_queued = 0
+    orders = {oid: db.get_pending_order_by_id(oid) for oid in order_ids}
+    # Objednávky, jejichž platební e-mail ještě čeká ve frontě – nový se nezařadí
+    try:
+        pending_mail = db.get_pending_mail_order_ids([o['id'] for o in orders.values() if o], 'payment_sent')
+    except Exception:
+        pending_mail = set()
+    # Chybějící faktury vygenerovat jednou dávkou předem (ne po jedné uvnitř smyčky)
+    missing = [order for order in orders.values()
+               if order and order['id'] not in pending_mail and (order.get('email') or '').strip()
+               and not (order.get('invoice_path') and os.path.isfile(order.get('invoice_path')))]
+    if missing:
+        try:
+            from settings_loader import get_pricing_tarifs
+            pricing = get_pricing_tarifs(db) if get_pricing_tarifs else {}
+        except Exception:
+            pricing = {}
+        jobs = [(o['id'], o, _admin_order_amount(pricing, o), o.get('tarif') or 'standard') for o in missing]
+        for order, (filepath, _err) in zip(missing, _admin_generate_invoices(db, jobs)):
+            if filepath and os.path.isfile(filepath):
+                db.update_pending_order_invoice_path(order['id'], filepath)
+                order['invoice_path'] = filepath
     for oid in order_ids:
-        order = db.get_pending_order_by_id(oid)
+        order = orders[oid]
         if not order:
             failed += 1
             continue
+        if order['id'] in pending_mail:
+            already_queued += 1
+            continue
         to_email = (order.get('email') or '').strip()
         if not to_email:
             failed += 1
@@ -1054,28 +1070,60 @@ def bulk_send_payment():
             if order.get('invoice_path') and os.path.isfile(order.get('invoice_path')):
                 invoice_path = order.get('invoice_path')
                 invoice_filename = 'faktura_{}.pdf'.format((order.get('invoice_number') or order.get('order_display_number') or '').strip() or oid)
-            ok = send_email_with_attachment(
-                to_email=to_email,
-                subject=subject,
-                body_plain=body_plain,
+            body_plain, body_html = apply_footer(body_plain, body_html)
+            mail_id = outbox.enqueue(
+                to_email, subject, body_plain,
                 body_html=body_html,
                 attachment_path=invoice_path,
                 attachment_filename=invoice_filename,
-                append_footer=True
+                order_id=order['id'],
+                order_status_on_success='payment_sent',
+                skip_if_pending=True
             )
-            if ok:
-                db.log_email(to_email, subject, 'success')
-                db.update_pending_order_status(oid, 'payment_sent')
-                sent += 1
+            if mail_id is not None:
+                queued += 1
             else:
-                db.log_email(to_email, subject, 'error')
+                # Souběžný request (dvojklik) ho mezitím zařadil, nebo zápis do fronty selhal
                 failed += 1
         except Exception:
             failed += 1
-    if sent:
-        flash('Odesláno e-mailů s platebními údaji: {}.'.format(sent), 'success')
+    if queued:
+        flash('Zařazeno k odeslání e-mailů s platebními údaji: {} (odesílají se na pozadí, stav objednávek se změní po odeslání).'.format(queued), 'success')
+    if already_queued:
+        flash('Přeskočeno {} objednávek – platební e-mail už čeká ve frontě k odeslání.'.format(already_queued), 'warning')
+    if failed:
+        flash('Selhalo nebo přeskočeno: {} objednávek.'.format(failed), 'error' if queued == 0 else 'warning')
+    return redirect(url_for('admin.users_licenses'))
+
+
+@admin_bp.route('/admin/bulk-regenerate-invoices', methods=['POST'])
+@admin_required
+def bulk_regenerate_invoices():
+    """Hromadně přegeneruje PDF faktury vybraných objednávek (jedna dávka, viz _admin_generate_invoices)."""
+    raw = request.form.get('order_ids', '') or ''
+    order_ids = [x.strip() for x in raw.split(',') if x.strip()]
+    if not order_ids:
+        flash('Nejsou vybrány žádné objednávky.', 'error')
+        return redirect(url_for('admin.users_licenses'))
+    db = get_db()
+    try:
+        from settings_loader import get_pricing_tarifs
+        pricing = get_pricing_tarifs(db) if get_pricing_tarifs else {}
+    except Exception:
+        pricing = {}
+    orders = [o for o in (db.get_pending_order_by_id(oid) for oid in order_ids) if o]
+    jobs = [(o['id'], o, _admin_order_amount(pricing, o), o.get('tarif') or 'standard') for o in orders]
+    done = 0
+    for order, (filepath, _err) in zip(orders, _admin_generate_invoices(db, jobs)):
+        if filepath and os.path.isfile(filepath):
+            db.update_pending_order_invoice_path(order['id'], filepath)
+            done += 1
+    failed = len(order_ids) - done
+    if done:
+        flash('Přegenerováno faktur: {}.'.format(done), 'success')
     if failed:
-        flash('Selhalo nebo přeskočeno: {} objednávek.'.format(failed), 'error' if sent == 0 else 'warning')
+        flash('Nepodařilo se přegenerovat: {} objednávek. Zkontrolujte Nastavení firmy a font Unicode.'.format(failed),
+              'error' if done == 0 else 'warning')
     return redirect(url_for('admin.users_licenses'))
 
 
@@ -1188,52 +1236,62 @@ def delete_user_from_order():
 
 def _admin_generate_invoice_for_order(db, order_id, order, amount_czk, tarif):
     """Pomocná: vygeneruje PDF fakturu pro objednávku a vrátí (filepath nebo None, chybová zpráva)."""
+    return _admin_generate_invoices(db, [(order_id, order, amount_czk, tarif)])[0]
+
+
+def _admin_generate_invoices(db, jobs):
+    """
+    Pomocná: vygeneruje PDF faktury pro více objednávek jednou dávkou (render_invoices – font, rozvržení
+    a údaje dodavatele se připraví jednou, velké dávky paralelně v procesech dle INVOICE_RENDER_WORKERS).
+    jobs = [(order_id, order, amount_czk, tarif)]. Vrací [(filepath nebo None, chybová zpráva)] ve stejném pořadí.
+    """
     import logging
     invoices_dir = (db.get_global_setting('invoices_dir') or '').strip() or None
-    supplier_trade_register = (db.get_global_setting('provider_trade_register') or '').strip() or None
-    supplier_name = db.get_global_setting('provider_name', '') or 'Ing. Martin Cieślar'
-    supplier_address = db.get_global_setting('provider_address', '') or 'Porubská 1, 742 83 Klimkovice'
-    supplier_ico = db.get_global_setting('provider_ico', '') or '04830661'
-    supplier_bank_name = (db.get_global_setting('provider_bank_name') or '').strip() or None
-    supplier_phone = (db.get_global_setting('provider_phone') or '').strip() or None
-    supplier_email = (db.get_global_setting('provider_email') or '').strip() or None
-    bank_iban = db.get_global_setting('bank_iban', '') or ''
-    bank_account = db.get_global_setting('bank_account', '') or ''
-    # Číslo faktury = VS = order_display_number (sjednocené číslování)
-    invoice_number = (order.get('invoice_number') or order.get('order_display_number') or '').strip() or str(order_id)
-    vs = invoice_number
-    if not (order.get('invoice_number') or '').strip() and (order.get('order_display_number') or '').strip():
-        db.update_pending_order_invoice_number(order_id, order.get('order_display_number'))
-    try:
-        from invoice_generator import generate_invoice_pdf
-        filepath = generate_invoice_pdf(
+    supplier = dict(
+        supplier_name=db.get_global_setting('provider_name', '') or 'Ing. Martin Cieślar',
+        supplier_address=db.get_global_setting('provider_address', '') or 'Porubská 1, 742 83 Klimkovice',
+        supplier_ico=db.get_global_setting('provider_ico', '') or '04830661',
+        bank_iban=db.get_global_setting('bank_iban', '') or '',
+        bank_account=db.get_global_setting('bank_account', '') or '',
+        supplier_trade_register=(db.get_global_setting('provider_trade_register') or '').strip() or None,
+        supplier_bank_name=(db.get_global_setting('provider_bank_name') or '').strip() or None,
+        supplier_phone=(db.get_global_setting('provider_phone') or '').strip() or None,
+        supplier_email=(db.get_global_setting('provider_email') or '').strip() or None,
+    )
+    invoices = []
+    for order_id, order, amount_czk, tarif in jobs:
+        # Číslo faktury = VS = order_display_number (sjednocené číslování)
+        invoice_number = (order.get('invoice_number') or order.get('order_display_number') or '').strip() or str(order_id)
+        if not (order.get('invoice_number') or '').strip() and (order.get('order_display_number') or '').strip():
+            db.update_pending_order_invoice_number(order_id, order.get('order_display_number'))
+        invoices.append(dict(
             order_id=order_id,
             jmeno_firma=order.get('jmeno_firma') or '',
             ico=order.get('ico') or '',
             email=order.get('email') or '',
             tarif=tarif,
             amount_czk=amount_czk,
-            supplier_name=supplier_name,
-            supplier_address=supplier_address,
-            supplier_ico=supplier_ico,
-            bank_iban=bank_iban,
-            bank_account=bank_account,
             invoice_number=invoice_number,
-            vs=vs,
-            supplier_trade_register=supplier_trade_register,
-            output_dir=invoices_dir,
-            supplier_bank_name=supplier_bank_name,
-            supplier_phone=supplier_phone,
-            supplier_email=supplier_email,
+            vs=invoice_number,
             buyer_ulice=order.get('ulice') or None,
             buyer_mesto=order.get('mesto') or None,
             buyer_psc=order.get('psc') or None,
             buyer_dic=order.get('dic') or None,
-        )
-        return (filepath, None)
+        ))
+    try:
+        from invoice_generator import render_invoices
+        paths = render_invoices(invoices, supplier, output_dir=invoices_dir)
+        return [(path, None) for path in paths]
     except Exception as e:
         logging.getLogger(__name__).error('Admin: generování PDF faktury selhalo: %s', e)
-        return (None, str(e))
+        return [(None, str(e))] * len(jobs)
+
+
+def _admin_order_amount(pricing, order):
+    """Částka faktury: po slevě (amount_czk_final), jinak z objednávky, jinak z ceníku tarifu."""
+    tarif = order.get('tarif') or 'standard'
+    fallback = pricing.get(tarif, {}).get('amount_czk', 1590) if isinstance(pricing, dict) else 1590
+    return order.get('amount_czk_final') or order.get('amount_czk') or fallback
 
 
 @admin_bp.route('/admin/generate-invoice', methods=['POST'])
@@ -2068,8 +2126,7 @@ def api_mobile_summary():
     # Aktivní licence (stejně jako desktop dashboard)
     active_licenses_count = 0
     try:
-        licenses = db.admin_get_all_licenses()
-        active_licenses_count = sum(1 for l in (licenses or []) if l.get('is_active') and not l.get('is_expired'))
+        active_licenses_count = db.admin_license_summary().get('active_licenses', 0)
     except Exception:
         active_licenses_count = 0
 
@@ -2526,12 +2583,12 @@ def api_stats_trial():
 def api_users_by_tier():
     """JSON pro Doughnut: počet uživatelů podle tieru."""
     db = get_db()
-    licenses = db.admin_get_all_licenses()
+    summary = db.admin_license_summary()
     tiers_list = db.get_all_license_tiers()
     by_tier = {t['name']: 0 for t in tiers_list}
-    for l in licenses:
-        tn = l.get('tier_name') or 'Free'
-        by_tier[tn] = by_tier.get(tn, 0) + 1
+    for g in summary.get('groups') or []:
+        tn = g.get('tier_name') or 'Free'
+        by_tier[tn] = by_tier.get(tn, 0) + g['licenses']
     return jsonify({'success': True, 'data': by_tier})
 
 
@@ -0,0 +1,190 @@
+# analysis_jobs.py
+# Asynchronní úlohy web kontroly: fronta v SQLite, analyzační vlákna, průběh přes SSE / long-poll
+# Build 41 | © 2025 Ing. Martin Cieślar
+#
+# - klient odešle soubory (nebo cestu ke složce) a hned dostane job_id
+# - položky si z tabulky analysis_job_items berou analyzační vlákna všech procesů webu
+# - výsledky se vrací po souborech v pořadí dokončení (done_order), zůstávají do vypršení TTL
+#   (TTL běží od poslední hotové položky; čekající / běžící úloha se neuklízí)
+# - nečinná vlákna spí na události od _create; úlohy z jiných procesů zachytí řídký poll (IDLE_POLL_INTERVAL)
+#
+# Konfigurace (proměnné prostředí):
+#   ANALYSIS_JOB_TTL_SECONDS   jak dlouho drží DB hotové výsledky (výchozí 3600 s)
+#
+# Položka visící déle než 2 × timeout + 60 s se vrací do fronty nejvýš MAX_ITEM_ATTEMPTS-krát; potom se uzavře
+# s chybou – soubor, na kterém analýza visí, tak nezablokuje postupně všechna vlákna všech procesů
+
+import logging
+import os
+import secrets
+import socket
+import threading
+import time
+
+from analysis_pool import configured_workers
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_TTL_SECONDS = 3600
+HOUSEKEEPING_INTERVAL = 60
+POLL_INTERVAL = 0.5
+IDLE_POLL_INTERVAL = 15.0
+MAX_ITEM_ATTEMPTS = 2
+
+
+def _job_ttl_seconds():
+    try:
+        return max(60, int(os.environ.get('ANALYSIS_JOB_TTL_SECONDS', '').strip() or DEFAULT_JOB_TTL_SECONDS))
+    except ValueError:
+        return DEFAULT_JOB_TTL_SECONDS
+
+
+class AnalysisJobRunner:
+    """
+    Analyzační vlákna nad frontou v SQLite.
+    analyze_upload(name, content, timeout) a analyze_path(path, name, timeout) vrací plochý výsledek pro web UI;
+    timeout_fn() vrací tvrdý limit na soubor (global_settings.analysis_timeout_seconds).
+    """
+
+    def __init__(self, db_factory, analyze_upload, analyze_path, timeout_fn=None, threads=None):
+        self._db_factory = db_factory
+        self._db = None
+        self._analyze_upload = analyze_upload
+        self._analyze_path = analyze_path
+        self._timeout_fn = timeout_fn or (lambda: None)
+        self.threads = max(1, int(threads or configured_workers() or 1))
+        self.ttl_seconds = _job_ttl_seconds()
+        self._wakeup = threading.Event()
+        self._progress = threading.Condition()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._last_housekeeping = 0.0
+
+    @property
+    def db(self):
+        if self._db is None:
+            with self._start_lock:
+                if self._db is None:
+                    self._db = self._db_factory()
+        return self._db
+
+    def ensure_started(self):
+        """Spustí analyzační vlákna v tomto procesu (líně, při první úloze nebo dotazu)."""
+        if self._started_pid == os.getpid():
+            return
+        self.db  # schéma DB založit dřív, než se vlákna začnou dotazovat
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            prefix = f'{socket.gethostname()}:{os.getpid()}'
+            for i in range(self.threads):
+                threading.Thread(target=self._worker_loop, args=(f'{prefix}:{i}',),
+                                 name=f'analysis-job-{i}', daemon=True).start()
+
+    # --- zakládání úloh ---
+
+    def _create(self, kind, items, ip_address):
+        self.ensure_started()
+        job_id = secrets.token_urlsafe(16)
+        if not self.db.create_analysis_job(job_id, kind, items, ip_address=ip_address, ttl_seconds=self.ttl_seconds):
+            raise RuntimeError('Úlohu se nepodařilo založit')
+        self._wakeup.set()
+        return job_id
+
+    def submit_uploads(self, items, ip_address=None):
+        """items: [{'name', 'content'} | {'name', 'result'}]. Vrací job_id."""
+        return self._create('upload', items, ip_address)
+
+    def submit_folder(self, folder_path, ip_address=None):
+        """Naplánuje všechna PDF ve složce (rekurzivně). Vrací (job_id, total)."""
+        items = []
+        for root, dirs, files in os.walk(folder_path):
+            for file in files:
+                if file.lower().endswith('.pdf'):
+                    filepath = os.path.join(root, file)
+                    items.append({'name': os.path.relpath(filepath, folder_path), 'path': filepath})
+        return self._create('folder', items, ip_address), len(items)
+
+    # --- zpracování ---
+
+    def _worker_loop(self, worker):
+        while True:
+            try:
+                self._housekeeping()
+                item = self.db.claim_analysis_job_item(worker)
+                if item is None:
+                    # Shodit událost a zkusit znovu – úloha založená mezi dotazem a clear() se neztratí
+                    self._wakeup.clear()
+                    item = self.db.claim_analysis_job_item(worker)
+                if item is None:
+                    # Úlohy z jiných procesů (a položky vrácené po pádu) zachytí řídký poll
+                    self._wakeup.wait(IDLE_POLL_INTERVAL)
+                    continue
+                self._process(item)
+            except Exception as e:
+                logger.error('Analyzační vlákno %s: %s', worker, e)
+                time.sleep(1.0)
+
+    def _process(self, item):
+        timeout = self._timeout_fn()
+        name = item.get('name') or 'upload.pdf'
+        try:
+            if item.get('path'):
+                result = self._analyze_path(item['path'], name, timeout)
+            else:
+                result = self._analyze_upload(name, bytes(item.get('content') or b''), timeout)
+        except Exception as e:
+            result = {'name': name, 'filename': name, 'error': str(e)}
+        self.db.finish_analysis_job_item(item['job_id'], item['seq'], result)
+        with self._progress:
+            self._progress.notify_all()
+
+    def _housekeeping(self):
+        now = time.monotonic()
+        if now - self._last_housekeeping < HOUSEKEEPING_INTERVAL:
+            return
+        self._last_housekeeping = now
+        timeout = self._timeout_fn() or 300
+        stale_after = timeout * 2 + 60
+        requeued = self.db.requeue_stale_analysis_job_items(stale_after, MAX_ITEM_ATTEMPTS)
+        exhausted = self.db.get_exhausted_analysis_job_items(stale_after, MAX_ITEM_ATTEMPTS)
+        for item in exhausted:
+            name = item.get('name') or 'upload.pdf'
+            error = f"Analýza souboru nedoběhla ani po {item['attempts']} pokusech, soubor byl přeskočen"
+            self.db.finish_analysis_job_item(item['job_id'], item['seq'], {'name': name, 'filename': name, 'error': error})
+        if exhausted:
+            with self._progress:
+                self._progress.notify_all()
+        purged = self.db.purge_expired_analysis_jobs()
+        if requeued or exhausted or purged:
+            logger.info('Úlohy: %s položek vráceno do fronty, %s uzavřeno po %s pokusech, %s úloh po TTL smazáno',
+                        requeued, len(exhausted), MAX_ITEM_ATTEMPTS, purged)
+
+    # --- čtení průběhu ---
+
+    def wait_for_results(self, job_id, after=0, wait=0.0):
+        """
+        Long-poll: čeká až wait sekund na výsledky s done_order > after.
+        Vrací (job, results); job None = úloha neexistuje nebo vypršela.
+        """
+        self.ensure_started()
+        deadline = time.monotonic() + max(0.0, wait)
+        while True:
+            job = self.db.get_analysis_job(job_id)
+            if job is None:
+                return None, []
+            results = self.db.get_analysis_job_results(job_id, after)
+            remaining = deadline - time.monotonic()
+            if results or job['status'] == 'done' or remaining <= 0:
+                return job, results
+            # Notifikace jen z tohoto procesu – výsledky z jiných procesů zachytí krátký poll
+            with self._progress:
+                self._progress.wait(min(POLL_INTERVAL, remaining))
+
+    def metrics(self):
+        """Stav fronty a propustnost/latence po analyzačních vláknech za poslední hodinu."""
+        stats = self.db.get_analysis_job_stats()
+        stats['threads_per_process'] = self.threads
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
@@ -0,0 +1,408 @@
+# analysis_pool.py
+# Izolovaný pool analyzačních procesů pro /analyze a /analyze-batch
+# Build 41 | © 2025 Ing. Martin Cieślar
+#
+# - předem spuštěné (warm) procesy s naimportovaným enginem (desktop_agent.pdf_checker)
+# - každý soubor má tvrdý časový limit; při překročení se worker zabije a nahradí novým
+# - paměťový limit na worker (RLIMIT_AS, jen POSIX)
+# - metriky: hloubka fronty, vytížení, timeouty, pády, latence, chybějící workery
+# - náhrada workeru se při neúspěchu zkouší znovu s backoffem; bez živého workeru (nebo po marném čekání
+#   na volný) běží analýza v procesu webu, volání nikdy neblokuje donekonečna
+#
+# Konfigurace (proměnné prostředí):
+#   ANALYSIS_POOL_WORKERS      počet procesů na jeden proces webu; výchozí 0 = vypnuto, analýza běží v procesu webu
+#                              (bez tvrdého timeoutu). Pool má každý WSGI worker zvlášť – celkem procesů je
+#                              (WSGI workery × ANALYSIS_POOL_WORKERS), na malé instanci nastavte 1
+#   ANALYSIS_WORKER_MEMORY_MB  paměťový limit jednoho workeru v MB (0 = bez limitu)
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 0
+DEFAULT_MEMORY_MB = 1024
+DEFAULT_TIMEOUT_SECONDS = 300
+WORKER_START_TIMEOUT = 60
+RESPAWN_BACKOFF_MIN = 1.0
+RESPAWN_BACKOFF_MAX = 60.0
+
+
+def _apply_memory_limit(memory_mb):
+    """Nastaví limit adresního prostoru procesu (POSIX). Na Windows se tiše přeskočí."""
+    if not memory_mb or memory_mb <= 0:
+        return
+    try:
+        import resource
+        limit = int(memory_mb) * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except Exception:
+        pass
+
+
+class PoolUnavailable(RuntimeError):
+    """Pool nemá živý worker, nebo se volný neuvolnil v časovém limitu."""
+
+
+def _analyze_in_process(kind, payload, filename):
+    """Záložní analýza v procesu webu (bez tvrdého timeoutu), stejný tvar výsledku jako z workeru."""
+    try:
+        from desktop_agent import pdf_checker as engine
+        try:
+            from desktop_agent.tsa_registry import is_tsa_issuer_qualified as _q
+            engine.is_tsa_issuer_qualified = _q
+        except Exception:
+            pass
+        if kind == 'path':
+            return engine.analyze_pdf_file(payload)
+        return engine.analyze_pdf_bytes(payload, filename=filename)
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'file_name': filename}
+
+
+def _worker_main(conn, memory_mb):
+    """Smyčka workeru: engine se naimportuje jednou, úlohy (kind, payload, filename) chodí rourou."""
+    _apply_memory_limit(memory_mb)
+    from desktop_agent import pdf_checker as engine
+    try:
+        from desktop_agent.tsa_registry import is_tsa_issuer_qualified as _q
+        engine.is_tsa_issuer_qualified = _q
+    except Exception:
+        pass
+    conn.send(('ready', os.getpid()))
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        kind, payload, filename = job
+        status = 'ok'
+        try:
+            if kind == 'path':
+                result = engine.analyze_pdf_file(payload)
+            else:
+                result = engine.analyze_pdf_bytes(payload, filename=filename)
+        except MemoryError:
+            # Po MemoryError nechceme proces dál používat – rodič ho nahradí
+            status = 'recycle'
+            result = {'success': False, 'error': 'Analýza překročila paměťový limit', 'file_name': filename}
+        except Exception as e:
+            result = {'success': False, 'error': str(e), 'file_name': filename}
+        try:
+            conn.send((status, result))
+        except (EOFError, OSError):
+            break
+        if status == 'recycle':
+            break
+
+
+class _Worker:
+    """Jeden analyzační proces a rodičovský konec jeho roury."""
+    __slots__ = ('process', 'conn', 'pid', 'jobs')
+
+    def __init__(self, process, conn, pid):
+        self.process = process
+        self.conn = conn
+        self.pid = pid
+        self.jobs = 0
+
+
+class AnalysisPool:
+    """
+    Pool warm analyzačních procesů s tvrdým timeoutem na soubor.
+    Volání je blokující a thread-safe; paralelismus pro dávku zajišťuje map().
+    """
+
+    def __init__(self, workers=None, memory_mb=None):
+        self.size = max(1, int(workers or DEFAULT_WORKERS))
+        self.memory_mb = DEFAULT_MEMORY_MB if memory_mb is None else int(memory_mb)
+        methods = multiprocessing.get_all_start_methods()
+        self._ctx = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        if self._ctx.get_start_method() == 'forkserver':
+            # Fork server má engine naimportovaný – nové workery (i náhrady po timeoutu) startují teplé
+            self._ctx.set_forkserver_preload(['desktop_agent.pdf_checker'])
+        self._cond = threading.Condition()
+        self._idle = []
+        self._all = set()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix='analysis-pool')
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'timeouts': 0,
+            'crashes': 0,
+            'respawns': 0,
+            'respawn_failures': 0,
+            'respawning': 0,
+            'fallbacks': 0,
+            'waiting': 0,
+            'max_waiting': 0,
+            'latency_total': 0.0,
+            'latency_max': 0.0,
+        }
+
+    # --- životní cyklus workerů ---
+
+    def start(self):
+        """Spustí všechny workery a počká, až budou připravené."""
+        for _ in range(self.size):
+            worker = self._spawn()
+            with self._cond:
+                self._all.add(worker)
+                self._idle.append(worker)
+                self._cond.notify()
+        return self
+
+    def _spawn(self):
+        parent_conn, child_conn = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker_main, args=(child_conn, self.memory_mb),
+                                    name='dokucheck-analysis', daemon=True)
+        process.start()
+        child_conn.close()
+        if not parent_conn.poll(WORKER_START_TIMEOUT):
+            self._terminate(process, parent_conn)
+            raise RuntimeError('Analyzační worker se nespustil včas')
+        msg = parent_conn.recv()
+        return _Worker(process, parent_conn, msg[1] if isinstance(msg, tuple) else process.pid)
+
+    @staticmethod
+    def _terminate(process, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        try:
+            if process.is_alive():
+                process.kill()
+            process.join(5)
+        except Exception:
+            pass
+
+    def _replace(self, worker, reason):
+        """
+        Zabije worker a na pozadí spustí náhradu (žádost, která timeout způsobila, nečeká na start).
+        Nepovedený start se opakuje s backoffem, dokud pool běží – pool se tiše nezmenšuje.
+        """
+        self._terminate(worker.process, worker.conn)
+        with self._cond:
+            self._all.discard(worker)
+            self._stats['respawns'] += 1
+            self._stats['respawning'] += 1
+            # Čekající v _acquire musí zjistit, že už nemusí zbýt žádný worker
+            self._cond.notify_all()
+        logger.warning('Analyzační worker %s nahrazen (%s)', worker.pid, reason)
+
+        def _respawn():
+            delay = RESPAWN_BACKOFF_MIN
+            try:
+                while True:
+                    with self._cond:
+                        if self._closed:
+                            return
+                    try:
+                        new_worker = self._spawn()
+                        break
+                    except Exception as e:
+                        with self._cond:
+                            self._stats['respawn_failures'] += 1
+                        logger.error('Náhradní analyzační worker se nespustil (%s), další pokus za %.0f s', e, delay)
+                        time.sleep(delay)
+                        delay = min(delay * 2, RESPAWN_BACKOFF_MAX)
+                with self._cond:
+                    if self._closed:
+                        self._terminate(new_worker.process, new_worker.conn)
+                        return
+                    self._all.add(new_worker)
+                    self._idle.append(new_worker)
+                    self._cond.notify()
+            finally:
+                with self._cond:
+                    self._stats['respawning'] -= 1
+
+        threading.Thread(target=_respawn, name='analysis-pool-respawn', daemon=True).start()
+
+    def _acquire(self, wait_timeout):
+        """Volný worker; PoolUnavailable, když žádný nežije nebo se do wait_timeout sekund neuvolní."""
+        deadline = time.monotonic() + wait_timeout
+        with self._cond:
+            self._stats['waiting'] += 1
+            self._stats['max_waiting'] = max(self._stats['max_waiting'], self._stats['waiting'])
+            try:
+                while not self._idle:
+                    if self._closed:
+                        raise RuntimeError('Analyzační pool je ukončen')
+                    if not self._all:
+                        raise PoolUnavailable('žádný živý analyzační worker')
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolUnavailable('volný analyzační worker se neuvolnil včas')
+                    self._cond.wait(remaining)
+                return self._idle.pop()
+            finally:
+                self._stats['waiting'] -= 1
+
+    def _release(self, worker):
+        with self._cond:
+            self._idle.append(worker)
+            self._cond.notify()
+
+    # --- analýza ---
+
+    def run(self, kind, payload, filename='upload.pdf', timeout=None):
+        """Provede jednu analýzu ve workeru. Vrací wrapped výsledek engine (dict se 'success')."""
+        timeout = timeout or DEFAULT_TIMEOUT_SECONDS
+        with self._cond:
+            self._stats['submitted'] += 1
+        try:
+            # Obsazený worker se do timeoutu uvolní, nebo ho run() nahradí – déle čekat nemá smysl
+            worker = self._acquire(timeout)
+        except PoolUnavailable as e:
+            with self._cond:
+                self._stats['fallbacks'] += 1
+            logger.warning('Analyzační pool nedostupný (%s), analýza %s poběží v procesu webu', e, filename)
+            return _analyze_in_process(kind, payload, filename)
+        started = time.monotonic()
+        try:
+            worker.conn.send((kind, payload, filename))
+            if not worker.conn.poll(timeout):
+                with self._cond:
+                    self._stats['timeouts'] += 1
+                self._replace(worker, 'timeout')
+                return {'success': False, 'error': f'Analýza překročila časový limit ({int(timeout)} s)',
+                        'file_name': filename, 'timeout': True}
+            status, result = worker.conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            with self._cond:
+                self._stats['crashes'] += 1
+            self._replace(worker, f'pád: {e!r}')
+            return {'success': False, 'error': 'Analyzační proces neočekávaně skončil', 'file_name': filename}
+        elapsed = time.monotonic() - started
+        with self._cond:
+            self._stats['completed'] += 1
+            self._stats['latency_total'] += elapsed
+            self._stats['latency_max'] = max(self._stats['latency_max'], elapsed)
+        worker.jobs += 1
+        if status == 'recycle':
+            self._replace(worker, 'paměťový limit')
+        else:
+            self._release(worker)
+        return result
+
+    def analyze_bytes(self, content, filename='upload.pdf', timeout=None):
+        return self.run('bytes', bytes(content), filename, timeout)
+
+    def analyze_path(self, path, timeout=None):
+        return self.run('path', path, os.path.basename(path), timeout)
+
+    def map(self, jobs, timeout=None):
+        """Paralelně zpracuje [(kind, payload, filename), ...]; výsledky vrací ve vstupním pořadí."""
+        futures = [self._executor.submit(self.run, kind, payload, filename, timeout)
+                   for kind, payload, filename in jobs]
+        return [f.result() for f in futures]
+
+    def metrics(self):
+        """Metriky pro monitoring (hloubka fronty, vytížení, timeouty, latence)."""
+        with self._cond:
+            s = dict(self._stats)
+            idle = len(self._idle)
+            alive = len(self._all)
+        completed = s['completed']
+        return {
+            'workers': self.size,
+            'alive': alive,
+            'idle': idle,
+            'busy': max(0, alive - idle),
+            'queue_depth': s['waiting'],
+            'max_queue_depth': s['max_waiting'],
+            'submitted': s['submitted'],
+            'completed': completed,
+            'timeouts': s['timeouts'],
+            'crashes': s['crashes'],
+            'respawns': s['respawns'],
+            'missing': max(0, self.size - alive),
+            'respawning': s['respawning'],
+            'respawn_failures': s['respawn_failures'],
+            'fallbacks': s['fallbacks'],
+            'avg_latency_ms': round(s['latency_total'] / completed * 1000, 1) if completed else 0,
+            'max_latency_ms': round(s['latency_max'] * 1000, 1),
+            'memory_limit_mb': self.memory_mb,
+            'start_method': self._ctx.get_start_method(),
+        }
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            workers = list(self._all)
+            self._all.clear()
+            self._idle.clear()
+            self._cond.notify_all()
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except Exception:
+                pass
+            self._terminate(worker.process, worker.conn)
+        self._executor.shutdown(wait=False)
+
+
+_pool = None
+_pool_pid = None
+_pool_failed = False
+_pool_lock = threading.Lock()
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, '').strip() or default)
+    except ValueError:
+        return default
+
+
+def configured_workers():
+    """Počet analyzačních procesů dle ANALYSIS_POOL_WORKERS (0 = pool vypnutý, výchozí stav)."""
+    return _env_int('ANALYSIS_POOL_WORKERS', DEFAULT_WORKERS)
+
+
+def get_pool():
+    """
+    Vrátí sdílený pool pro tento proces (spouští se líně při první analýze).
+    None = pool je vypnutý nebo se nepodařilo spustit – volající analyzuje v procesu.
+    """
+    global _pool, _pool_pid, _pool_failed
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            return _pool
+        if _pool_failed and _pool_pid == os.getpid():
+            return None
+        _pool_pid = os.getpid()
+        workers = configured_workers()
+        if workers <= 0:
+            _pool_failed = True
+            return None
+        try:
+            _pool = AnalysisPool(workers=workers,
+                                 memory_mb=_env_int('ANALYSIS_WORKER_MEMORY_MB', DEFAULT_MEMORY_MB)).start()
+            _pool_failed = False
+        except Exception as e:
+            logger.error('Analyzační pool se nepodařilo spustit, analýza poběží v procesu: %s', e)
+            _pool = None
+            _pool_failed = True
+        return _pool
+
+
+def get_pool_metrics():
+    """Metriky sdíleného poolu, nebo {'enabled': False} pokud neběží."""
+    pool = _pool if _pool_pid == os.getpid() else None
+    if pool is None:
+        return {'enabled': False}
+    out = pool.metrics()
+    out['enabled'] = True
+    return out
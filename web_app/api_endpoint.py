@@ -148,8 +148,13 @@ def register_api_routes(app):
                         "results": {...}
                     },
                     ...
-                ]
+                ],
+                "batch_id": "batch_...",          (volitelné – aktualizace existující dávky)
+                "removed": ["IO-01/A/stary.pdf"]  (volitelné – relativní cesty smazané ze složky)
             }
+
+        S batch_id se nová dávka nezakládá: výsledky se stejnou relative_path se v dávce nahradí,
+        soubory z „removed“ se z ní odeberou (režim sledování složky v agentovi posílá jen změny).
         """
         try:
             auth_header = request.headers.get('Authorization')
@@ -172,8 +177,13 @@ def register_api_routes(app):
             batch_name = data.get('batch_name')
             source_folder = data.get('source_folder')
             results = data.get('results', [])
+            update_batch_id = data.get('batch_id')
+            removed = [p for p in (data.get('removed') or []) if isinstance(p, str)]
 
-            if not results:
+            if update_batch_id and db.get_batch_api_key(update_batch_id) != api_key:
+                return jsonify({'error': 'batch_not_found'}), 404
+
+            if not results and not (update_batch_id and removed):
                 return jsonify({'error': 'No results provided'}), 400
 
             total_submitted = len(results)
@@ -236,10 +246,16 @@ def register_api_routes(app):
                         'error': 'Denní kvóta vyčerpána. Limit bude obnoven do půlnoci.'
                     }), 403
 
-            # Vytvoř batch
-            batch_id = db.create_batch(api_key, batch_name, source_folder)
-            if not batch_id:
-                return jsonify({'error': 'Failed to create batch'}), 500
+            if update_batch_id:
+                # Aktualizace: změněné soubory nahradit, smazané odebrat
+                batch_id = update_batch_id
+                replaced = [r.get('relative_path') or r.get('file_name') for r in results]
+                db.delete_batch_results_by_paths(batch_id, replaced + removed)
+            else:
+                # Vytvoř batch
+                batch_id = db.create_batch(api_key, batch_name, source_folder)
+                if not batch_id:
+                    return jsonify({'error': 'Failed to create batch'}), 500
 
             # Ulož výsledky (už oříznuté na max_files)
             saved_count = 0
@@ -270,6 +286,8 @@ def register_api_routes(app):
             resp = {
                 'success': True,
                 'batch_id': batch_id,
+                'updated': bool(update_batch_id),
+                'removed_count': len(removed) if update_batch_id else 0,
                 'saved_count': saved_count,
                 'total_count': total_submitted,
                 'processed_count': saved_count,
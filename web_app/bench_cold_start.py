@@ -0,0 +1,85 @@
+# bench_cold_start.py – měření studeného startu webu (import aplikace + první request)
+# Spouštění z kořene projektu:  python web_app/bench_cold_start.py [--runs 5] [--db cesta.db] [--reset-schema]
+#
+# Každý běh = nový proces Pythonu (jako reload workeru na PythonAnywhere):
+#   import_ms         import pdf_check_web_main (Flask, routy, registrace API vč. prvního Database())
+#   first_request_ms  první GET (výchozí /) přes test_client
+#   second_request_ms druhý GET – ustálený stav pro srovnání
+# DB se pro měření zkopíruje do dočasné složky (DOKUCHECK_DB_PATH), produkční soubor se nemění.
+# --reset-schema před každým během vynuluje PRAGMA user_version = chování před jednorázovou kontrolou schématu
+# (init_database + _migrate_schema při každém startu).
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+
+_WEB_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_CHILD = r'''
+import json, os, sys, time
+sys.path.insert(0, sys.argv[1])
+t0 = time.perf_counter()
+import pdf_check_web_main as m
+t1 = time.perf_counter()
+client = m.app.test_client()
+r1 = client.get(sys.argv[2])
+t2 = time.perf_counter()
+r2 = client.get(sys.argv[2])
+t3 = time.perf_counter()
+print(json.dumps({
+    'import_ms': round((t1 - t0) * 1000, 1),
+    'first_request_ms': round((t2 - t1) * 1000, 1),
+    'second_request_ms': round((t3 - t2) * 1000, 1),
+    'status': r1.status_code,
+}))
+'''
+
+
+def _run_once(db_path, path, reset_schema):
+    if reset_schema and os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        conn.execute('PRAGMA user_version = 0')
+        conn.commit()
+        conn.close()
+    env = dict(os.environ, DOKUCHECK_DB_PATH=db_path)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # .pyc jako na serveru, ne kompilace při každém běhu
+    out = subprocess.run([sys.executable, '-c', _CHILD, _WEB_APP_DIR, path], env=env,
+                         capture_output=True, text=True, cwd=_WEB_APP_DIR)
+    if out.returncode != 0:
+        raise RuntimeError(out.stderr.strip().splitlines()[-1] if out.stderr.strip() else 'běh selhal')
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Studený start webu DokuCheck')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--db', default=os.path.join(_WEB_APP_DIR, 'pdfcheck_results.db'),
+                        help='DB ke zkopírování (výchozí produkční soubor vedle aplikace; chybí-li, začne se prázdnou)')
+    parser.add_argument('--path', default='/', help='URL prvního requestu')
+    parser.add_argument('--reset-schema', action='store_true', help='vynutit DDL při každém startu (srovnání)')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='dokucheck-bench-')
+    db_copy = os.path.join(tmp, 'bench.db')
+    try:
+        if os.path.exists(args.db):
+            shutil.copyfile(args.db, db_copy)
+        _run_once(db_copy, args.path, args.reset_schema)  # zahřátí: .pyc, stránková cache OS, schéma DB
+        runs = [_run_once(db_copy, args.path, args.reset_schema) for _ in range(max(1, args.runs))]
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    for key in ('import_ms', 'first_request_ms', 'second_request_ms'):
+        values = [r[key] for r in runs]
+        print(f"{key:18} medián {statistics.median(values):8.1f}   min {min(values):8.1f}   max {max(values):8.1f}")
+    print(f"HTTP status: {runs[-1]['status']}   běhů: {len(runs)}   reset schématu: {'ano' if args.reset_schema else 'ne'}")
+
+
+if __name__ == '__main__':
+    main()
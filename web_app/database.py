@@ -11,11 +11,27 @@ import uuid
 
 # Absolute DB path (required on PythonAnywhere/WSGI – CWD may not be app dir)
 basedir = os.path.abspath(os.path.dirname(__file__))
-db_path = os.path.join(basedir, 'pdfcheck_results.db')
+# DOKUCHECK_DB_PATH = jiná DB (např. kopie pro bench_cold_start.py); jinak vedle tohoto souboru
+db_path = os.environ.get('DOKUCHECK_DB_PATH') or os.path.join(basedir, 'pdfcheck_results.db')
 _default_db_path = db_path  # used by Database.__init__ when no path is passed
 
 import hashlib
 import secrets
+import threading
+import time
+import zlib
+
+# Paměťová cache denní kvóty před tabulkou daily_usage: {(db_path, api_key, den): (počet, čas načtení)}
+# Krátké TTL – DB je sdílená více workery, cache jen šetří dotazy při opakovaných kontrolách.
+DAILY_USAGE_CACHE_TTL = 5.0
+DAILY_USAGE_CACHE_MAX = 10000
+_daily_usage_cache = {}
+_daily_usage_lock = threading.Lock()
+
+# Schéma se kontroluje jednou za proces a DB: otisk DDL kódu (init_database, _migrate_*, _ensure_*)
+# je v PRAGMA user_version; když sedí, celé init_database (desítky CREATE/PRAGMA table_info) se přeskočí.
+_schema_ready = set()
+_schema_lock = threading.Lock()
 
 # Import licenční konfigurace
 try:
@@ -31,12 +47,154 @@ except ImportError:
     def tier_to_string(t): return "Free"
 
 
+def _tier_name_case_sql(column):
+    """SQL výraz převádějící license_tier (0–3) na název tarifu – stejně jako tier_to_string()."""
+    whens = []
+    for value in range(4):
+        try:
+            name = tier_to_string(LicenseTier(value))
+        except Exception:
+            name = tier_to_string(value)
+        whens.append("WHEN %d THEN '%s'" % (value, str(name).replace("'", "''")))
+    return 'CASE COALESCE(%s, 0) %s ELSE \'%s\' END' % (column, ' '.join(whens), tier_to_string(None))
+
+
+# Název tarifu licence: přednost má license_tiers.name (tier_id), jinak license_tier
+_TIER_NAME_SQL = 'COALESCE(lt.name, %s)' % _tier_name_case_sql('ak.license_tier')
+
+# Obsah výsledku kontroly (klíče 'results' a 'display') se ukládá jednou do result_blobs
+# (zlib, kanonický JSON, klíč = SHA-256). Řádek check_results/check_history drží v results_json
+# jen „obálku“ (file_name, processed_at, success…) a v result_blob odkaz na blob.
+RESULT_BLOB_CODEC = 'zlib'
+_RESULT_BLOB_LEVEL = 6
+
+
+def _derived_display(results):
+    """Sekce 'display' tak, jak ji skládá pdf_checker – odvozená z 'results'."""
+    pdf_format = results.get('pdf_format') or {}
+    signatures = results.get('signatures') or []
+    return {
+        'pdf_version': pdf_format.get('exact_version'),
+        'is_pdf_a3': pdf_format.get('is_pdf_a3'),
+        'signature_count': len(signatures),
+        'signatures': signatures,
+        'docmdp_level': results.get('docmdp_level'),
+        'issr_compatible': results.get('issr_compatible', True),
+    }
+
+
+def _pack_result(data):
+    """
+    Rozdělí výsledek na (obálka_json, blob); blob = (blob_hash, codec, body, raw_size) nebo None.
+    Duplicitní 'display' (kopie 'results') se do blobu neukládá, jen příznak pro rekonstrukci.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get('results'), dict):
+        return json.dumps(data, ensure_ascii=False), None
+    envelope = {k: v for k, v in data.items() if k not in ('results', 'display')}
+    body = {'results': data['results']}
+    if 'display' in data:
+        if data['display'] == _derived_display(data['results']):
+            body['display_derived'] = True
+        else:
+            body['display'] = data['display']
+    canonical = json.dumps(body, ensure_ascii=False, sort_keys=True, separators=(',', ':'), default=str).encode('utf-8')
+    blob_hash = hashlib.sha256(canonical).hexdigest()
+    blob = (blob_hash, RESULT_BLOB_CODEC, zlib.compress(canonical, _RESULT_BLOB_LEVEL), len(canonical))
+    return json.dumps(envelope, ensure_ascii=False), blob
+
+
+def _decode_result_blob(codec, body):
+    if codec == 'zlib':
+        return json.loads(zlib.decompress(body).decode('utf-8'))
+    raise ValueError(f'Neznámý kodek result_blobs: {codec}')
+
+
+def _unpack_result(envelope, blob_body):
+    """Složí původní výsledek z obálky a dekódovaného blobu."""
+    data = dict(envelope)
+    results = blob_body.get('results') or {}
+    data['results'] = results
+    if blob_body.get('display_derived'):
+        data['display'] = _derived_display(results)
+    elif 'display' in blob_body:
+        data['display'] = blob_body['display']
+    return data
+
+
+def _normalize_setting_value(val, default):
+    """Hodnota z global_settings: prázdná -> default, '1'/'0' apod. -> bool, jinak řetězec."""
+    if val is None or (isinstance(val, str) and val.strip() == ''):
+        return default
+    if val in ('1', 'true', 'yes'):
+        return True
+    if val in ('0', 'false', 'no'):
+        return False
+    return val
+
+
+class GlobalSettingsSnapshot:
+    """Načtená global_settings v paměti se stejnými gettery jako Database (get_global_setting, get_setting_*)."""
+
+    def __init__(self, values):
+        self._values = values
+
+    def get_global_setting(self, key, default=None):
+        if key not in self._values:
+            return default
+        return _normalize_setting_value(self._values[key], default)
+
+    def global_settings_snapshot(self):
+        return self
+
+
 class Database:
     """Správa SQLite databáze pro výsledky kontrol"""
 
     def __init__(self, db_path=None):
         self.db_path = db_path if db_path is not None else _default_db_path  # absolute path on PA
-        self.init_database()
+        self.ensure_schema()
+
+    @classmethod
+    def schema_version(cls):
+        """Otisk DDL metod (31 bitů pro PRAGMA user_version). Mění se jen se změnou jejich kódu / SQL."""
+        h = hashlib.sha256()
+
+        def feed(code):
+            h.update(code.co_code)
+            for const in code.co_consts:
+                if hasattr(const, 'co_code'):
+                    feed(const)
+                else:
+                    h.update(repr(const).encode('utf-8'))
+
+        for name in sorted(vars(cls)):
+            if name == 'init_database' or name.startswith(('_migrate_', '_ensure_')):
+                feed(getattr(cls, name).__code__)
+        return int(h.hexdigest()[:7], 16) or 1
+
+    def ensure_schema(self):
+        """Jednorázová kontrola schématu: v procesu podruhé bez dotazu, jinak jeden PRAGMA; DDL jen při změně."""
+        key = os.path.abspath(self.db_path)
+        if key in _schema_ready:
+            return
+        with _schema_lock:
+            if key in _schema_ready:
+                return
+            version = self.schema_version()
+            conn = sqlite3.connect(self.db_path)
+            try:
+                current = conn.execute('PRAGMA user_version').fetchone()[0]
+            finally:
+                conn.close()
+            if current != version:
+                self.init_database()
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    conn.execute(f'PRAGMA user_version = {int(version)}')
+                    conn.commit()
+                finally:
+                    conn.close()
+            _schema_ready.add(key)
 
     def get_connection(self):
         """Vytvoří připojení k databázi"""
@@ -620,6 +778,225 @@ class Database:
             pass
 
         self._migrate_set_password_tokens_nullable_expires(cursor)
+        self._ensure_license_stats(cursor)
+        self._ensure_daily_usage(cursor)
+        self._ensure_analysis_jobs(cursor)
+        self._ensure_analysis_cache(cursor)
+        self._ensure_result_blobs(cursor)
+        self._ensure_mail_outbox(cursor)
+
+    def _ensure_license_stats(self, cursor):
+        """
+        Materializované počítadlo pro admin přehled licencí (license_stats).
+        Udržuje se triggery v téže transakci jako zápis do check_results, device_activations
+        a user_logs – admin přehled tak nemusí pro každou licenci počítat korelované poddotazy.
+        """
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='license_stats'")
+        is_new = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS license_stats (
+                api_key TEXT PRIMARY KEY,
+                active_devices INTEGER NOT NULL DEFAULT 0,
+                device_names TEXT,
+                total_checks INTEGER NOT NULL DEFAULT 0,
+                last_active TIMESTAMP,
+                last_ip TEXT
+            )
+        ''')
+        _recount_devices = '''
+                INSERT OR IGNORE INTO license_stats (api_key) VALUES ({ref}.api_key);
+                UPDATE license_stats SET
+                    active_devices = (SELECT COUNT(*) FROM device_activations da
+                                      WHERE da.api_key = {ref}.api_key AND da.is_active = 1),
+                    device_names = (SELECT GROUP_CONCAT(COALESCE(device_name, hwid), ', ') FROM device_activations da
+                                    WHERE da.api_key = {ref}.api_key AND da.is_active = 1)
+                WHERE api_key = {ref}.api_key;
+        '''
+        triggers = [
+            ('trg_license_stats_check_insert', 'AFTER INSERT ON check_results', '''
+                INSERT OR IGNORE INTO license_stats (api_key) VALUES (NEW.api_key);
+                UPDATE license_stats SET total_checks = total_checks + 1 WHERE api_key = NEW.api_key;
+            '''),
+            ('trg_license_stats_check_delete', 'AFTER DELETE ON check_results', '''
+                UPDATE license_stats SET total_checks = MAX(total_checks - 1, 0) WHERE api_key = OLD.api_key;
+            '''),
+            ('trg_license_stats_device_insert', 'AFTER INSERT ON device_activations',
+             _recount_devices.format(ref='NEW')),
+            ('trg_license_stats_device_update', 'AFTER UPDATE OF is_active, device_name, hwid ON device_activations',
+             _recount_devices.format(ref='NEW')),
+            ('trg_license_stats_device_delete', 'AFTER DELETE ON device_activations',
+             _recount_devices.format(ref='OLD')),
+            ('trg_license_stats_log_insert', 'AFTER INSERT ON user_logs', '''
+                INSERT OR IGNORE INTO license_stats (api_key) VALUES (NEW.user_id);
+                UPDATE license_stats SET last_active = NEW.timestamp, last_ip = NEW.ip_address
+                WHERE api_key = NEW.user_id AND (last_active IS NULL OR NEW.timestamp >= last_active);
+            '''),
+            ('trg_license_stats_key_delete', 'AFTER DELETE ON api_keys', '''
+                DELETE FROM license_stats WHERE api_key = OLD.api_key;
+            '''),
+        ]
+        for name, event, body in triggers:
+            cursor.execute(f'CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END')
+        if is_new:
+            # Jednorázové naplnění z existujících dat (pouze při vzniku tabulky)
+            cursor.execute('''
+                INSERT OR REPLACE INTO license_stats (api_key, active_devices, device_names, total_checks, last_active, last_ip)
+                SELECT
+                    ak.api_key,
+                    (SELECT COUNT(*) FROM device_activations da
+                     WHERE da.api_key = ak.api_key AND da.is_active = 1),
+                    (SELECT GROUP_CONCAT(COALESCE(device_name, hwid), ', ') FROM device_activations da
+                     WHERE da.api_key = ak.api_key AND da.is_active = 1),
+                    (SELECT COUNT(*) FROM check_results cr WHERE cr.api_key = ak.api_key),
+                    (SELECT MAX(timestamp) FROM user_logs ul WHERE ul.user_id = ak.api_key),
+                    (SELECT ip_address FROM user_logs WHERE user_id = ak.api_key ORDER BY timestamp DESC LIMIT 1)
+                FROM api_keys ak
+            ''')
+
+    def _ensure_daily_usage(self, cursor):
+        """
+        Denní počítadlo zkontrolovaných souborů (daily_usage) pro denní kvótu.
+        Trigger ho zvyšuje v téže transakci jako INSERT do check_results; dotaz na kvótu je
+        pak vyhledání podle primárního klíče místo COUNT(*) přes celou historii uživatele.
+        Mazání výsledků (např. „Vymazat vše“) počítadlo nesnižuje – kvóta tím nejde obejít.
+        """
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='daily_usage'")
+        is_new = cursor.fetchone() is None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_usage (
+                api_key TEXT NOT NULL,
+                day TEXT NOT NULL,
+                files INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (api_key, day)
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_daily_usage_check_insert
+            AFTER INSERT ON check_results
+            BEGIN
+                INSERT OR IGNORE INTO daily_usage (api_key, day, files)
+                VALUES (NEW.api_key, date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP), 'localtime'), 0);
+                UPDATE daily_usage SET files = files + 1
+                WHERE api_key = NEW.api_key AND day = date(COALESCE(NEW.created_at, CURRENT_TIMESTAMP), 'localtime');
+            END
+        ''')
+        if is_new:
+            # Jednorázové naplnění z existujících výsledků (pouze při vzniku tabulky)
+            cursor.execute('''
+                INSERT OR REPLACE INTO daily_usage (api_key, day, files)
+                SELECT api_key, date(created_at, 'localtime'), COUNT(*)
+                FROM check_results
+                WHERE created_at IS NOT NULL
+                GROUP BY api_key, date(created_at, 'localtime')
+            ''')
+
+    def _ensure_analysis_jobs(self, cursor):
+        """
+        Fronta asynchronních web kontrol (analysis_jobs + analysis_job_items).
+        Položky si berou analyzační vlákna všech procesů webu; obsah uploadu se po analýze maže,
+        výsledek zůstává do expires_at (TTL od posledního průběhu, čekající / běžící úloha se nemaže).
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                total INTEGER NOT NULL DEFAULT 0,
+                done INTEGER NOT NULL DEFAULT 0,
+                ip_address TEXT,
+                ttl_seconds INTEGER NOT NULL DEFAULT 3600,
+                created_at REAL NOT NULL,
+                finished_at REAL,
+                expires_at REAL NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_job_items (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                name TEXT,
+                path TEXT,
+                content BLOB,
+                status TEXT NOT NULL DEFAULT 'queued',
+                done_order INTEGER,
+                result_json TEXT,
+                worker TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                started_at REAL,
+                finished_at REAL,
+                PRIMARY KEY (job_id, seq)
+            )
+        ''')
+        cursor.execute('PRAGMA table_info(analysis_job_items)')
+        if 'attempts' not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute('ALTER TABLE analysis_job_items ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_analysis_job_items_status ON analysis_job_items(status)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_analysis_jobs_expires ON analysis_jobs(expires_at)')
+
+    def _ensure_mail_outbox(self, cursor):
+        """
+        Odchozí pošta (mail_outbox): e-maily z adminu se jen zařadí, odesílá je vlákno MailOutbox
+        přes jedno přihlášené SMTP spojení. Po odeslání / definitivním selhání zápis do email_logs
+        a volitelně změna stavu objednávky (order_id + order_status_on_success).
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS mail_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                recipient TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                body_plain TEXT NOT NULL,
+                body_html TEXT,
+                attachment_path TEXT,
+                attachment_filename TEXT,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                order_id INTEGER,
+                order_status_on_success TEXT,
+                worker TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                sent_at REAL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_mail_outbox_due ON mail_outbox(status, next_attempt_at)')
+
+    def _ensure_result_blobs(self, cursor):
+        """Tabulka result_blobs + sloupec result_blob v check_results/check_history (viz _pack_result)."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS result_blobs (
+                blob_hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                body BLOB NOT NULL,
+                raw_size INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        for table in ('check_results', 'check_history'):
+            cursor.execute(f'PRAGMA table_info({table})')
+            if 'result_blob' not in {row[1] for row in cursor.fetchall()}:
+                try:
+                    cursor.execute(f'ALTER TABLE {table} ADD COLUMN result_blob TEXT')
+                except sqlite3.OperationalError:
+                    pass
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_check_results_result_blob ON check_results(result_blob)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_check_history_result_blob ON check_history(result_blob)')
+
+    def _ensure_analysis_cache(self, cursor):
+        """Cache výsledků analýzy podle SHA-256 obsahu a verze engine (viz result_cache.py)."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                file_hash TEXT NOT NULL,
+                engine_version TEXT NOT NULL,
+                result_json TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_hit_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (file_hash, engine_version)
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_analysis_cache_last_hit ON analysis_cache(last_hit_at)')
 
     def _migrate_set_password_tokens_nullable_expires(self, cursor):
         """Migrace: expires_at v set_password_tokens může být NULL (= bez časové expirace)."""
@@ -775,6 +1152,27 @@ class Database:
         conn.close()
         return row['api_key'] if row else None
 
+    def delete_batch_results_by_paths(self, batch_id, file_paths):
+        """Smaže z dávky výsledky souborů podle relativní cesty (file_path). Pro průběžnou aktualizaci dávky agentem."""
+        file_paths = [p for p in (file_paths or []) if p]
+        if not file_paths:
+            return 0
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            deleted = 0
+            for i in range(0, len(file_paths), 500):
+                chunk = file_paths[i:i + 500]
+                cursor.execute(
+                    'DELETE FROM check_results WHERE batch_id = ? AND file_path IN (%s)' % ','.join('?' * len(chunk)),
+                    [batch_id] + chunk,
+                )
+                deleted += cursor.rowcount
+            conn.commit()
+            return deleted
+        finally:
+            conn.close()
+
     def get_batch_results(self, batch_id):
         """Vrátí všechny výsledky pro danou dávku"""
         conn = self.get_connection()
@@ -787,13 +1185,10 @@ class Database:
         ''', (batch_id,))
 
         results = [dict(row) for row in cursor.fetchall()]
+        # Parsuj JSON (obálka + blob)
+        self._attach_parsed_results(cursor, results)
         conn.close()
 
-        # Parsuj JSON
-        for result in results:
-            if result.get('results_json'):
-                result['parsed_results'] = json.loads(result['results_json'])
-
         return results
 
     def delete_batch(self, batch_id):
@@ -875,20 +1270,22 @@ class Database:
             signature_count = len(signatures)
             has_errors = not result_data.get('success', True)
 
-            # Ulož jako JSON string
-            results_json = json.dumps(result_data, ensure_ascii=False)
+            # Obálka jako JSON string, obsah výsledku do result_blobs (sdílený mezi stejnými výsledky)
+            results_json, blob = _pack_result(result_data)
+            blob_hash = self._store_result_blob(cursor, blob)
 
             cursor.execute('''
                 INSERT INTO check_results (
                     api_key, batch_id, file_name, file_path, folder_path, file_hash, file_size, processed_at,
-                    is_pdf_a3, pdf_version, signature_count, has_errors, results_json
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    is_pdf_a3, pdf_version, signature_count, has_errors, results_json, result_blob
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 api_key, batch_id, file_name, file_path, folder_path, file_hash, file_size, processed_at,
-                is_pdf_a3, pdf_version, signature_count, has_errors, results_json
+                is_pdf_a3, pdf_version, signature_count, has_errors, results_json, blob_hash
             ))
 
             conn.commit()
+            self._bump_daily_usage_cache(api_key)
             return True, cursor.lastrowid
 
         except Exception as e:
@@ -897,19 +1294,36 @@ class Database:
             conn.close()
 
     def get_daily_files_checked(self, api_key):
-        """Počet souborů zkontrolovaných dnes (kalendářní den) pro daný api_key. Pro denní kvótu."""
+        """Počet souborů zkontrolovaných dnes (kalendářní den) pro daný api_key. Pro denní kvótu.
+        Čte se z daily_usage (vyhledání podle klíče) přes krátkodobou paměťovou cache."""
+        today = datetime.now().strftime('%Y-%m-%d')
+        cache_key = (self.db_path, api_key, today)
+        now = time.monotonic()
+        with _daily_usage_lock:
+            cached = _daily_usage_cache.get(cache_key)
+            if cached and now - cached[1] < DAILY_USAGE_CACHE_TTL:
+                return cached[0]
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
-            today = datetime.now().strftime('%Y-%m-%d')
-            cursor.execute('''
-                SELECT COUNT(*) AS cnt FROM check_results
-                WHERE api_key = ? AND date(created_at) = ?
-            ''', (api_key, today))
+            cursor.execute('SELECT files FROM daily_usage WHERE api_key = ? AND day = ?', (api_key, today))
             row = cursor.fetchone()
-            return (row['cnt'] or 0) if row else 0
+            files = (row['files'] or 0) if row else 0
         finally:
             conn.close()
+        with _daily_usage_lock:
+            if len(_daily_usage_cache) >= DAILY_USAGE_CACHE_MAX:
+                _daily_usage_cache.clear()
+            _daily_usage_cache[cache_key] = (files, now)
+        return files
+
+    def _bump_daily_usage_cache(self, api_key, count=1):
+        """Po uložení výsledku navýší hodnotu v paměťové cache (DB počítadlo zvyšuje trigger)."""
+        cache_key = (self.db_path, api_key, datetime.now().strftime('%Y-%m-%d'))
+        with _daily_usage_lock:
+            cached = _daily_usage_cache.get(cache_key)
+            if cached:
+                _daily_usage_cache[cache_key] = (cached[0] + count, cached[1])
 
     def get_results_by_api_key(self, api_key, limit=100, offset=0):
         """Vrátí výsledky pro daný API klíč"""
@@ -924,12 +1338,10 @@ class Database:
         ''', (api_key, limit, offset))
 
         results = [dict(row) for row in cursor.fetchall()]
-        conn.close()
 
-        # Parsuj JSON zpět
-        for result in results:
-            if result.get('results_json'):
-                result['parsed_results'] = json.loads(result['results_json'])
+        # Parsuj JSON zpět (obálka + blob)
+        self._attach_parsed_results(cursor, results)
+        conn.close()
 
         return results
 
@@ -1000,15 +1412,16 @@ class Database:
         filename = data.get('file_name') or data.get('file_path') or 'unknown'
         status = 'ok' if data.get('success', True) else 'error'
         processed_at = data.get('processed_at') or datetime.now().isoformat()
-        results_json = json.dumps(data, ensure_ascii=False)
+        results_json, blob = _pack_result(data)
 
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
+            blob_hash = self._store_result_blob(cursor, blob)
             cursor.execute('''
-                INSERT INTO check_history (user_id, filename, status, timestamp, results_json, batch_id, source)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (user_id, filename, status, processed_at, results_json, batch_id, source))
+                INSERT INTO check_history (user_id, filename, status, timestamp, results_json, batch_id, source, result_blob)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, filename, status, processed_at, results_json, batch_id, source, blob_hash))
             conn.commit()
             return True, cursor.lastrowid
         except Exception as e:
@@ -1023,20 +1436,15 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT id, user_id, filename, status, timestamp, results_json, batch_id, source
+            SELECT id, user_id, filename, status, timestamp, results_json, batch_id, source, result_blob
             FROM check_history
             WHERE user_id = ?
             ORDER BY timestamp DESC
             LIMIT ? OFFSET ?
         ''', (user_id, limit, offset))
         rows = [dict(row) for row in cursor.fetchall()]
+        self._attach_parsed_results(cursor, rows)
         conn.close()
-        for row in rows:
-            if row.get('results_json'):
-                try:
-                    row['parsed_results'] = json.loads(row['results_json'])
-                except Exception:
-                    row['parsed_results'] = None
         return rows
 
     def delete_check_history_record(self, record_id, user_id):
@@ -1099,10 +1507,8 @@ class Database:
             ''', (batch['batch_id'],))
             results = [dict(row) for row in cursor.fetchall()]
 
-            # Parsuj JSON
-            for result in results:
-                if result.get('results_json'):
-                    result['parsed_results'] = json.loads(result['results_json'])
+            # Parsuj JSON (obálka + blob)
+            self._attach_parsed_results(cursor, results)
 
             batch['results'] = results
 
@@ -1129,12 +1535,9 @@ class Database:
                 LIMIT 500
             ''')
         legacy_results = [dict(row) for row in cursor2.fetchall()]
+        self._attach_parsed_results(cursor2, legacy_results)
         conn2.close()
 
-        for result in legacy_results:
-            if result.get('results_json'):
-                result['parsed_results'] = json.loads(result['results_json'])
-
         # Seskup legacy výsledky podle data
         if legacy_results:
             legacy_grouped = {}
@@ -2251,18 +2654,19 @@ class Database:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT cr.id, cr.api_key, cr.batch_id, cr.file_name, cr.folder_path, cr.created_at, cr.results_json,
-                   ak.email
+                   cr.result_blob, ak.email
             FROM check_results cr
             LEFT JOIN api_keys ak ON ak.api_key = cr.api_key
             ORDER BY cr.created_at DESC LIMIT ?
         ''', (limit,))
+        fetched = [dict(row) for row in cursor.fetchall()]
+        self._attach_parsed_results(cursor, fetched)
         rows = []
-        for row in cursor.fetchall():
-            r = dict(row)
+        for r in fetched:
             signer = '—'
-            if r.get('results_json'):
+            if r.get('parsed_results'):
                 try:
-                    data = json.loads(r['results_json'])
+                    data = r['parsed_results']
                     sigs = data.get('signatures') or []
                     if sigs and isinstance(sigs[0], dict):
                         signer = (sigs[0].get('signer') or sigs[0].get('common_name') or '—').strip() or '—'
@@ -3258,14 +3662,16 @@ class Database:
         conn.close()
         if not row:
             return default
-        val = row['value']
-        if val is None or (isinstance(val, str) and val.strip() == ''):
-            return default
-        if val in ('1', 'true', 'yes'):
-            return True
-        if val in ('0', 'false', 'no'):
-            return False
-        return val
+        return _normalize_setting_value(row['value'], default)
+
+    def global_settings_snapshot(self):
+        """Všechna globální nastavení jedním dotazem – pro view, které jich čte desítky (každé spojení parsuje schéma)."""
+        conn = self.get_connection()
+        try:
+            rows = conn.execute('SELECT key, value FROM global_settings').fetchall()
+        finally:
+            conn.close()
+        return GlobalSettingsSnapshot({row['key']: row['value'] for row in rows})
 
     def get_setting_int(self, key: str, default: int = 0) -> int:
         """Globální nastavení jako int. Při chybě nebo prázdné hodnotě vrátí default."""
@@ -3674,82 +4080,151 @@ class Database:
     # ADMIN: SPRÁVA LICENCÍ (rozšířené metody)
     # =========================================================================
 
+    _LICENSE_LIST_COLUMNS = '''
+        ak.id, ak.api_key, ak.user_name, ak.email, ak.license_tier, ak.tier_id, ak.license_expires,
+        ak.max_devices, ak.rate_limit_hour, ak.created_at, ak.is_active, ak.max_batch_size,
+        ak.allow_signatures, ak.allow_timestamp, ak.allow_excel_export, ak.password_plain_stored,
+        ak.payment_method, ak.last_payment_date,
+        COALESCE(ls.active_devices, 0) AS active_devices,
+        ls.device_names,
+        COALESCE(ls.total_checks, 0) AS total_checks,
+        ls.last_active,
+        ls.last_ip
+    '''
+
+    def _license_filter_sql(self, search=None, tier_name=None, status=None):
+        """Sestaví FROM + WHERE pro přehled licencí (vyhledávání, tarif, stav) nad license_stats."""
+        sql = (
+            ' FROM api_keys ak'
+            ' LEFT JOIN license_tiers lt ON ak.tier_id = lt.id'
+            ' LEFT JOIN license_stats ls ON ls.api_key = ak.api_key'
+        )
+        where, params = [], []
+        if search:
+            pattern = '%' + search.lower().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            where.append(
+                "(LOWER(COALESCE(ak.email, '')) LIKE ? ESCAPE '\\' OR "
+                "LOWER(COALESCE(ak.user_name, '')) LIKE ? ESCAPE '\\' OR "
+                "LOWER(ak.api_key) LIKE ? ESCAPE '\\')"
+            )
+            params.extend([pattern, pattern, pattern])
+        if tier_name:
+            where.append(f'LOWER({_TIER_NAME_SQL}) = LOWER(?)')
+            params.append(tier_name)
+        if status == 'blocked':
+            where.append('NOT COALESCE(ak.is_active, 0)')
+        elif status == 'active':
+            where.append('COALESCE(ak.is_active, 0)')
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        return sql, params
+
+    def _license_row_to_dict(self, row):
+        """Doplní tier_name, is_expired a days_remaining k řádku přehledu licencí."""
+        license_data = dict(row)
+        license_data['tier_name'] = license_data.pop('tier_name_sql', None) or tier_to_string(
+            LicenseTier(license_data.get('license_tier') or 0))
+        if license_data['license_expires']:
+            try:
+                exp_date = datetime.fromisoformat(license_data['license_expires'])
+                license_data['is_expired'] = exp_date < datetime.now()
+                license_data['days_remaining'] = (exp_date - datetime.now()).days
+            except Exception:
+                license_data['is_expired'] = False
+                license_data['days_remaining'] = -1
+        else:
+            license_data['is_expired'] = False
+            license_data['days_remaining'] = -1
+        return license_data
+
+    def admin_query_licenses(self, search=None, tier_name=None, status=None, limit=None, offset=0):
+        """
+        Přehled licencí pro admin – vyhledávání, filtr tarifu/stavu a stránkování v SQL.
+        Počítadla (zařízení, soubory, poslední aktivita) se čtou z license_stats.
+        Vrací (seznam licencí, celkový počet odpovídajících filtru).
+        """
+        from_sql, params = self._license_filter_sql(search, tier_name, status)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('SELECT COUNT(*) AS c' + from_sql, params)
+            total = cursor.fetchone()['c']
+            sql = (f'SELECT {self._LICENSE_LIST_COLUMNS}, {_TIER_NAME_SQL} AS tier_name_sql'
+                   + from_sql + ' ORDER BY ak.created_at DESC, ak.id DESC')
+            page_params = list(params)
+            if limit is not None:
+                sql += ' LIMIT ? OFFSET ?'
+                page_params.extend([int(limit), int(offset or 0)])
+            cursor.execute(sql, page_params)
+            licenses = [self._license_row_to_dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        return licenses, total
+
     def admin_get_all_licenses(self) -> list:
         """Vrátí všechny licence s detailními informacemi pro admin dashboard (včetně tier z license_tiers a last_active)."""
+        licenses, _ = self.admin_query_licenses()
+        return licenses
+
+    def admin_license_summary(self, search=None, tier_name=None, status=None) -> dict:
+        """
+        Souhrn pro admin dashboard počítaný agregací v SQL (bez načtení všech licencí):
+        počty licencí, zařízení, souborů a rozpad podle license_tier / tier_id / názvu tarifu.
+        """
+        from_sql, params = self._license_filter_sql(search, tier_name, status)
+        expired_sql = "(ak.license_expires IS NOT NULL AND datetime(ak.license_expires) < datetime('now', 'localtime'))"
         conn = self.get_connection()
         cursor = conn.cursor()
         try:
-            cursor.execute('''
+            cursor.execute(f'''
                 SELECT
-                    ak.id,
-                    ak.api_key,
-                    ak.user_name,
-                    ak.email,
-                    ak.license_tier,
+                    COALESCE(ak.license_tier, 0) AS license_tier,
                     ak.tier_id,
-                    ak.license_expires,
-                    ak.max_devices,
-                    ak.rate_limit_hour,
-                    ak.created_at,
-                    ak.is_active,
-                    ak.max_batch_size,
-                    ak.allow_signatures,
-                    ak.allow_timestamp,
-                    ak.allow_excel_export,
-                    ak.password_plain_stored,
-                    lt.name AS tier_name_override,
-                    (SELECT COUNT(*) FROM device_activations da
-                     WHERE da.api_key = ak.api_key AND da.is_active = 1) as active_devices,
-                    (SELECT GROUP_CONCAT(COALESCE(device_name, hwid), ', ') FROM device_activations da
-                     WHERE da.api_key = ak.api_key AND da.is_active = 1) as device_names,
-                    (SELECT COUNT(*) FROM check_results cr
-                     WHERE cr.api_key = ak.api_key) as total_checks,
-                    (SELECT MAX(timestamp) FROM user_logs ul WHERE ul.user_id = ak.api_key) as last_active,
-                    (SELECT ip_address FROM user_logs WHERE user_id = ak.api_key ORDER BY timestamp DESC LIMIT 1) as last_ip
-                FROM api_keys ak
-                LEFT JOIN license_tiers lt ON ak.tier_id = lt.id
-                ORDER BY ak.created_at DESC
-            ''')
-        except sqlite3.OperationalError:
-            # tier_id nebo license_tiers ještě neexistují
-            cursor.execute("PRAGMA table_info(api_keys)")
-            cols = {r[1] for r in cursor.fetchall()}
-            sel = ['ak.id', 'ak.api_key', 'ak.user_name', 'ak.email', 'ak.license_tier', 'ak.license_expires',
-                   'ak.max_devices', 'ak.rate_limit_hour', 'ak.created_at', 'ak.is_active', 'ak.max_batch_size',
-                   'ak.allow_signatures', 'ak.allow_timestamp', 'ak.allow_excel_export',
-                   '(SELECT COUNT(*) FROM device_activations da WHERE da.api_key = ak.api_key AND da.is_active = 1) as active_devices',
-                   '(SELECT GROUP_CONCAT(COALESCE(device_name, hwid), ", ") FROM device_activations da WHERE da.api_key = ak.api_key AND da.is_active = 1) as device_names',
-                   '(SELECT COUNT(*) FROM check_results cr WHERE cr.api_key = ak.api_key) as total_checks']
-            if 'tier_id' in cols:
-                sel.append('ak.tier_id')
-                sel.append('(SELECT MAX(timestamp) FROM user_logs ul WHERE ul.user_id = ak.api_key) as last_active')
-                sel.append('(SELECT ip_address FROM user_logs WHERE user_id = ak.api_key ORDER BY timestamp DESC LIMIT 1) as last_ip')
-            cursor.execute('SELECT ' + ', '.join(sel) + ' FROM api_keys ak ORDER BY ak.created_at DESC')
-
-        licenses = []
-        for row in cursor.fetchall():
-            license_data = dict(row)
-            license_data['tier_name'] = license_data.pop('tier_name_override', None) or tier_to_string(LicenseTier(license_data.get('license_tier', 0)))
-            if 'last_active' not in license_data:
-                license_data['last_active'] = self.get_user_last_active(license_data['api_key'])
-
-            # Zkontroluj expiraci
-            if license_data['license_expires']:
-                try:
-                    exp_date = datetime.fromisoformat(license_data['license_expires'])
-                    license_data['is_expired'] = exp_date < datetime.now()
-                    license_data['days_remaining'] = (exp_date - datetime.now()).days
-                except:
-                    license_data['is_expired'] = False
-                    license_data['days_remaining'] = -1
-            else:
-                license_data['is_expired'] = False
-                license_data['days_remaining'] = -1
-
-            licenses.append(license_data)
+                    {_TIER_NAME_SQL} AS tier_name,
+                    COUNT(*) AS licenses,
+                    SUM(CASE WHEN COALESCE(ak.is_active, 0) AND NOT {expired_sql} THEN 1 ELSE 0 END) AS active,
+                    SUM(CASE WHEN {expired_sql} THEN 1 ELSE 0 END) AS expired,
+                    SUM(COALESCE(ls.active_devices, 0)) AS devices,
+                    SUM(COALESCE(ls.total_checks, 0)) AS checks
+            ''' + from_sql + ' GROUP BY 1, 2, 3', params)
+            groups = [dict(row) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+        summary = {
+            'total_licenses': sum(g['licenses'] for g in groups),
+            'active_licenses': sum(g['active'] or 0 for g in groups),
+            'expired_licenses': sum(g['expired'] or 0 for g in groups),
+            'total_devices': sum(g['devices'] or 0 for g in groups),
+            'total_checks': sum(g['checks'] or 0 for g in groups),
+            'groups': groups,
+        }
+        return summary
 
-        conn.close()
-        return licenses
+    def admin_get_active_licenses_by_emails(self, emails) -> dict:
+        """Vrátí {email (lower): api_key} aktivních placených licencí pro zadané e-maily (párování objednávek)."""
+        emails = sorted({(e or '').strip().lower() for e in (emails or []) if (e or '').strip()})
+        if not emails:
+            return {}
+        result = {}
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            for i in range(0, len(emails), 500):
+                chunk = emails[i:i + 500]
+                cursor.execute(f'''
+                    SELECT LOWER(TRIM(ak.email)) AS email, ak.api_key
+                    FROM api_keys ak
+                    LEFT JOIN license_tiers lt ON ak.tier_id = lt.id
+                    WHERE ak.is_active = 1
+                      AND LOWER(TRIM(ak.email)) IN ({','.join('?' * len(chunk))})
+                      AND LOWER({_TIER_NAME_SQL}) NOT IN ('trial', 'free')
+                    ORDER BY ak.created_at DESC
+                ''', chunk)
+                for row in cursor.fetchall():
+                    result[row['email']] = row['api_key']
+        finally:
+            conn.close()
+        return result
 
     def admin_reset_devices(self, api_key: str) -> int:
         """Resetuje všechna zařízení pro daný API klíč (admin funkce)"""
@@ -3997,6 +4472,620 @@ class Database:
             conn.close()
 
 
+    # =========================================================================
+    # ANALYSIS JOBS (asynchronní web kontroly – fronta v SQLite)
+    # =========================================================================
+
+    def create_analysis_job(self, job_id, kind, items, ip_address=None, ttl_seconds=3600):
+        """
+        Založí úlohu a její položky v jedné transakci.
+        items: [{'name', 'path'} | {'name', 'content'} | {'name', 'result'}] – položka s 'result'
+        (např. odmítnutý příliš velký soubor) je rovnou hotová.
+        """
+        now = time.time()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            done = 0
+            for seq, item in enumerate(items):
+                if 'result' in item:
+                    done += 1
+                    cursor.execute('''
+                        INSERT INTO analysis_job_items (job_id, seq, name, status, done_order, result_json, started_at, finished_at)
+                        VALUES (?, ?, ?, 'done', ?, ?, ?, ?)
+                    ''', (job_id, seq, item.get('name'), done, json.dumps(item['result'], ensure_ascii=False), now, now))
+                else:
+                    content = item.get('content')
+                    cursor.execute('''
+                        INSERT INTO analysis_job_items (job_id, seq, name, path, content)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (job_id, seq, item.get('name'), item.get('path'),
+                          sqlite3.Binary(content) if content is not None else None))
+            total = len(items)
+            finished = done >= total
+            # expires_at se posouvá s každou hotovou položkou; čekající / běžící úlohu úklid nemaže
+            cursor.execute('''
+                INSERT INTO analysis_jobs (job_id, kind, status, total, done, ip_address, ttl_seconds,
+                                           created_at, finished_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (job_id, kind, 'done' if finished else 'queued', total, done, ip_address or '', int(ttl_seconds),
+                  now, now if finished else None, now + ttl_seconds))
+            conn.commit()
+            return True
+        except sqlite3.Error:
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
+    def claim_analysis_job_item(self, worker):
+        """
+        Atomicky převezme nejstarší čekající položku (BEGIN IMMEDIATE). Vrací dict včetně content, nebo None.
+        Prázdná fronta se pozná čtením bez zápisového zámku – nečinná vlákna neblokují zápisy requestů.
+        """
+        conn = self.get_connection()
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1 FROM analysis_job_items WHERE status = 'queued' LIMIT 1")
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT job_id, seq, name, path, content FROM analysis_job_items
+                WHERE status = 'queued' ORDER BY rowid LIMIT 1
+            ''')
+            row = cursor.fetchone()
+            if not row:
+                cursor.execute('COMMIT')
+                return None
+            cursor.execute('''
+                UPDATE analysis_job_items SET status = 'running', worker = ?, started_at = ?, attempts = attempts + 1
+                WHERE job_id = ? AND seq = ?
+            ''', (worker, time.time(), row['job_id'], row['seq']))
+            cursor.execute("UPDATE analysis_jobs SET status = 'running' WHERE job_id = ? AND status = 'queued'",
+                           (row['job_id'],))
+            cursor.execute('COMMIT')
+            return dict(row)
+        except sqlite3.Error:
+            try:
+                cursor.execute('ROLLBACK')
+            except sqlite3.Error:
+                pass
+            return None
+        finally:
+            conn.close()
+
+    def finish_analysis_job_item(self, job_id, seq, result):
+        """Uloží výsledek položky (smaže obsah uploadu), přidělí pořadí dokončení a případně uzavře úlohu."""
+        now = time.time()
+        conn = self.get_connection()
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT COALESCE(MAX(done_order), 0) + 1 FROM analysis_job_items WHERE job_id = ?', (job_id,))
+            done_order = cursor.fetchone()[0]
+            cursor.execute('''
+                UPDATE analysis_job_items
+                SET status = 'done', content = NULL, done_order = ?, result_json = ?, finished_at = ?
+                WHERE job_id = ? AND seq = ? AND status != 'done'
+            ''', (done_order, json.dumps(result, ensure_ascii=False, default=str), now, job_id, seq))
+            if cursor.rowcount:
+                # Průběh posouvá expires_at – TTL běží od poslední hotové položky
+                cursor.execute('''
+                    UPDATE analysis_jobs SET done = done + 1,
+                        status = CASE WHEN done + 1 >= total THEN 'done' ELSE 'running' END,
+                        finished_at = CASE WHEN done + 1 >= total THEN ? ELSE finished_at END,
+                        expires_at = ? + ttl_seconds
+                    WHERE job_id = ?
+                ''', (now, now, job_id))
+            cursor.execute('COMMIT')
+            return done_order
+        except sqlite3.Error:
+            try:
+                cursor.execute('ROLLBACK')
+            except sqlite3.Error:
+                pass
+            return None
+        finally:
+            conn.close()
+
+    def get_analysis_job(self, job_id):
+        """Stav úlohy (bez výsledků), nebo None pokud neexistuje / vypršela. Čekající / běžící úloha nevyprší."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT job_id, kind, status, total, done, created_at, finished_at, expires_at
+            FROM analysis_jobs WHERE job_id = ? AND (expires_at >= ? OR status IN ('queued', 'running'))
+        ''', (job_id, time.time()))
+        row = cursor.fetchone()
+        conn.close()
+        return dict(row) if row else None
+
+    def get_analysis_job_results(self, job_id, after=0):
+        """Hotové položky s done_order > after, v pořadí dokončení: [{seq, done_order, name, result}, ...]."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT seq, done_order, name, result_json FROM analysis_job_items
+            WHERE job_id = ? AND status = 'done' AND done_order > ?
+            ORDER BY done_order
+        ''', (job_id, int(after or 0)))
+        rows = []
+        for row in cursor.fetchall():
+            try:
+                result = json.loads(row['result_json']) if row['result_json'] else None
+            except (TypeError, ValueError):
+                result = None
+            rows.append({'seq': row['seq'], 'done_order': row['done_order'], 'name': row['name'], 'result': result})
+        conn.close()
+        return rows
+
+    def requeue_stale_analysis_job_items(self, older_than_seconds, max_attempts):
+        """
+        Vrátí do fronty položky, které zůstaly 'running' po spadlém procesu (nebo analýza visí),
+        jen dokud mají méně než max_attempts převzetí. Vrací počet.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE analysis_job_items SET status = 'queued', worker = NULL, started_at = NULL
+            WHERE status = 'running' AND started_at < ? AND attempts < ?
+        ''', (time.time() - older_than_seconds, int(max_attempts)))
+        conn.commit()
+        n = cursor.rowcount
+        conn.close()
+        return n
+
+    def get_exhausted_analysis_job_items(self, older_than_seconds, max_attempts):
+        """Visící 'running' položky, které už vyčerpaly max_attempts převzetí: [{job_id, seq, name, attempts}]."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT job_id, seq, name, attempts FROM analysis_job_items
+            WHERE status = 'running' AND started_at < ? AND attempts >= ?
+        ''', (time.time() - older_than_seconds, int(max_attempts)))
+        rows = [dict(r) for r in cursor.fetchall()]
+        conn.close()
+        return rows
+
+    def purge_expired_analysis_jobs(self):
+        """Smaže dokončené úlohy po TTL včetně jejich položek (čekající / běžící ne). Vrací počet smazaných úloh."""
+        now = time.time()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            DELETE FROM analysis_job_items
+            WHERE job_id IN (SELECT job_id FROM analysis_jobs
+                             WHERE expires_at < ? AND status NOT IN ('queued', 'running'))
+        ''', (now,))
+        cursor.execute("DELETE FROM analysis_jobs WHERE expires_at < ? AND status NOT IN ('queued', 'running')", (now,))
+        n = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return n
+
+    def get_analysis_job_stats(self, since_seconds=3600):
+        """
+        Metriky fronty: čekající/běžící položky a propustnost + latence po workerech
+        za posledních since_seconds ({worker, files, avg_ms, max_ms, avg_wait_ms}).
+        """
+        since = time.time() - since_seconds
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT SUM(status = 'queued') AS queued, SUM(status = 'running') AS running
+            FROM analysis_job_items
+        ''')
+        row = cursor.fetchone()
+        cursor.execute('''
+            SELECT i.worker,
+                   COUNT(*) AS files,
+                   AVG(i.finished_at - i.started_at) * 1000 AS avg_ms,
+                   MAX(i.finished_at - i.started_at) * 1000 AS max_ms,
+                   AVG(i.started_at - j.created_at) * 1000 AS avg_wait_ms
+            FROM analysis_job_items i
+            JOIN analysis_jobs j ON j.job_id = i.job_id
+            WHERE i.status = 'done' AND i.worker IS NOT NULL AND i.finished_at >= ?
+            GROUP BY i.worker
+            ORDER BY files DESC
+        ''', (since,))
+        workers = [{k: (round(v, 1) if isinstance(v, float) else v) for k, v in dict(r).items()}
+                   for r in cursor.fetchall()]
+        conn.close()
+        return {'queued': row['queued'] or 0, 'running': row['running'] or 0, 'workers': workers}
+
+
+    # =========================================================================
+    # ODCHOZÍ POŠTA (mail_outbox, odesílá MailOutbox na pozadí)
+    # =========================================================================
+
+    def enqueue_mail(self, recipient, subject, body_plain, body_html=None, attachment_path=None,
+                     attachment_filename=None, order_id=None, order_status_on_success=None, skip_if_pending=False):
+        """
+        Zařadí e-mail do odchozí fronty. Vrací id záznamu, nebo None.
+        skip_if_pending: objednávka už má ve frontě (queued / sending) e-mail se stejným order_status_on_success
+        -> nic se nezařadí a vrací None (kontrola a vložení v jednom příkazu – i souběžné requesty).
+        """
+        now = time.time()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            values = (str(recipient), str(subject), body_plain, body_html, attachment_path, attachment_filename,
+                      order_id, order_status_on_success, now, now)
+            if skip_if_pending and order_id is not None:
+                cursor.execute('''
+                    INSERT INTO mail_outbox (recipient, subject, body_plain, body_html, attachment_path,
+                        attachment_filename, order_id, order_status_on_success, next_attempt_at, created_at)
+                    SELECT ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+                    WHERE NOT EXISTS (
+                        SELECT 1 FROM mail_outbox WHERE order_id = ? AND order_status_on_success IS ?
+                        AND status IN ('queued', 'sending'))
+                ''', values + (order_id, order_status_on_success))
+            else:
+                cursor.execute('''
+                    INSERT INTO mail_outbox (recipient, subject, body_plain, body_html, attachment_path,
+                        attachment_filename, order_id, order_status_on_success, next_attempt_at, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', values)
+            conn.commit()
+            return cursor.lastrowid if cursor.rowcount else None
+        except sqlite3.Error:
+            return None
+        finally:
+            conn.close()
+
+    def get_pending_mail_order_ids(self, order_ids, order_status_on_success):
+        """Z order_ids ty, které už mají ve frontě (queued / sending) e-mail s daným order_status_on_success."""
+        ids = [int(x) for x in order_ids]
+        if not ids:
+            return set()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT DISTINCT order_id FROM mail_outbox
+            WHERE order_status_on_success IS ? AND status IN ('queued', 'sending')
+              AND order_id IN ({})
+        '''.format(','.join('?' * len(ids))), (order_status_on_success, *ids))
+        found = {row[0] for row in cursor.fetchall()}
+        conn.close()
+        return found
+
+    def claim_mail_batch(self, worker, limit=20):
+        """
+        Atomicky převezme až limit zpráv, kterým už uplynul next_attempt_at (BEGIN IMMEDIATE). Vrací [dict].
+        Prázdná fronta se pozná čtením bez zápisového zámku – nečinná vlákna neblokují zápisy requestů.
+        """
+        now = time.time()
+        conn = self.get_connection()
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT 1 FROM mail_outbox WHERE status = 'queued' AND next_attempt_at <= ? LIMIT 1", (now,))
+            if cursor.fetchone() is None:
+                return []
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT * FROM mail_outbox
+                WHERE status = 'queued' AND next_attempt_at <= ?
+                ORDER BY next_attempt_at, id LIMIT ?
+            ''', (now, int(limit)))
+            rows = [dict(r) for r in cursor.fetchall()]
+            for row in rows:
+                cursor.execute('''
+                    UPDATE mail_outbox SET status = 'sending', worker = ?, started_at = ?, attempts = attempts + 1
+                    WHERE id = ?
+                ''', (worker, now, row['id']))
+                row['attempts'] += 1
+            cursor.execute('COMMIT')
+            return rows
+        except sqlite3.Error:
+            try:
+                cursor.execute('ROLLBACK')
+            except sqlite3.Error:
+                pass
+            return []
+        finally:
+            conn.close()
+
+    def finish_mail(self, mail_id, error=None, retry_at=None):
+        """
+        Uzavře pokus o odeslání. error None = odesláno (email_logs 'success' + stav objednávky);
+        s retry_at se zpráva vrátí do fronty, jinak je definitivně 'failed' (email_logs 'error').
+        """
+        now = time.time()
+        conn = self.get_connection()
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('SELECT recipient, subject, order_id, order_status_on_success FROM mail_outbox WHERE id = ?',
+                           (mail_id,))
+            row = cursor.fetchone()
+            if not row:
+                cursor.execute('COMMIT')
+                return False
+            if error is None:
+                cursor.execute("UPDATE mail_outbox SET status = 'sent', sent_at = ?, last_error = NULL WHERE id = ?",
+                               (now, mail_id))
+                cursor.execute('INSERT INTO email_logs (recipient, subject, status) VALUES (?, ?, ?)',
+                               (row['recipient'], row['subject'], 'success'))
+                if row['order_id'] and row['order_status_on_success']:
+                    if row['order_status_on_success'] == 'payment_sent':
+                        cursor.execute('''UPDATE pending_orders SET status = ?, payment_sent_at = CURRENT_TIMESTAMP
+                                          WHERE id = ?''', (row['order_status_on_success'], row['order_id']))
+                    else:
+                        cursor.execute('UPDATE pending_orders SET status = ? WHERE id = ?',
+                                       (row['order_status_on_success'], row['order_id']))
+            elif retry_at is not None:
+                cursor.execute('''UPDATE mail_outbox SET status = 'queued', worker = NULL, next_attempt_at = ?,
+                                  last_error = ? WHERE id = ?''', (retry_at, str(error)[:500], mail_id))
+            else:
+                cursor.execute("UPDATE mail_outbox SET status = 'failed', last_error = ? WHERE id = ?",
+                               (str(error)[:500], mail_id))
+                cursor.execute('INSERT INTO email_logs (recipient, subject, status) VALUES (?, ?, ?)',
+                               (row['recipient'], row['subject'], 'error'))
+            cursor.execute('COMMIT')
+            return True
+        except sqlite3.Error:
+            try:
+                cursor.execute('ROLLBACK')
+            except sqlite3.Error:
+                pass
+            return False
+        finally:
+            conn.close()
+
+    def refresh_mail_claim(self, worker):
+        """Obnoví started_at u zpráv, které worker právě odesílá (dlouhá dávka se tak nepovažuje za spadlou)."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE mail_outbox SET started_at = ? WHERE worker = ? AND status = 'sending'
+        ''', (time.time(), worker))
+        conn.commit()
+        n = cursor.rowcount
+        conn.close()
+        return n
+
+    def requeue_stale_mail(self, older_than_seconds):
+        """Vrátí do fronty zprávy, které zůstaly 'sending' po spadlém procesu. Vrací počet."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE mail_outbox SET status = 'queued', worker = NULL
+            WHERE status = 'sending' AND started_at < ?
+        ''', (time.time() - older_than_seconds,))
+        conn.commit()
+        n = cursor.rowcount
+        conn.close()
+        return n
+
+    def purge_sent_mail(self, older_than_seconds):
+        """Smaže odeslané zprávy starší než older_than_seconds (záznam zůstává v email_logs). Vrací počet."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM mail_outbox WHERE status = 'sent' AND sent_at < ?",
+                       (time.time() - older_than_seconds,))
+        conn.commit()
+        n = cursor.rowcount
+        conn.close()
+        return n
+
+    def get_mail_outbox_stats(self, since_seconds=3600):
+        """Metriky odchozí pošty: počty podle stavu, odesláno za since_seconds a průměrné zpoždění od zařazení (ms)."""
+        since = time.time() - since_seconds
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, COUNT(*) AS n FROM mail_outbox GROUP BY status')
+        counts = {r['status']: r['n'] for r in cursor.fetchall()}
+        cursor.execute('''
+            SELECT COUNT(*) AS sent, AVG(sent_at - created_at) * 1000 AS avg_delay_ms
+            FROM mail_outbox WHERE status = 'sent' AND sent_at >= ?
+        ''', (since,))
+        row = cursor.fetchone()
+        conn.close()
+        return {
+            'queued': counts.get('queued', 0),
+            'sending': counts.get('sending', 0),
+            'failed': counts.get('failed', 0),
+            'sent_last_hour': row['sent'] or 0,
+            'avg_delay_ms': round(row['avg_delay_ms'], 1) if row['avg_delay_ms'] is not None else None,
+        }
+
+    # =========================================================================
+    # ANALYSIS CACHE (výsledky podle SHA-256 obsahu + verze engine)
+    # =========================================================================
+
+    def get_cached_analysis(self, file_hash, engine_version):
+        """Vrátí result_json z cache (a započítá zásah), nebo None."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                'SELECT result_json FROM analysis_cache WHERE file_hash = ? AND engine_version = ?',
+                (file_hash, engine_version)
+            )
+            row = cursor.fetchone()
+            if not row:
+                return None
+            cursor.execute(
+                'UPDATE analysis_cache SET hits = hits + 1, last_hit_at = ? WHERE file_hash = ? AND engine_version = ?',
+                (time.time(), file_hash, engine_version)
+            )
+            conn.commit()
+            return row['result_json']
+        finally:
+            conn.close()
+
+    def put_cached_analysis(self, file_hash, engine_version, result_json, max_entries=5000):
+        """Uloží výsledek do cache; nad max_entries smaže nejdéle nepoužité záznamy."""
+        now = time.time()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT OR REPLACE INTO analysis_cache (file_hash, engine_version, result_json, created_at, last_hit_at, hits)
+                VALUES (?, ?, ?, ?, ?, 0)
+            ''', (file_hash, engine_version, result_json, now, now))
+            cursor.execute('SELECT COUNT(*) FROM analysis_cache')
+            excess = cursor.fetchone()[0] - int(max_entries)
+            if excess > 0:
+                cursor.execute('''
+                    DELETE FROM analysis_cache WHERE rowid IN (
+                        SELECT rowid FROM analysis_cache ORDER BY last_hit_at LIMIT ?
+                    )
+                ''', (excess,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def purge_analysis_cache(self, keep_engine_version=None):
+        """Smaže záznamy cache jiné verze engine (bez parametru celou cache). Vrací počet smazaných."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        if keep_engine_version is None:
+            cursor.execute('DELETE FROM analysis_cache')
+        else:
+            cursor.execute('DELETE FROM analysis_cache WHERE engine_version != ?', (keep_engine_version,))
+        n = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return n
+
+    def count_cached_analyses(self):
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM analysis_cache')
+        n = cursor.fetchone()[0]
+        conn.close()
+        return n
+
+
+    # =========================================================================
+    # RESULT BLOBS (komprimovaný obsah výsledků, sdílený podle SHA-256)
+    # =========================================================================
+
+    def _store_result_blob(self, cursor, blob):
+        """Uloží blob, pokud ještě neexistuje (v transakci volajícího). Vrací blob_hash nebo None."""
+        if not blob:
+            return None
+        blob_hash, codec, body, raw_size = blob
+        cursor.execute(
+            'INSERT OR IGNORE INTO result_blobs (blob_hash, codec, body, raw_size) VALUES (?, ?, ?, ?)',
+            (blob_hash, codec, sqlite3.Binary(body), raw_size)
+        )
+        return blob_hash
+
+    def _attach_parsed_results(self, cursor, rows):
+        """
+        Doplní řádkům check_results/check_history 'parsed_results' a plné 'results_json'
+        (obálka + blob) – pro volající stejný tvar jako před zavedením result_blobs.
+        """
+        blob_keys = list({r['result_blob'] for r in rows if r.get('result_blob')})
+        bodies = {}
+        for i in range(0, len(blob_keys), 500):
+            chunk = blob_keys[i:i + 500]
+            cursor.execute(
+                'SELECT blob_hash, codec, body FROM result_blobs WHERE blob_hash IN (%s)' % ','.join('?' * len(chunk)),
+                chunk
+            )
+            for row in cursor.fetchall():
+                try:
+                    bodies[row['blob_hash']] = _decode_result_blob(row['codec'], row['body'])
+                except Exception:
+                    pass
+        for r in rows:
+            blob_key = r.pop('result_blob', None)
+            parsed = None
+            if r.get('results_json'):
+                try:
+                    parsed = json.loads(r['results_json'])
+                except Exception:
+                    parsed = None
+            if blob_key and isinstance(parsed, dict) and blob_key in bodies:
+                parsed = _unpack_result(parsed, bodies[blob_key])
+                r['results_json'] = json.dumps(parsed, ensure_ascii=False)
+            if r.get('results_json'):
+                r['parsed_results'] = parsed
+        return rows
+
+    def migrate_results_to_blobs(self, batch_size=500, max_rows=None):
+        """
+        Převede starší řádky (plné results_json, result_blob NULL) na obálku + result_blobs.
+        Zpracovává po dávkách s commitem, lze přerušit a spustit znovu. Vrací {tabulka: převedeno}.
+        """
+        converted = {}
+        for table, key in (('check_results', 'id'), ('check_history', 'id')):
+            done = 0
+            last_id = 0
+            while max_rows is None or done < max_rows:
+                conn = self.get_connection()
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(f'''
+                        SELECT {key} AS row_id, results_json FROM {table}
+                        WHERE result_blob IS NULL AND results_json IS NOT NULL AND {key} > ?
+                        ORDER BY {key} LIMIT ?
+                    ''', (last_id, batch_size))
+                    rows = cursor.fetchall()
+                    if not rows:
+                        break
+                    for row in rows:
+                        last_id = row['row_id']
+                        try:
+                            data = json.loads(row['results_json'])
+                        except Exception:
+                            continue
+                        envelope_json, blob = _pack_result(data)
+                        if not blob:
+                            continue
+                        self._store_result_blob(cursor, blob)
+                        cursor.execute(f'UPDATE {table} SET results_json = ?, result_blob = ? WHERE {key} = ?',
+                                       (envelope_json, blob[0], row['row_id']))
+                        done += 1
+                    conn.commit()
+                finally:
+                    conn.close()
+            converted[table] = done
+        return converted
+
+    def purge_orphan_result_blobs(self):
+        """Smaže bloby, na které už neodkazuje žádný řádek. Vrací počet smazaných."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            DELETE FROM result_blobs
+            WHERE blob_hash NOT IN (SELECT result_blob FROM check_results WHERE result_blob IS NOT NULL)
+              AND blob_hash NOT IN (SELECT result_blob FROM check_history WHERE result_blob IS NOT NULL)
+        ''')
+        n = cursor.rowcount
+        conn.commit()
+        conn.close()
+        return n
+
+    def get_result_blob_stats(self):
+        """Počet blobů, jejich nekomprimovaná a uložená velikost a počet řádků s odkazem."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*), COALESCE(SUM(raw_size), 0), COALESCE(SUM(LENGTH(body)), 0) FROM result_blobs')
+        blobs, raw_size, stored_size = cursor.fetchone()
+        cursor.execute('SELECT COUNT(*) FROM check_results WHERE result_blob IS NOT NULL')
+        result_rows = cursor.fetchone()[0]
+        cursor.execute('SELECT COUNT(*) FROM check_history WHERE result_blob IS NOT NULL')
+        history_rows = cursor.fetchone()[0]
+        conn.close()
+        return {'blobs': blobs, 'raw_bytes': raw_size, 'stored_bytes': stored_size,
+                'check_results_rows': result_rows, 'check_history_rows': history_rows}
+
+
+# Typované gettery snapshotu = tytéž metody jako u Database (volají jen get_global_setting)
+GlobalSettingsSnapshot.get_setting_int = Database.get_setting_int
+GlobalSettingsSnapshot.get_setting_bool = Database.get_setting_bool
+GlobalSettingsSnapshot.get_setting_json = Database.get_setting_json
+
+
 # Helper funkce pro generování API klíče
 def generate_api_key():
     """Vygeneruje náhodný API klíč"""
@@ -4052,3 +5141,4 @@ if __name__ == "__main__":
     # Statistiky
     stats = db.get_statistics(test_key)
     print(f"Statistiky: {stats}")
+
@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+# db_maintenance.py
+# Údržba DB: retence podle tarifu, archiv studených řádků po měsících, inkrementální VACUUM a ANALYZE
+# Build 41 | © 2025 Ing. Martin Cieślar
+#
+# Spouštět pravidelně (PythonAnywhere → Tasks, např. 1× denně v noci):
+#   cd ~/web_app && python db_maintenance.py
+# Volby:
+#   --dry-run                     jen spočítá, co by se archivovalo
+#   --budget N                    časový rozpočet celého běhu v sekundách (výchozí 120)
+#   --enable-incremental-vacuum   jednorázově přepne DB na auto_vacuum=INCREMENTAL (plný VACUUM!)
+#
+# - check_results / check_history: retence = history_days tarifu licence (license_config.TIER_LIMITS)
+# - logy: retence ve dnech z global_settings retention_days_<tabulka> (výchozí RETENTION_DEFAULTS)
+# - studené řádky se přesouvají do data/archive/pdfcheck_archive_RRRR_MM.db (zlib JSON po řádcích)
+# - vše po malých dávkách (CHUNK_ROWS, CHUNK_SECONDS) – zápisový zámek se drží jen krátce
+
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from database import Database, _TIER_NAME_SQL
+
+try:
+    from license_config import LicenseTier, TIER_LIMITS, TIER_NAMES
+except ImportError:
+    LicenseTier = None
+    TIER_LIMITS = {}
+    TIER_NAMES = {}
+
+logger = logging.getLogger(__name__)
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+ARCHIVE_DIR = os.path.join(basedir, 'data', 'archive')
+
+CHUNK_ROWS = 500
+CHUNK_SECONDS = 0.5      # jedna transakce nejdéle cca takto dlouho
+CHUNK_PAUSE = 0.05       # pauza mezi dávkami – prostor pro zápisy webu
+VACUUM_PAGES_PER_STEP = 2000
+DEFAULT_BUDGET_SECONDS = 120
+
+# Retence logů ve dnech (přepíše global_settings retention_days_<tabulka>; 0 = nemazat)
+RETENTION_DEFAULTS = {
+    'user_logs': 365,
+    'activity_log': 365,
+    'online_demo_log': 365,
+    'page_views': 180,
+    'web_trial_ip_usage': 90,
+}
+# Tabulka -> sloupec s časem
+TIMESTAMP_COLUMNS = {
+    'check_results': 'created_at',
+    'check_history': 'timestamp',
+    'user_logs': 'timestamp',
+    'activity_log': 'timestamp',
+    'online_demo_log': 'timestamp',
+    'page_views': 'timestamp',
+    'web_trial_ip_usage': 'usage_timestamp',
+}
+# Licence bez známého tarifu (smazaný klíč apod.) – nejdelší retence, nic se nesmaže předčasně
+FALLBACK_HISTORY_DAYS = 90
+
+
+def _history_days_sql(name_sql):
+    """SQL výraz: počet dní historie podle názvu tarifu (Free/Trial 1, Basic 30, Pro 90 …)."""
+    days_by_name = {}
+    for tier, limits in TIER_LIMITS.items():
+        days = limits.get('history_days')
+        if days is None:
+            continue
+        days_by_name[str(TIER_NAMES.get(tier, '')).lower()] = days
+    if LicenseTier is not None and LicenseTier.FREE in TIER_LIMITS:
+        days_by_name.setdefault('trial', TIER_LIMITS[LicenseTier.FREE].get('history_days', 1))
+    whens = ' '.join("WHEN '%s' THEN %d" % (name.replace("'", "''"), int(days))
+                     for name, days in days_by_name.items() if name)
+    if not whens:
+        return str(FALLBACK_HISTORY_DAYS)
+    return 'CASE LOWER(%s) %s ELSE %d END' % (name_sql, whens, FALLBACK_HISTORY_DAYS)
+
+
+def _cutoff(days):
+    """Datum (RRRR-MM-DD) – řádky s časem menším než tento řetězec jsou starší než `days` dní."""
+    return (datetime.utcnow() - timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def _archive_path(month):
+    return os.path.join(ARCHIVE_DIR, 'pdfcheck_archive_%s.db' % month.replace('-', '_'))
+
+
+class Maintenance:
+    """Jeden běh údržby s časovým rozpočtem; výsledky v self.report."""
+
+    def __init__(self, db=None, budget_seconds=DEFAULT_BUDGET_SECONDS, dry_run=False):
+        self.db = db or Database()
+        self.deadline = time.monotonic() + budget_seconds
+        self.dry_run = dry_run
+        self.report = {'archived': {}, 'deleted': {}, 'dry_run': dry_run}
+
+    def time_left(self):
+        return self.deadline - time.monotonic()
+
+    # --- výběr studených řádků ---
+
+    def _cold_rows_sql(self, table):
+        """(SQL, parametry) vracející id, měsíc a řádek studených záznamů tabulky, nejstarší první."""
+        ts = TIMESTAMP_COLUMNS[table]
+        if table in ('check_results', 'check_history'):
+            owner = 'api_key' if table == 'check_results' else 'user_id'
+            days_sql = _history_days_sql(_TIER_NAME_SQL)
+            # Hranice se počítá v SQL podle tarifu vlastníka řádku
+            sql = f'''
+                SELECT t.*, substr(t.{ts}, 1, 7) AS _month FROM {table} t
+                LEFT JOIN api_keys ak ON ak.api_key = t.{owner}
+                LEFT JOIN license_tiers lt ON lt.id = ak.tier_id
+                WHERE t.{ts} < date('now', '-' || (CASE WHEN ak.api_key IS NULL THEN {FALLBACK_HISTORY_DAYS} ELSE {days_sql} END) || ' days')
+                ORDER BY t.id LIMIT ?
+            '''
+            return sql, ()
+        days = self.db.get_setting_int(f'retention_days_{table}', RETENTION_DEFAULTS[table])
+        if days <= 0:
+            return None, ()
+        sql = f'''
+            SELECT t.*, substr(t.{ts}, 1, 7) AS _month FROM {table} t
+            WHERE t.{ts} < ? ORDER BY t.id LIMIT ?
+        '''
+        return sql, (_cutoff(days),)
+
+    # --- archivace ---
+
+    def archive_table(self, table):
+        """Přesune studené řádky tabulky do měsíčních archivů, po dávkách. Vrací počet."""
+        sql, params = self._cold_rows_sql(table)
+        if sql is None:
+            return 0
+        moved = 0
+        last_id = 0
+        while self.time_left() > 0:
+            conn = self.db.get_connection()
+            try:
+                cursor = conn.cursor()
+                paged_sql = sql.replace('ORDER BY t.id LIMIT ?', 'AND t.id > ? ORDER BY t.id LIMIT ?')
+                cursor.execute(paged_sql, params + (last_id, CHUNK_ROWS))
+                rows = [dict(r) for r in cursor.fetchall()]
+                if not rows:
+                    break
+                if self.dry_run:
+                    moved += len(rows)
+                    last_id = rows[-1]['id']
+                    continue
+                # Jedna dávka = jeden měsíc (jeden připojený archivní soubor)
+                month = rows[0].pop('_month') or 'unknown'
+                batch = [rows[0]] + [r for r in rows[1:] if r.pop('_month') == month]
+                if table in ('check_results', 'check_history'):
+                    self.db._attach_parsed_results(cursor, batch)
+                    for r in batch:
+                        r.pop('parsed_results', None)
+                moved += self._move_batch(conn, table, month, batch)
+            finally:
+                conn.close()
+            time.sleep(CHUNK_PAUSE)
+        if moved:
+            self.report['archived'][table] = self.report['archived'].get(table, 0) + moved
+        return moved
+
+    def _move_batch(self, conn, table, month, rows):
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        cursor.execute('ATTACH DATABASE ? AS arch', (_archive_path(month),))
+        try:
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS arch.archived_rows (
+                    source_table TEXT NOT NULL,
+                    row_id INTEGER NOT NULL,
+                    ts TEXT,
+                    payload BLOB NOT NULL,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (source_table, row_id)
+                )
+            ''')
+            started = time.monotonic()
+            done = 0
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                ts_col = TIMESTAMP_COLUMNS[table]
+                for row in rows:
+                    payload = zlib.compress(json.dumps(row, ensure_ascii=False, default=str).encode('utf-8'), 6)
+                    cursor.execute(
+                        'INSERT OR IGNORE INTO arch.archived_rows (source_table, row_id, ts, payload) VALUES (?, ?, ?, ?)',
+                        (table, row['id'], row.get(ts_col), sqlite3.Binary(payload))
+                    )
+                    cursor.execute(f'DELETE FROM main.{table} WHERE id = ?', (row['id'],))
+                    done += 1
+                    if time.monotonic() - started > CHUNK_SECONDS:
+                        break
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+            return done
+        finally:
+            cursor.execute('DETACH DATABASE arch')
+
+    # --- ostatní úklid ---
+
+    def cleanup_misc(self):
+        """Expirované tokeny, rate limity, úlohy po TTL, osiřelé bloby a prázdné staré dávky."""
+        deleted = self.report['deleted']
+        if self.dry_run:
+            return
+        deleted['rate_limits'] = self.db.cleanup_rate_limits(hours_old=24)
+        self.db.cleanup_expired_one_time_tokens()
+        deleted['analysis_jobs'] = self.db.purge_expired_analysis_jobs()
+        deleted['result_blobs'] = self.db.purge_orphan_result_blobs()
+        conn = self.db.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                DELETE FROM batches
+                WHERE created_at < ?
+                  AND NOT EXISTS (SELECT 1 FROM check_results cr WHERE cr.batch_id = batches.batch_id)
+            ''', (_cutoff(FALLBACK_HISTORY_DAYS),))
+            deleted['batches'] = cursor.rowcount
+            conn.commit()
+        finally:
+            conn.close()
+
+    # --- místo na disku ---
+
+    def _page_stats(self, cursor):
+        cursor.execute('PRAGMA page_size')
+        page_size = cursor.fetchone()[0]
+        cursor.execute('PRAGMA freelist_count')
+        return page_size, cursor.fetchone()[0]
+
+    def compact(self):
+        """Inkrementální VACUUM po krocích (jen při auto_vacuum=INCREMENTAL) a ANALYZE s omezeným vzorkem."""
+        conn = self.db.get_connection()
+        conn.isolation_level = None
+        try:
+            cursor = conn.cursor()
+            cursor.execute('PRAGMA auto_vacuum')
+            mode = cursor.fetchone()[0]
+            page_size, free_before = self._page_stats(cursor)
+            self.report['free_bytes_before'] = page_size * free_before
+            if self.dry_run:
+                return
+            if mode == 2:
+                while self.time_left() > 0:
+                    _, free = self._page_stats(cursor)
+                    if free == 0:
+                        break
+                    cursor.execute(f'PRAGMA incremental_vacuum({VACUUM_PAGES_PER_STEP})')
+                    cursor.fetchall()
+                    time.sleep(CHUNK_PAUSE)
+                _, free_after = self._page_stats(cursor)
+                self.report['bytes_reclaimed'] = page_size * (free_before - free_after)
+            else:
+                self.report['bytes_reclaimed'] = 0
+                self.report['note'] = 'auto_vacuum není INCREMENTAL – spusťte jednou s --enable-incremental-vacuum'
+            if self.time_left() > 0:
+                try:
+                    cursor.execute('PRAGMA analysis_limit = 1000')
+                except sqlite3.Error:
+                    pass
+                cursor.execute('ANALYZE')
+                self.report['analyzed'] = True
+        finally:
+            conn.close()
+
+    def run(self):
+        started = time.monotonic()
+        size_before = os.path.getsize(self.db.db_path) if os.path.exists(self.db.db_path) else 0
+        for table in ('check_results', 'check_history', 'user_logs', 'activity_log',
+                      'online_demo_log', 'page_views', 'web_trial_ip_usage'):
+            if self.time_left() <= 0:
+                self.report['incomplete'] = True
+                break
+            try:
+                self.archive_table(table)
+            except sqlite3.Error as e:
+                logger.error('Údržba: archivace %s selhala: %s', table, e)
+                self.report.setdefault('errors', {})[table] = str(e)
+        self.cleanup_misc()
+        self.compact()
+        self.report['file_bytes_before'] = size_before
+        self.report['file_bytes_after'] = os.path.getsize(self.db.db_path) if os.path.exists(self.db.db_path) else 0
+        self.report['elapsed_s'] = round(time.monotonic() - started, 2)
+        return self.report
+
+
+def enable_incremental_vacuum(db=None):
+    """Jednorázově: auto_vacuum=INCREMENTAL + plný VACUUM (drží zámek po celou dobu, spouštět mimo provoz)."""
+    db = db or Database()
+    conn = db.get_connection()
+    conn.isolation_level = None
+    try:
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    finally:
+        conn.close()
+
+
+def run_maintenance(budget_seconds=DEFAULT_BUDGET_SECONDS, dry_run=False, db=None):
+    return Maintenance(db=db, budget_seconds=budget_seconds, dry_run=dry_run).run()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    budget = DEFAULT_BUDGET_SECONDS
+    if '--budget' in args:
+        try:
+            budget = float(args[args.index('--budget') + 1])
+        except (IndexError, ValueError):
+            print("CHYBA: --budget vyžaduje počet sekund")
+            sys.exit(2)
+    if '--enable-incremental-vacuum' in args:
+        print("Přepínám na auto_vacuum=INCREMENTAL (plný VACUUM)...")
+        print("OK" if enable_incremental_vacuum() else "CHYBA: auto_vacuum se nepodařilo změnit")
+    report = run_maintenance(budget_seconds=budget, dry_run='--dry-run' in args)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# db_migration_result_blobs.py
+# Převod results_json v check_results / check_history na obálku + komprimované result_blobs.
+# Spusť na PythonAnywhere v konzoli: cd ~/web_app && python db_migration_result_blobs.py [--vacuum]
+# Lze přerušit a spustit znovu – převádí jen řádky bez result_blob.
+# © 2025 Ing. Martin Cieślar
+
+import os
+import sqlite3
+import sys
+
+from database import Database, db_path
+
+
+def run_migration(vacuum=False):
+    if not os.path.exists(db_path):
+        print(f"CHYBA: Databáze nenalezena: {db_path}")
+        return False
+
+    size_before = os.path.getsize(db_path)
+    db = Database(db_path)  # založí result_blobs a sloupce result_blob
+
+    converted = db.migrate_results_to_blobs(batch_size=500)
+    for table, count in converted.items():
+        print(f"  {table}: převedeno {count} řádků")
+    orphans = db.purge_orphan_result_blobs()
+    if orphans:
+        print(f"  result_blobs: smazáno {orphans} nepoužitých blobů")
+
+    stats = db.get_result_blob_stats()
+    print(f"  result_blobs: {stats['blobs']} blobů, {stats['raw_bytes'] // 1024} kB JSON "
+          f"-> {stats['stored_bytes'] // 1024} kB uloženo")
+
+    if vacuum:
+        # Místo po zkrácených results_json vrátí souboru až VACUUM (potřebuje volné místo ~ velikost DB)
+        print("  VACUUM...")
+        conn = sqlite3.connect(db_path)
+        conn.execute('VACUUM')
+        conn.close()
+    print(f"Velikost DB: {size_before // 1024} kB -> {os.path.getsize(db_path) // 1024} kB")
+    return True
+
+
+if __name__ == "__main__":
+    run_migration(vacuum='--vacuum' in sys.argv)
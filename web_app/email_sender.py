@@ -18,6 +18,67 @@ def _apply_footer(body_plain, footer_text):
     return (body_plain.rstrip() + "\n\n" + str(footer_text).strip()).strip()
 
 
+def apply_footer(body_plain, body_html=None):
+    """Patička z nastavení e-mailů k textovému i HTML tělu. Vrací (body_plain, body_html)."""
+    footer_text = get_email_templates().get("footer_text", "")
+    body_plain = _apply_footer(body_plain, footer_text)
+    if body_html:
+        # Jednoduché připojení textové patičky do HTML
+        body_html = body_html + "<br><br><hr><pre>" + footer_text.replace('\n', '<br>') + "</pre>"
+    return body_plain, body_html
+
+
+def smtp_settings(config):
+    """SMTP parametry z env / app.config (env má přednost). Vrací dict, nebo None bez serveru či uživatele."""
+    smtp_host = os.environ.get('MAIL_SERVER') or config.get('MAIL_SERVER', '') or 'smtp.seznam.cz'
+    smtp_port = int(os.environ.get('MAIL_PORT') or config.get('MAIL_PORT') or 465)
+    smtp_user = os.environ.get('MAIL_USERNAME') or config.get('MAIL_USERNAME', '') or 'info@dokucheck.cz'
+    smtp_pass = os.environ.get('MAIL_PASSWORD') or config.get('MAIL_PASSWORD', '')
+    if not smtp_host or not smtp_user:
+        return None
+    return {
+        'host': smtp_host,
+        'port': smtp_port,
+        'user': smtp_user,
+        'password': smtp_pass,
+        'use_ssl': config.get('MAIL_USE_SSL', True),
+        'from_addr': config.get('MAIL_DEFAULT_SENDER') or smtp_user,
+    }
+
+
+def open_smtp(settings, timeout=30):
+    """Otevře a přihlásí SMTP spojení (SSL na 465, STARTTLS na 587). Volající ho zavírá (quit)."""
+    import smtplib
+    if settings['use_ssl'] and settings['port'] == 465:
+        server = smtplib.SMTP_SSL(settings['host'], settings['port'], timeout=timeout)
+    else:
+        server = smtplib.SMTP(settings['host'], settings['port'], timeout=timeout)
+        if settings['port'] == 587:
+            server.starttls()
+    if settings['password']:
+        server.login(settings['user'], settings['password'])
+    return server
+
+
+def build_message(from_addr, to_email, subject, body_plain, body_html=None, attachment_path=None, attachment_filename=None):
+    """EmailMessage v UTF-8 (SMTPUTF8 – pojistka proti 'ascii' codec u ě, č, ř, ý) s volitelným HTML a PDF přílohou."""
+    from email.message import EmailMessage
+    from email.policy import SMTPUTF8
+    msg = EmailMessage(policy=SMTPUTF8)
+    msg['Subject'] = subject
+    msg['From'] = from_addr
+    msg['To'] = to_email
+    msg.set_content(body_plain, subtype='plain', charset='utf-8')
+    if body_html:
+        msg.add_alternative(body_html, subtype='html', charset='utf-8')
+    if attachment_path and os.path.isfile(attachment_path):
+        with open(attachment_path, 'rb') as f:
+            pdf_data = f.read()
+        msg.add_attachment(pdf_data, maintype='application', subtype='pdf',
+                           filename=(attachment_filename or os.path.basename(attachment_path)))
+    return msg
+
+
 def send_email(to_email, subject, body_plain, append_footer=True):
     """Odešle e-mail (UTF-8). Pokud append_footer=True, na konec přidá footer_text ze šablon."""
     if append_footer:
@@ -31,36 +92,12 @@ def send_email(to_email, subject, body_plain, append_footer=True):
             msg = Message(subject=subject, recipients=[to_email], body=body_plain)
             mail.send(msg)
             return True
-        import smtplib
-        from email.message import EmailMessage
-        from email.policy import SMTPUTF8
-        # UTF-8: send_message(msg) + set_content(..., charset='utf-8') – odstraní chybu 'ascii' codec (ý, í, ě)
-        smtp_host = os.environ.get('MAIL_SERVER') or app.config.get('MAIL_SERVER', '') or 'smtp.seznam.cz'
-        smtp_port = int(os.environ.get('MAIL_PORT') or app.config.get('MAIL_PORT') or 465)
-        smtp_user = os.environ.get('MAIL_USERNAME') or app.config.get('MAIL_USERNAME', '') or 'info@dokucheck.cz'
-        smtp_pass = os.environ.get('MAIL_PASSWORD') or app.config.get('MAIL_PASSWORD', '')
-        if not smtp_host or not smtp_user:
+        settings = smtp_settings(app.config)
+        if not settings:
             return False
-        from_addr = app.config.get('MAIL_DEFAULT_SENDER') or smtp_user
-        # Ekvivalent MIMEText(body_plain, 'plain', 'utf-8') + server.send_message(msg) – pojistka proti 'ascii' codec (ě, č, ř, ý)
-        msg = EmailMessage(policy=SMTPUTF8)
-        msg['Subject'] = subject
-        msg['From'] = from_addr if from_addr else smtp_user
-        msg['To'] = to_email
-        msg.set_content(body_plain, subtype='plain', charset='utf-8')
-        use_ssl = app.config.get('MAIL_USE_SSL', True)
-        if use_ssl and smtp_port == 465:
-            with smtplib.SMTP_SSL(smtp_host, smtp_port) as server:
-                if smtp_pass:
-                    server.login(smtp_user, smtp_pass)
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(smtp_host, smtp_port) as server:
-                if smtp_port == 587:
-                    server.starttls()
-                if smtp_pass:
-                    server.login(smtp_user, smtp_pass)
-                server.send_message(msg)
+        msg = build_message(settings['from_addr'], to_email, subject, body_plain)
+        with open_smtp(settings) as server:
+            server.send_message(msg)
         return True
     except Exception as e:
         import traceback
@@ -124,13 +161,7 @@ def send_order_notification_to_admin(order=None, **kwargs):
 def send_email_with_attachment(to_email, subject, body_plain, attachment_path=None, attachment_filename=None, append_footer=True, body_html=None):
     """Odešle e-mail s volitelnou přílohou (PDF faktura) a volitelným HTML tělem."""
     if append_footer:
-        templates = get_email_templates()
-        footer_text = templates.get("footer_text", "")
-        body_plain = _apply_footer(body_plain, footer_text)
-        if body_html:
-            # Jednoduché připojení textové patičky do HTML
-            footer_html = "<br><br><hr><pre>" + footer_text.replace('\n', '<br>') + "</pre>"
-            body_html = body_html + footer_html
+        body_plain, body_html = apply_footer(body_plain, body_html)
     app = current_app
     try:
         mail = getattr(app, 'mail', None)
@@ -142,47 +173,13 @@ def send_email_with_attachment(to_email, subject, body_plain, attachment_path=No
                     msg.attach(attachment_filename or os.path.basename(attachment_path), 'application/pdf', f.read())
             mail.send(msg)
             return True
-        import smtplib
-        from email.message import EmailMessage
-        from email.policy import SMTPUTF8
-        smtp_host = os.environ.get('MAIL_SERVER') or app.config.get('MAIL_SERVER', '') or 'smtp.seznam.cz'
-        smtp_port = int(os.environ.get('MAIL_PORT') or app.config.get('MAIL_PORT') or 465)
-        smtp_user = os.environ.get('MAIL_USERNAME') or app.config.get('MAIL_USERNAME', '') or 'info@dokucheck.cz'
-        smtp_pass = os.environ.get('MAIL_PASSWORD') or app.config.get('MAIL_PASSWORD', '')
-        if not smtp_host or not smtp_user:
+        settings = smtp_settings(app.config)
+        if not settings:
             return False
-        
-        # Vytvoření zprávy s podporou UTF-8
-        msg = EmailMessage(policy=SMTPUTF8)
-        msg['Subject'] = subject
-        from_addr = app.config.get('MAIL_DEFAULT_SENDER') or smtp_user
-        msg['From'] = from_addr if from_addr else smtp_user
-        msg['To'] = to_email
-        
-        # Tělo e-mailu (plain vs html)
-        msg.set_content(body_plain, subtype='plain', charset='utf-8')
-        if body_html:
-            msg.add_alternative(body_html, subtype='html', charset='utf-8')
-            
-        # Příloha
-        if attachment_path and os.path.isfile(attachment_path):
-            with open(attachment_path, 'rb') as f:
-                pdf_data = f.read()
-            msg.add_attachment(pdf_data, maintype='application', subtype='pdf', filename=(attachment_filename or os.path.basename(attachment_path)))
-            
-        use_ssl = app.config.get('MAIL_USE_SSL', True)
-        if use_ssl and smtp_port == 465:
-            with smtplib.SMTP_SSL(smtp_host, smtp_port) as server:
-                if smtp_pass:
-                    server.login(smtp_user, smtp_pass)
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(smtp_host, smtp_port) as server:
-                if smtp_port == 587:
-                    server.starttls()
-                if smtp_pass:
-                    server.login(smtp_user, smtp_pass)
-                server.send_message(msg)
+        msg = build_message(settings['from_addr'], to_email, subject, body_plain, body_html,
+                            attachment_path, attachment_filename)
+        with open_smtp(settings) as server:
+            server.send_message(msg)
         return True
     except Exception as e:
         import traceback
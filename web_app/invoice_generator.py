@@ -1,18 +1,48 @@
 # invoice_generator.py – generování PDF faktury (daňový doklad pro neplátce DPH)
 # Redesign dle vzoru: hlavička FAKTURA | DOKLAD Č., sloupce Dodavatel/Odběratel, platební blok, tabulka, pata, QR platba.
 # Unicode: DejaVu/Arial.
+# Hromadně: render_invoices() – font se v procesu načte jednou (předem zúžený na pevnou sadu latinky),
+# třída rozvržení a údaje dodavatele se sestaví jednou na dávku, volitelně paralelně v procesech.
 
 import os
-import io
+import hashlib
 import logging
+import multiprocessing
+import tempfile
+import threading
 import traceback
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
 INVOICES_DIR = os.path.join(os.path.dirname(__file__), 'data', 'invoices')
 FONTS_DIR = os.path.join(os.path.dirname(__file__), 'fonts')
+FONT_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'dokucheck-fonts')
+
+# Pevná sada znaků zúženého fontu: ASCII, Latin-1, Latin Extended-A (česká, slovenská, polská, německá…
+# diakritika), typografická interpunkce a €. Zúží se jednou na proces i na disku; faktura se znakem mimo sadu
+# (azbuka, CJK…) použije plný font. Čím méně glyfů, tím rychlejší je i podmnožina, kterou fpdf dělá při output().
+BASE_FONT_CHARS = frozenset(
+    [chr(c) for c in range(0x20, 0x7F)] + [chr(c) for c in range(0xA0, 0x180)]
+    + [chr(c) for c in range(0x2010, 0x2027)] + [chr(c) for c in range(0x2030, 0x203B)] + ['€', '№', '™']
+)
+QR_MASK_PATTERN = 0
+# Pod tímto počtem faktur se process pool nevyplatí (start workerů + načtení fontu v každém)
+POOL_MIN_INVOICES = 40
+# Procesy pro hromadné vykreslení (INVOICE_RENDER_WORKERS): 0 = podle počtu CPU, 1 = vždy v procesu webu.
+# Pool žije jen po dobu jedné dávky, s analyzačním poolem (ANALYSIS_POOL_WORKERS) nesouvisí.
+DEFAULT_RENDER_WORKERS = 0
+
+
+def configured_render_workers():
+    """Počet procesů pro render_invoices dle INVOICE_RENDER_WORKERS (0 / nezadáno = počet CPU)."""
+    try:
+        workers = int(os.environ.get('INVOICE_RENDER_WORKERS', '').strip() or DEFAULT_RENDER_WORKERS)
+    except ValueError:
+        workers = DEFAULT_RENDER_WORKERS
+    return workers if workers > 0 else (os.cpu_count() or 1)
 
 
 def _get_unicode_font_path():
@@ -138,19 +168,156 @@ def _spayd_string(iban, amount_czk, vs, message='Faktura DokuCheck'):
     return '*'.join(parts)
 
 
-def generate_invoice_pdf(order_id, jmeno_firma, ico, email, tarif, amount_czk,
-                         supplier_name, supplier_address, supplier_ico, bank_iban, bank_account,
-                         invoice_number=None, supplier_trade_register=None, output_dir=None,
-                         supplier_bank_name=None, supplier_phone=None, supplier_email=None, vs=None,
-                         buyer_ulice=None, buyer_mesto=None, buyer_psc=None, buyer_dic=None,
-                         duzp=None):
+_fpdf_class = None
+_layout_class = None
+_font_cache = {}
+_font_lock = threading.Lock()
+
+
+def _load_fpdf():
+    """Třída FPDF (fpdf2), nebo None. Import jednou na proces."""
+    global _fpdf_class
+    if _fpdf_class is None:
+        try:
+            from fpdf import FPDF
+        except ImportError:
+            try:
+                from fpdf2 import FPDF
+            except ImportError:
+                logger.error('[invoice_generator] Nainstalujte: pip install fpdf2')
+                return None
+        _fpdf_class = FPDF
+    return _fpdf_class
+
+
+def _subset_font(src_path, chars):
     """
-    Vygeneruje PDF fakturu (daňový doklad) pro neplátce DPH.
-    Redesign: hlavička FAKTURA vlevo / DOKLAD Č. vpravo, sloupce Dodavatel|Odběratel,
-    platební blok, tabulka "Fakturujeme Vám za:", CELKEM K ÚHRADĚ, pata Vystavil/Telefon/E-mail, QR kód dole.
-    Pro QR platbu: pokud je bank_iban vyplněn, použije se; jinak se z bank_account (172912882/0300) převede na IBAN.
-    Unicode font (DejaVu/Arial). Při chybě vrátí None a zapíše do logu.
+    Uloží font zúžený na chars do FONT_CACHE_DIR (sdílené procesy, klíč = soubor + jeho mtime + znaky) a vrátí cestu.
+    Plný DejaVu (~700 kB, tisíce glyfů) fpdf parsuje i podmnožinuje u každé faktury; zúžený má desítky kB.
+    Volá se jen s BASE_FONT_CHARS – na disku tak leží jeden soubor na verzi fontu.
+    """
+    st = os.stat(src_path)
+    text = ''.join(sorted(chars))
+    key = hashlib.sha1('{}|{}|{}|{}'.format(src_path, st.st_size, st.st_mtime_ns, text).encode('utf-8')).hexdigest()[:20]
+    out_path = os.path.join(FONT_CACHE_DIR, '{}-{}.ttf'.format(os.path.splitext(os.path.basename(src_path))[0], key))
+    if os.path.isfile(out_path):
+        return out_path
+    from fontTools import subset as ftsubset
+    from fontTools.ttLib import TTFont
+    options = ftsubset.Options()
+    options.glyph_names = True      # fpdf při výstupu dohledává glyfy podle jména
+    options.notdef_outline = True
+    options.name_IDs = ['*']
+    options.layout_features = ['*']
+    options.drop_tables += ['FFTM']  # tabulka FontForge – fontTools ji neumí podmnožinovat, jen varuje
+    font = TTFont(src_path, recalcTimestamp=False)
+    subsetter = ftsubset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    os.makedirs(FONT_CACHE_DIR, exist_ok=True)
+    tmp = '{}.{}.tmp'.format(out_path, os.getpid())
+    font.save(tmp)
+    font.close()
+    os.replace(tmp, out_path)
+    # Podmnožiny starší verze fontu (nebo dřívější sady znaků) už nikdo nepoužije
+    stale = re.compile(r'^{}-[0-9a-f]{{20}}\.ttf$'.format(re.escape(os.path.splitext(os.path.basename(src_path))[0])))
+    for name in os.listdir(FONT_CACHE_DIR):
+        if stale.match(name) and os.path.join(FONT_CACHE_DIR, name) != out_path:
+            try:
+                os.remove(os.path.join(FONT_CACHE_DIR, name))
+            except OSError:
+                pass
+    return out_path
+
+
+def _invoice_fonts(chars=None):
+    """
+    (regular, bold) cesty k fontu pro fakturu, nebo (None, None). Zúžený font (BASE_FONT_CHARS) se drží v procesu;
+    chars mimo sadu nebo selhání zúžení (např. chybí fontTools) = plný soubor.
     """
+    font_path, font_path_bold = _get_unicode_font_path()
+    if not font_path or not os.path.isfile(font_path):
+        return (None, None)
+    if set(chars or ()) - BASE_FONT_CHARS - set('\n\r\t'):
+        return (font_path, font_path_bold)
+    key = (font_path, font_path_bold)
+    fonts = _font_cache.get(key)
+    if fonts is None:
+        with _font_lock:
+            fonts = _font_cache.get(key)
+            if fonts is None:
+                try:
+                    fonts = (_subset_font(font_path, BASE_FONT_CHARS),
+                             _subset_font(font_path_bold, BASE_FONT_CHARS) if font_path_bold else None)
+                except Exception as e:
+                    logger.warning('[invoice_generator] Zúžení fontu selhalo, použije se celý soubor: %s', e)
+                    fonts = (font_path, font_path_bold)
+                _font_cache[key] = fonts
+    return fonts
+
+
+def _get_layout_class():
+    """Třída stránky faktury (hlavička FAKTURA | DOKLAD Č., pata Vystavil/Telefon/E-mail). Sestaví se jednou."""
+    global _layout_class
+    if _layout_class is not None:
+        return _layout_class
+    FPDF = _load_fpdf()
+    if FPDF is None:
+        return None
+
+    class InvoiceFPDF(FPDF):
+        def __init__(self, invoice_number, supplier, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self._invoice_number = invoice_number
+            self._supplier = supplier
+
+        def header(self):
+            self.set_font('DejaVu', 'B', 16)
+            self.cell(0, 8, 'FAKTURA', 0, 0, 'L')
+            self.cell(0, 8, 'DOKLAD Č. {}'.format(self._invoice_number), 0, 1, 'R')
+            self.ln(4)
+
+        def footer(self):
+            self.set_y(-28)
+            self.set_font('DejaVu', '', 8)
+            self.cell(0, 5, 'Vystavil: {}'.format(self._supplier['name']), 0, 1, 'L')
+            self.cell(0, 5, 'Telefon: {}'.format(self._supplier['phone'] or '—'), 0, 1, 'L')
+            self.cell(0, 5, 'E-mail: {}'.format(self._supplier['email'] or '—'), 0, 1, 'L')
+            self.ln(2)
+            self.cell(0, 5, 'DokuCheck | www.dokucheck.cz', 0, 1, 'C')
+
+    _layout_class = InvoiceFPDF
+    return _layout_class
+
+
+def prepare_supplier(supplier_name=None, supplier_address=None, supplier_ico=None, bank_iban=None, bank_account=None,
+                     supplier_trade_register=None, supplier_bank_name=None, supplier_phone=None, supplier_email=None):
+    """Údaje dodavatele s výchozími hodnotami a IBAN pro QR – stejné pro celou dávku, počítají se jednou."""
+    _account_display = (bank_account or '').strip()
+    if not _account_display and bank_iban:
+        _account_display = (bank_iban or '').strip()
+    # IBAN pro QR: preferujeme vyplněný bank_iban, jinak převod z CZ účtu
+    iban_for_qr = (bank_iban or '').replace(' ', '').strip()
+    if not iban_for_qr and bank_account and '/' in str(bank_account):
+        iban_for_qr = _cz_account_to_iban(bank_account)
+    if iban_for_qr and not iban_for_qr.upper().startswith('CZ'):
+        iban_for_qr = 'CZ' + iban_for_qr
+    return {
+        'name': supplier_name or 'Ing. Martin Cieślar',
+        'address': supplier_address or 'Porubská 1, 742 83 Klimkovice – Václavovice',
+        'ico': supplier_ico or '04830661',
+        'bank_name': (supplier_bank_name or '').strip() or 'ČSOB',
+        # Zobrazení účtu: pouze český formát (předčíslí-číslo/kód_banky), bez IBAN/SWIFT
+        'account_display': _account_display,
+        'phone': (supplier_phone or '').strip(),
+        'email': (supplier_email or '').strip(),
+        'trade_register': (supplier_trade_register or '').strip() or 'Fyzická osoba zapsaná v Živnostenském rejstříku vedeném na Magistrátu města Ostrava.',
+        'dph_text': 'Nejsem plátce DPH.',
+        'iban_for_qr': iban_for_qr,
+    }
+
+
+def _prepare_save_dir(output_dir):
     save_dir = (output_dir or '').strip() or INVOICES_DIR
     try:
         os.makedirs(save_dir, exist_ok=True)
@@ -162,21 +329,26 @@ def generate_invoice_pdf(order_id, jmeno_firma, ico, email, tarif, amount_czk,
                 return None
         else:
             return None
-
-    try:
-        from fpdf import FPDF
-    except ImportError:
-        try:
-            from fpdf2 import FPDF
-        except ImportError:
-            logger.error('[invoice_generator] Nainstalujte: pip install fpdf2')
-            return None
-
-    font_path, font_path_bold = _get_unicode_font_path()
-    if not font_path or not os.path.isfile(font_path):
-        logger.error('[invoice_generator] Nenalezen font s Unicode. Přidejte web_app/fonts/DejaVuSans.ttf')
-        return None
-
+    return save_dir
+
+
+def _invoice_chars(supplier, invoices):
+    """Všechny znaky proměnných textů dávky (pro zúžení fontu)."""
+    chars = set()
+    for value in supplier.values():
+        if isinstance(value, str):
+            chars.update(value)
+    for inv in invoices:
+        for value in inv.values():
+            if isinstance(value, str):
+                chars.update(value)
+    return chars
+
+
+def _render_invoice(layout_class, fonts, supplier, save_dir, order_id, jmeno_firma=None, ico=None, email=None,
+                    tarif=None, amount_czk=0, invoice_number=None, vs=None, buyer_ulice=None, buyer_mesto=None,
+                    buyer_psc=None, buyer_dic=None, duzp=None):
+    """Vykreslí jednu fakturu do save_dir. Vrací cestu, při chybě None (zapíše do logu)."""
     cislo_faktury = (invoice_number or str(order_id)).strip()
     variabilni_symbol = (vs or cislo_faktury or str(order_id)).strip()
     today = datetime.now()
@@ -184,52 +356,17 @@ def generate_invoice_pdf(order_id, jmeno_firma, ico, email, tarif, amount_czk,
     datum_splatnosti = _format_date_cz(today + timedelta(days=14))
     # DUZP: z parametru (duzp / dateOfSupply / taxDate), fallback = datum vystavení
     datum_duzp = _format_date_cz(duzp) if duzp else datum_vystaveni
+    font_path, font_path_bold = fonts
 
     try:
-        _name = supplier_name or 'Ing. Martin Cieślar'
-        _addr = supplier_address or 'Porubská 1, 742 83 Klimkovice – Václavovice'
-        _ico = supplier_ico or '04830661'
-        _bank_name = (supplier_bank_name or '').strip() or 'ČSOB'
-        # Zobrazení účtu: pouze český formát (předčíslí-číslo/kód_banky), bez IBAN/SWIFT
-        _account_display = (bank_account or '').strip()
-        if not _account_display and bank_iban:
-            _account_display = (bank_iban or '').strip()
-        _phone = (supplier_phone or '').strip()
-        _email = (supplier_email or '').strip()
-        zivnost = (supplier_trade_register or '').strip() or 'Fyzická osoba zapsaná v Živnostenském rejstříku vedeném na Magistrátu města Ostrava.'
-        dph_text = 'Nejsem plátce DPH.'
-
-        # IBAN pro QR: preferujeme vyplněný bank_iban, jinak převod z CZ účtu
-        iban_for_qr = (bank_iban or '').replace(' ', '').strip()
-        if not iban_for_qr and bank_account and '/' in str(bank_account):
-            iban_for_qr = _cz_account_to_iban(bank_account)
-        if iban_for_qr and not iban_for_qr.upper().startswith('CZ'):
-            iban_for_qr = 'CZ' + iban_for_qr
-
-        class SimpleFPDF(FPDF):
-            def __init__(self, font_path, font_path_bold, *args, **kwargs):
-                super().__init__(*args, **kwargs)
-                self._font_path = font_path
-                self._font_path_bold = font_path_bold
-
-            def header(self):
-                self.set_font('DejaVu', 'B', 16)
-                self.cell(0, 8, 'FAKTURA', 0, 0, 'L')
-                self.cell(0, 8, 'DOKLAD Č. {}'.format(cislo_faktury), 0, 1, 'R')
-                self.ln(4)
-
-            def footer(self):
-                self.set_y(-28)
-                self.set_font('DejaVu', '', 8)
-                self.cell(0, 5, 'Vystavil: {}'.format(_name), 0, 1, 'L')
-                self.cell(0, 5, 'Telefon: {}'.format(_phone or '—'), 0, 1, 'L')
-                self.cell(0, 5, 'E-mail: {}'.format(_email or '—'), 0, 1, 'L')
-                self.ln(2)
-                self.cell(0, 5, 'DokuCheck | www.dokucheck.cz', 0, 1, 'C')
-
-        pdf = SimpleFPDF(font_path, font_path_bold)
-        pdf.add_font('DejaVu', '', font_path, uni=True)
-        pdf.add_font('DejaVu', 'B', font_path_bold or font_path, uni=True)
+        pdf = layout_class(cislo_faktury, supplier)
+        pdf.add_font('DejaVu', '', font_path)
+        pdf.add_font('DejaVu', 'B', font_path_bold or font_path)
+        for font in pdf.fonts.values():
+            # fpdf při output() font podmnožinuje a ukládá znovu; s přepočtem bboxů by rozbalil a znovu
+            # zkompiloval každý glyf. Zúžený font má bboxy správně, glyfy se jen vyberou.
+            if getattr(font, 'ttfont', None) is not None:
+                font.ttfont.recalcBBoxes = False
         pdf.add_page()
         pdf.set_auto_page_break(True, margin=28)
         pdf.set_font('DejaVu', '', 10)
@@ -238,7 +375,8 @@ def generate_invoice_pdf(order_id, jmeno_firma, ico, email, tarif, amount_czk,
         pdf.set_font('DejaVu', 'B', 10)
         pdf.cell(0, 6, 'Dodavatel', 0, 1)
         pdf.set_font('DejaVu', '', 9)
-        pdf.multi_cell(0, 5, '{}\n{}\nIČ: {}\n{}\n{}'.format(_name, _addr, _ico, zivnost, dph_text))
+        pdf.multi_cell(0, 5, '{}\n{}\nIČ: {}\n{}\n{}'.format(supplier['name'], supplier['address'], supplier['ico'],
+                                                            supplier['trade_register'], supplier['dph_text']))
         pdf.ln(4)
 
         pdf.set_font('DejaVu', 'B', 10)
@@ -260,8 +398,8 @@ def generate_invoice_pdf(order_id, jmeno_firma, ico, email, tarif, amount_czk,
         pdf.set_font('DejaVu', 'B', 10)
         pdf.cell(0, 6, 'Platební údaje', 0, 1)
         pdf.set_font('DejaVu', '', 9)
-        pdf.cell(0, 5, 'Banka: {}'.format(_bank_name), 0, 1)
-        pdf.cell(0, 5, 'Číslo účtu: {}'.format(_account_display or '—'), 0, 1)
+        pdf.cell(0, 5, 'Banka: {}'.format(supplier['bank_name']), 0, 1)
+        pdf.cell(0, 5, 'Číslo účtu: {}'.format(supplier['account_display'] or '—'), 0, 1)
         pdf.cell(0, 5, 'Variabilní symbol: {}'.format(variabilni_symbol), 0, 1)
         pdf.ln(3)
 
@@ -301,26 +439,17 @@ def generate_invoice_pdf(order_id, jmeno_firma, ico, email, tarif, amount_czk,
         pdf.ln(8)
 
         # QR kód SPAYD (dolní část faktury)
-        spayd = _spayd_string(iban_for_qr, amount_czk, variabilni_symbol, 'Faktura {}'.format(cislo_faktury))
+        spayd = _spayd_string(supplier['iban_for_qr'], amount_czk, variabilni_symbol, 'Faktura {}'.format(cislo_faktury))
         if spayd:
             try:
                 import qrcode
-                qr = qrcode.QRCode(version=1, box_size=3, border=2)
+                # Pevná maska: výběr nejlepší z 8 masek stojí víc než zbytek faktury; čtečky přečtou každou
+                qr = qrcode.QRCode(version=1, box_size=3, border=2, mask_pattern=QR_MASK_PATTERN)
                 qr.add_data(spayd)
                 qr.make(fit=True)
                 img = qr.make_image(fill_color='black', back_color='white')
-                buf = io.BytesIO()
-                img.save(buf, format='PNG')
-                buf.seek(0)
-                qr_path = os.path.join(save_dir, '_qr_temp_{}.png'.format(order_id))
-                with open(qr_path, 'wb') as f:
-                    f.write(buf.getvalue())
-                if os.path.isfile(qr_path):
-                    pdf.image(qr_path, x=10, y=pdf.get_y(), w=42)
-                    try:
-                        os.remove(qr_path)
-                    except Exception:
-                        pass
+                # PIL obrázek přímo do fpdf – bez kódování a dekódování PNG
+                pdf.image(getattr(img, 'get_image', lambda: img)(), x=10, y=pdf.get_y(), w=42)
             except Exception as e:
                 logger.warning('[invoice_generator] QR kód: %s', e)
                 pdf.cell(0, 6, 'QR platba (SPAYD): účet nebyl k dispozici nebo chyba generování.', 0, 1)
@@ -337,3 +466,75 @@ def generate_invoice_pdf(order_id, jmeno_firma, ico, email, tarif, amount_czk,
         logger.error('[invoice_generator] Chyba pri generovani PDF: %s', e)
         logger.error(traceback.format_exc())
         return None
+
+
+def generate_invoice_pdf(order_id, jmeno_firma, ico, email, tarif, amount_czk,
+                         supplier_name, supplier_address, supplier_ico, bank_iban, bank_account,
+                         invoice_number=None, supplier_trade_register=None, output_dir=None,
+                         supplier_bank_name=None, supplier_phone=None, supplier_email=None, vs=None,
+                         buyer_ulice=None, buyer_mesto=None, buyer_psc=None, buyer_dic=None,
+                         duzp=None):
+    """
+    Vygeneruje PDF fakturu (daňový doklad) pro neplátce DPH.
+    Redesign: hlavička FAKTURA vlevo / DOKLAD Č. vpravo, sloupce Dodavatel|Odběratel,
+    platební blok, tabulka "Fakturujeme Vám za:", CELKEM K ÚHRADĚ, pata Vystavil/Telefon/E-mail, QR kód dole.
+    Pro QR platbu: pokud je bank_iban vyplněn, použije se; jinak se z bank_account (172912882/0300) převede na IBAN.
+    Unicode font (DejaVu/Arial). Při chybě vrátí None a zapíše do logu.
+    """
+    supplier = dict(supplier_name=supplier_name, supplier_address=supplier_address, supplier_ico=supplier_ico,
+                    bank_iban=bank_iban, bank_account=bank_account, supplier_trade_register=supplier_trade_register,
+                    supplier_bank_name=supplier_bank_name, supplier_phone=supplier_phone, supplier_email=supplier_email)
+    invoice = dict(order_id=order_id, jmeno_firma=jmeno_firma, ico=ico, email=email, tarif=tarif,
+                   amount_czk=amount_czk, invoice_number=invoice_number, vs=vs, buyer_ulice=buyer_ulice,
+                   buyer_mesto=buyer_mesto, buyer_psc=buyer_psc, buyer_dic=buyer_dic, duzp=duzp)
+    return render_invoices([invoice], supplier, output_dir=output_dir)[0]
+
+
+def _render_chunk(invoices, supplier, save_dir):
+    """Vykreslí seznam faktur v tomto procesu (jeden font, jedna třída rozvržení). Vrací [cesta | None]."""
+    layout_class = _get_layout_class()
+    if layout_class is None:
+        return [None] * len(invoices)
+    fonts = _invoice_fonts(_invoice_chars(supplier, invoices))
+    if not fonts[0]:
+        logger.error('[invoice_generator] Nenalezen font s Unicode. Přidejte web_app/fonts/DejaVuSans.ttf')
+        return [None] * len(invoices)
+    return [_render_invoice(layout_class, fonts, supplier, save_dir, **inv) for inv in invoices]
+
+
+def render_invoices(invoices, supplier, output_dir=None, workers=None):
+    """
+    Hromadné vykreslení faktur. invoices = [dict s parametry odběratele jako generate_invoice_pdf
+    (order_id, jmeno_firma, ico, email, tarif, amount_czk, invoice_number, vs, buyer_*, duzp)],
+    supplier = dict s parametry dodavatele (supplier_name, ..., bank_iban, bank_account).
+    Vrací seznam cest ve stejném pořadí (None = faktura se nepodařila). workers (None = INVOICE_RENDER_WORKERS)
+    > 1 a aspoň POOL_MIN_INVOICES faktur = dávka se rozdělí do procesů; pokud pool nejde spustit, vykreslí se v procesu.
+    """
+    if workers is None:
+        workers = configured_render_workers()
+    invoices = [dict(inv) for inv in invoices]
+    if not invoices:
+        return []
+    save_dir = _prepare_save_dir(output_dir)
+    if save_dir is None:
+        return [None] * len(invoices)
+    prepared = prepare_supplier(**supplier)
+    workers = max(1, min(int(workers or 1), os.cpu_count() or 1))
+    if workers > 1 and len(invoices) >= POOL_MIN_INVOICES:
+        # Znaky celé dávky předem: zúžený font se uloží jednou a workery ho jen načtou z FONT_CACHE_DIR
+        _invoice_fonts(_invoice_chars(prepared, invoices))
+        size = -(-len(invoices) // workers)
+        chunks = [invoices[i:i + size] for i in range(0, len(invoices), size)]
+        try:
+            # Volá se z vláknového web procesu (outbox, analyzační úlohy, SQLite) – fork by zdědil zamčené zámky,
+            # proto forkserver / spawn jako v analysis_pool
+            methods = multiprocessing.get_all_start_methods()
+            ctx = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            with ProcessPoolExecutor(max_workers=len(chunks), mp_context=ctx) as executor:
+                results = []
+                for part in executor.map(_render_chunk, chunks, [prepared] * len(chunks), [save_dir] * len(chunks)):
+                    results.extend(part)
+                return results
+        except Exception as e:
+            logger.warning('[invoice_generator] Process pool nelze použít, faktury se vykreslí v procesu: %s', e)
+    return _render_chunk(invoices, prepared, save_dir)
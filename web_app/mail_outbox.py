@@ -0,0 +1,245 @@
+# mail_outbox.py
+# Odchozí pošta na pozadí: fronta v SQLite (mail_outbox), jedno přihlášené SMTP spojení pro mnoho zpráv
+# Build 41 | © 2025 Ing. Martin Cieślar
+#
+# - admin (hromadné odeslání platebních údajů) zprávy jen zařadí a hned se vrátí
+# - odesílací vlákno si bere dávky zpráv, posílá je přes jedno spojení (drží se otevřené MAIL_IDLE_SECONDS)
+# - dočasné chyby (výpadek spojení, 4xx) se opakují s exponenciálním odstupem, trvalé 5xx u příjemce ne
+# - po odeslání zápis do email_logs a změna stavu objednávky (Database.finish_mail), vše mimo request
+# - vlákno se v každém procesu spouští z before_request (start_mail_outbox), takže zprávy čekající ve frontě
+#   (odložené pokusy, vrácené po pádu) se po reloadu workeru odešlou i bez nového zařazení
+#
+# Konfigurace (proměnné prostředí):
+#   MAIL_RATE_PER_MINUTE   strop propustnosti JEDNOHO procesu (výchozí 60 zpráv/min; 0 = bez omezení) – každý
+#                          worker webu má vlastní odesílací vlákno, při N workerech je celkový strop N× vyšší;
+#                          limit SMTP serveru proto vydělte počtem workerů
+#   MAIL_BATCH_SIZE        kolik zpráv si vlákno převezme najednou (výchozí 20; nejvýš tolik, kolik projde za minutu)
+#   MAIL_MAX_ATTEMPTS      počet pokusů před označením 'failed' (výchozí 5)
+
+import logging
+import os
+import smtplib
+import socket
+import threading
+import time
+
+from email_sender import build_message, open_smtp
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RATE_PER_MINUTE = 60
+DEFAULT_BATCH_SIZE = 20
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 30
+RETRY_MAX_SECONDS = 3600
+MAIL_IDLE_SECONDS = 30        # nepoužívané spojení se po této době zavře (servery samy odpojují po ~60 s)
+HOUSEKEEPING_INTERVAL = 60
+IDLE_POLL_INTERVAL = 15.0     # nečinné vlákno budí enqueue; kontrola fronty po této době jen kvůli jiným procesům
+STALE_SENDING_SECONDS = 600
+SENT_RETENTION_SECONDS = 7 * 24 * 3600
+
+
+def _env_int(name, default, minimum=0):
+    try:
+        return max(minimum, int(os.environ.get(name, '').strip() or default))
+    except ValueError:
+        return default
+
+
+def _is_permanent(exc):
+    """Trvalá chyba = opakování nepomůže (neexistující příjemce, odmítnutá zpráva). Chybné přihlášení se opakuje –
+    admin mezitím může opravit nastavení SMTP."""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in exc.recipients.values()]
+        return bool(codes) and all(500 <= code < 600 for code in codes)
+    if isinstance(exc, smtplib.SMTPAuthenticationError):
+        return False
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return 500 <= exc.smtp_code < 600
+    return False
+
+
+class MailOutbox:
+    """
+    Odesílací vlákno nad tabulkou mail_outbox.
+    settings_fn() vrací SMTP parametry (email_sender.smtp_settings) – čte se při každém novém spojení,
+    takže změna v adminu se projeví bez restartu.
+    """
+
+    def __init__(self, db_factory, settings_fn, rate_per_minute=None, batch_size=None, max_attempts=None):
+        self._db_factory = db_factory
+        self._db = None
+        self._settings_fn = settings_fn
+        self.rate_per_minute = _env_int('MAIL_RATE_PER_MINUTE', DEFAULT_RATE_PER_MINUTE) if rate_per_minute is None else rate_per_minute
+        self.batch_size = _env_int('MAIL_BATCH_SIZE', DEFAULT_BATCH_SIZE, 1) if batch_size is None else batch_size
+        self.max_attempts = _env_int('MAIL_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS, 1) if max_attempts is None else max_attempts
+        self._wakeup = threading.Event()
+        self._started_pid = None
+        self._start_lock = threading.Lock()
+        self._last_housekeeping = 0.0
+        self._server = None
+        self._server_used_at = 0.0
+        self._next_send_at = 0.0
+        self._counters = {'connections': 0, 'sent': 0, 'retried': 0, 'failed': 0}
+
+    @property
+    def db(self):
+        if self._db is None:
+            with self._start_lock:
+                if self._db is None:
+                    self._db = self._db_factory()
+        return self._db
+
+    def ensure_started(self):
+        """Spustí odesílací vlákno v tomto procesu (líně – z before_request, při zařazení nebo z metrics)."""
+        if self._started_pid == os.getpid():
+            return
+        self.db
+        with self._start_lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+            # Spojení zděděné přes fork nepatří tomuto procesu
+            self._server = None
+            worker = f'{socket.gethostname()}:{os.getpid()}'
+            threading.Thread(target=self._sender_loop, args=(worker,), name='mail-outbox', daemon=True).start()
+
+    def enqueue(self, recipient, subject, body_plain, body_html=None, attachment_path=None,
+                attachment_filename=None, order_id=None, order_status_on_success=None, skip_if_pending=False):
+        """
+        Zařadí e-mail (patička už má být připojená). Vrací id ve frontě, nebo None.
+        skip_if_pending: pro objednávku, která už stejný e-mail ve frontě má, se nic nezařadí (None).
+        """
+        self.ensure_started()
+        mail_id = self.db.enqueue_mail(recipient, subject, body_plain, body_html, attachment_path,
+                                       attachment_filename, order_id, order_status_on_success,
+                                       skip_if_pending=skip_if_pending)
+        if mail_id is not None:
+            self._wakeup.set()
+        return mail_id
+
+    # --- odesílání ---
+
+    def _sender_loop(self, worker):
+        while True:
+            try:
+                self._housekeeping()
+                batch = self.db.claim_mail_batch(worker, self._claim_limit())
+                if not batch:
+                    # Signál z enqueue mezi dotazem a clear() by se ztratil – po clear() se zeptat ještě jednou
+                    self._wakeup.clear()
+                    batch = self.db.claim_mail_batch(worker, self._claim_limit())
+                if not batch:
+                    self._close_if_idle()
+                    # Jiný proces mohl zprávy zařadit (nebo uplynul odklad pokusu) – budíme se i bez signálu
+                    self._wakeup.wait(IDLE_POLL_INTERVAL)
+                    continue
+                claimed_at = time.monotonic()
+                for mail in batch:
+                    if time.monotonic() - claimed_at > HOUSEKEEPING_INTERVAL:
+                        # Pomalá dávka (nízký strop, SMTP timeouty) – nepřevzaté zprávy nesmí housekeeping vrátit do fronty
+                        self.db.refresh_mail_claim(worker)
+                        claimed_at = time.monotonic()
+                    self._send_one(mail)
+            except Exception as e:
+                logger.error('Odchozí pošta %s: %s', worker, e)
+                self._disconnect()
+                time.sleep(1.0)
+
+    def _claim_limit(self):
+        """Dávka nejvýš na minutu provozu – převzaté zprávy neleží ve stavu 'sending' déle, než je nutné."""
+        if self.rate_per_minute <= 0:
+            return self.batch_size
+        return max(1, min(self.batch_size, self.rate_per_minute))
+
+    def _throttle(self):
+        if self.rate_per_minute <= 0:
+            return
+        delay = self._next_send_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_send_at = max(self._next_send_at, time.monotonic()) + 60.0 / self.rate_per_minute
+
+    def _send_one(self, mail):
+        self._throttle()
+        try:
+            settings = self._settings_fn()
+            if not settings:
+                raise RuntimeError('SMTP není nastaveno (MAIL_SERVER / MAIL_USERNAME)')
+            msg = build_message(settings['from_addr'], mail['recipient'], mail['subject'], mail['body_plain'],
+                                mail.get('body_html'), mail.get('attachment_path'), mail.get('attachment_filename'))
+            try:
+                self._connection(settings).send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                # Server zavřel nečinné spojení dřív, než jsme čekali – jeden pokus s novým
+                self._disconnect()
+                self._connection(settings).send_message(msg)
+            self._server_used_at = time.monotonic()
+        except Exception as e:
+            if isinstance(e, (smtplib.SMTPServerDisconnected, OSError, smtplib.SMTPAuthenticationError)):
+                self._disconnect()
+            self._fail(mail, e)
+            return
+        self.db.finish_mail(mail['id'])
+        self._counters['sent'] += 1
+
+    def _fail(self, mail, exc):
+        permanent = _is_permanent(exc)
+        if permanent or mail['attempts'] >= self.max_attempts:
+            logger.warning('[SMTP] %s: zpráva %s definitivně neodeslána (%s)', mail['recipient'], mail['id'], exc)
+            self.db.finish_mail(mail['id'], error=exc)
+            self._counters['failed'] += 1
+            return
+        backoff = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (mail['attempts'] - 1))
+        logger.info('[SMTP] %s: pokus %s selhal (%s), další za %s s', mail['recipient'], mail['attempts'], exc, backoff)
+        self.db.finish_mail(mail['id'], error=exc, retry_at=time.time() + backoff)
+        self._counters['retried'] += 1
+
+    def _connection(self, settings):
+        if self._server is not None and time.monotonic() - self._server_used_at > MAIL_IDLE_SECONDS / 2:
+            # Po delší pauze ověřit, že server spojení nezavřel
+            try:
+                if self._server.noop()[0] != 250:
+                    self._disconnect()
+            except (smtplib.SMTPException, OSError):
+                self._disconnect()
+        if self._server is None:
+            self._server = open_smtp(settings)
+            self._server_used_at = time.monotonic()
+            self._counters['connections'] += 1
+        return self._server
+
+    def _close_if_idle(self):
+        if self._server is not None and time.monotonic() - self._server_used_at > MAIL_IDLE_SECONDS:
+            self._disconnect()
+
+    def _disconnect(self):
+        server, self._server = self._server, None
+        if server is None:
+            return
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            try:
+                server.close()
+            except OSError:
+                pass
+
+    def _housekeeping(self):
+        now = time.monotonic()
+        if now - self._last_housekeeping < HOUSEKEEPING_INTERVAL:
+            return
+        self._last_housekeeping = now
+        requeued = self.db.requeue_stale_mail(STALE_SENDING_SECONDS)
+        purged = self.db.purge_sent_mail(SENT_RETENTION_SECONDS)
+        if requeued or purged:
+            logger.info('Odchozí pošta: %s zpráv vráceno do fronty, %s starých odeslaných smazáno', requeued, purged)
+
+    def metrics(self):
+        """Stav fronty (všechny procesy) a počítadla odesílacího vlákna tohoto procesu."""
+        self.ensure_started()
+        stats = self.db.get_mail_outbox_stats()
+        stats.update(self._counters)
+        stats['rate_per_minute'] = self.rate_per_minute
+        stats['batch_size'] = self.batch_size
+        return stats
@@ -7,7 +7,7 @@
 #
 # Spuštění: python pdf_check_web_main.py
 
-from flask import Flask, request, jsonify, render_template_string, render_template, Response, redirect, url_for, session, flash, current_app, send_from_directory, make_response
+from flask import Flask, Request, request, jsonify, render_template_string, render_template, Response, redirect, url_for, session, flash, current_app, send_from_directory, make_response
 import io
 import logging
 import re
@@ -15,8 +15,10 @@ import os
 import sys
 import traceback
 import json
+import queue
 import subprocess
 import threading
+import time
 import webbrowser
 
 # Nejdřív musí být ve sys.path složka web_app (tento soubor), jinak „import version“ může načíst
@@ -51,13 +53,18 @@ def _dbg(hypothesis_id: str, message: str, data: dict | None = None, run_id: str
 from api_endpoint import register_api_routes, consume_one_time_token
 from database import Database
 try:
-    from settings_loader import get_pricing_tarifs, get_email_order_confirmation_subject, load_settings_for_views, DEFAULT_PRICING_TARIFS
+    from settings_loader import get_pricing_tarifs, get_email_order_confirmation_subject, load_settings_for_views, DEFAULT_PRICING_TARIFS, get_analysis_timeout_seconds
 except ImportError:
-    get_pricing_tarifs = get_email_order_confirmation_subject = load_settings_for_views = None
+    get_pricing_tarifs = get_email_order_confirmation_subject = load_settings_for_views = get_analysis_timeout_seconds = None
     DEFAULT_PRICING_TARIFS = {"basic": {"label": "BASIC", "amount_czk": 1090}, "standard": {"label": "PRO", "amount_czk": 1590}}
 
 # NOVÉ: Admin systém
 from admin_routes import admin_bp, get_db, admin_required
+from analysis_pool import get_pool, get_pool_metrics, configured_workers
+from analysis_jobs import AnalysisJobRunner
+from mail_outbox import MailOutbox
+from email_sender import smtp_settings
+from result_cache import ResultCache, content_hash
 from version import (
     WEB_BUILD,
     WEB_VERSION,
@@ -97,7 +104,15 @@ def kill_port(port=5000):
     except:
         pass
 
+class _InMemoryUploadRequest(Request):
+    """Nahrané soubory drží werkzeug v paměti (BytesIO) místo dočasného souboru – upload nejde na disk."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return io.BytesIO()
+
+
 app = Flask(__name__, template_folder='templates')
+app.request_class = _InMemoryUploadRequest
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024
 
 
@@ -128,6 +143,23 @@ def admin_mobile_service_worker():
     resp.headers['Cache-Control'] = 'no-store'
     return resp
 
+
+@app.route('/admin/api/analysis-pool', methods=['GET'])
+@admin_required
+def admin_analysis_pool_metrics():
+    """Metriky analyzačního poolu (hloubka fronty, vytížení workerů, timeouty) a fronty úloh."""
+    out = get_pool_metrics()
+    try:
+        out['jobs'] = analysis_jobs.metrics()
+    except Exception as e:
+        out['jobs'] = {'error': str(e)}
+    try:
+        out['mail_outbox'] = mail_outbox.metrics()
+    except Exception as e:
+        out['mail_outbox'] = {'error': str(e)}
+    out['cache'] = result_cache.stats()
+    return jsonify(out)
+
 # Kanonická doména a HTTPS (obcházení problému s DNS přesměrováním na Wedosu)
 CANONICAL_HOST = 'www.dokucheck.cz'
 BARE_DOMAIN = 'dokucheck.cz'
@@ -261,7 +293,7 @@ app.config['SESSION_COOKIE_SECURE'] = os.environ.get('SESSION_COOKIE_SECURE', ''
 app.config['SESSION_COOKIE_HTTPONLY'] = True
 app.config['PERMANENT_SESSION_LIFETIME'] = 86400  # 24 hodin
 
-# Flask-Mail – SMTP (výchozí objednavky@dokucheck.cz; příjemce notifikací objednavky@)
+# SMTP pro email_sender a MailOutbox (smtp_settings; výchozí objednavky@dokucheck.cz, notifikace objednavky@)
 # MAIL_USERNAME a MAIL_PASSWORD: na PythonAnywhere → Web → Environment variables (nebo WSGI)
 app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.seznam.cz')
 app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', '465') or 465)
@@ -269,11 +301,20 @@ app.config['MAIL_USE_SSL'] = True
 app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'objednavky@dokucheck.cz')
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', '')
 app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'DokuCheck Objednávky <objednavky@dokucheck.cz>')
-try:
-    from flask_mail import Mail
-    mail = Mail(app)
-except ImportError:
-    mail = None
+
+# Odchozí pošta na pozadí (hromadné e-maily z adminu) – SMTP parametry z app.config,
+# které before_request doplňuje z nastavení v DB
+mail_outbox = MailOutbox(Database, lambda: smtp_settings(app.config))
+app.extensions['mail_outbox'] = mail_outbox
+
+
+@app.before_request
+def start_mail_outbox():
+    """Odesílací vlákno v každém procesu workeru – po reloadu dořeší zprávy, které už ve frontě čekají."""
+    try:
+        mail_outbox.ensure_started()
+    except Exception:
+        pass
 
 # =============================================================================
 # HTML ŠABLONA - NOVÝ DESIGN V26 se splash screenem
@@ -1717,27 +1758,40 @@ function scanDiskFolder() {
     progressFile.textContent = '—';
     progressModal.classList.add('visible');
     
-    // SSE pro průběžný progress
+    // SSE: výsledek každého souboru chodí hned (v pořadí dokončení, seq = pořadí ve výčtu)
     const eventSource = new EventSource('/api/scan-folder-stream?path=' + encodeURIComponent(selectedDiskPath));
+    const batch = { id: ++batchCounter, name: selectedDiskPath.split(/[\\\\/]/).pop(), timestamp: new Date().toLocaleTimeString().slice(0,5), files: [], collapsed: false };
+    let batchShown = false;
+    let renderTimer = null;
+    function flushDiskBatch() {
+        renderTimer = null;
+        if (!batchShown) { batches.push(batch); batchShown = true; }
+        renderResults();
+        updateFilterLists();
+    }
     
     eventSource.onmessage = function(e) {
         const data = JSON.parse(e.data);
         
-        if (data.type === 'progress') {
-            const percent = Math.round((data.current / data.total) * 100);
-            progressBar.style.width = percent + '%';
-            progressText.textContent = data.current + ' / ' + data.total + ' (' + percent + '%)';
+        if (data.type === 'result') {
+            data.result._seq = data.seq;
+            batch.files.push(data.result);
+            if (!renderTimer) renderTimer = setTimeout(flushDiskBatch, 500);
+        } else if (data.type === 'progress') {
+            if (data.total) {
+                const percent = Math.round((data.current / data.total) * 100);
+                progressBar.style.width = percent + '%';
+                progressText.textContent = data.current + ' / ' + data.total + ' (' + percent + '%)';
+            } else {
+                progressText.textContent = data.current + ' / …';
+            }
             progressFile.textContent = data.file;
         } else if (data.type === 'complete') {
             eventSource.close();
             progressModal.classList.remove('visible');
-            
-            if (data.results && data.results.length > 0) {
-                const batch = { id: ++batchCounter, name: selectedDiskPath.split(/[\\\\/]/).pop(), timestamp: new Date().toLocaleTimeString().slice(0,5), files: data.results, collapsed: false };
-                batches.push(batch);
-                renderResults();
-                updateFilterLists();
-            }
+            if (renderTimer) { clearTimeout(renderTimer); renderTimer = null; }
+            batch.files.sort(function(a, b) { return a._seq - b._seq; });
+            if (batch.files.length > 0) flushDiskBatch();
         } else if (data.type === 'error') {
             eventSource.close();
             progressModal.classList.remove('visible');
@@ -3502,35 +3556,18 @@ def _enrich_signatures_tsa_qualified(result):
             sig['name'] = sig.get('signer', '—')
 
 
-def _get_pdfa_details(content):
-    """Doplňková web metadata: verze PDF a úroveň PDF/A."""
-    pdf_version = ''
-    conformance = ''
-    try:
-        pdf_header = re.search(rb'%PDF-(\d+\.\d+)', content[:100])
-        if pdf_header:
-            pdf_version = pdf_header.group(1).decode('ascii')
-    except Exception:
-        pass
-    try:
-        conf_match = re.search(rb"pdfaid:conformance=['\"]?([ABUYabuy])['\"]?", content, re.IGNORECASE)
-        if conf_match:
-            conformance = conf_match.group(1).decode('ascii').lower()
-        if not conformance:
-            for level in (b'PDF/A-3y', b'PDF/A-3u', b'PDF/A-3b', b'PDF/A-3a'):
-                if level in content:
-                    conformance = level.decode('ascii')[-1].lower()
-                    break
-    except Exception:
-        pass
-    try:
-        pdfa_info = check_pdfa_version(content)
-        if isinstance(pdfa_info, tuple) and pdfa_info:
-            part = pdfa_info[0]
-        else:
-            part = None
-    except Exception:
-        part = None
+def _get_pdfa_details(content=None, markers=None):
+    """Doplňková web metadata: verze PDF a úroveň PDF/A.
+    markers = výsledek sdíleného průchodu značkami (pdf_format z engine); content jen jako záloha."""
+    if markers is None:
+        try:
+            from desktop_agent.pdf_checker import scan_pdfa_markers
+            markers = scan_pdfa_markers(content or b'')
+        except Exception:
+            markers = {}
+    pdf_version = markers.get('pdf_version') or ''
+    conformance = markers.get('conformance') or ''
+    part = markers.get('part')
     if part == 3 and conformance:
         pdfa_level = f'A-3{conformance}'
     elif part:
@@ -3544,7 +3581,41 @@ def _get_pdfa_details(content):
     }
 
 
-def _flatten_shared_result(wrapped, content, fallback_name='upload.pdf'):
+def _pdfa_markers_from_result(wrapped):
+    """Značky PDF/A, které engine zjistil při analýze (results.pdf_format) – bez nového čtení obsahu."""
+    pdf_format = ((wrapped or {}).get('results') or {}).get('pdf_format') or {}
+    if 'pdf_version' not in pdf_format and 'conformance' not in pdf_format:
+        return None
+    m = re.search(r'PDF/A-(\d)', str(pdf_format.get('exact_version') or ''))
+    return {
+        'pdf_version': pdf_format.get('pdf_version'),
+        'conformance': pdf_format.get('conformance'),
+        'part': int(m.group(1)) if m else None,
+    }
+
+
+def _pdfa_markers_for_web(wrapped, content=None, filepath=None):
+    """
+    Značky PDF/A pro web detaily. U malých souborů je engine prošel celé (results.pdf_format);
+    nad limitem byte-scanu viděl engine jen začátek + konec, proto se skenuje celý obsah
+    (buffer uploadu, u souboru z disku jeho obsah) – XMP velkých výkresů bývá uprostřed.
+    """
+    markers = _pdfa_markers_from_result(wrapped)
+    try:
+        from desktop_agent.pdf_checker import is_chunk_scanned, scan_pdfa_markers
+        if markers is not None and not is_chunk_scanned((wrapped or {}).get('file_size')):
+            return markers
+        if content is None and filepath:
+            with open(filepath, 'rb') as f:
+                content = f.read()
+        if content is not None:
+            return scan_pdfa_markers(content if isinstance(content, (bytes, bytearray)) else bytes(content))
+    except Exception:
+        pass
+    return markers
+
+
+def _flatten_shared_result(wrapped, content=None, fallback_name='upload.pdf', filepath=None):
     """Převede wrapped výstup sdíleného engine na plochý tvar očekávaný web UI."""
     if not isinstance(wrapped, dict) or not wrapped.get('success'):
         return {
@@ -3561,7 +3632,7 @@ def _flatten_shared_result(wrapped, content, fallback_name='upload.pdf'):
             'issr_compatible': True,
             'error': (wrapped or {}).get('error', 'Analyzer error')
         }
-    details = _get_pdfa_details(content)
+    details = _get_pdfa_details(content, markers=_pdfa_markers_for_web(wrapped, content, filepath))
     results = wrapped.get('results', {})
     signatures = (results.get('signatures') or []) if isinstance(results, dict) else []
     signature_objs = [s for s in signatures if s.get('type') == 'SIGNATURE']
@@ -3618,8 +3689,57 @@ def _flatten_shared_result(wrapped, content, fallback_name='upload.pdf'):
     }
 
 
-def analyze_pdf_from_content(content):
-    """Analýza PDF z bajtů přes sdílený desktop engine + web adaptér."""
+def _analysis_timeout(db=None):
+    """Tvrdý časový limit analýzy jednoho souboru (global_settings.analysis_timeout_seconds)."""
+    if get_analysis_timeout_seconds is None:
+        return None
+    try:
+        return get_analysis_timeout_seconds(db or Database())
+    except Exception:
+        return None
+
+
+# Cache výsledků engine podle SHA-256 obsahu + verze engine (opakované nahrání stejného PDF)
+result_cache = ResultCache(Database)
+
+
+def _engine_analyze_contents(items, timeout=None):
+    """
+    [(filename, content), ...] -> wrapped výsledky engine ve vstupním pořadí.
+    Nejdřív cache; chybějící soubory paralelně v analyzačním poolu, bez poolu v procesu webu.
+    """
+    hashes = [content_hash(content) for _, content in items]
+    wrapped = [result_cache.get(h, filename=name) for h, (name, _) in zip(hashes, items)]
+    missing = [i for i, w in enumerate(wrapped) if w is None]
+    if not missing:
+        return wrapped
+    pool = get_pool()
+    if pool is not None:
+        jobs = [('bytes', bytes(items[i][1]), items[i][0]) for i in missing]
+        if len(jobs) > 1:
+            outputs = pool.map(jobs, timeout=timeout)
+        else:
+            outputs = [pool.run(*jobs[0], timeout=timeout)]
+    else:
+        from desktop_agent import pdf_checker as shared_engine
+        try:
+            from desktop_agent.tsa_registry import is_tsa_issuer_qualified as _q
+            shared_engine.is_tsa_issuer_qualified = _q
+        except Exception:
+            pass
+        outputs = [shared_engine.analyze_pdf_bytes(items[i][1], filename=items[i][0]) for i in missing]
+    for i, out in zip(missing, outputs):
+        wrapped[i] = out
+        result_cache.put(hashes[i], out)
+    return wrapped
+
+
+def analyze_pdf_from_content(content, filename='upload.pdf', timeout=None):
+    """
+    Analýza PDF z bajtů přes sdílený desktop engine + web adaptér. Celá v paměti – bez dočasného souboru.
+    Běží v analyzačním poolu (izolovaný proces s tvrdým timeoutem); bez poolu v procesu webu.
+    Stejný obsah se stejnou verzí engine se vrací z cache.
+    """
     try:
         # H1: desktop_agent import / sys.path / cwd
         _dbg("H1", "analyze_pdf_from_content:enter", {
@@ -3627,7 +3747,6 @@ def analyze_pdf_from_content(content):
             "cwd": os.getcwd(),
             "project_root_in_syspath": _PROJECT_ROOT in sys.path,
         })
-        import tempfile
         try:
             from desktop_agent import pdf_checker as shared_engine
             _dbg("H1", "analyze_pdf_from_content:import_desktop_agent_ok", {"desktop_agent_module": getattr(shared_engine, "__name__", "pdf_checker")})
@@ -3639,30 +3758,32 @@ def analyze_pdf_from_content(content):
             shared_engine.is_tsa_issuer_qualified = _q
         except Exception:
             pass
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-            tmp.write(content)
-            tmp_path = tmp.name
-        try:
-            _dbg("H4", "analyze_pdf_from_content:tmp_written", {"tmp_path": tmp_path, "tmp_exists": os.path.exists(tmp_path)})
-            wrapped = shared_engine.analyze_pdf_file(tmp_path)
-            # H3: engine dependency failures will surface here
-            _dbg("H3", "analyze_pdf_from_content:engine_ok", {
-                "wrapped_success": bool(getattr(wrapped, "get", lambda *_: None)("success")) if isinstance(wrapped, dict) else None,
-                "wrapped_keys": list(wrapped.keys())[:20] if isinstance(wrapped, dict) else None,
-            })
-        finally:
-            try:
-                os.remove(tmp_path)
-            except OSError:
-                pass
-        return _flatten_shared_result(wrapped, content, fallback_name='upload.pdf')
+        wrapped = _engine_analyze_contents([(filename, content)], timeout=timeout)[0]
+        # H3: engine dependency failures will surface here
+        _dbg("H3", "analyze_pdf_from_content:engine_ok", {
+            "wrapped_success": bool(getattr(wrapped, "get", lambda *_: None)("success")) if isinstance(wrapped, dict) else None,
+            "wrapped_keys": list(wrapped.keys())[:20] if isinstance(wrapped, dict) else None,
+        })
+        return _flatten_shared_result(wrapped, content, fallback_name=filename)
     except Exception as e:
         _dbg("H2", "analyze_pdf_from_content:exception", {"err_type": type(e).__name__, "err": str(e)})
-        return {'name': 'upload.pdf', 'pdfaVersion': None, 'pdfaStatus': 'FAIL', 'pdfVersion': None, 'pdfaConformance': None, 'pdfaLevel': None, 'sig': 'FAIL', 'signer': '—', 'ckait': '—', 'tsa': 'NONE', 'issr_compatible': True, 'error': str(e)}
+        return {'name': filename, 'pdfaVersion': None, 'pdfaStatus': 'FAIL', 'pdfVersion': None, 'pdfaConformance': None, 'pdfaLevel': None, 'sig': 'FAIL', 'signer': '—', 'ckait': '—', 'tsa': 'NONE', 'issr_compatible': True, 'error': str(e)}
+
+
+def analyze_pdfs_from_contents(items, timeout=None):
+    """Paralelní analýza [(filename, content), ...] v poolu (s cache); výsledky ve vstupním pořadí."""
+    if len(items) < 2:
+        return [analyze_pdf_from_content(content, filename=filename, timeout=timeout) for filename, content in items]
+    try:
+        wrapped_list = _engine_analyze_contents(items, timeout=timeout)
+    except Exception as e:
+        wrapped_list = [{'success': False, 'error': str(e)} for _ in items]
+    return [_flatten_shared_result(wrapped, content, fallback_name=filename)
+            for (filename, content), wrapped in zip(items, wrapped_list)]
 
 
-def analyze_pdf_file(filepath):
-    """Analýza souboru z disku přes sdílený desktop engine + web adaptér."""
+def analyze_pdf_file(filepath, timeout=None):
+    """Analýza souboru z disku přes sdílený desktop engine + web adaptér (v analyzačním poolu, je-li k dispozici)."""
     try:
         from desktop_agent import pdf_checker as shared_engine
         try:
@@ -3670,10 +3791,13 @@ def analyze_pdf_file(filepath):
             shared_engine.is_tsa_issuer_qualified = _q
         except Exception:
             pass
-        wrapped = shared_engine.analyze_pdf_file(filepath)
-        with open(filepath, 'rb') as f:
-            content = f.read()
-        out = _flatten_shared_result(wrapped, content, fallback_name=os.path.basename(filepath))
+        pool = get_pool()
+        if pool is not None:
+            wrapped = pool.analyze_path(filepath, timeout=timeout)
+        else:
+            wrapped = shared_engine.analyze_pdf_file(filepath)
+        # Metadata PDF/A bere adaptér ze značek zjištěných enginem – soubor se znovu čte jen nad limitem byte-scanu
+        out = _flatten_shared_result(wrapped, fallback_name=os.path.basename(filepath), filepath=filepath)
         out['name'] = os.path.basename(filepath)
         return out
     except Exception as e:
@@ -4414,7 +4538,9 @@ def analyze_batch():
                     'limit_exceeded': True
                 }), 429
 
+        # Nejdřív načíst a odfiltrovat, pak všechny platné soubory analyzovat paralelně v poolu
         results = []
+        pending = []
         for file in files:
             if not file.filename or not file.filename.lower().endswith('.pdf'):
                 continue
@@ -4422,10 +4548,14 @@ def analyze_batch():
             if len(content) > ONLINE_DEMO_MAX_FILE_SIZE:
                 results.append({'error': f'{file.filename}: soubor je větší než 2 MB', 'filename': file.filename})
                 continue
-            r = analyze_pdf_from_content(content)
+            pending.append((len(results), file.filename, content))
+            results.append(None)
+        analyzed = analyze_pdfs_from_contents([(name, content) for _, name, content in pending],
+                                              timeout=_analysis_timeout(db))
+        for (idx, name, _), r in zip(pending, analyzed):
             _enrich_signatures_tsa_qualified(r)
-            r['filename'] = file.filename
-            results.append(r)
+            r['filename'] = name
+            results[idx] = r
 
         if not paid_user:
             db.record_web_trial_usage(ip)
@@ -4463,7 +4593,7 @@ def analyze():
                 }), 429
             db.record_web_trial_usage(ip)
         db.insert_activity_log(ip_address=ip, source_type='web_trial', file_count=1)
-        result = analyze_pdf_from_content(content)
+        result = analyze_pdf_from_content(content, filename=file.filename or 'upload.pdf', timeout=_analysis_timeout(db))
         _enrich_signatures_tsa_qualified(result)
         _dbg("H2", "/analyze:ok", {"has_error": bool(result.get("error")), "pdfaStatus": result.get("pdfaStatus"), "sig": result.get("sig")})
         return jsonify(result)
@@ -4517,44 +4647,107 @@ def api_settings():
         return jsonify({'error': str(e)}), 500
 
 
+def _iter_folder_scan(folder_path, timeout=None, workers=None):
+    """
+    Paralelní skenování složky. Výčet (os.walk) běží ve vlastním vlákně souběžně s analýzou,
+    soubory analyzuje `workers` vláken (přes analyzační pool).
+    Generuje ('result', seq, rel_path, result) v pořadí dokončení a jednou ('total', n) po konci výčtu.
+    Při předčasném zavření generátoru (klient odpojen) se zbylé soubory už neanalyzují.
+    """
+    workers = max(1, int(workers or configured_workers() or 1))
+    work = queue.Queue(maxsize=workers * 4)
+    events = queue.Queue()
+    stop = threading.Event()
+
+    def enumerate_files():
+        n = 0
+        try:
+            for root, dirs, files in os.walk(folder_path):
+                if stop.is_set():
+                    break
+                for file in files:
+                    if file.lower().endswith('.pdf'):
+                        work.put((n, os.path.join(root, file)))
+                        n += 1
+        finally:
+            events.put(('total', n))
+            for _ in range(workers):
+                work.put(None)
+
+    def analyse():
+        while True:
+            job = work.get()
+            if job is None:
+                return
+            seq, filepath = job
+            if stop.is_set():
+                continue
+            rel_path = os.path.relpath(filepath, folder_path)
+            result = analyze_pdf_file(filepath, timeout=timeout)
+            result['path'] = rel_path
+            events.put(('result', seq, rel_path, result))
+
+    threading.Thread(target=enumerate_files, name='scan-folder-walk', daemon=True).start()
+    for i in range(workers):
+        threading.Thread(target=analyse, name=f'scan-folder-{i}', daemon=True).start()
+
+    total = None
+    emitted = 0
+    try:
+        while total is None or emitted < total:
+            event = events.get()
+            if event[0] == 'total':
+                total = event[1]
+                yield event
+            else:
+                emitted += 1
+                yield event
+    finally:
+        stop.set()
+
+
+def _scan_aggregates(counters, result):
+    """Přičte výsledek do souhrnných počtů (finální událost nese jen agregace, ne výsledky)."""
+    if result.get('error'):
+        counters['errors'] += 1
+    for key in ('pdfaStatus', 'sig', 'tsa'):
+        bucket = counters[key]
+        value = str(result.get(key) or '—')
+        bucket[value] = bucket.get(value, 0) + 1
+
+
 @app.route('/api/scan-folder-stream')
 def scan_folder_stream():
-    """SSE endpoint pro skenování složky s průběžným progress"""
+    """
+    SSE endpoint pro skenování složky. Každý soubor = vlastní událost 'result' (seq = pořadí ve výčtu,
+    chodí v pořadí dokončení), 'progress' průběžně, 'complete' jen se souhrnem.
+    """
     folder_path = request.args.get('path', '')
     
     if not folder_path or not os.path.isdir(folder_path):
         def error_gen():
             yield f"data: {json.dumps({'type': 'error', 'message': 'Neplatná cesta'})}\n\n"
         return Response(error_gen(), mimetype='text/event-stream')
-    
+
+    timeout = _analysis_timeout()
+
     def generate():
-        # Najdi všechny PDF soubory
-        pdf_files = []
-        for root, dirs, files in os.walk(folder_path):
-            for file in files:
-                if file.lower().endswith('.pdf'):
-                    pdf_files.append(os.path.join(root, file))
-        
-        total = len(pdf_files)
-        if total == 0:
-            yield f"data: {json.dumps({'type': 'complete', 'results': [], 'total': 0})}\n\n"
-            return
-        
-        results = []
-        for i, filepath in enumerate(pdf_files):
-            filename = os.path.basename(filepath)
-            rel_path = os.path.relpath(filepath, folder_path)
-            
-            # Pošli progress
-            yield f"data: {json.dumps({'type': 'progress', 'current': i + 1, 'total': total, 'file': filename})}\n\n"
-            
-            # Analyzuj soubor
-            result = analyze_pdf_file(filepath)
-            result['path'] = rel_path
-            results.append(result)
-        
-        # Pošli výsledky
-        yield f"data: {json.dumps({'type': 'complete', 'results': results, 'total': total})}\n\n"
+        started = time.monotonic()
+        total = None
+        done = 0
+        counters = {'errors': 0, 'pdfaStatus': {}, 'sig': {}, 'tsa': {}}
+        for event in _iter_folder_scan(folder_path, timeout=timeout):
+            if event[0] == 'total':
+                total = event[1]
+                continue
+            _, seq, rel_path, result = event
+            done += 1
+            _scan_aggregates(counters, result)
+            yield f"data: {json.dumps({'type': 'result', 'seq': seq, 'path': rel_path, 'result': result}, ensure_ascii=False)}\n\n"
+            yield f"data: {json.dumps({'type': 'progress', 'current': done, 'total': total, 'file': os.path.basename(rel_path)})}\n\n"
+        complete = {'type': 'complete', 'total': total or 0, 'elapsed_ms': int((time.monotonic() - started) * 1000)}
+        complete.update(counters)
+        yield f"data: {json.dumps(complete)}\n\n"
     
     return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
@@ -4564,17 +4757,149 @@ def scan_folder():
     folder_path = data.get('path', '')
     if not folder_path or not os.path.isdir(folder_path):
         return jsonify({'error': 'Neplatná cesta'}), 400
-    results = []
-    for root, dirs, files in os.walk(folder_path):
-        for file in files:
-            if file.lower().endswith('.pdf'):
-                filepath = os.path.join(root, file)
-                rel_path = os.path.relpath(filepath, folder_path)
-                result = analyze_pdf_file(filepath)
-                result['path'] = rel_path
-                results.append(result)
+    # Stejné paralelní skenování jako stream; odpověď drží pořadí výčtu
+    ordered = {}
+    for event in _iter_folder_scan(folder_path, timeout=_analysis_timeout()):
+        if event[0] == 'result':
+            ordered[event[1]] = event[3]
+    results = [ordered[seq] for seq in sorted(ordered)]
     return jsonify({'results': results, 'total': len(results)})
 
+# =============================================================================
+# ASYNCHRONNÍ ÚLOHY (job_id hned, výsledky po souborech přes SSE / long-poll)
+# =============================================================================
+
+def _job_analyze_upload(name, content, timeout):
+    r = analyze_pdf_from_content(content, filename=name, timeout=timeout)
+    _enrich_signatures_tsa_qualified(r)
+    r['filename'] = name
+    return r
+
+
+def _job_analyze_path(path, rel_path, timeout):
+    r = analyze_pdf_file(path, timeout=timeout)
+    r['path'] = rel_path
+    return r
+
+
+analysis_jobs = AnalysisJobRunner(Database, _job_analyze_upload, _job_analyze_path,
+                                  timeout_fn=lambda: _analysis_timeout(analysis_jobs.db))
+
+JOB_LONG_POLL_MAX_WAIT = 30
+
+
+def _job_payload(job, results):
+    return {
+        'job_id': job['job_id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'total': job['total'],
+        'done': job['done'],
+        'results': results,
+        'next': results[-1]['done_order'] if results else None,
+    }
+
+
+@app.route('/api/jobs', methods=['POST'])
+def create_analysis_job():
+    """
+    Založí asynchronní kontrolu a hned vrátí job_id (202).
+    multipart 'files' = stejné limity jako /analyze-batch; JSON {"path": ...} = složka jako /api/scan-folder.
+    """
+    ip = _get_client_ip()
+    if request.is_json:
+        folder_path = (request.get_json(silent=True) or {}).get('path', '')
+        if not folder_path or not os.path.isdir(folder_path):
+            return jsonify({'error': 'Neplatná cesta'}), 400
+        try:
+            job_id, total = analysis_jobs.submit_folder(folder_path, ip_address=ip)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    else:
+        files = request.files.getlist('files') or request.files.getlist('file') or []
+        if not files:
+            return jsonify({'error': 'Žádné soubory'}), 400
+        if len(files) > WEB_TRIAL_MAX_FILES:
+            return jsonify({'error': f'Maximálně {WEB_TRIAL_MAX_FILES} souborů na jednu kontrolu.', 'limit_exceeded': False}), 400
+        try:
+            db = Database()
+            paid_user = _is_paid_user_from_request(db)
+            if not paid_user:
+                allowed, _ = db.check_web_trial_limit(ip)
+                if not allowed:
+                    return jsonify({
+                        'error': 'Dosáhli jste limitu kontrol za 24 hodin (IP). Pro neomezené kontroly se přihlaste nebo si zakoupte licenci.',
+                        'limit_exceeded': True
+                    }), 429
+            items = []
+            for file in files:
+                if not file.filename or not file.filename.lower().endswith('.pdf'):
+                    continue
+                content = file.read()
+                if len(content) > ONLINE_DEMO_MAX_FILE_SIZE:
+                    items.append({'name': file.filename,
+                                  'result': {'error': f'{file.filename}: soubor je větší než 2 MB', 'filename': file.filename}})
+                    continue
+                items.append({'name': file.filename, 'content': content})
+            if not items:
+                return jsonify({'error': 'Žádné soubory PDF'}), 400
+            job_id = analysis_jobs.submit_uploads(items, ip_address=ip)
+            total = len(items)
+            if not paid_user:
+                db.record_web_trial_usage(ip)
+            db.insert_activity_log(ip_address=ip, source_type='web_trial', file_count=total)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'job_id': job_id,
+        'status': 'queued',
+        'total': total,
+        'status_url': url_for('get_analysis_job', job_id=job_id),
+        'events_url': url_for('analysis_job_events', job_id=job_id),
+    }), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_analysis_job(job_id):
+    """Stav úlohy a výsledky dokončené po ?after=N (done_order). ?wait=S = long-poll až S sekund."""
+    after = request.args.get('after', 0, type=int) or 0
+    wait = min(max(request.args.get('wait', 0, type=float) or 0, 0), JOB_LONG_POLL_MAX_WAIT)
+    job, results = analysis_jobs.wait_for_results(job_id, after=after, wait=wait)
+    if job is None:
+        return jsonify({'error': 'Úloha neexistuje nebo vypršela'}), 404
+    return jsonify(_job_payload(job, results))
+
+
+@app.route('/api/jobs/<job_id>/events')
+def analysis_job_events(job_id):
+    """
+    SSE: jedna zpráva 'result' na soubor (id = done_order, navázání přes Last-Event-ID),
+    'progress' s počty a nakonec 'complete'.
+    """
+    after = request.headers.get('Last-Event-ID', type=int) or request.args.get('after', 0, type=int) or 0
+
+    def generate():
+        last = after
+        while True:
+            job, results = analysis_jobs.wait_for_results(job_id, after=last, wait=15)
+            if job is None:
+                yield f"data: {json.dumps({'type': 'error', 'message': 'Úloha neexistuje nebo vypršela'})}\n\n"
+                return
+            for item in results:
+                last = item['done_order']
+                payload = {'type': 'result', 'seq': item['seq'], 'name': item['name'], 'result': item['result']}
+                yield f"id: {last}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            if results:
+                yield f"data: {json.dumps({'type': 'progress', 'current': max(job['done'], last), 'total': job['total']})}\n\n"
+            elif job['status'] != 'done':
+                # Keep-alive, aby proxy spojení nezavřela
+                yield ": ping\n\n"
+            if job['status'] == 'done' and last >= job['done']:
+                yield f"data: {json.dumps({'type': 'complete', 'total': job['total']})}\n\n"
+                return
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # =============================================================================
 # REGISTRACE ADMIN BLUEPRINTU
 # =============================================================================
@@ -0,0 +1,178 @@
+# result_cache.py
+# Cache výsledků analýzy podle obsahu: SHA-256 bajtů + verze engine
+# Build 41 | © 2025 Ing. Martin Cieślar
+#
+# - před SQLite tabulkou analysis_cache je paměťová LRU (na proces)
+# - verze engine = hash zdrojů desktop_agent/pdf_checker.py a tsa_registry.py;
+#   po jejich změně se paměťová cache vyprázdní a staré řádky v DB smažou
+# - ukládají se jen úspěšné analýzy (chyby a timeouty ne)
+#
+# Konfigurace (proměnné prostředí):
+#   ANALYSIS_CACHE_MAX_ENTRIES   max. počet řádků v DB (0 = cache vypnutá), výchozí 5000
+#   ANALYSIS_CACHE_MEMORY_ENTRIES  velikost paměťové LRU, výchozí 256
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINE_SOURCES = (
+    os.path.join(_PROJECT_ROOT, 'desktop_agent', 'pdf_checker.py'),
+    os.path.join(_PROJECT_ROOT, 'desktop_agent', 'tsa_registry.py'),
+)
+DEFAULT_MAX_ENTRIES = 5000
+DEFAULT_MEMORY_ENTRIES = 256
+VERSION_CHECK_INTERVAL = 5.0
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, '').strip() or default)
+    except ValueError:
+        return default
+
+
+def content_hash(content):
+    """SHA-256 obsahu (hex) – klíč cache."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class ResultCache:
+    """Cache wrapped výsledků engine (před flatten pro web UI) podle (sha256, engine_version)."""
+
+    def __init__(self, db_factory, max_entries=None, memory_entries=None, sources=ENGINE_SOURCES):
+        self._db_factory = db_factory
+        self._db = None
+        self.max_entries = _env_int('ANALYSIS_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES) if max_entries is None else max_entries
+        self.memory_entries = (_env_int('ANALYSIS_CACHE_MEMORY_ENTRIES', DEFAULT_MEMORY_ENTRIES)
+                               if memory_entries is None else memory_entries)
+        self._sources = tuple(sources)
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._version = None
+        self._version_stamp = None
+        self._version_checked = 0.0
+        self._stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'stores': 0, 'invalidations': 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @property
+    def db(self):
+        if self._db is None:
+            with self._lock:
+                if self._db is None:
+                    self._db = self._db_factory()
+        return self._db
+
+    def engine_version(self):
+        """Hash zdrojů engine; přepočítá se jen když se změní mtime/velikost (kontrola max. 1× za 5 s)."""
+        now = time.monotonic()
+        if self._version is not None and now - self._version_checked < VERSION_CHECK_INTERVAL:
+            return self._version
+        stamp = []
+        for path in self._sources:
+            try:
+                st = os.stat(path)
+                stamp.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append((path, None, None))
+        stamp = tuple(stamp)
+        with self._lock:
+            self._version_checked = now
+            if stamp == self._version_stamp:
+                return self._version
+        h = hashlib.sha256()
+        for path in self._sources:
+            try:
+                with open(path, 'rb') as f:
+                    h.update(f.read())
+            except OSError:
+                h.update(b'missing:' + os.path.basename(path).encode())
+        version = h.hexdigest()[:16]
+        with self._lock:
+            changed = self._version is not None and version != self._version
+            self._version = version
+            self._version_stamp = stamp
+            if changed:
+                self._memory.clear()
+                self._stats['invalidations'] += 1
+        # Řádky jiných verzí engine v DB už nikdy nebudou platit
+        try:
+            removed = self.db.purge_analysis_cache(keep_engine_version=version)
+            if removed:
+                logger.info('Cache analýz: smazáno %s záznamů staré verze engine', removed)
+        except Exception as e:
+            logger.warning('Cache analýz: úklid starých verzí selhal: %s', e)
+        return version
+
+    def get(self, file_hash, filename=None):
+        """Wrapped výsledek z cache (nová kopie), nebo None."""
+        if not self.enabled:
+            return None
+        version = self.engine_version()
+        key = (file_hash, version)
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+                self._stats['memory_hits'] += 1
+        if payload is None:
+            try:
+                payload = self.db.get_cached_analysis(file_hash, version)
+            except Exception:
+                payload = None
+            with self._lock:
+                if payload is None:
+                    self._stats['misses'] += 1
+                    return None
+                self._stats['db_hits'] += 1
+                self._remember(key, payload)
+        result = json.loads(payload)
+        if filename:
+            result['file_name'] = filename
+        result['from_cache'] = True
+        return result
+
+    def put(self, file_hash, wrapped):
+        """Uloží úspěšný wrapped výsledek; neúspěchy se necachují."""
+        if not self.enabled or not isinstance(wrapped, dict) or not wrapped.get('success'):
+            return
+        version = self.engine_version()
+        payload = json.dumps(wrapped, ensure_ascii=False, default=str)
+        with self._lock:
+            self._remember((file_hash, version), payload)
+            self._stats['stores'] += 1
+        try:
+            self.db.put_cached_analysis(file_hash, version, payload, max_entries=self.max_entries)
+        except Exception as e:
+            logger.warning('Cache analýz: uložení selhalo: %s', e)
+
+    def _remember(self, key, payload):
+        self._memory[key] = payload
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        """Počítadla hit/miss (za proces) a velikost cache."""
+        with self._lock:
+            out = dict(self._stats)
+            out['memory_entries'] = len(self._memory)
+        lookups = out['memory_hits'] + out['db_hits'] + out['misses']
+        out['hit_rate'] = round((out['memory_hits'] + out['db_hits']) / lookups, 3) if lookups else 0
+        out['enabled'] = self.enabled
+        out['max_entries'] = self.max_entries
+        out['engine_version'] = self._version
+        try:
+            out['db_entries'] = self.db.count_cached_analyses()
+        except Exception:
+            out['db_entries'] = None
+        return out
@@ -142,6 +142,8 @@ def load_settings_for_views(db):
     Načte všechna nastavení potřebná pro veřejné view (landing, checkout, VOP, GDPR, footer).
     Vrací slovník: vždy platné hodnoty (fallback pokud DB prázdná).
     """
+    # Desítky klíčů – jedním dotazem místo spojení na každý
+    db = db.global_settings_snapshot() if hasattr(db, 'global_settings_snapshot') else db
     out = {}
     for k in DEFAULTS:
         if isinstance(DEFAULTS[k], bool):
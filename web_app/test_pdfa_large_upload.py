@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Test: metadata PDF/A u velkého PDF (nad limitem byte-scanu enginu) s XMP uprostřed souboru.
+Engine nad 2 MB prochází jen začátek + konec; web detaily (pdfVersion, pdfaConformance, pdfaLevel)
+musí i tak odpovídat průchodu celým obsahem – stejně pro upload z paměti i soubor z disku.
+
+Spuštění: z adresáře web_app příkazem  python test_pdfa_large_upload.py
+"""
+import os
+import re
+import shutil
+import sys
+import tempfile
+
+# běh z web_app nebo z kořene projektu
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+PADDING = 1200 * 1024
+
+XMP = (
+    b'<?xpacket begin="" id="W5M0MpCehiHzreSzNTczkc9d"?>'
+    b'<x:xmpmeta xmlns:x="adobe:ns:meta/"><rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+    b'<rdf:Description rdf:about="" xmlns:pdfaid="http://www.aiim.org/pdfa/ns/id/"'
+    b' pdfaid:part="3" pdfaid:conformance="B"/>'
+    b'</rdf:RDF></x:xmpmeta><?xpacket end="w"?>'
+)
+
+
+def _build_pdf(padding):
+    """PDF 1.7 s platnou xref; výplňové streamy před a za XMP, takže XMP leží mimo začátek i konec."""
+    def stream(body, extra=b''):
+        return b'<< /Length %d%s >>\nstream\n' % (len(body), extra) + body + b'\nendstream'
+    objects = [
+        (1, b'<< /Type /Catalog /Pages 2 0 R /Metadata 4 0 R >>'),
+        (2, b'<< /Type /Pages /Kids [3 0 R] /Count 1 >>'),
+        (3, b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] >>'),
+        (5, stream(b'0' * padding)),
+        (4, stream(XMP, b' /Type /Metadata /Subtype /XML')),
+        (6, stream(b'0' * padding)),
+    ]
+    out = bytearray(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+    offsets = {}
+    for num, body in objects:
+        offsets[num] = len(out)
+        out += b'%d 0 obj\n' % num + body + b'\nendobj\n'
+    xref = len(out)
+    out += b'xref\n0 7\n0000000000 65535 f \n'
+    for num in range(1, 7):
+        out += b'%010d 00000 n \n' % offsets[num]
+    out += b'trailer\n<< /Size 7 /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % xref
+    return bytes(out)
+
+
+def _baseline_details(content):
+    """Web detaily tak, jak je dřív počítal _get_pdfa_details – regexy nad celým obsahem."""
+    from desktop_agent.pdf_checker import check_pdfa_version
+    pdf_header = re.search(rb'%PDF-(\d+\.\d+)', content[:100])
+    pdf_version = pdf_header.group(1).decode('ascii') if pdf_header else None
+    conf_match = re.search(rb"pdfaid:conformance=['\"]?([ABUYabuy])['\"]?", content, re.IGNORECASE)
+    conformance = conf_match.group(1).decode('ascii').lower() if conf_match else None
+    part = check_pdfa_version(content)[0]
+    if part == 3 and conformance:
+        level = f'A-3{conformance}'
+    elif part:
+        level = f'A-{part}'
+    else:
+        level = None
+    return {'pdfVersion': pdf_version, 'pdfaConformance': conformance, 'pdfaLevel': level}
+
+
+def _details(result):
+    return {key: result.get(key) for key in ('pdfVersion', 'pdfaConformance', 'pdfaLevel')}
+
+
+def main(tmp):
+    # Izolovaná DB (cache výsledků) a analýza v procesu testu
+    os.environ['DOKUCHECK_DB_PATH'] = os.path.join(tmp, 'test.db')
+    os.environ['ANALYSIS_POOL_WORKERS'] = '0'
+    os.environ['ANALYSIS_CACHE_MAX_ENTRIES'] = '0'
+    import pdf_check_web_main as web
+    from desktop_agent.pdf_checker import is_chunk_scanned
+
+    content = _build_pdf(PADDING)
+    start = content.index(b'<?xpacket begin')
+    if not is_chunk_scanned(len(content)) or start < 512 * 1024 or start > len(content) - 1024 * 1024:
+        print('FAIL: testovací PDF nemá XMP mimo začátek + konec byte-scanu')
+        return 1
+    expected = _baseline_details(content)
+    if expected != {'pdfVersion': '1.7', 'pdfaConformance': 'b', 'pdfaLevel': 'A-3b'}:
+        print(f'FAIL: neočekávaný stav průchodem celým obsahem: {expected}')
+        return 1
+
+    from_upload = web.analyze_pdf_from_content(content, filename='vykres_velky.pdf')
+    if from_upload.get('error') or _details(from_upload) != expected:
+        print(f'FAIL: upload z paměti: {_details(from_upload)} (chyba: {from_upload.get("error")}), čekáno {expected}')
+        return 1
+    print(f'OK: upload z paměti ({len(content) // 1024} kB): {_details(from_upload)}')
+
+    path = os.path.join(tmp, 'vykres_velky.pdf')
+    with open(path, 'wb') as f:
+        f.write(content)
+    from_disk = web.analyze_pdf_file(path)
+    if from_disk.get('error') or _details(from_disk) != expected:
+        print(f'FAIL: soubor z disku: {_details(from_disk)} (chyba: {from_disk.get("error")}), čekáno {expected}')
+        return 1
+    print(f'OK: soubor z disku: {_details(from_disk)}')
+
+    # Malý soubor se stejným XMP – detaily přímo ze značek enginu, výsledek stejný
+    small = _build_pdf(1024)
+    from_small = web.analyze_pdf_from_content(small, filename='vykres_maly.pdf')
+    if _details(from_small) != _baseline_details(small):
+        print(f'FAIL: malý soubor: {_details(from_small)}, čekáno {_baseline_details(small)}')
+        return 1
+    print(f'OK: malý soubor: {_details(from_small)}')
+
+    print('Všechny kontroly prošly.')
+    return 0
+
+
+if __name__ == '__main__':
+    tmp_dir = tempfile.mkdtemp(prefix='dokucheck_pdfa_')
+    try:
+        code = main(tmp_dir)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    sys.exit(code)